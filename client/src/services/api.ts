@@ -10,12 +10,23 @@ interface ApiResponse<T> {
   data?: T;
 }
 
+interface Citation {
+  document_id: string;
+  document: string;
+  article: string | null;
+  chapter: string | null;
+  section: string | null;
+  page: number | null;
+  view_url: string;
+}
+
 interface ChatResponse {
   answer: string;
   sources: Array<{
     content: string;
     metadata?: Record<string, any>;
   }>;
+  citations: Citation[];
 }
 
 interface UploadResponse {
@@ -144,5 +155,5 @@ class ApiService {
 }
 
 export const apiService = new ApiService();
-export type { ChatResponse, UploadResponse, DocumentInfo, Document, ModelInfo };
+export type { ChatResponse, Citation, UploadResponse, DocumentInfo, Document, ModelInfo };
 
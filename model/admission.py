@@ -0,0 +1,289 @@
+"""
+Controle de admissão das chamadas ao LLM do IB - EstradaResponde.
+
+Limita as respostas calculadas ao mesmo tempo e coloca o excedente numa fila
+limitada. A fila é justa entre clientes (cada cliente tem a sua própria fila
+e as vagas são distribuídas em rodízio), cada cliente pode ter poucas
+requisições na fila e nenhuma requisição espera mais que o orçamento de
+tempo. Quando não há como atender, a requisição é rejeitada de imediato com
+uma sugestão de quando tentar de novo, em vez de aumentar a latência de todos.
+
+Atende chamadores síncronos (threads do Flask) e assíncronos (servidor ASGI)
+com a mesma fila.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Requisição recusada pelo controle de admissão (servidor ocupado)."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f'Requisição recusada: {reason}')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """Requisição na fila; é acordada quando recebe uma vaga."""
+
+    __slots__ = ('client_id', 'enqueued_at', 'granted', '_event', '_loop', '_future')
+
+    def __init__(self, client_id: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.client_id = client_id
+        self.enqueued_at = time.perf_counter()
+        self.granted = False
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+            self._future = None
+        else:
+            self._event = None
+            self._future = loop.create_future()
+
+    def wake(self):
+        """Acorda o chamador (thread ou corrotina); chamado com a trava do controlador."""
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._set_future)
+
+    def _set_future(self):
+        if not self._future.done():
+            self._future.set_result(True)
+
+    def wait(self, timeout: float) -> bool:
+        return self._event.wait(timeout)
+
+    async def async_wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(asyncio.shield(self._future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class AdmissionController:
+    """Fila limitada e justa entre clientes na frente da cadeia de Q&A."""
+
+    def __init__(self, max_concurrent: int = 16, max_queue: int = 64,
+                 max_queue_wait_seconds: float = 10.0, max_queued_per_client: int = 4):
+        """
+        Inicializa o controle de admissão.
+
+        Args:
+            max_concurrent: Respostas calculadas ao mesmo tempo
+            max_queue: Tamanho máximo da fila (todas as requisições em espera)
+            max_queue_wait_seconds: Tempo máximo de espera na fila
+            max_queued_per_client: Requisições em espera por cliente
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_wait_seconds = max_queue_wait_seconds
+        self.max_queued_per_client = max_queued_per_client
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # Uma fila por cliente; a ordem das chaves define o rodízio
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._queued = 0
+
+        self._admitted = 0
+        self._rejected: Dict[str, int] = {'queue_full': 0, 'client_queue_full': 0, 'queue_timeout': 0}
+        self._recent_waits: Deque[float] = deque(maxlen=1024)
+        self._max_wait = 0.0
+        # Média móvel do tempo de atendimento (para a sugestão de nova tentativa)
+        self._service_seconds = 1.0
+
+    # ------------------------------------------------------------------
+    # Fila
+
+    def _enqueue(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.client_id)
+        if queue is None:
+            queue = self._queues[waiter.client_id] = deque()
+        queue.append(waiter)
+        self._queued += 1
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.client_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[waiter.client_id]
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """Próximo da fila em rodízio entre clientes."""
+        if not self._queues:
+            return None
+        client_id, queue = next(iter(self._queues.items()))
+        waiter = queue.popleft()
+        self._queued -= 1
+        del self._queues[client_id]
+        if queue:
+            # O cliente volta para o fim do rodízio
+            self._queues[client_id] = queue
+        return waiter
+
+    def _retry_after(self) -> int:
+        """Sugestão (segundos) de quando tentar novamente."""
+        backlog = (self._queued + self._in_flight) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(backlog * self._service_seconds))
+
+    def _try_admit(self, client_id: str) -> bool:
+        """
+        Admite de imediato ou verifica se a requisição pode esperar (chamado com a trava).
+
+        Returns:
+            True se admitido; False se a requisição deve entrar na fila
+
+        Raises:
+            AdmissionRejected: Se a fila geral ou a do cliente estiver cheia
+        """
+        if self._in_flight < self.max_concurrent and not self._queued:
+            self._in_flight += 1
+            self._record_admission(0.0)
+            return True
+        if self._queued >= self.max_queue:
+            self._rejected['queue_full'] += 1
+            raise AdmissionRejected('queue_full', self._retry_after())
+        queue = self._queues.get(client_id)
+        if queue is not None and len(queue) >= self.max_queued_per_client:
+            self._rejected['client_queue_full'] += 1
+            raise AdmissionRejected('client_queue_full', self._retry_after())
+        return False
+
+    def _record_admission(self, waited: float):
+        self._admitted += 1
+        self._recent_waits.append(waited)
+        self._max_wait = max(self._max_wait, waited)
+
+    def _wait_limit(self, max_wait_seconds: Optional[float]) -> float:
+        """Espera na fila: o limite do controlador ou o prazo da requisição, o menor."""
+        if max_wait_seconds is None:
+            return self.max_queue_wait_seconds
+        return max(0.0, min(self.max_queue_wait_seconds, max_wait_seconds))
+
+    def _resolve_wait(self, waiter: _Waiter):
+        """Conclui a espera: admitido ou removido da fila por tempo esgotado."""
+        with self._lock:
+            if waiter.granted:
+                self._record_admission(time.perf_counter() - waiter.enqueued_at)
+                return
+            self._remove(waiter)
+            self._rejected['queue_timeout'] += 1
+            retry_after = self._retry_after()
+        raise AdmissionRejected('queue_timeout', retry_after)
+
+    # ------------------------------------------------------------------
+    # API pública
+
+    @property
+    def queue_depth(self) -> int:
+        """Requisições esperando por uma vaga."""
+        return self._queued
+
+    def acquire(self, client_id: str = '', max_wait_seconds: Optional[float] = None):
+        """
+        Obtém uma vaga, esperando na fila até o orçamento de tempo.
+
+        Args:
+            client_id: Cliente da requisição (fila justa)
+            max_wait_seconds: Espera máxima desta requisição (ex: o que resta
+                do seu prazo); nunca ultrapassa max_queue_wait_seconds
+
+        Raises:
+            AdmissionRejected: Se a fila estiver cheia ou a espera esgotar
+        """
+        with self._lock:
+            if self._try_admit(client_id):
+                return
+            waiter = _Waiter(client_id)
+            self._enqueue(waiter)
+        waiter.wait(self._wait_limit(max_wait_seconds))
+        self._resolve_wait(waiter)
+
+    async def aacquire(self, client_id: str = '', max_wait_seconds: Optional[float] = None):
+        """Versão assíncrona de acquire (não bloqueia o event loop)."""
+        with self._lock:
+            if self._try_admit(client_id):
+                return
+            waiter = _Waiter(client_id, asyncio.get_running_loop())
+            self._enqueue(waiter)
+        try:
+            await waiter.async_wait(self._wait_limit(max_wait_seconds))
+        except asyncio.CancelledError:
+            # Cliente desistiu: sai da fila ou devolve a vaga já recebida
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._remove(waiter)
+            if granted:
+                self.release()
+            raise
+        self._resolve_wait(waiter)
+
+    def release(self, service_seconds: Optional[float] = None):
+        """
+        Libera a vaga, passando-a para o próximo da fila (se houver).
+
+        Args:
+            service_seconds: Tempo que a requisição ocupou a vaga (atualiza a
+                estimativa usada no Retry-After)
+        """
+        with self._lock:
+            if service_seconds is not None:
+                self._service_seconds = 0.8 * self._service_seconds + 0.2 * service_seconds
+            waiter = self._next_waiter()
+            if waiter is None:
+                self._in_flight -= 1
+                return
+            # A vaga passa direto para o próximo (in_flight não muda)
+            waiter.granted = True
+            waiter.wake()
+
+    @contextmanager
+    def admit(self, client_id: str = '', max_wait_seconds: Optional[float] = None):
+        """Context manager: acquire + release."""
+        self.acquire(client_id, max_wait_seconds)
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started_at)
+
+    @asynccontextmanager
+    async def aadmit(self, client_id: str = '', max_wait_seconds: Optional[float] = None):
+        """Context manager assíncrono: aacquire + release."""
+        await self.aacquire(client_id, max_wait_seconds)
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started_at)
+
+    def stats(self) -> dict:
+        """Retorna ocupação, fila e tempos de espera."""
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            return {
+                'max_concurrent': self.max_concurrent,
+                'in_flight': self._in_flight,
+                'queue_depth': self._queued,
+                'queued_clients': len(self._queues),
+                'max_queue': self.max_queue,
+                'max_queue_wait_seconds': self.max_queue_wait_seconds,
+                'admitted': self._admitted,
+                'rejected': dict(self._rejected),
+                'wait_seconds_avg': round(sum(waits) / len(waits), 4) if waits else 0.0,
+                'wait_seconds_p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4) if waits else 0.0,
+                'wait_seconds_max': round(self._max_wait, 4),
+                'service_seconds_avg': round(self._service_seconds, 3)
+            }
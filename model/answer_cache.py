@@ -0,0 +1,287 @@
+"""
+Cache de respostas do IB - EstradaResponde.
+
+Guarda as respostas do LLM para perguntas repetidas. A chave inclui a versão
+do corpus de documentos, o provedor, o modelo e a versão do prompt, de modo
+que uma resposta nunca é servida depois de um upload, exclusão ou
+renomeação de documentos.
+"""
+
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normaliza uma pergunta para uso como chave de cache.
+
+    Converte para minúsculas, remove acentos, espaços extras e a pontuação
+    final ("Qual é a multa?" e "qual e a multa" geram a mesma chave).
+
+    Args:
+        question: Pergunta do usuário
+
+    Returns:
+        Pergunta normalizada
+    """
+    if not question:
+        return ""
+    decomposed = unicodedata.normalize('NFKD', question.lower())
+    without_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(without_accents.split()).rstrip('?!.;: ')
+
+
+class _CacheEntry:
+    """Resposta armazenada e o custo original para calculá-la."""
+
+    __slots__ = ('value', 'expires_at', 'compute_seconds')
+
+    def __init__(self, value: Any, expires_at: float, compute_seconds: float):
+        self.value = value
+        self.expires_at = expires_at
+        self.compute_seconds = compute_seconds
+
+
+class AnswerCache:
+    """Cache LRU com expiração (TTL) e estatísticas de uso."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600):
+        """
+        Inicializa o cache.
+
+        Args:
+            max_entries: Número máximo de respostas guardadas (LRU)
+            ttl_seconds: Tempo de vida de cada resposta em segundos
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._saved_seconds = 0.0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Obtém uma resposta do cache.
+
+        Args:
+            key: Chave da resposta
+
+        Returns:
+            Valor guardado ou None se ausente/expirado
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            self._saved_seconds += entry.compute_seconds
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, compute_seconds: float = 0.0):
+        """
+        Guarda uma resposta no cache.
+
+        Args:
+            key: Chave da resposta
+            value: Resposta a guardar
+            compute_seconds: Tempo gasto para calcular a resposta (para a
+                estatística de latência economizada)
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = _CacheEntry(value, time.monotonic() + self.ttl_seconds, compute_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Remove todas as respostas guardadas (as estatísticas são mantidas)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Retorna estatísticas de uso do cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'saved_latency_seconds': round(self._saved_seconds, 3)
+            }
+
+
+class SemanticAnswerCache:
+    """
+    Cache de respostas por similaridade semântica entre perguntas.
+
+    Guarda o embedding das perguntas já respondidas num pequeno índice em
+    memória e reutiliza a resposta quando uma nova pergunta tem similaridade
+    de cosseno acima do limiar, dentro do mesmo escopo (versão do corpus,
+    provedor, modelo e versão do prompt).
+    """
+
+    def __init__(self, max_entries: int = 256, threshold: float = 0.92,
+                 ttl_seconds: float = 3600, audit_log_path: Optional[str] = None):
+        """
+        Inicializa o cache semântico.
+
+        Args:
+            max_entries: Número máximo de perguntas guardadas (LRU)
+            threshold: Similaridade de cosseno mínima para reutilizar a resposta
+            ttl_seconds: Tempo de vida de cada resposta em segundos
+            audit_log_path: Arquivo JSONL onde cada acerto é registrado (para
+                ajuste do limiar); None desativa o registro
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.audit_log_path = audit_log_path
+        # Entradas na ordem de uso (a mais antiga primeiro)
+        self._entries: list = []
+        self._lock = threading.Lock()
+        self._audit_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._saved_seconds = 0.0
+
+    @staticmethod
+    def _normalize_vector(embedding):
+        import numpy as np
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def get(self, question: str, embedding, scope: Hashable) -> Optional[Any]:
+        """
+        Procura uma resposta para uma pergunta semelhante.
+
+        Args:
+            question: Pergunta do usuário (usada apenas no registro de auditoria)
+            embedding: Embedding da pergunta
+            scope: Escopo da resposta (versão do corpus, provedor, modelo, prompt)
+
+        Returns:
+            Resposta guardada ou None se nenhuma pergunta for semelhante o bastante
+        """
+        import numpy as np
+
+        query = self._normalize_vector(embedding)
+        now = time.monotonic()
+        with self._lock:
+            self._entries = [entry for entry in self._entries if entry['expires_at'] > now]
+            candidates = [entry for entry in self._entries if entry['scope'] == scope]
+            best = None
+            similarity = 0.0
+            if candidates:
+                matrix = np.stack([entry['vector'] for entry in candidates])
+                scores = matrix @ query
+                index = int(np.argmax(scores))
+                similarity = float(scores[index])
+                if similarity >= self.threshold:
+                    best = candidates[index]
+            if best is None:
+                self._misses += 1
+                return None
+            position = next(i for i, entry in enumerate(self._entries) if entry is best)
+            self._entries.append(self._entries.pop(position))
+            self._hits += 1
+            self._saved_seconds += best['compute_seconds']
+
+        self._audit(question, best['question'], similarity)
+        return best['value']
+
+    def put(self, question: str, embedding, scope: Hashable, value: Any, compute_seconds: float = 0.0):
+        """
+        Guarda a resposta de uma pergunta.
+
+        Args:
+            question: Pergunta do usuário
+            embedding: Embedding da pergunta
+            scope: Escopo da resposta
+            value: Resposta a guardar
+            compute_seconds: Tempo gasto para calcular a resposta
+        """
+        if self.max_entries <= 0:
+            return
+        entry = {
+            'question': question,
+            'vector': self._normalize_vector(embedding),
+            'scope': scope,
+            'value': value,
+            'expires_at': time.monotonic() + self.ttl_seconds,
+            'compute_seconds': compute_seconds
+        }
+        with self._lock:
+            self._entries.append(entry)
+            if len(self._entries) > self.max_entries:
+                del self._entries[:len(self._entries) - self.max_entries]
+
+    def _audit(self, question: str, matched_question: str, similarity: float):
+        """Registra um acerto no log de auditoria (JSONL)."""
+        if not self.audit_log_path:
+            return
+        import json
+        import os
+        from datetime import datetime
+
+        record = {
+            'timestamp': datetime.now().isoformat(),
+            'question': question,
+            'matched_question': matched_question,
+            'similarity': round(similarity, 4),
+            'threshold': self.threshold
+        }
+        try:
+            with self._audit_lock:
+                directory = os.path.dirname(self.audit_log_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.audit_log_path, 'a', encoding='utf-8') as audit_file:
+                    audit_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.warning("Erro ao registrar auditoria do cache semântico: %s", e)
+
+    def clear(self):
+        """Remove todas as respostas guardadas (as estatísticas são mantidas)."""
+        with self._lock:
+            self._entries = []
+
+    def stats(self) -> dict:
+        """Retorna estatísticas de uso do cache semântico."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'saved_latency_seconds': round(self._saved_seconds, 3)
+            }
@@ -2,15 +2,53 @@
 API Flask para o sistema IB - EstradaResponde.
 """
 
+import logging
 import os
+import threading
+import time
 import uuid
 from typing import Optional
-from flask import Flask, request, jsonify
+
+# Início da importação da API (tempo de inicialização em /api/stats)
+_IMPORT_STARTED_AT = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from document_processor import DocumentProcessor
-from llm_providers import get_llm_provider
-from config import API_HOST, API_PORT, API_DEBUG, CORS_ORIGINS, LLM_PROVIDER
+from markdown_renderer import render_answer_html
+from citations import build_citations
+from llm_providers import get_llm_provider, create_provider, get_provider_class
+from llm_providers.base import PROMPT_VERSION, get_search_settings
+from llm_providers.record_replay_provider import replay_stats
+from index_snapshot import SnapshotRetriever
+from answer_cache import AnswerCache, SemanticAnswerCache, normalize_question
+from singleflight import SingleFlight
+from admission import AdmissionController, AdmissionRejected
+from load_policy import LoadPolicy, TIER_NORMAL, TIER_DEGRADED, apply_context_budget
+from deadline import Deadline, StageTimeout, run_stage
+import metrics
+import lazy_imports
+import profiling
+import usage
+from metrics import LLMTimingCallback, span
+from logging_setup import setup_logging, logging_stats
+from config import (
+    API_HOST, API_PORT, API_DEBUG, CORS_ORIGINS, LLM_PROVIDER, LLM_CONFIG, LLM_ROUTER_PROVIDERS,
+    CHROMA_COLLECTION_NAME,
+    ANSWER_CACHE_ENABLED, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_AUDIT_LOG, MAX_CONCURRENT_LLM_CALLS, SINGLE_FLIGHT_ENABLED,
+    LLM_QUEUE_MAX_SIZE, LLM_QUEUE_MAX_WAIT_SECONDS, LLM_QUEUE_MAX_PER_CLIENT,
+    DEGRADED_MODE_ENABLED, DEGRADED_QUEUE_DEPTH, DEGRADED_P95_SECONDS, DEGRADED_RECOVERY_RATIO,
+    DEGRADED_MIN_SECONDS, DEGRADED_LLM_PROVIDER, DEGRADED_MODEL, DEGRADED_MAX_TOKENS,
+    DEGRADED_SEARCH_K, DEGRADED_CONTEXT_CHARS, REQUEST_TIMEOUT_SECONDS, EMBEDDING_TIMEOUT_SECONDS,
+    RETRIEVAL_TIMEOUT_SECONDS, LLM_TIMEOUT_SECONDS, METRICS_ENABLED, PROFILING_ADMIN_TOKEN,
+    PROFILING_MAX_PROFILES, STARTUP_BUDGET_SECONDS
+)
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app, origins=CORS_ORIGINS)
@@ -20,6 +58,9 @@ UPLOAD_FOLDER = './uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
+# Formatos aceitos na resposta do /api/chat
+CHAT_RESPONSE_FORMATS = {'html', 'json'}
+
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
@@ -27,7 +68,53 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 # Instâncias globais
 document_processor = DocumentProcessor()
 llm_provider = None
+# Cadeia de Q&A publicada e a versão do corpus usada para montá-la; uma nova
+# cadeia só substitui a anterior depois de pronta
 qa_chain = None
+qa_chain_version = None
+qa_chain_lock = threading.Lock()
+# Cadeia do modo degradado (modelo mais barato, menos trechos), publicada junto com qa_chain
+degraded_provider = None
+degraded_qa_chain = None
+answer_cache = AnswerCache(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS) if ANSWER_CACHE_ENABLED else None
+semantic_cache = SemanticAnswerCache(
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    audit_log_path=SEMANTIC_CACHE_AUDIT_LOG
+) if SEMANTIC_CACHE_ENABLED else None
+# Vagas para chamadas ao LLM e fila justa entre clientes (compartilhada com o servidor ASGI)
+admission = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_LLM_CALLS,
+    max_queue=LLM_QUEUE_MAX_SIZE,
+    max_queue_wait_seconds=LLM_QUEUE_MAX_WAIT_SECONDS,
+    max_queued_per_client=LLM_QUEUE_MAX_PER_CLIENT
+)
+# Política de carga: escolhe o nível (normal ou degradado) de cada nova pergunta
+load_policy = LoadPolicy(
+    queue_depth_threshold=DEGRADED_QUEUE_DEPTH,
+    p95_threshold_seconds=DEGRADED_P95_SECONDS,
+    recovery_ratio=DEGRADED_RECOVERY_RATIO,
+    min_degraded_seconds=DEGRADED_MIN_SECONDS
+) if DEGRADED_MODE_ENABLED else None
+# Mensagem da resposta 503 quando não há vaga para a pergunta
+BUSY_MESSAGE = 'Olá! 😊 Estou a receber muitas perguntas neste momento. Por favor, tente novamente em alguns segundos.'
+# Perguntas idênticas em andamento (mesma chave do cache) são calculadas uma única vez
+answer_flight = SingleFlight() if SINGLE_FLIGHT_ENABLED else None
+# Erros do cálculo que dependem do cliente e do prazo de quem o executou
+LEADER_ERRORS = (AdmissionRejected, StageTimeout)
+
+startup_seconds = time.perf_counter() - _IMPORT_STARTED_AT
+lazy_imports.record_startup('api', startup_seconds)
+if startup_seconds > STARTUP_BUDGET_SECONDS:
+    logger.warning("Importação da API levou %.2fs (orçamento: %.2fs); detalhes: python -m benchmarks.bench_startup",
+                   startup_seconds, STARTUP_BUDGET_SECONDS)
+
+# Ocupação do LLM lida no momento da coleta das métricas
+metrics.REGISTRY.gauge('estrada_llm_in_flight', 'Respostas sendo calculadas pelo LLM',
+                       lambda: admission.stats()['in_flight'])
+metrics.REGISTRY.gauge('estrada_llm_queue_depth', 'Requisições esperando uma vaga no LLM',
+                       lambda: admission.queue_depth)
 
 
 def find_document_by_name(doc_name: str) -> Optional[str]:
@@ -35,54 +122,44 @@ def find_document_by_name(doc_name: str) -> Optional[str]:
     Encontra o nome exato de um documento no banco de dados fazendo lookup
     com normalização de nomes.
     
+    Usa o índice de nomes em memória do DocumentProcessor, que só é
+    reconstruído após upload, renomeação ou exclusão de documentos.
+    
     Args:
         doc_name: Nome do documento como gerado pelo LLM (ex: "Regulamento Pedagógico 2020")
         
     Returns:
         Nome exato do arquivo se encontrado, None caso contrário
     """
-    if not doc_name:
-        return None
-    
-    # Obter lista de documentos
-    documents_list = document_processor.get_documents_list()
-    if not documents_list:
-        return None
-    
-    # Função auxiliar para normalizar nomes
-    def normalize_name(name: str) -> str:
-        """Normaliza nome removendo espaços extras, convertendo para minúsculas, removendo .pdf"""
-        if not name:
-            return ""
-        normalized = name.strip().lower()
-        # Remover .pdf se presente
-        if normalized.endswith('.pdf'):
-            normalized = normalized[:-4]
-        # Substituir underscores e hífens por espaços
-        normalized = normalized.replace('_', ' ').replace('-', ' ')
-        # Remover espaços extras
-        normalized = ' '.join(normalized.split())
-        return normalized
-    
-    # Normalizar nome fornecido
-    doc_name_normalized = normalize_name(doc_name)
-    
-    # Tentar match exato primeiro (case-insensitive, sem .pdf)
-    for doc in documents_list:
-        doc_file_name = doc.get('name', '')
-        if normalize_name(doc_file_name) == doc_name_normalized:
-            return doc_file_name
-    
-    # Tentar match parcial (contém o nome normalizado)
-    for doc in documents_list:
-        doc_file_name = doc.get('name', '')
-        doc_normalized = normalize_name(doc_file_name)
-        # Verificar se o nome normalizado do documento contém o nome fornecido ou vice-versa
-        if doc_name_normalized in doc_normalized or doc_normalized in doc_name_normalized:
-            return doc_file_name
+    return document_processor.find_document_by_name(doc_name)
+
+
+def get_answer_cache_scope() -> tuple:
+    """
+    Retorna o escopo em que uma resposta em cache é válida.
     
-    # Se não encontrou, retornar None
-    return None
+    O escopo inclui a versão do corpus, o provedor, o modelo e a versão do
+    prompt, para que respostas antigas nunca sejam reutilizadas após
+    mudanças nos documentos ou na configuração do modelo.
+    """
+    if LLM_ROUTER_PROVIDERS:
+        # Com roteamento, a resposta pode vir de qualquer um dos provedores
+        provider = 'router'
+        model = tuple(LLM_CONFIG.get(name, {}).get('model') for name in LLM_ROUTER_PROVIDERS)
+    else:
+        provider = LLM_PROVIDER
+        model = LLM_CONFIG.get(LLM_PROVIDER, {}).get('model')
+    return (
+        document_processor.corpus_version,
+        provider,
+        model,
+        PROMPT_VERSION
+    )
+
+
+def get_answer_cache_key(question: str) -> tuple:
+    """Monta a chave do cache de respostas para uma pergunta."""
+    return (normalize_question(question),) + get_answer_cache_scope()
 
 
 def allowed_file(filename):
@@ -91,23 +168,119 @@ def allowed_file(filename):
 
 
 def initialize_qa_chain():
-    """Inicializa a cadeia de Q&A."""
-    global qa_chain, llm_provider
+    """
+    Inicializa a cadeia de Q&A para a versão atual do corpus.
     
-    vectorstore = document_processor.get_vectorstore()
-    if not vectorstore:
-        return None
+    A cadeia é montada com a trava de leitura do índice e publicada de uma
+    vez; se já houver uma cadeia para a versão atual, ela é reutilizada.
+    """
+    global qa_chain, qa_chain_version, degraded_qa_chain, llm_provider
+    
+    with document_processor.lock.read_locked(), qa_chain_lock:
+        version = document_processor.corpus_version
+        if qa_chain is not None and qa_chain_version == version:
+            return qa_chain
+        
+        # Com o snapshot do índice em memória, o worker não precisa abrir o ChromaDB
+        retriever = None
+        snapshot = document_processor.get_index_snapshot()
+        if snapshot is not None and snapshot.count:
+            search_type, search_kwargs = get_search_settings()
+            retriever = SnapshotRetriever(
+                snapshot=snapshot,
+                embeddings=document_processor.embeddings,
+                search_type=search_type,
+                search_kwargs=search_kwargs
+            )
+        
+        vectorstore = None if retriever else document_processor.get_vectorstore()
+        if not retriever and not vectorstore:
+            qa_chain, degraded_qa_chain, qa_chain_version = None, None, version
+            return None
+        
+        try:
+            if not llm_provider:
+                llm_provider = get_llm_provider()
+            chain = llm_provider.get_qa_chain(vectorstore, retriever=retriever)
+        except Exception as e:
+            logger.error("Erro ao inicializar QA chain: %s", e)
+            return None
+        degraded_chain = build_degraded_qa_chain(chain) if load_policy else None
+        qa_chain, degraded_qa_chain, qa_chain_version = chain, degraded_chain, version
+        return chain
+
+
+def build_degraded_qa_chain(chain):
+    """
+    Monta a cadeia do modo degradado a partir da cadeia normal.
+    
+    Usa o mesmo índice com menos trechos (DEGRADED_SEARCH_K) e o modelo mais
+    barato configurado em DEGRADED_LLM_PROVIDER/DEGRADED_MODEL.
+    
+    Returns:
+        Cadeia de Q&A ou None (o nível normal continua sendo usado)
+    """
+    global degraded_provider
     
     try:
-        if not llm_provider:
-            llm_provider = get_llm_provider()
-        qa_chain = llm_provider.get_qa_chain(vectorstore)
-        return qa_chain
+        if not degraded_provider:
+            degraded_provider = create_provider(
+                DEGRADED_LLM_PROVIDER, {'model': DEGRADED_MODEL, 'max_tokens': DEGRADED_MAX_TOKENS}
+            )
+        search_kwargs = dict(chain.retriever.search_kwargs, k=DEGRADED_SEARCH_K)
+        retriever = chain.retriever.model_copy(update={'search_kwargs': search_kwargs})
+        return degraded_provider.get_qa_chain(retriever=retriever)
     except Exception as e:
-        print(f"Erro ao inicializar QA chain: {str(e)}")
+        logger.error("Erro ao inicializar QA chain do modo degradado: %s", e)
         return None
 
 
+def get_profile_token() -> Optional[str]:
+    """Token de administrador do profiling enviado pelo cliente (header ou ?profile=)."""
+    return request.headers.get('X-Profile-Token') or request.args.get('profile')
+
+
+@app.before_request
+def start_request_profile():
+    """Perfila a requisição quando pedido com o token de administrador ou por amostragem."""
+    if not profiling.enabled() or request.path.startswith('/api/profiles'):
+        return
+    # A amostragem vale só para as perguntas; o token, para qualquer rota
+    trigger = profiling.profile_trigger(get_profile_token(), sampled=request.path == '/api/chat')
+    if trigger:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.request_profile = profiling.start(route, request.method, trigger)
+
+
+@app.before_request
+def sync_corpus_version():
+    """Recarrega o índice se outro worker alterou os documentos."""
+    g.request_started_at = time.perf_counter()
+    document_processor.refresh_corpus_version()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Conta a requisição e a sua duração (por rota, sem os parâmetros da URL)."""
+    started_at = g.get('request_started_at')
+    if started_at is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, time.perf_counter() - started_at)
+    profile = g.get('request_profile')
+    if profile is not None:
+        g.request_profile_status = response.status_code
+        response.headers['X-Profile-Id'] = profile.id
+    return response
+
+
+@app.teardown_request
+def finish_request_profile(error=None):
+    """Encerra e grava o perfil da requisição (depois de montada a resposta)."""
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        profiling.finish(profile, g.get('request_profile_status', 500))
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Endpoint de health check."""
@@ -170,21 +343,21 @@ def upload_files():
         # Processar PDFs
         result = document_processor.process_pdfs(pdf_paths)
         
-        # Inicializar QA chain
+        # Publicar a cadeia de Q&A para o novo corpus
         initialize_qa_chain()
         
         return jsonify({
             'success': True,
             'message': 'PDFs processados com sucesso',
             'files': [{'id': f['id'], 'name': f['name']} for f in uploaded_files],
+            'usage': result.pop('usage', None),
             'processing_info': result
         }), 200
     
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        print(f"Erro ao processar PDFs: {str(e)}")
-        print(f"Traceback completo:\n{error_trace}")
+        logger.exception("Erro ao processar PDFs: %s", e)
         return jsonify({
             'error': f'Erro ao processar PDFs: {str(e)}',
             'details': error_trace if API_DEBUG else None
@@ -197,10 +370,6 @@ def convert_markdown_to_html(text: str, base_url: str = None) -> str:
     Remove ## e * e converte para tags HTML apropriadas.
     Também converte citações de documentos em links clicáveis.
     """
-    import re
-    import html
-    from urllib.parse import quote
-    
     if not text:
         return text
     
@@ -208,829 +377,463 @@ def convert_markdown_to_html(text: str, base_url: str = None) -> str:
     if not base_url:
         base_url = request.host_url.rstrip('/') if hasattr(request, 'host_url') else 'http://localhost:5000'
     
-    # Função para criar link de documento
-    def create_document_link(match):
-        full_match = match.group(0)  # Texto completo da citação
-        article_part = match.group(1) if match.group(1) else ""  # Parte do artigo (Artigo X, etc.)
-        doc_name = match.group(2)  # Nome do documento
-        
-        # Criar URL do documento
-        encoded_name = quote(doc_name, safe='')
-        doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-        
-        # Criar link HTML
-        link_text = f"{article_part} do {doc_name}" if article_part else doc_name
-        link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(link_text)}</a>'
-        
-        # Retornar a citação com o link
-        if article_part:
-            return f"({article_part} do {link_html})"
-        else:
-            return f"({link_html})"
-    
-    # Padrão para detectar citações: (Artigo X do [Nome do documento]) ou (do [Nome do documento])
-    # Também captura variações como (Artigo X, número Y do [Nome]) ou (Artigo X, alínea Z do [Nome])
-    citation_pattern = r'\(([^)]*?)\s+do\s+\[([^\]]+)\]\)'
-    
-    # Função para criar link na seção de FONTES
-    def create_fontes_link(match):
-        full_line = match.group(0)  # Linha completa
-        doc_name_llm = match.group(1)  # Nome do documento como gerado pelo LLM (primeiro grupo)
-        article_info = match.group(2) if len(match.groups()) > 1 else ""  # Informação do artigo (segundo grupo)
-        
-        if not doc_name_llm:
-            return full_line  # Se não encontrou nome, retornar original
-        
-        # Fazer lookup do nome exato do documento no banco
-        doc_name_exact = find_document_by_name(doc_name_llm.strip())
-        
-        # Se não encontrou, usar o nome do LLM (pode funcionar se for exato)
-        if not doc_name_exact:
-            doc_name_exact = doc_name_llm.strip()
-        
-        # Criar URL do documento usando o nome exato
-        encoded_name = quote(doc_name_exact, safe='')
-        doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-        
-        # Criar link HTML (mostrar nome do LLM, mas usar nome exato na URL)
-        link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm.strip())}</a>'
-        
-        # Retornar a linha com o link
-        # Verificar se a linha original tinha hífen no início
-        has_hyphen = full_line.strip().startswith('-')
-        if article_info:
-            if has_hyphen:
-                return f"- {link_html}, {article_info.strip()}"
-            else:
-                return f"{link_html}, {article_info.strip()}"
-        else:
-            if has_hyphen:
-                return f"- {link_html}"
-            else:
-                return link_html
-    
-    # Padrão para detectar na seção FONTES: - [Nome do documento], Artigo X
-    # Também captura variações como: - [Nome], Artigo X ou - Nome do documento, Artigo X
-    # E também: Nome do documento, Artigo X (sem hífen e sem colchetes)
-    fontes_pattern_with_brackets = r'-\s+\[([^\]]+)\],\s*(.+)$'
-    fontes_pattern_without_brackets = r'-\s+([^,]+?),\s*(.+)$'
-    fontes_pattern_no_hyphen = r'^\s*([^,]+?),\s*(.+)$'  # Sem hífen no início, permite espaços
-    # Padrão específico para o formato do prompt: "Nome_do_documento.pdf, Artigo X"
-    # Este padrão deve capturar EXATAMENTE o formato que o Claude está gerando
-    fontes_pattern_prompt_format = r'^([A-Za-z0-9_\-\.\s]+?\.pdf|[A-Za-z0-9_\-\.\s]+?),\s*(.+)$'  # Captura nome com .pdf ou sem
-    # Padrão mais flexível para capturar qualquer formato: Nome, Artigo ou Nome.pdf, Artigo
-    fontes_pattern_flexible = r'([A-Za-z0-9_\-\.\s]+?\.pdf|[A-Za-z0-9_\-\.\s]+?),\s*(.+)$'  # Captura nome com ou sem .pdf
-    # Padrão SIMPLES e DIRETO: qualquer coisa antes de vírgula seguida de espaço e "Artigo"
-    fontes_pattern_simple = r'^([^,]+?),\s*(.+)$'  # Qualquer coisa antes da vírgula, depois vírgula + espaço + resto
-    
-    # Substituir citações por links ANTES de processar o resto do HTML
-    text = re.sub(citation_pattern, create_document_link, text)
+    with span('html_render'):
+        return render_answer_html(text, base_url, resolve_document=find_document_by_name)
+
+
+class ChatRequestError(Exception):
+    """Erro de validação ou de disponibilidade ao processar uma pergunta."""
     
-    # PROCESSAR SEÇÃO FONTES ANTES de converter para HTML (para evitar escape)
-    # Dividir em linhas para processar a seção FONTES separadamente
-    lines = text.split('\n')
-    processed_lines_fontes_pre = []
-    in_fontes_section_pre = False
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def parse_chat_request(data) -> tuple:
+    """
+    Valida o corpo de uma requisição de chat.
     
-    for i, line in enumerate(lines):
-        line_stripped = line.strip()
-        
-        # Detectar início da seção FONTES (pode ter --- antes ou não)
-        if re.match(r'^FONTES?:?\s*$', line_stripped, re.IGNORECASE):
-            in_fontes_section_pre = True
-            processed_lines_fontes_pre.append(line)
-            continue
-        
-        # Se a linha anterior era --- e esta é FONTES
-        if i > 0 and re.match(r'^-{3,}\s*$', lines[i-1].strip()) and re.match(r'^FONTES?:?\s*$', line_stripped, re.IGNORECASE):
-            in_fontes_section_pre = True
-            processed_lines_fontes_pre.append(line)
-            continue
+    Args:
+        data: Corpo JSON da requisição
         
-        # Se a linha contém "FONTES:" ou "REFERÊNCIAS:" (pode estar em qualquer lugar da linha)
-        if re.search(r'FONTES?:?\s*$', line_stripped, re.IGNORECASE) or re.search(r'REFERÊNCIAS?:?\s*$', line_stripped, re.IGNORECASE):
-            in_fontes_section_pre = True
-            processed_lines_fontes_pre.append(line)
-            continue
+    Returns:
+        Tupla (pergunta, formato da resposta)
         
-        # Se estamos na seção FONTES, processar links ANTES de converter para HTML
-        if in_fontes_section_pre:
-            if not line_stripped:  # Linha vazia
-                processed_lines_fontes_pre.append(line)
-                continue
-            elif line_stripped.startswith('---'):  # Separador
-                processed_lines_fontes_pre.append(line)
-                continue
-            else:
-                # Remover hífen inicial se existir
-                line_to_process = line_stripped.lstrip('-').strip()
-                has_hyphen = line_stripped.startswith('-')
-                
-                # Processar linha da seção FONTES - tentar múltiplos padrões
-                line_processed = None
-                
-                # Tentar padrões regex primeiro
-                # Primeiro tentar o padrão SIMPLES (mais permissivo): qualquer coisa antes de vírgula
-                line_processed = re.sub(fontes_pattern_simple, create_fontes_link, line_to_process)
-                if line_processed == line_to_process:
-                    # Depois tentar o formato específico do prompt: "Nome_do_documento.pdf, Artigo X"
-                    line_processed = re.sub(fontes_pattern_prompt_format, create_fontes_link, line_to_process)
-                if line_processed == line_to_process:
-                    line_processed = re.sub(fontes_pattern_with_brackets, create_fontes_link, line_to_process)
-                if line_processed == line_to_process:
-                    line_processed = re.sub(fontes_pattern_without_brackets, create_fontes_link, line_to_process)
-                if line_processed == line_to_process:
-                    line_processed = re.sub(fontes_pattern_no_hyphen, create_fontes_link, line_to_process)
-                if line_processed == line_to_process:
-                    line_processed = re.sub(fontes_pattern_flexible, create_fontes_link, line_to_process)
-                
-                # Se regex funcionou, garantir que está em <p>
-                if line_processed != line_to_process and '<a href=' in line_processed and not line_processed.startswith('<p>'):
-                    line_processed = f'<p>{line_processed}</p>'
-                
-                # Se nenhum padrão regex funcionou, usar fallback: dividir por vírgula
-                # Este é o formato esperado: "Nome_do_documento.pdf, Artigo X"
-                if line_processed == line_to_process and ',' in line_to_process:
-                    parts = line_to_process.split(',', 1)
-                    if len(parts) == 2:
-                        doc_name_llm = parts[0].strip()
-                        article_info = parts[1].strip()
-                        if doc_name_llm:
-                            # Remover colchetes se existirem
-                            doc_name_llm = doc_name_llm.strip('[]')
-                            # Remover espaços extras
-                            doc_name_llm = ' '.join(doc_name_llm.split())
-                            doc_name_exact = find_document_by_name(doc_name_llm)
-                            if not doc_name_exact:
-                                doc_name_exact = doc_name_llm
-                            encoded_name = quote(doc_name_exact, safe='')
-                            doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                            link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                            line_processed = f"{link_html}, {article_info}"
-                            # Envolver em <p> para preservar o HTML
-                            line_processed = f'<p>{line_processed}</p>'
-                
-                # Se ainda não processou, tentar padrão muito permissivo: qualquer texto antes de "Artigo" ou "Art."
-                if line_processed == line_to_process:
-                    # Procurar por "Artigo" ou "Art." na linha
-                    artigo_match = re.search(r'(Artigo|Art\.)\s+', line_to_process, re.IGNORECASE)
-                    if artigo_match:
-                        # Tudo antes de "Artigo" é o nome do documento
-                        doc_name_llm = line_to_process[:artigo_match.start()].strip().rstrip(',').strip()
-                        article_info = line_to_process[artigo_match.start():].strip()
-                        if doc_name_llm:
-                            doc_name_llm = doc_name_llm.strip('[]')
-                            doc_name_exact = find_document_by_name(doc_name_llm)
-                            if not doc_name_exact:
-                                doc_name_exact = doc_name_llm
-                            encoded_name = quote(doc_name_exact, safe='')
-                            doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                            link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                            line_processed = f"{link_html}, {article_info}"
-                            # Envolver em <p> para preservar o HTML
-                            line_processed = f'<p>{line_processed}</p>'
-                
-                # Adicionar hífen de volta se existia (mas não se já está em <p>)
-                if has_hyphen and line_processed != line_to_process and not line_processed.startswith('<p>'):
-                    line_processed = f"- {line_processed}"
-                elif has_hyphen and not line_processed.startswith('<p>'):
-                    line_processed = line_stripped
-                
-                # Se foi processado, usar o resultado; senão, tentar fallback direto
-                if line_processed != line_stripped and line_processed != line_to_process:
-                    # Se o resultado contém HTML (link), envolver em <p> para preservar
-                    if '<a href=' in line_processed and not line_processed.startswith('<p>'):
-                        processed_lines_fontes_pre.append(f'<p>{line_processed}</p>')
-                    else:
-                        processed_lines_fontes_pre.append(line_processed)
-                else:
-                    # FALLBACK GARANTIDO: Se não processou com regex, dividir por vírgula
-                    # Este é o formato exato: "Nome_do_documento.pdf, Artigo X"
-                    if ',' in line_to_process:
-                        parts = line_to_process.split(',', 1)
-                        if len(parts) == 2:
-                            doc_name_llm = parts[0].strip().strip('[]')
-                            article_info = parts[1].strip()
-                            if doc_name_llm:
-                                doc_name_llm = ' '.join(doc_name_llm.split())
-                                doc_name_exact = find_document_by_name(doc_name_llm)
-                                if not doc_name_exact:
-                                    doc_name_exact = doc_name_llm
-                                encoded_name = quote(doc_name_exact, safe='')
-                                doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                                link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                                line_processed = f"{link_html}, {article_info}"
-                                # SEMPRE envolver em <p> para preservar o HTML (ignorar hífen se existir)
-                                processed_lines_fontes_pre.append(f'<p>{line_processed}</p>')
-                            else:
-                                processed_lines_fontes_pre.append(line)
-                        else:
-                            processed_lines_fontes_pre.append(line)
-                    else:
-                        processed_lines_fontes_pre.append(line)
-        else:
-            processed_lines_fontes_pre.append(line)
-    
-    text = '\n'.join(processed_lines_fontes_pre)
-    
-    # Primeiro, processar títulos e listas (que começam no início da linha)
-    # Converter ## Título para <h2>Título</h2>
-    def replace_h2(match):
-        title = html.escape(match.group(1))
-        return f'<h2>{title}</h2>'
-    text = re.sub(r'^##\s+(.+)$', replace_h2, text, flags=re.MULTILINE)
+    Raises:
+        ChatRequestError: Se a pergunta ou o formato forem inválidos
+    """
+    if not data or 'question' not in data:
+        raise ChatRequestError('Pergunta não fornecida')
     
-    # Converter ### Subtítulo para <h3>Subtítulo</h3>
-    def replace_h3(match):
-        subtitle = html.escape(match.group(1))
-        return f'<h3>{subtitle}</h3>'
-    text = re.sub(r'^###\s+(.+)$', replace_h3, text, flags=re.MULTILINE)
+    question = data['question'].strip()
+    if not question:
+        raise ChatRequestError('Pergunta vazia')
     
-    # Converter linhas que começam com * (mas não **) para lista
-    def replace_star_list_item(match):
-        content = match.group(1)
-        # Processar **texto** antes de escapar
-        content = re.sub(r'\*\*([^*]+?)\*\*', r'<STRONG>\1</STRONG>', content)
-        # Escapar o conteúdo
-        content = html.escape(content)
-        # Restaurar tags <strong>
-        content = content.replace('&lt;STRONG&gt;', '<strong>')
-        content = content.replace('&lt;/STRONG&gt;', '</strong>')
-        return f'<li>{content}</li>'
-    text = re.sub(r'^\*\s+(.+)$', replace_star_list_item, text, flags=re.MULTILINE)
+    # Formato da resposta: 'html' (padrão, para o frontend) ou 'json' (compacto,
+    # com o texto original do modelo e apenas as citações estruturadas)
+    response_format = data.get('format', 'html')
+    if response_format not in CHAT_RESPONSE_FORMATS:
+        raise ChatRequestError(f'Formato inválido. Use: {", ".join(sorted(CHAT_RESPONSE_FORMATS))}')
     
-    # Converter linhas que começam com - para lista (mas não --- que é separador)
-    # MAS NÃO processar linhas que já têm links (seção FONTES já processada)
-    def replace_list_item(match):
-        content = match.group(1)
-        # Se já contém tag <a>, não processar (já foi processado na seção FONTES)
-        # Apenas envolver em <li> sem escapar
-        if '<a href=' in content:
-            return f'<li>{content}</li>'
-        # Processar **texto** antes de escapar
-        content = re.sub(r'\*\*([^*]+?)\*\*', r'<STRONG>\1</STRONG>', content)
-        # Escapar o conteúdo, mas preservar tags HTML existentes (como links)
-        # Dividir por tags HTML e escapar apenas o texto
-        parts = re.split(r'(<a[^>]*>.*?</a>)', content)
-        processed_parts = []
-        for part in parts:
-            if part.startswith('<a'):
-                # É um link, manter como está
-                processed_parts.append(part)
-            else:
-                # Escapar HTML e restaurar <strong>
-                escaped = html.escape(part)
-                escaped = escaped.replace('&lt;STRONG&gt;', '<strong>')
-                escaped = escaped.replace('&lt;/STRONG&gt;', '</strong>')
-                processed_parts.append(escaped)
-        return f'<li>{"".join(processed_parts)}</li>'
-    text = re.sub(r'^-\s+(.+)$', replace_list_item, text, flags=re.MULTILINE)
+    return question, response_format
+
+
+def lookup_cached_answer(question: str) -> tuple:
+    """
+    Procura a resposta de uma pergunta no cache exato.
     
-    # Envolver grupos consecutivos de <li> com <ul>
-    # Primeiro, vamos processar grupos de <li> que estão na mesma "área"
-    # Mas preservar linhas que já têm links (seção FONTES)
-    lines = text.split('\n')
-    processed_lines = []
-    current_list_items = []
-    in_fontes_list = False
+    Não calcula o embedding da pergunta: ele só é necessário (para o cache
+    semântico e a busca) quando a pergunta não está no cache exato.
     
-    for line in lines:
-        line_stripped = line.strip()
-        
-        # Se é um título FONTES, marcar que estamos em lista de fontes
-        if '<h3>FONTES:</h3>' in line_stripped:
-            in_fontes_list = True
-            # Se havia itens de lista acumulados, envolver com <ul>
-            if current_list_items:
-                processed_lines.append('<ul>')
-                processed_lines.extend(current_list_items)
-                processed_lines.append('</ul>')
-                current_list_items = []
-            processed_lines.append(line)
-            continue
+    Args:
+        question: Pergunta do usuário
         
-        # Se é um <li> e estamos na seção FONTES, adicionar à lista
-        if in_fontes_list and line_stripped.startswith('<li>'):
-            current_list_items.append(line_stripped)
-        elif in_fontes_list and not line_stripped.startswith('<li>') and line_stripped:
-            # Sair da seção FONTES
-            in_fontes_list = False
-            # Envolver itens de FONTES com <ul>
-            if current_list_items:
-                processed_lines.append('<ul>')
-                processed_lines.extend(current_list_items)
-                processed_lines.append('</ul>')
-                current_list_items = []
-            processed_lines.append(line)
-        elif line_stripped.startswith('<li>'):
-            current_list_items.append(line_stripped)
-        else:
-            # Se havia itens de lista acumulados, envolver com <ul>
-            if current_list_items:
-                processed_lines.append('<ul>')
-                processed_lines.extend(current_list_items)
-                processed_lines.append('</ul>')
-                current_list_items = []
-            processed_lines.append(line)
-    
-    # Se ainda há itens de lista no final
-    if current_list_items:
-        processed_lines.append('<ul>')
-        processed_lines.extend(current_list_items)
-        processed_lines.append('</ul>')
+    Returns:
+        Tupla (resposta ou None, chave do cache)
+    """
+    # Perguntas repetidas são respondidas pelo cache (mesma versão do corpus)
+    cache_key = get_answer_cache_key(question)
+    response = None
+    if answer_cache:
+        response = answer_cache.get(cache_key)
+        metrics.CACHE_LOOKUPS.inc(cache='answer', result='hit' if response is not None else 'miss')
+    if response is not None:
+        metrics.CHAT_ANSWERS.inc(source='cache', tier=response.get('tier', TIER_NORMAL))
+    return response, cache_key
+
+
+def lookup_semantic_answer(question: str, cache_key: tuple, question_embedding) -> Optional[dict]:
+    """
+    Procura a resposta de uma pergunta parafraseada no cache semântico.
     
-    text = '\n'.join(processed_lines)
+    Args:
+        question: Pergunta do usuário (não encontrada no cache exato)
+        cache_key: Chave retornada por lookup_cached_answer
+        question_embedding: Embedding da pergunta
+        
+    Returns:
+        Resposta ou None
+    """
+    if not semantic_cache:
+        return None
+    response = None
+    try:
+        response = semantic_cache.get(question, question_embedding, cache_key[1:])
+        metrics.CACHE_LOOKUPS.inc(cache='semantic', result='hit' if response is not None else 'miss')
+    except Exception as e:
+        logger.warning("Erro ao consultar cache semântico: %s", e)
+    if response is not None:
+        metrics.CHAT_ANSWERS.inc(source='cache', tier=response.get('tier', TIER_NORMAL))
+    return response
+
+
+def embed_question(question: str) -> list:
+    """Embedding da pergunta (cache de consultas ou provedor), medido na etapa query_embedding."""
+    with span('query_embedding'):
+        return document_processor.embeddings.embed_query(question)
+
+
+def store_answer(question: str, cache_key: tuple, question_embedding, chain_response: dict,
+                 elapsed: float) -> dict:
+    """
+    Guarda a resposta da cadeia de Q&A nos caches.
     
-    # Converter título FONTES para <h3> se ainda não foi convertido
-    text = re.sub(r'^FONTES?:?\s*$', '<h3>FONTES:</h3>', text, flags=re.MULTILINE | re.IGNORECASE)
+    Respostas do modo degradado não são guardadas: quando a carga cair, a
+    mesma pergunta volta a ser respondida pelo nível normal. O tempo gasto
+    alimenta a política de carga.
     
-    # Converter **texto** para <strong>texto</strong> (fazer antes de escapar)
-    text = re.sub(r'\*\*([^*]+?)\*\*', r'<STRONG>\1</STRONG>', text)
+    Args:
+        question: Pergunta do usuário
+        cache_key: Chave retornada por lookup_cached_answer
+        question_embedding: Embedding da pergunta (ou None)
+        chain_response: Resultado da cadeia de Q&A
+        elapsed: Tempo gasto pela cadeia (segundos)
+        
+    Returns:
+        Resposta no formato guardado em cache ('result', 'source_documents' e 'tier')
+    """
+    response = {
+        'result': chain_response['result'],
+        'source_documents': chain_response.get('source_documents') or [],
+        'tier': chain_response.get('tier', TIER_NORMAL)
+    }
+    metrics.CHAT_ANSWERS.inc(source='llm', tier=response['tier'])
+    if load_policy:
+        load_policy.record_latency(elapsed)
+    if response['tier'] != TIER_NORMAL:
+        return response
+    if answer_cache:
+        answer_cache.put(cache_key, response, elapsed)
+    if semantic_cache and question_embedding is not None:
+        semantic_cache.put(question, question_embedding, cache_key[1:], response, elapsed)
+    return response
+
+
+def build_chat_payload(response: dict, base_url: str, response_format: str, cached: bool,
+                       request_usage: Optional[dict] = None) -> dict:
+    """
+    Monta o corpo da resposta do /api/chat.
     
-    # Converter *texto* (não negrito, não lista) para <strong>texto</strong>
-    # Apenas se não for no início da linha (já processamos listas)
-    text = re.sub(r'(?<!^)\*([^*\n\s]+?)\*(?!\s|$)', r'<STRONG>\1</STRONG>', text, flags=re.MULTILINE)
+    Args:
+        response: Resposta ('result' e 'source_documents')
+        base_url: URL base para os links de documentos
+        response_format: 'html' ou 'json'
+        cached: Se a resposta veio de um cache
+        request_usage: Tokens e custo gastos pela requisição (usage.RequestUsage.to_dict)
+        
+    Returns:
+        Dicionário pronto para ser serializado em JSON
+    """
+    # Citações estruturadas a partir dos metadados recuperados
+    retrieved_documents = response.get('source_documents') or []
+    citations = build_citations(retrieved_documents, base_url, resolve_document=find_document_by_name)
+    
+    if response_format == 'json':
+        return {
+            'answer': response['result'],
+            'citations': citations,
+            'cached': cached,
+            'tier': response.get('tier', TIER_NORMAL),
+            'usage': request_usage
+        }
+    
+    # Converter Markdown para HTML
+    answer_html = convert_markdown_to_html(response['result'], base_url=base_url)
+    
+    # Extrair documentos fonte
+    source_documents = []
+    for doc in retrieved_documents:
+        source_documents.append({
+            'content': doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content,
+            'metadata': doc.metadata if hasattr(doc, 'metadata') else {}
+        })
+    
+    return {
+        'answer': answer_html,
+        'sources': source_documents,
+        'citations': citations,
+        'cached': cached,
+        'tier': response.get('tier', TIER_NORMAL),
+        'usage': request_usage
+    }
+
+
+def get_ready_qa_chain(tier: str = TIER_NORMAL) -> tuple:
+    """
+    Retorna a cadeia de Q&A da versão atual do corpus, inicializando-a se necessário.
     
-    # PROCESSAR SEÇÃO FONTES NOVAMENTE (caso tenha sido convertida para <p>)
-    # Verificar se há linhas na seção FONTES que ainda não foram processadas
-    # Esta é uma passada FINAL e AGRESSIVA para garantir que TODAS as linhas sejam processadas
-    lines = text.split('\n')
-    processed_lines_fontes_final = []
-    in_fontes_section_final = False
+    Args:
+        tier: Nível pedido; sem cadeia do modo degradado, o normal é usado
     
-    for i, line in enumerate(lines):
-        line_stripped = line.strip()
-        original_line = line
-        
-        # Detectar início da seção FONTES (múltiplas formas)
-        if '<h3>FONTES:</h3>' in line_stripped or '<h3>FONTES:</h3>' in line:
-            in_fontes_section_final = True
-            processed_lines_fontes_final.append(line)
-            continue
-        if re.match(r'^FONTES?:?\s*$', line_stripped, re.IGNORECASE):
-            in_fontes_section_final = True
-            processed_lines_fontes_final.append('<h3>FONTES:</h3>')
-            continue
-        if re.search(r'FONTES?:?\s*$', line_stripped, re.IGNORECASE) or re.search(r'REFERÊNCIAS?:?\s*$', line_stripped, re.IGNORECASE):
-            in_fontes_section_final = True
-            if '<h3>' not in line_stripped:
-                processed_lines_fontes_final.append('<h3>FONTES:</h3>')
-            else:
-                processed_lines_fontes_final.append(line)
-            continue
-        
-        # Se estamos na seção FONTES, processar TODAS as linhas que ainda não têm links
-        if in_fontes_section_final:
-            # Se já tem link, manter como está
-            if '<a href=' in line_stripped:
-                processed_lines_fontes_final.append(line)
-                continue
-            
-            # Processar linhas dentro de <p>
-            if line_stripped.startswith('<p>') and '</p>' in line_stripped:
-                # Extrair conteúdo do <p>
-                content_match = re.match(r'<p>(.*?)</p>', line_stripped, re.DOTALL)
-                if content_match:
-                    content = content_match.group(1)
-                    # Desescapar HTML se necessário (pode ter sido escapado antes)
-                    try:
-                        content_unescaped = html.unescape(content)
-                    except:
-                        content_unescaped = content
-                    
-                    # Tentar processar com múltiplos padrões
-                    line_processed = None
-                    for content_to_try in [content, content_unescaped]:
-                        # Tentar padrões regex - primeiro o formato específico do prompt
-                        line_processed = re.sub(fontes_pattern_prompt_format, create_fontes_link, content_to_try)
-                        if line_processed != content_to_try:
-                            break
-                        line_processed = re.sub(fontes_pattern_no_hyphen, create_fontes_link, content_to_try)
-                        if line_processed != content_to_try:
-                            break
-                        line_processed = re.sub(fontes_pattern_flexible, create_fontes_link, content_to_try)
-                        if line_processed != content_to_try:
-                            break
-                        
-                        # Fallback: dividir por vírgula (formato esperado: "Nome_do_documento.pdf, Artigo X")
-                        if ',' in content_to_try:
-                            parts = content_to_try.split(',', 1)
-                            if len(parts) == 2:
-                                doc_name_llm = parts[0].strip()
-                                article_info = parts[1].strip()
-                                if doc_name_llm:
-                                    # Remover colchetes se existirem
-                                    doc_name_llm = doc_name_llm.strip('[]')
-                                    # Remover espaços extras
-                                    doc_name_llm = ' '.join(doc_name_llm.split())
-                                    doc_name_exact = find_document_by_name(doc_name_llm)
-                                    if not doc_name_exact:
-                                        doc_name_exact = doc_name_llm
-                                    encoded_name = quote(doc_name_exact, safe='')
-                                    doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                                    link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                                    line_processed = f"{link_html}, {article_info}"
-                                    break
-                        
-                        # Fallback alternativo: procurar por "Artigo"
-                        artigo_match = re.search(r'(Artigo|Art\.)\s+', content_to_try, re.IGNORECASE)
-                        if artigo_match:
-                            doc_name_llm = content_to_try[:artigo_match.start()].strip().rstrip(',').strip()
-                            article_info = content_to_try[artigo_match.start():].strip()
-                            if doc_name_llm:
-                                doc_name_llm = doc_name_llm.strip('[]')
-                                doc_name_exact = find_document_by_name(doc_name_llm)
-                                if not doc_name_exact:
-                                    doc_name_exact = doc_name_llm
-                                encoded_name = quote(doc_name_exact, safe='')
-                                doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                                link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                                line_processed = f"{link_html}, {article_info}"
-                                break
-                    
-                    if line_processed and line_processed != content and line_processed != content_unescaped:
-                        processed_lines_fontes_final.append(f'<p>{line_processed}</p>')
-                    else:
-                        processed_lines_fontes_final.append(line)
-                else:
-                    processed_lines_fontes_final.append(line)
-            elif not line_stripped or line_stripped == '</ul>' or line_stripped.startswith('<ul'):
-                processed_lines_fontes_final.append(line)
-            elif '<a href=' in line_stripped:
-                # Já tem link, manter como está
-                processed_lines_fontes_final.append(line)
-            # Processar linhas de texto simples que ainda não foram convertidas para <p>
-            elif line_stripped and not line_stripped.startswith('<p>') and not line_stripped.startswith('<') and not line_stripped.startswith('</'):
-                # Linha de texto simples na seção FONTES - FORÇAR processamento
-                line_to_process = line_stripped.lstrip('-').strip()
-                has_hyphen = line_stripped.startswith('-')
-                
-                # SEMPRE tentar processar se tem vírgula ou "Artigo"
-                should_process = ',' in line_to_process or re.search(r'(Artigo|Art\.)', line_to_process, re.IGNORECASE)
-                
-                if should_process:
-                    line_processed = None
-                    
-                    # Tentar padrões regex primeiro
-                    line_processed = re.sub(fontes_pattern_prompt_format, create_fontes_link, line_to_process)
-                    if line_processed == line_to_process:
-                        line_processed = re.sub(fontes_pattern_no_hyphen, create_fontes_link, line_to_process)
-                    if line_processed == line_to_process:
-                        line_processed = re.sub(fontes_pattern_flexible, create_fontes_link, line_to_process)
-                    
-                    # FALLBACK GARANTIDO: dividir por vírgula
-                    if line_processed == line_to_process and ',' in line_to_process:
-                        parts = line_to_process.split(',', 1)
-                        if len(parts) == 2:
-                            doc_name_llm = parts[0].strip().strip('[]')
-                            article_info = parts[1].strip()
-                            if doc_name_llm:
-                                doc_name_llm = ' '.join(doc_name_llm.split())  # Remover espaços extras
-                                doc_name_exact = find_document_by_name(doc_name_llm)
-                                if not doc_name_exact:
-                                    doc_name_exact = doc_name_llm
-                                encoded_name = quote(doc_name_exact, safe='')
-                                doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                                link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                                line_processed = f"{link_html}, {article_info}"
-                    
-                    # Se ainda não processou, procurar por "Artigo"
-                    if line_processed == line_to_process:
-                        artigo_match = re.search(r'(Artigo|Art\.)\s+', line_to_process, re.IGNORECASE)
-                        if artigo_match:
-                            doc_name_llm = line_to_process[:artigo_match.start()].strip().rstrip(',').strip()
-                            article_info = line_to_process[artigo_match.start():].strip()
-                            if doc_name_llm:
-                                doc_name_llm = doc_name_llm.strip('[]')
-                                doc_name_llm = ' '.join(doc_name_llm.split())
-                                doc_name_exact = find_document_by_name(doc_name_llm)
-                                if not doc_name_exact:
-                                    doc_name_exact = doc_name_llm
-                                encoded_name = quote(doc_name_exact, safe='')
-                                doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                                link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                                line_processed = f"{link_html}, {article_info}"
-                    
-                    # Se processou, adicionar como <p> com link
-                    if line_processed and line_processed != line_to_process:
-                        if has_hyphen:
-                            line_processed = f"- {line_processed}"
-                        processed_lines_fontes_final.append(f'<p>{line_processed}</p>')
-                    else:
-                        # Se não processou mas tem vírgula, forçar criação de link
-                        if ',' in line_to_process:
-                            parts = line_to_process.split(',', 1)
-                            if len(parts) == 2:
-                                doc_name_llm = parts[0].strip()
-                                article_info = parts[1].strip()
-                                if doc_name_llm:
-                                    doc_name_llm = ' '.join(doc_name_llm.split())
-                                    doc_name_exact = find_document_by_name(doc_name_llm)
-                                    if not doc_name_exact:
-                                        doc_name_exact = doc_name_llm
-                                    encoded_name = quote(doc_name_exact, safe='')
-                                    doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                                    link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                                    line_processed = f"{link_html}, {article_info}"
-                                    if has_hyphen:
-                                        line_processed = f"- {line_processed}"
-                                    processed_lines_fontes_final.append(f'<p>{line_processed}</p>')
-                                else:
-                                    processed_lines_fontes_final.append(f'<p>{line_stripped}</p>')
-                            else:
-                                processed_lines_fontes_final.append(f'<p>{line_stripped}</p>')
-                        else:
-                            # Envolver em <p> mesmo sem processar
-                            processed_lines_fontes_final.append(f'<p>{line_stripped}</p>')
-                else:
-                    # Linha sem vírgula nem "Artigo" - pode ser separador ou título
-                    if not line_stripped or line_stripped.startswith('---'):
-                        processed_lines_fontes_final.append(line)
-                    else:
-                        # Envolver em <p> mesmo sem processar
-                        processed_lines_fontes_final.append(f'<p>{line_stripped}</p>')
-            else:
-                # Se não é <p> nem vazio, pode ser que saiu da seção FONTES
-                if line_stripped and not line_stripped.startswith('<') and not line_stripped.startswith('</'):
-                    # Verificar se ainda está na seção FONTES (pode ser uma linha de texto sem formatação)
-                    if ',' in line_stripped or re.search(r'(Artigo|Art\.)', line_stripped, re.IGNORECASE):
-                        # Ainda parece ser uma linha de FONTES, processar
-                        line_to_process = line_stripped.lstrip('-').strip()
-                        has_hyphen = line_stripped.startswith('-')
-                        if ',' in line_to_process:
-                            parts = line_to_process.split(',', 1)
-                            if len(parts) == 2:
-                                doc_name_llm = parts[0].strip().strip('[]')
-                                article_info = parts[1].strip()
-                                if doc_name_llm:
-                                    doc_name_exact = find_document_by_name(doc_name_llm)
-                                    if not doc_name_exact:
-                                        doc_name_exact = doc_name_llm
-                                    encoded_name = quote(doc_name_exact, safe='')
-                                    doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                                    link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                                    line_processed = f"{link_html}, {article_info}"
-                                    if has_hyphen:
-                                        line_processed = f"- {line_processed}"
-                                    processed_lines_fontes_final.append(f'<p>{line_processed}</p>')
-                                else:
-                                    processed_lines_fontes_final.append(line)
-                            else:
-                                processed_lines_fontes_final.append(line)
-                        else:
-                            processed_lines_fontes_final.append(line)
-                    else:
-                        # Sair da seção FONTES
-                        in_fontes_section_final = False
-                        processed_lines_fontes_final.append(line)
-                else:
-                    processed_lines_fontes_final.append(line)
-        else:
-            processed_lines_fontes_final.append(line)
+    Returns:
+        Tupla (cadeia de Q&A, nível da cadeia)
     
-    text = '\n'.join(processed_lines_fontes_final)
+    Raises:
+        ChatRequestError: Se não houver documentos ou o modelo não puder ser inicializado
+    """
+    with qa_chain_lock:
+        current = qa_chain_version == document_processor.corpus_version
+        chain = qa_chain if current else None
+    if chain is None:
+        chain = initialize_qa_chain()
+    if not chain:
+        raise ChatRequestError(
+            'Olá! 😊 No momento não consigo responder suas perguntas. Por favor, tente novamente em alguns instantes.'
+        )
+    if tier == TIER_DEGRADED:
+        with qa_chain_lock:
+            degraded_chain = degraded_qa_chain
+        if degraded_chain is not None:
+            return degraded_chain, TIER_DEGRADED
+    return chain, TIER_NORMAL
+
+
+def select_tier() -> str:
+    """Nível da próxima pergunta, segundo a política de carga (normal sem o modo degradado)."""
+    return load_policy.select_tier(admission.queue_depth) if load_policy else TIER_NORMAL
+
+
+def retrieve_documents(question: str, tier: str = TIER_NORMAL) -> tuple:
+    """
+    Busca os trechos relevantes para a pergunta.
     
-    # Dividir em linhas para processar parágrafos
-    lines = text.split('\n')
-    result_lines = []
+    A busca é feita com a trava de leitura do índice: uploads e exclusões
+    esperam a busca terminar e nunca recriam o vectorstore no meio dela.
+    A chamada ao LLM acontece depois, sem a trava. No modo degradado o
+    contexto também é limitado a DEGRADED_CONTEXT_CHARS.
     
-    for line in lines:
-        original_line = line
-        line_stripped = line.strip()
-        
-        # Se já é uma tag HTML (h2, h3, ul, li, hr), adicionar diretamente
-        if (line_stripped.startswith('<h') or line_stripped.startswith('<ul') or line_stripped.startswith('<li') or 
-            line_stripped.startswith('</ul') or line_stripped.startswith('<hr') or line_stripped.startswith('</hr')):
-            result_lines.append(line_stripped)
-            continue
-        
-        # Se linha vazia, pular
-        if not line_stripped:
-            continue
-        
-        # Se a linha é apenas --- ou --- com espaços, converter para <hr>
-        if re.match(r'^-{3,}\s*$', line_stripped):
-            result_lines.append('<hr>')
-            continue
-        
-        # CRÍTICO: Se a linha já é um parágrafo completo com link (vem da seção FONTES), 
-        # adicionar diretamente SEM PROCESSAR - NÃO ESCAPAR
-        if line_stripped.startswith('<p>') and '</p>' in line_stripped and '<a href=' in line_stripped:
-            result_lines.append(line_stripped)
-            continue
-        
-        # Se a linha já contém tags <a> (links de documentos), não escapar o HTML
-        if '<a href=' in line_stripped or line_stripped.startswith('<a'):
-            # Apenas escapar partes que não são links
-            # Dividir por tags <a> e processar separadamente
-            parts = re.split(r'(<a[^>]*>.*?</a>)', line_stripped)
-            processed_parts = []
-            for part in parts:
-                if part.startswith('<a'):
-                    # É um link, manter como está
-                    processed_parts.append(part)
-                else:
-                    # Escapar HTML e restaurar <strong>
-                    escaped = html.escape(part)
-                    escaped = escaped.replace('&lt;STRONG&gt;', '<strong>')
-                    escaped = escaped.replace('&lt;/STRONG&gt;', '</strong>')
-                    processed_parts.append(escaped)
-            result_lines.append(f'<p>{"".join(processed_parts)}</p>')
-        else:
-            # Escapar HTML no conteúdo
-            line_escaped = html.escape(line_stripped)
-            
-            # Restaurar tags <strong> que foram escapadas
-            line_escaped = line_escaped.replace('&lt;STRONG&gt;', '<strong>')
-            line_escaped = line_escaped.replace('&lt;/STRONG&gt;', '</strong>')
-            
-            # Adicionar como parágrafo
-            result_lines.append(f'<p>{line_escaped}</p>')
+    Returns:
+        Tupla (cadeia de Q&A usada, documentos recuperados, nível usado)
+    """
+    with document_processor.lock.read_locked():
+        chain, tier = get_ready_qa_chain(tier)
+        with span('vector_search'):
+            source_documents = chain.retriever.invoke(question)
+    if tier == TIER_DEGRADED:
+        source_documents = apply_context_budget(source_documents, DEGRADED_CONTEXT_CHARS)
+    metrics.RETRIEVED_CHUNKS.inc(len(source_documents))
+    return chain, source_documents, tier
+
+
+def run_qa_chain(question: str, tier: str = TIER_NORMAL, deadline: Optional[Deadline] = None) -> dict:
+    """
+    Responde uma pergunta: busca no índice e geração da resposta pelo LLM.
     
-    # Juntar todas as linhas
-    result = '\n'.join(result_lines)
+    Cada etapa (embedding da pergunta, busca e geração) respeita o seu
+    limite e o prazo total da pergunta.
     
-    # PROCESSAMENTO FINAL AGRESSIVO DA SEÇÃO FONTES
-    # Processar TODAS as linhas <p> na seção FONTES que ainda não têm links
-    lines_final = result.split('\n')
-    processed_lines_final_fontes = []
-    in_fontes_final = False
+    Raises:
+        StageTimeout: Se uma etapa esgotar o tempo
     
-    for line in lines_final:
-        line_stripped = line.strip()
-        
-        # Detectar seção FONTES - múltiplas formas
-        if '<h3>FONTES:</h3>' in line_stripped or '<h3>FONTES:</h3>' in line:
-            in_fontes_final = True
-            processed_lines_final_fontes.append(line)
-            continue
-        
-        # Detectar seção FONTES por texto "FONTES:" ou "FONTES" (pode estar em <strong> ou <p>)
-        if re.search(r'FONTES?:?\s*', line_stripped, re.IGNORECASE):
-            in_fontes_final = True
-            processed_lines_final_fontes.append(line)
-            continue
-        
-        if in_fontes_final:
-            # Se já tem link em <p>, manter SEM PROCESSAR
-            if '<a href=' in line_stripped and line_stripped.startswith('<p>') and '</p>' in line_stripped:
-                processed_lines_final_fontes.append(line)
-                continue
-            
-            # Processar linhas <p> que não têm links
-            if line_stripped.startswith('<p>') and '</p>' in line_stripped and '<a href=' not in line_stripped:
-                print(f"DEBUG: Processando linha FONTES: {line_stripped[:100]}")
-                content_match = re.match(r'<p>(.*?)</p>', line_stripped, re.DOTALL)
-                if content_match:
-                    content = content_match.group(1)
-                    # Desescapar HTML
-                    try:
-                        content_unescaped = html.unescape(content)
-                    except:
-                        content_unescaped = content
-                    
-                    # Remover tags HTML que possam estar no conteúdo (como <strong>)
-                    content_clean = re.sub(r'<[^>]+>', '', content_unescaped)
-                    content_clean = content_clean.strip()
-                    
-                    # Se a linha contém apenas o nome do arquivo sem vírgula e artigo, pular (formato incorreto)
-                    # O formato correto deve ter vírgula: "Nome_arquivo.pdf, Artigo X"
-                    if not ',' in content_clean:
-                        print(f"DEBUG: Linha FONTES sem vírgula (formato incorreto): {content_clean}")
-                        # Não processar - deixar como está ou remover
-                        processed_lines_final_fontes.append(line)
-                        continue
-                    
-                    # FORÇAR processamento: dividir por vírgula se tiver
-                    # Este é o formato esperado: "Nome_do_documento.pdf, Artigo X"
-                    if ',' in content_clean and not '<a href=' in content_clean:
-                        parts = content_clean.split(',', 1)
-                        if len(parts) == 2:
-                            doc_name_llm = parts[0].strip().strip('[]')
-                            article_info = parts[1].strip()
-                            if doc_name_llm:
-                                # Remover espaços extras
-                                doc_name_llm = ' '.join(doc_name_llm.split())
-                                doc_name_exact = find_document_by_name(doc_name_llm)
-                                if not doc_name_exact:
-                                    doc_name_exact = doc_name_llm
-                                encoded_name = quote(doc_name_exact, safe='')
-                                doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                                link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                                processed_lines_final_fontes.append(f'<p>{link_html}, {article_info}</p>')
-                                print(f"DEBUG: Link criado para '{doc_name_llm}' -> '{doc_name_exact}'")
-                            else:
-                                processed_lines_final_fontes.append(line)
-                        else:
-                            processed_lines_final_fontes.append(line)
-                    elif '<a href=' in content_clean:
-                        # Já tem link, manter
-                        processed_lines_final_fontes.append(line)
-                    else:
-                        # Tentar processar mesmo sem vírgula (pode ser formato diferente)
-                        processed_lines_final_fontes.append(line)
-                else:
-                    processed_lines_final_fontes.append(line)
-            else:
-                # Se não é <p>, verificar se é uma linha de texto simples na seção FONTES
-                if line_stripped and not line_stripped.startswith('<') and ',' in line_stripped:
-                    # Tentar processar linha de texto simples
-                    parts = line_stripped.split(',', 1)
-                    if len(parts) == 2:
-                        doc_name_llm = parts[0].strip().strip('[]')
-                        article_info = parts[1].strip()
-                        if doc_name_llm:
-                            doc_name_llm = ' '.join(doc_name_llm.split())
-                            doc_name_exact = find_document_by_name(doc_name_llm)
-                            if not doc_name_exact:
-                                doc_name_exact = doc_name_llm
-                            encoded_name = quote(doc_name_exact, safe='')
-                            doc_url = f"{base_url}/api/documents/{encoded_name}/view"
-                            link_html = f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" class="document-link" style="color: #059669; text-decoration: underline; font-weight: 500;">{html.escape(doc_name_llm)}</a>'
-                            processed_lines_final_fontes.append(f'<p>{link_html}, {article_info}</p>')
-                            print(f"DEBUG: Link criado (linha simples) para '{doc_name_llm}' -> '{doc_name_exact}'")
-                        else:
-                            processed_lines_final_fontes.append(line)
-                    else:
-                        processed_lines_final_fontes.append(line)
-                else:
-                    processed_lines_final_fontes.append(line)
-        else:
-            processed_lines_final_fontes.append(line)
+    Returns:
+        Dicionário com 'result' e 'source_documents' (como o RetrievalQA) e 'tier'
+    """
+    deadline = deadline or Deadline(REQUEST_TIMEOUT_SECONDS)
+    # O embedding fica no cache de consultas e é reutilizado pela busca
+    run_stage('embedding', lambda: embed_question(question), deadline, EMBEDDING_TIMEOUT_SECONDS)
+    chain, source_documents, tier = run_stage('retrieval', lambda: retrieve_documents(question, tier),
+                                              deadline, RETRIEVAL_TIMEOUT_SECONDS)
+    combine_chain = chain.combine_documents_chain
+    output = run_stage(
+        'llm', lambda: combine_chain.invoke({'input_documents': source_documents, 'question': question},
+                                            config={'callbacks': [LLMTimingCallback()]}),
+        deadline, LLM_TIMEOUT_SECONDS
+    )
+    return {'result': output[combine_chain.output_key], 'source_documents': source_documents, 'tier': tier}
+
+
+def compute_answer(question: str, cache_key: tuple, question_embedding, client_id: str = '',
+                   deadline: Optional[Deadline] = None) -> dict:
+    """
+    Calcula a resposta de uma pergunta que não está em cache e a guarda nos caches.
     
-    result = '\n'.join(processed_lines_final_fontes)
+    A busca e a chamada ao LLM só começam depois de o controle de admissão
+    conceder uma vaga ao cliente. Se uma etapa esgotar o tempo, a vaga só é
+    liberada quando a chamada abandonada terminar, para que o limite de
+    chamadas simultâneas continue valendo.
     
-    # Limpar parágrafos vazios e espaços extras
-    result = re.sub(r'<p>\s*</p>', '', result)
-    result = re.sub(r'\n\s*\n', '\n', result)
+    Raises:
+        AdmissionRejected: Se não houver vaga dentro do tempo máximo de espera
+            (limitado pelo que resta do prazo)
+        StageTimeout: Se uma etapa esgotar o tempo
     
-    return result
+    Returns:
+        Resposta no formato guardado em cache ('result' e 'source_documents')
+    """
+    deadline = deadline or Deadline(REQUEST_TIMEOUT_SECONDS)
+    # A espera na fila não passa do prazo da requisição
+    admission.acquire(client_id, deadline.remaining())
+    started_at = time.perf_counter()
+    release_now = True
+    try:
+        deadline.check('queue')
+        chain_response = run_qa_chain(question, select_tier(), deadline)
+    except StageTimeout as e:
+        if e.future is not None:
+            release_now = False
+            e.future.add_done_callback(lambda _: admission.release(time.perf_counter() - started_at))
+        raise
+    finally:
+        if release_now:
+            admission.release(time.perf_counter() - started_at)
+    return store_answer(question, cache_key, question_embedding, chain_response,
+                        time.perf_counter() - started_at)
+
+
+def get_client_id() -> str:
+    """Identifica o cliente para a fila justa (primeiro IP do X-Forwarded-For ou o endereço remoto)."""
+    forwarded_for = request.headers.get('X-Forwarded-For', '')
+    if forwarded_for:
+        return forwarded_for.split(',')[0].strip()
+    return request.remote_addr or ''
+
+
+def timeout_payload(error: StageTimeout) -> dict:
+    """Corpo da resposta 504, com a etapa que esgotou o tempo."""
+    return {
+        'error': f'Erro ao processar pergunta: {str(error)}',
+        'stage': error.stage,
+        'timeout_seconds': round(error.timeout_seconds, 1)
+    }
+
+
+def busy_response(error: AdmissionRejected):
+    """Resposta 503 (servidor ocupado) com a sugestão de nova tentativa."""
+    response = jsonify({'error': BUSY_MESSAGE, 'retry_after': error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
 
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Endpoint para fazer perguntas ao IB - EstradaResponde."""
-    data = request.get_json()
-    
-    if not data or 'question' not in data:
-        return jsonify({'error': 'Pergunta não fornecida'}), 400
-    
-    question = data['question'].strip()
-    if not question:
-        return jsonify({'error': 'Pergunta vazia'}), 400
-    
-    # Inicializar QA chain se necessário
-    if not qa_chain:
-        chain = initialize_qa_chain()
-        if not chain:
-            return jsonify({
-                'error': 'Olá! 😊 No momento não consigo responder suas perguntas. Por favor, tente novamente em alguns instantes.'
-            }), 400
-    
     try:
-        response = qa_chain({'query': question})
+        question, response_format = parse_chat_request(request.get_json())
+        deadline = Deadline(REQUEST_TIMEOUT_SECONDS)
+        # Tokens gastos por esta requisição (zero para respostas em cache)
+        with usage.collect() as request_usage:
+            # O embedding da pergunta só é calculado se ela não estiver no cache exato
+            response, cache_key = lookup_cached_answer(question)
+            question_embedding = None
+            if response is None and semantic_cache:
+                question_embedding = run_stage('embedding', lambda: embed_question(question),
+                                               deadline, EMBEDDING_TIMEOUT_SECONDS)
+                response = lookup_semantic_answer(question, cache_key, question_embedding)
+            cached = response is not None
+            if not cached:
+                client_id = get_client_id()
+                if answer_flight:
+                    # A resposta é guardada no cache antes de a chave sair da tabela,
+                    # então quem chega depois encontra a resposta no cache. Vaga
+                    # negada ou prazo esgotado valem só para o líder: quem esperava
+                    # calcula com o próprio cliente e o próprio prazo
+                    response, _ = answer_flight.do(
+                        cache_key, lambda: compute_answer(question, cache_key, question_embedding, client_id, deadline),
+                        retry_errors=LEADER_ERRORS, deadline=deadline
+                    )
+                else:
+                    response = compute_answer(question, cache_key, question_embedding, client_id, deadline)
         
         # Obter base URL para links
         base_url = request.host_url.rstrip('/') if request.host_url else 'http://localhost:5000'
         
-        # Converter Markdown para HTML
-        answer_html = convert_markdown_to_html(response['result'], base_url=base_url)
-        
-        # DEBUG TEMPORÁRIO: Verificar se links estão sendo gerados
-        if 'FONTES' in answer_html:
-            fontes_start = answer_html.find('FONTES')
-            fontes_section = answer_html[fontes_start:fontes_start+1000]
-            print("=" * 80)
-            print("DEBUG: Seção FONTES no HTML gerado:")
-            print(fontes_section)
-            print(f"DEBUG: Contém '<a href=': {'<a href=' in fontes_section}")
-            print(f"DEBUG: Total de '<a href=' no HTML completo: {answer_html.count('<a href=')}")
-            print("=" * 80)
-        
-        # Extrair documentos fonte
-        source_documents = []
-        if 'source_documents' in response and response['source_documents']:
-            for doc in response['source_documents']:
-                source_documents.append({
-                    'content': doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content,
-                    'metadata': doc.metadata if hasattr(doc, 'metadata') else {}
-                })
-        
-        return jsonify({
-            'answer': answer_html,
-            'sources': source_documents
-        }), 200
-    
+        payload = build_chat_payload(response, base_url, response_format, cached, request_usage.to_dict())
+        return jsonify(payload), 200
+    
+    except ChatRequestError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except StageTimeout as e:
+        return jsonify(timeout_payload(e)), 504
     except Exception as e:
         return jsonify({'error': f'Erro ao processar pergunta: {str(e)}'}), 500
 
 
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Endpoint com estatísticas de desempenho (caches, embeddings, contenção do índice e fila do LLM)."""
+    return jsonify({
+        'corpus_version': document_processor.corpus_version,
+        'qa_chain_version': qa_chain_version,
+        'corpus_reloads': document_processor.corpus_reloads,
+        'index_lock': document_processor.lock.stats(),
+        'answer_cache': answer_cache.stats() if answer_cache else {'enabled': False},
+        'semantic_cache': semantic_cache.stats() if semantic_cache else {'enabled': False},
+        'query_embeddings': document_processor.embeddings.stats(),
+        'single_flight': answer_flight.stats() if answer_flight else {'enabled': False},
+        'admission': admission.stats(),
+        'load_policy': load_policy.stats() if load_policy else {'enabled': False},
+        'llm_router': llm_provider.stats() if hasattr(llm_provider, 'stats') else {'enabled': False},
+        'llm_replay': replay_stats(),
+        'imports': lazy_imports.stats(),
+        'logging': logging_stats()
+    }), 200
+
+
+@app.route('/api/usage', methods=['GET'])
+def get_usage():
+    """Endpoint com os tokens e custos agregados por dia, provedor/modelo e documento."""
+    return jsonify(usage.LEDGER.summary()), 200
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Endpoint de métricas (latência por etapa, requisições, caches, chunks e tokens) no formato do Prometheus."""
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Métricas desativadas (METRICS_ENABLED=False)'}), 404
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def check_profiles_access():
+    """Resposta de erro se os perfis não puderem ser consultados, ou None."""
+    if not profiling.enabled():
+        return jsonify({'error': 'Profiling desativado (PROFILING_ADMIN_TOKEN e PROFILING_SAMPLE_RATE)'}), 404
+    if PROFILING_ADMIN_TOKEN and not profiling.is_authorized(get_profile_token()):
+        return jsonify({'error': 'Token de profiling inválido'}), 403
+    return None
+
+
+@app.route('/api/profiles', methods=['GET'])
+def get_profiles():
+    """Endpoint com os perfis de requisições mais recentes (?limit=, padrão 20)."""
+    error = check_profiles_access()
+    if error:
+        return error
+    limit = max(1, min(request.args.get('limit', 20, type=int), PROFILING_MAX_PROFILES))
+    return jsonify({'profiles': profiling.list_profiles(limit)}), 200
+
+
+@app.route('/api/profiles/<profile_id>/<kind>', methods=['GET'])
+def get_profile_file(profile_id, kind):
+    """Endpoint para baixar um perfil: 'json' (resumo), 'folded' (flame graph) ou 'prof' (pstats)."""
+    from flask import send_file
+
+    error = check_profiles_access()
+    if error:
+        return error
+    path = profiling.profile_path(profile_id, kind)
+    if path is None:
+        return jsonify({'error': 'Perfil não encontrado'}), 404
+    if kind == 'prof':
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True)
+    return send_file(path, mimetype='application/json' if kind == 'json' else 'text/plain')
+
+
 @app.route('/api/documents', methods=['GET'])
 def get_documents():
     """Endpoint para obter informações sobre documentos processados."""
-    vectorstore = document_processor.get_vectorstore()
+    with document_processor.lock.read_locked():
+        return _describe_documents()
+
+
+def _describe_documents():
+    """Monta a resposta de GET /api/documents (com a trava de leitura do índice)."""
+    snapshot = document_processor.get_index_snapshot()
+    vectorstore = None if snapshot is not None else document_processor.get_vectorstore()
     
-    if not vectorstore:
+    if not vectorstore and not (snapshot is not None and snapshot.count):
         return jsonify({
             'has_documents': False,
             'message': 'Nenhum documento processado',
@@ -1040,9 +843,12 @@ def get_documents():
         }), 200
     
     try:
-        # Obter informações da collection
-        collection = vectorstore._collection
-        count = collection.count()
+        # Obter informações da collection (ou do snapshot do índice)
+        if snapshot is not None:
+            count, collection_name = snapshot.count, CHROMA_COLLECTION_NAME
+        else:
+            collection = vectorstore._collection
+            count, collection_name = collection.count(), collection.name
         
         # Obter lista de documentos com metadados
         documents_list = document_processor.get_documents_list()
@@ -1051,7 +857,7 @@ def get_documents():
             'has_documents': True,
             'document_count': len(documents_list),
             'total_chunks': count,
-            'collection_name': collection.name,
+            'collection_name': collection_name,
             'documents': documents_list
         }), 200
     except Exception as e:
@@ -1069,8 +875,7 @@ def clear_documents():
     """Endpoint para limpar todos os documentos."""
     try:
         document_processor.clear_vectorstore()
-        global qa_chain
-        qa_chain = None
+        initialize_qa_chain()
         
         # Limpar arquivos de upload
         for filename in os.listdir(UPLOAD_FOLDER):
@@ -1094,17 +899,15 @@ def delete_document(document_name):
     try:
         # Decodificar nome do documento
         doc_name = unquote(document_name)
-        print(f"[DELETE] Nome recebido na URL (raw): {repr(document_name)}")
-        print(f"[DELETE] Nome decodificado: {repr(doc_name)}")
-        print(f"[DELETE] Tipo: {type(doc_name)}, Len: {len(doc_name)}")
+        logger.debug("[DELETE] Nome recebido na URL: %r, decodificado: %r", document_name, doc_name)
         
-        # Listar documentos disponíveis para debug
         docs_list = document_processor.get_documents_list()
-        print(f"[DELETE] Documentos disponíveis: {[repr(d['name']) for d in docs_list]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[DELETE] Documentos disponíveis: %s", [d['name'] for d in docs_list])
         
         # Verificar se há match exato
         exact_match = any(d['name'] == doc_name for d in docs_list)
-        print(f"[DELETE] Match exato encontrado: {exact_match}")
+        logger.debug("[DELETE] Match exato encontrado: %s", exact_match)
         
         # Se não há match exato, tentar encontrar usando match parcial/normalizado
         if not exact_match and docs_list:
@@ -1117,20 +920,20 @@ def delete_document(document_name):
                 return normalized
             
             doc_name_normalized = normalize_name(doc_name)
-            print(f"[DELETE] Tentando encontrar documento usando match normalizado: {repr(doc_name_normalized)}")
+            logger.debug("[DELETE] Tentando encontrar documento usando match normalizado: %r", doc_name_normalized)
             
             found = False
             for doc in docs_list:
                 doc_normalized = normalize_name(doc['name'])
                 if doc_normalized == doc_name_normalized or doc_normalized.lower() == doc_name_normalized.lower():
-                    print(f"[DELETE] Match encontrado! Usando: {repr(doc['name'])}")
+                    logger.debug("[DELETE] Match encontrado! Usando: %r", doc['name'])
                     doc_name = doc['name']  # Usar o nome exato do ChromaDB
                     found = True
                     break
             
             # Última tentativa: se houver apenas um documento, usar ele
             if not found and len(docs_list) == 1:
-                print(f"[DELETE] Usando único documento disponível como fallback")
+                logger.debug("[DELETE] Usando único documento disponível como fallback")
                 doc_name = docs_list[0]['name']
                 found = True
         
@@ -1138,9 +941,7 @@ def delete_document(document_name):
         success = document_processor.delete_document(doc_name)
         
         if success:
-            # Reinicializar QA chain
-            global qa_chain
-            qa_chain = None
+            # Publicar a cadeia de Q&A para o novo corpus
             initialize_qa_chain()
             
             return jsonify({
@@ -1157,9 +958,7 @@ def delete_document(document_name):
                 'error': error_msg
             }), 404
     except Exception as e:
-        import traceback
-        print(f"[DELETE] Erro: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("[DELETE] Erro: %s", e)
         return jsonify({'error': f'Erro ao deletar documento: {str(e)}'}), 500
 
 
@@ -1173,9 +972,8 @@ def view_document(document_name):
         # Decodificar nome do documento
         doc_name = unquote(document_name)
         
-        # Obter lista de documentos para encontrar o caminho
-        documents_list = document_processor.get_documents_list()
-        document = next((d for d in documents_list if d['name'] == doc_name), None)
+        # Obter o documento pelo índice de nomes para encontrar o caminho
+        document = document_processor.name_index.get(doc_name)
         
         if not document or not document.get('file_path'):
             return jsonify({'error': 'Documento não encontrado'}), 404
@@ -1202,19 +1000,62 @@ def view_document(document_name):
 def get_model_info():
     """Endpoint para obter informações sobre o modelo LLM atual."""
     try:
-        from config import LLM_CONFIG
         provider_name = LLM_PROVIDER
         config = LLM_CONFIG.get(provider_name, {})
         
-        return jsonify({
+        info = {
             'provider': provider_name,
             'model': config.get('model', 'N/A'),
             'temperature': config.get('temperature', 'N/A')
-        }), 200
+        }
+        if LLM_ROUTER_PROVIDERS:
+            info['provider'] = 'router'
+            info['model'] = 'N/A'
+            info['router_providers'] = [
+                {'provider': name, 'model': LLM_CONFIG.get(name, {}).get('model', 'N/A')}
+                for name in LLM_ROUTER_PROVIDERS
+            ]
+        return jsonify(info), 200
     except Exception as e:
         return jsonify({'error': f'Erro ao obter informações do modelo: {str(e)}'}), 500
 
 
+def preload_dependencies(include_chromadb: bool = True) -> dict:
+    """
+    Importa os SDKs que a configuração atual vai usar, sem criar clientes.
+    
+    Os provedores e o ChromaDB são importados sob demanda (lazy_imports); com
+    gunicorn --preload, o mestre chama esta função antes do fork para que os
+    workers já nasçam com os módulos usados (páginas compartilhadas) e a
+    primeira pergunta de cada worker não pague a importação. Os SDKs de
+    provedores não configurados continuam fora do processo.
+    
+    Args:
+        include_chromadb: Importa também o ChromaDB (dispensável com o
+            snapshot do índice, quando os workers não abrem o ChromaDB)
+        
+    Returns:
+        Segundos gastos por módulo importado
+    """
+    started = dict(lazy_imports.stats()['lazy_loads'])
+    providers = set(LLM_ROUTER_PROVIDERS or [LLM_PROVIDER])
+    if DEGRADED_MODE_ENABLED:
+        providers.add(DEGRADED_LLM_PROVIDER)
+    for name in sorted(providers):
+        try:
+            get_provider_class(name.lower())
+        except ValueError as e:
+            logger.warning("Provedor não pré-carregado: %s", e)
+    lazy_imports.import_module('langchain_openai')
+    if include_chromadb:
+        lazy_imports.import_module('chromadb')
+        lazy_imports.import_module('langchain_community.vectorstores.chroma')
+    return {
+        name: load['seconds'] for name, load in lazy_imports.stats()['lazy_loads'].items()
+        if name not in started
+    }
+
+
 def print_startup_info():
     """Imprime informações sobre a configuração do sistema ao iniciar."""
     print("\n" + "="*60)
@@ -1228,6 +1069,8 @@ def print_startup_info():
     
     print(f"\n📊 CONFIGURAÇÃO DO MODELO LLM:")
     print(f"   Provedor: {provider_name}")
+    if LLM_ROUTER_PROVIDERS:
+        print(f"   Roteamento: {', '.join(LLM_ROUTER_PROVIDERS)} (failover entre provedores)")
     print(f"   Modelo: {config.get('model', 'N/A')}")
     print(f"   Temperatura: {config.get('temperature', 'N/A')}")
     print(f"   Max Tokens: {config.get('max_tokens', 'N/A')}")
@@ -0,0 +1,277 @@
+"""
+Aplicação ASGI do IB - EstradaResponde (modo de produção assíncrono).
+
+POST /api/chat é atendido por um handler assíncrono nativo: a chamada ao
+LLM usa ainvoke, de modo que uma pergunta aguardando o modelo não ocupa uma
+thread. O trabalho síncrono (a busca no vectorstore, protegida pela trava de
+leitura do índice, as consultas aos caches e a montagem da resposta, que
+pode recarregar o índice de nomes) roda em threads, sem bloquear o event
+loop; a busca usa o mesmo pool de etapas da rota Flask. O controle de admissão (o mesmo da rota Flask) limita as
+respostas calculadas ao mesmo tempo e responde 503 quando a fila está
+cheia. Cada pergunta tem um prazo total repartido entre as etapas
+(deadline.py); se o cliente desconectar, a geração em andamento é
+cancelada. As demais rotas (upload, documentos, etc.) continuam sendo
+atendidas pelo Flask, cada requisição numa thread própria.
+
+Uso:
+    uvicorn asgi:app --host 0.0.0.0 --port 5001
+    python asgi.py
+"""
+
+import asyncio
+import json
+import time
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+import api
+from admission import AdmissionRejected
+from deadline import Deadline, StageTimeout, arun_stage, submit_stage
+import metrics
+import usage
+from metrics import LLMTimingCallback, span
+from config import (
+    API_HOST, API_PORT, CORS_ORIGINS, REQUEST_TIMEOUT_SECONDS, EMBEDDING_TIMEOUT_SECONDS,
+    RETRIEVAL_TIMEOUT_SECONDS, LLM_TIMEOUT_SECONDS
+)
+
+# Tamanho máximo do corpo aceito no /api/chat (a pergunta é texto curto)
+MAX_CHAT_BODY_SIZE = 64 * 1024
+
+
+class _ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """
+    Adaptador WSGI -> ASGI que atende requisições em paralelo.
+
+    O WsgiToAsgi executa o app WSGI com thread_sensitive=True: sem um
+    contexto, todas as requisições iriam para a mesma thread, o que
+    serializaria uploads e listagens. Dentro de um ThreadSensitiveContext
+    (API pública do asgiref) cada requisição usa uma thread própria.
+    """
+
+    async def __call__(self, scope, receive, send):
+        async with ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+
+class ChatASGIApp:
+    """Aplicação ASGI: /api/chat assíncrono e demais rotas via Flask."""
+
+    def __init__(self, flask_app):
+        self.wsgi = _ThreadPoolWsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == '/api/chat' and scope['method'] == 'POST':
+            await self._handle_chat_with_metrics(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise ConnectionError('Cliente desconectou')
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if len(body) > MAX_CHAT_BODY_SIZE:
+                raise api.ChatRequestError('Requisição muito grande', 413)
+        return body
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        """Retorna quando o cliente desconectar (o corpo já foi lido)."""
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    @staticmethod
+    def _base_url(scope) -> str:
+        headers = dict(scope.get('headers') or [])
+        host = headers.get(b'host', b'').decode('latin-1')
+        if not host:
+            server = scope.get('server') or ('localhost', 5000)
+            host = f"{server[0]}:{server[1]}"
+        return f"{scope.get('scheme', 'http')}://{host}"
+
+    @staticmethod
+    def _client_id(scope) -> str:
+        """Identifica o cliente para a fila justa (como api.get_client_id)."""
+        forwarded_for = dict(scope.get('headers') or []).get(b'x-forwarded-for', b'').decode('latin-1')
+        if forwarded_for:
+            return forwarded_for.split(',')[0].strip()
+        client = scope.get('client')
+        return client[0] if client else ''
+
+    @staticmethod
+    async def _send_json(scope, send, payload: dict, status: int, extra_headers: list = None):
+        headers = [(b'content-type', b'application/json')] + (extra_headers or [])
+        origin = dict(scope.get('headers') or []).get(b'origin', b'').decode('latin-1')
+        if origin and origin in CORS_ORIGINS:
+            headers.append((b'access-control-allow-origin', origin.encode('latin-1')))
+            headers.append((b'vary', b'Origin'))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': json.dumps(payload).encode('utf-8')})
+
+    @staticmethod
+    async def _embed_question(question: str) -> list:
+        """Embedding assíncrono da pergunta, medido na etapa query_embedding (como api.embed_question)."""
+        with span('query_embedding'):
+            return await api.document_processor.embeddings.aembed_query(question)
+
+    async def answer(self, question: str, client_id: str = '', deadline: Deadline = None):
+        """
+        Responde uma pergunta de forma assíncrona (caches + cadeia de Q&A).
+
+        Raises:
+            AdmissionRejected: Se não houver vaga para calcular a resposta
+            StageTimeout: Se uma etapa esgotar o tempo
+
+        Returns:
+            Tupla (resposta, se veio do cache)
+        """
+        # Alterações feitas por outro worker (o caminho rápido é um os.stat)
+        if api.document_processor.corpus_version_changed():
+            await asyncio.to_thread(api.document_processor.refresh_corpus_version)
+
+        deadline = deadline or Deadline(REQUEST_TIMEOUT_SECONDS)
+        # O embedding da pergunta só é calculado se ela não estiver no cache exato.
+        # As consultas aos caches rodam no pool de threads (travas e varredura
+        # do cache semântico não bloqueiam o event loop)
+        response, cache_key = await asyncio.to_thread(api.lookup_cached_answer, question)
+        if response is not None:
+            return response, True
+        question_embedding = None
+        if api.semantic_cache:
+            question_embedding = await arun_stage(
+                'embedding', self._embed_question(question), deadline, EMBEDDING_TIMEOUT_SECONDS
+            )
+            response = await asyncio.to_thread(api.lookup_semantic_answer, question, cache_key, question_embedding)
+            if response is not None:
+                return response, True
+
+        if api.answer_flight:
+            # Vaga negada ou prazo esgotado do líder: cada requisição calcula com o próprio cliente e prazo
+            response, _ = await api.answer_flight.ado(
+                cache_key, lambda: self.compute_answer(question, cache_key, question_embedding, client_id, deadline),
+                retry_errors=api.LEADER_ERRORS, deadline=deadline
+            )
+        else:
+            response = await self.compute_answer(question, cache_key, question_embedding, client_id, deadline)
+        return response, False
+
+    async def compute_answer(self, question: str, cache_key: tuple, question_embedding,
+                             client_id: str = '', deadline: Deadline = None) -> dict:
+        """
+        Busca no índice e geração assíncrona da resposta (guardada nos caches).
+
+        Cada etapa respeita o seu limite e o prazo total; a geração é
+        cancelada no fim do prazo. A busca roda no pool das etapas (como na
+        rota Flask) e não pode ser interrompida: se ela for abandonada, a
+        vaga só é liberada quando a busca terminar.
+        """
+        deadline = deadline or Deadline(REQUEST_TIMEOUT_SECONDS)
+        await api.admission.aacquire(client_id, deadline.remaining())
+        started_at = time.perf_counter()
+        retrieval = None
+        try:
+            deadline.check('queue')
+            await arun_stage('embedding', self._embed_question(question), deadline, EMBEDDING_TIMEOUT_SECONDS)
+            tier = api.select_tier()
+            retrieval = submit_stage(lambda: api.retrieve_documents(question, tier))
+            chain, source_documents, tier = await arun_stage(
+                'retrieval', asyncio.wrap_future(retrieval), deadline, RETRIEVAL_TIMEOUT_SECONDS
+            )
+            combine_chain = chain.combine_documents_chain
+            output = await arun_stage(
+                'llm', combine_chain.ainvoke({'input_documents': source_documents, 'question': question},
+                                             config={'callbacks': [LLMTimingCallback()]}),
+                deadline, LLM_TIMEOUT_SECONDS
+            )
+        finally:
+            if retrieval is not None and not retrieval.done():
+                # Busca abandonada (prazo ou cliente desconectado) ainda ocupa a thread
+                retrieval.add_done_callback(lambda _: api.admission.release(time.perf_counter() - started_at))
+            else:
+                api.admission.release(time.perf_counter() - started_at)
+        chain_response = {'result': output[combine_chain.output_key], 'source_documents': source_documents,
+                          'tier': tier}
+        return await asyncio.to_thread(api.store_answer, question, cache_key, question_embedding,
+                                       chain_response, time.perf_counter() - started_at)
+
+    async def _handle_chat_with_metrics(self, scope, receive, send):
+        """Atende o /api/chat registrando a requisição (status 499 se o cliente desconectou)."""
+        started_at = time.perf_counter()
+        status = 499
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.handle_chat(scope, receive, send_with_status)
+        finally:
+            metrics.observe_request('/api/chat', 'POST', status, time.perf_counter() - started_at)
+
+    async def handle_chat(self, scope, receive, send):
+        """Handler assíncrono de POST /api/chat (mesmo contrato da rota Flask)."""
+        try:
+            body = await self._read_body(receive)
+            try:
+                data = json.loads(body or b'null')
+            except ValueError:
+                data = None
+            question, response_format = api.parse_chat_request(data)
+
+            # A resposta é calculada enquanto se observa a conexão: se o cliente
+            # desconectar, o cálculo é cancelado (inclusive a chamada ao LLM).
+            # A tarefa herda o coletor de uso de tokens desta requisição
+            with usage.collect() as request_usage:
+                answer_task = asyncio.ensure_future(
+                    self.answer(question, self._client_id(scope), Deadline(REQUEST_TIMEOUT_SECONDS))
+                )
+            disconnect_task = asyncio.ensure_future(self._wait_for_disconnect(receive))
+            try:
+                await asyncio.wait({answer_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                disconnect_task.cancel()
+                if not answer_task.done():
+                    answer_task.cancel()
+            if not answer_task.done():
+                # Cliente desconectou: espera o cancelamento terminar, sem resposta
+                await asyncio.wait({answer_task})
+                return
+            response, cached = answer_task.result()
+            # As citações consultam o índice de nomes (recarregado do banco após
+            # uma alteração): a montagem roda no pool de threads
+            payload = await asyncio.to_thread(api.build_chat_payload, response, self._base_url(scope),
+                                              response_format, cached, request_usage.to_dict())
+            await self._send_json(scope, send, payload, 200)
+        except ConnectionError:
+            return
+        except api.ChatRequestError as e:
+            await self._send_json(scope, send, {'error': e.message}, e.status_code)
+        except AdmissionRejected as e:
+            await self._send_json(scope, send, {'error': api.BUSY_MESSAGE, 'retry_after': e.retry_after}, 503,
+                                  [(b'retry-after', str(e.retry_after).encode('latin-1'))])
+        except StageTimeout as e:
+            await self._send_json(scope, send, api.timeout_payload(e), 504)
+        except Exception as e:
+            await self._send_json(scope, send, {'error': f'Erro ao processar pergunta: {str(e)}'}, 500)
+
+
+app = ChatASGIApp(api.app)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    api.print_startup_info()
+    api.initialize_qa_chain()
+    uvicorn.run(app, host=API_HOST, port=API_PORT)
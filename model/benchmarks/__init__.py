@@ -0,0 +1,6 @@
+"""
+Benchmarks e harnesses de avaliação do IB - EstradaResponde.
+
+Executar a partir da pasta model/, por exemplo:
+    python -m benchmarks.bench_markdown_renderer
+"""
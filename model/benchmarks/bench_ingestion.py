@@ -0,0 +1,279 @@
+"""
+Benchmark de ingestão e de gestão de documentos à medida que o corpus cresce.
+
+Gera decretos sintéticos (benchmarks/corpus_generator.py) e os ingere com o
+DocumentProcessor da API, em etapas até cada tamanho de --sizes (ex: 10, 50,
+200 documentos). Os embeddings são locais e deterministas (HashEmbeddings,
+latência configurável), então o tempo medido é o do próprio processamento:
+extração do texto, chunking, gravação no ChromaDB e snapshot do índice.
+
+Em cada etapa mostra e grava (--output):
+- ingestão: páginas/s, chunks/s, chamadas ao provedor de embeddings (e textos
+  por chamada) e a duração de cada etapa da ingestão (pdf_extract, chunking,
+  document_embedding, index_write);
+- tamanho do índice em disco (ChromaDB e, com --snapshot, o snapshot);
+- latência (p50/p95) de listar os documentos (índice em memória e leitura da
+  collection), e de enviar, renomear e excluir um documento com o corpus
+  daquele tamanho (--operations documentos de teste por etapa).
+
+Uso (a partir de model/):
+    python -m benchmarks.bench_ingestion
+    python -m benchmarks.bench_ingestion --sizes 10,50,200,500 --pages 40 --output ingestao.json
+    python -m benchmarks.bench_ingestion --sizes 50 --batch-size 10 --embedding-latency-ms 200 --snapshot
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.bench_load import _git_commit, _latency_summary, stage_breakdown
+from benchmarks.corpus_generator import document_name, generate_corpus, generate_document
+
+# Numeração dos documentos de teste (enviados, renomeados e excluídos em cada etapa)
+PROBE_START = 90000
+
+
+def configure_environment(directory: str, args):
+    """Variáveis de ambiente lidas pelo config.py (antes de importar o DocumentProcessor)."""
+    os.environ['CHROMA_DB_PATH'] = os.path.join(directory, 'chroma')
+    os.environ['INDEX_SNAPSHOT_PATH'] = os.path.join(directory, 'snapshot')
+    os.environ['INDEX_SNAPSHOT_ENABLED'] = str(args.snapshot)
+    if args.chunk_size:
+        os.environ['CHUNK_SIZE'] = str(args.chunk_size)
+    os.environ['USAGE_LOG_PATH'] = ''
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # O modelo de embeddings real é criado no construtor e substituído pelo local
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+
+def create_processor(args):
+    """DocumentProcessor com embeddings locais."""
+    from benchmarks.stubs import HashEmbeddings
+    from document_processor import DocumentProcessor
+    from embedding_cache import CachedQueryEmbeddings
+
+    processor = DocumentProcessor()
+    base_embeddings = HashEmbeddings(dimension=args.embedding_dimension,
+                                     latency_seconds=args.embedding_latency_ms / 1000.0)
+    processor.embeddings = CachedQueryEmbeddings(base_embeddings, provider='stub', model='stub-embedding')
+    return processor, base_embeddings
+
+
+def directory_size(path: str) -> int:
+    """Tamanho total dos arquivos de uma pasta (bytes)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class EmbeddingCalls:
+    """Conta as chamadas ao provedor de embeddings e os textos enviados (HashEmbeddings)."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.texts = 0
+        self._embed_documents = embeddings.embed_documents
+        embeddings.embed_documents = self._counted
+
+    def _counted(self, texts):
+        self.texts += len(texts)
+        return self._embed_documents(texts)
+
+    def snapshot(self) -> tuple:
+        return self.embeddings.calls, self.texts
+
+
+def ingest(processor, paths: list, batch_size: int, calls: EmbeddingCalls) -> dict:
+    """Ingere os PDFs em lotes de batch_size (como um upload com vários arquivos)."""
+    from metrics import STAGE_SECONDS
+
+    before = STAGE_SECONDS.snapshot()
+    calls_before, texts_before = calls.snapshot()
+    pages = chunks = 0
+    batch_seconds = []
+    started_at = time.perf_counter()
+    for start in range(0, len(paths), batch_size):
+        batch = [(path, os.path.basename(path)) for path in paths[start:start + batch_size]]
+        batch_started_at = time.perf_counter()
+        info = processor.process_pdfs(batch)
+        batch_seconds.append(time.perf_counter() - batch_started_at)
+        pages += info['total_pages']
+        chunks += info['total_chunks']
+    seconds = time.perf_counter() - started_at
+    calls_after, texts_after = calls.snapshot()
+    return {
+        'documents': len(paths),
+        'pages': pages,
+        'chunks': chunks,
+        'seconds': round(seconds, 3),
+        'pages_per_second': round(pages / seconds, 1) if seconds else 0.0,
+        'chunks_per_second': round(chunks / seconds, 1) if seconds else 0.0,
+        'embedding_calls': calls_after - calls_before,
+        'texts_per_embedding_call': round((texts_after - texts_before) / max(1, calls_after - calls_before), 1),
+        'batch': _latency_summary(batch_seconds),
+        'stages': stage_breakdown(before, STAGE_SECONDS.snapshot())
+    }
+
+
+def measure_operations(processor, directory: str, step: int, operations: int, args) -> dict:
+    """Latência de listar, enviar, renomear e excluir documentos com o corpus atual."""
+    list_cached = []
+    list_cold = []
+    upload = []
+    rename = []
+    delete = []
+    errors = 0
+
+    processor.get_documents_list()
+    for _ in range(operations):
+        started_at = time.perf_counter()
+        processor.get_documents_list()
+        list_cached.append(time.perf_counter() - started_at)
+
+        # Leitura da collection (ou do snapshot), como após uma alteração do corpus
+        processor.name_index.invalidate()
+        started_at = time.perf_counter()
+        processor.get_documents_list()
+        list_cold.append(time.perf_counter() - started_at)
+
+    # Os documentos de teste são gerados a cada etapa: a exclusão remove o arquivo
+    probe_dir = os.path.join(directory, f'probes_{step}')
+    os.makedirs(probe_dir, exist_ok=True)
+    for index in range(operations):
+        number = PROBE_START + step * operations + index
+        path = os.path.join(probe_dir, document_name(number))
+        generate_document(path, number, args.pages, args.seed)
+        name = os.path.basename(path)
+        new_name = f'Renomeado-{number}.pdf'
+
+        started_at = time.perf_counter()
+        processor.process_pdfs([(path, name)])
+        upload.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        renamed = processor.update_document_name(name, new_name)
+        rename.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        deleted = processor.delete_document(new_name if renamed else name)
+        delete.append(time.perf_counter() - started_at)
+        errors += (not renamed) + (not deleted)
+
+    return {
+        'list_cached': _latency_summary(list_cached),
+        'list_cold': _latency_summary(list_cold),
+        'upload': _latency_summary(upload),
+        'rename': _latency_summary(rename),
+        'delete': _latency_summary(delete),
+        'errors': errors
+    }
+
+
+def _print_step(result: dict):
+    ingestion = result['ingestion']
+    operations = result['operations']
+    print(f"\n== {result['documents']} documentos ({result['chunks_in_index']} chunks,"
+          f" índice {result['index_bytes'] / 1024 / 1024:.1f} MB"
+          + (f", snapshot {result['snapshot_bytes'] / 1024 / 1024:.1f} MB" if result['snapshot_bytes'] else '')
+          + ")")
+    print(f"ingestão de {ingestion['documents']} documentos: {ingestion['pages']} páginas e {ingestion['chunks']}"
+          f" chunks em {ingestion['seconds']:.1f}s ({ingestion['pages_per_second']:.1f} páginas/s,"
+          f" {ingestion['chunks_per_second']:.1f} chunks/s, {ingestion['embedding_calls']} chamadas de"
+          f" embeddings com {ingestion['texts_per_embedding_call']:.0f} textos)")
+    for stage, summary in ingestion['stages'].items():
+        print(f"  {stage:<20}{summary['total_seconds']:>8.2f}s  média {summary['mean_ms']:.1f}ms")
+    print(f"{'operação':<14}{'p50':>10}{'p95':>10}{'máx':>10}")
+    for operation in ('list_cached', 'list_cold', 'upload', 'rename', 'delete'):
+        summary = operations[operation]
+        print(f"{operation:<14}{summary['p50_ms']:>8.1f}ms{summary['p95_ms']:>8.1f}ms{summary['max_ms']:>8.1f}ms")
+    if operations['errors']:
+        print(f"operações com erro: {operations['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de ingestão com corpus sintético crescente')
+    parser.add_argument('--sizes', default='10,50,100', help='Tamanhos do corpus (documentos), em ordem crescente')
+    parser.add_argument('--pages', type=int, default=40, help='Páginas por documento (aproximado)')
+    parser.add_argument('--batch-size', type=int, default=1, help='Documentos por chamada a process_pdfs')
+    parser.add_argument('--operations', type=int, default=3,
+                        help='Documentos de teste enviados, renomeados e excluídos por etapa')
+    parser.add_argument('--chunk-size', type=int, help='CHUNK_SIZE usado (padrão: o da configuração)')
+    parser.add_argument('--embedding-latency-ms', type=float, default=0, help='Latência de cada chamada de embeddings')
+    parser.add_argument('--embedding-dimension', type=int, default=256, help='Dimensão dos embeddings')
+    parser.add_argument('--snapshot', action='store_true', help='Ativa INDEX_SNAPSHOT_ENABLED')
+    parser.add_argument('--seed', type=int, default=42, help='Semente do texto dos documentos')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    sizes = sorted({int(size) for size in args.sizes.split(',') if size.strip()})
+    directory = tempfile.mkdtemp(prefix='bench_ingestion_')
+    try:
+        configure_environment(directory, args)
+        processor, base_embeddings = create_processor(args)
+        calls = EmbeddingCalls(base_embeddings)
+        corpus_dir = os.path.join(directory, 'corpus')
+
+        steps = []
+        current = 0
+        for step, size in enumerate(sizes):
+            print(f"Gerando e ingerindo documentos {current + 1} a {size}...")
+            paths = generate_corpus(corpus_dir, size - current, args.pages, args.seed, start=current + 1)
+            ingestion = ingest(processor, paths, args.batch_size, calls)
+            current = size
+            documents = processor.get_documents_list()
+            result = {
+                'documents': len(documents),
+                'chunks_in_index': sum(document['chunk_count'] for document in documents),
+                'index_bytes': directory_size(os.environ['CHROMA_DB_PATH']),
+                'snapshot_bytes': directory_size(os.environ['INDEX_SNAPSHOT_PATH']) if args.snapshot else 0,
+                'ingestion': ingestion,
+                'operations': measure_operations(processor, directory, step, args.operations, args)
+            }
+            _print_step(result)
+            steps.append(result)
+
+        import config
+        report = {
+            'benchmark': 'bench_ingestion',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            **_git_commit(),
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpu_count': os.cpu_count()},
+            'options': {key: value for key, value in vars(args).items() if key != 'output'},
+            'config': {name: getattr(config, name) for name in (
+                'CHUNK_SIZE', 'CHUNK_OVERLAP', 'INDEX_SNAPSHOT_ENABLED'
+            )},
+            'steps': steps
+        }
+
+        print(f"\n{'documentos':>10}{'chunks':>9}{'páginas/s':>11}{'chunks/s':>10}{'índice':>10}"
+              f"{'listar':>10}{'enviar':>10}{'renomear':>10}{'excluir':>10}")
+        for result in steps:
+            operations = result['operations']
+            print(f"{result['documents']:>10}{result['chunks_in_index']:>9}"
+                  f"{result['ingestion']['pages_per_second']:>11.1f}{result['ingestion']['chunks_per_second']:>10.1f}"
+                  f"{result['index_bytes'] / 1024 / 1024:>8.1f}MB{operations['list_cold']['p50_ms']:>8.1f}ms"
+                  f"{operations['upload']['p50_ms']:>8.0f}ms{operations['rename']['p50_ms']:>8.0f}ms"
+                  f"{operations['delete']['p50_ms']:>8.0f}ms")
+        print("(listar = leitura da collection; enviar/renomear/excluir = p50 de um documento)")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output_file:
+                json.dump(report, output_file, indent=2, ensure_ascii=False)
+            print(f"\nResultados gravados em {args.output}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
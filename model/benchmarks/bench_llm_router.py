@@ -0,0 +1,125 @@
+"""
+Roteamento entre provedores de LLM com provedores locais (stubs).
+
+Compara um provedor sozinho com o roteador (llm_providers/router_provider.py)
+em cenários de degradação de um fornecedor, sem chamar APIs reais:
+
+- lentidão ocasional (abaixo do p95) com e sem requisição de reserva (hedge);
+- taxa de erros alta com e sem failover;
+- lentidão frequente: o roteador passa a preferir o provedor mais rápido.
+
+Para cada cenário, mostra latência p50/p95/p99, taxa de erros e quantas
+respostas vieram de cada provedor.
+
+Uso (a partir de model/):
+    python -m benchmarks.bench_llm_router
+    python -m benchmarks.bench_llm_router --requests 400 --concurrency 32 --output roteamento.json
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import StubChatModel
+from llm_providers.router_provider import BackendHealth, RouterBackend, RoutingChatModel
+
+# Latências em segundos (escala reduzida: ~50 ms por resposta normal)
+NORMAL = {'latency_seconds': 0.05, 'jitter_seconds': 0.03}
+BACKUP = {'latency_seconds': 0.07, 'jitter_seconds': 0.03}
+SLOW_SECONDS = 1.5
+
+
+def _router(primary: StubChatModel, backup: StubChatModel, hedge: bool) -> RoutingChatModel:
+    return RoutingChatModel(
+        backends=[RouterBackend('primario', primary, BackendHealth()),
+                  RouterBackend('reserva', backup, BackendHealth())],
+        timeout_seconds=5.0,
+        hedge_enabled=hedge,
+        hedge_min_seconds=0.1
+    )
+
+
+def build_scenarios() -> list:
+    """Retorna (nome, modelo) de cada cenário; cada modelo tem os seus próprios stubs."""
+    def occasional_slow(seed):
+        return StubChatModel(slow_rate=0.04, slow_latency_seconds=SLOW_SECONDS, seed=seed, **NORMAL)
+
+    def failing(seed):
+        return StubChatModel(error_rate=0.3, seed=seed, **NORMAL)
+
+    def frequently_slow(seed):
+        return StubChatModel(slow_rate=0.2, slow_latency_seconds=SLOW_SECONDS, seed=seed, **NORMAL)
+
+    return [
+        ('4% lentas: sozinho', occasional_slow(1)),
+        ('4% lentas: roteador sem hedge', _router(occasional_slow(1), StubChatModel(seed=2, **BACKUP), False)),
+        ('4% lentas: roteador com hedge', _router(occasional_slow(1), StubChatModel(seed=2, **BACKUP), True)),
+        ('30% erros: sozinho', failing(3)),
+        ('30% erros: roteador (failover)', _router(failing(3), StubChatModel(seed=4, **BACKUP), False)),
+        ('20% lentas: sozinho', frequently_slow(5)),
+        ('20% lentas: roteador', _router(frequently_slow(5), StubChatModel(seed=6, **BACKUP), False)),
+    ]
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run_scenario(model, requests: int, concurrency: int) -> dict:
+    """Faz as chamadas em paralelo e mede latência e erros."""
+    def call(i):
+        started_at = time.perf_counter()
+        try:
+            message = model.invoke(f'Pergunta {i}')
+            backend = message.response_metadata.get('router_backend', 'primario')
+            return time.perf_counter() - started_at, backend
+        except Exception:
+            return time.perf_counter() - started_at, None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(requests)))
+
+    latencies = [latency for latency, backend in results if backend is not None]
+    answered = {}
+    for _, backend in results:
+        if backend is not None:
+            answered[backend] = answered.get(backend, 0) + 1
+    return {
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 1),
+        'error_rate': round(1 - len(latencies) / max(requests, 1), 4),
+        'answered': answered
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Roteamento entre provedores de LLM (stubs)')
+    parser.add_argument('--requests', type=int, default=200, help='Chamadas por cenário')
+    parser.add_argument('--concurrency', type=int, default=16, help='Chamadas simultâneas')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    print(f"{'cenário':<34}{'p50':>9}{'p95':>9}{'p99':>9}{'erros':>8}  respostas")
+    results = []
+    for name, model in build_scenarios():
+        result = run_scenario(model, args.requests, args.concurrency)
+        result['scenario'] = name
+        results.append(result)
+        answered = ', '.join(f"{backend}={count}" for backend, count in sorted(result['answered'].items()))
+        print(f"{name:<34}{result['p50_ms']:>7.0f}ms{result['p95_ms']:>7.0f}ms{result['p99_ms']:>7.0f}ms"
+              f"{result['error_rate'] * 100:>7.1f}%  {answered}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({'requests': args.requests, 'concurrency': args.concurrency, 'results': results},
+                      output_file, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
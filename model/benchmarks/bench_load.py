@@ -0,0 +1,400 @@
+"""
+Teste de carga de ponta a ponta da API, sem custo de API.
+
+Sobe a API Flask (api.py) no próprio processo com provedores locais: embeddings
+deterministas a partir do hash das palavras (HashEmbeddings) e um chat model
+com latência e taxa de geração de tokens configuráveis (StubChatModel). O
+ChromaDB, os uploads e a versão do corpus ficam numa pasta temporária.
+
+1. Ingestão: envia os PDFs de docs/ pelo /api/upload, um de cada vez.
+2. Carga mista: --requests requisições com --concurrency clientes
+   simultâneos, numa sequência fixa sorteada a partir de --seed:
+   - chat: pergunta nova (passa pelo embedding, busca e LLM);
+   - chat_repeat: pergunta já feita (normalmente respondida pelo cache);
+   - upload: novo PDF (cópia de um documento de docs/), que muda o corpus
+     enquanto as perguntas continuam.
+
+Mostra e grava (--output) latência p50/p95/p99 por operação, vazão e a
+duração de cada etapa (histograma estrada_stage_duration_seconds, com p50/p95
+estimados pelos limites do histograma). O JSON inclui o commit, as opções e a
+configuração usada, para comparar resultados entre commits.
+
+Uso (a partir de model/):
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --requests 500 --concurrency 32 --output carga.json
+    python -m benchmarks.bench_load --llm-latency-ms 800 --llm-tokens-per-second 40 --llm-streaming
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'docs')
+
+QUESTIONS = [
+    'Qual é a multa por excesso de velocidade dentro das localidades?',
+    'Quais documentos o condutor deve trazer consigo?',
+    'É permitido usar o telemóvel durante a condução?',
+    'Qual é a taxa de álcool no sangue a partir da qual a condução é proibida?',
+    'Quem tem prioridade num cruzamento sem sinalização?',
+    'Quando é obrigatório o uso do cinto de segurança?',
+    'Quais são os limites de velocidade nas auto-estradas?',
+    'O que acontece se conduzir sem carta de condução?',
+    'Onde é proibido estacionar?',
+    'Como devem ser transportadas as crianças nos automóveis?',
+    'Quais são as regras para a ultrapassagem?',
+    'Que sanções se aplicam a quem não pare num acidente?',
+    'Quando devem ser usadas as luzes de cruzamento?',
+    'Qual é a distância de segurança entre veículos?',
+    'Quais são as obrigações do condutor perante a passadeira de peões?',
+    'É obrigatório o seguro de responsabilidade civil?',
+    'Quais os deveres do condutor em caso de avaria na via pública?',
+    'O que é considerada uma contravenção muito grave?',
+    'Quais os requisitos para a inspeção periódica dos veículos?',
+    'Como se processa a apreensão da carta de condução?',
+]
+
+# Resposta do modelo local: Markdown com citações, como as respostas reais
+ANSWER = (
+    '## Resposta\n\nDe acordo com o **Artigo 27** do documento Decreto-Lei-n-01.2011-Aprova-o-Codigo-da-Estrada.pdf, '
+    'os condutores devem respeitar os limites de velocidade fixados para cada categoria de veículo.\n\n'
+    '* A infração é sancionada com multa, nos termos do **Artigo 145**;\n'
+    '* Em caso de reincidência aplica-se a inibição de conduzir (**Artigo 147**).\n\n'
+    'Consulte também o Artigo 28 do mesmo documento para as exceções aplicáveis aos veículos prioritários.'
+)
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _latency_summary(latencies: list) -> dict:
+    return {
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+        'max_ms': round(max(latencies) * 1000, 1) if latencies else 0.0
+    }
+
+
+def _histogram_quantile(bounds: tuple, counts: list, q: float) -> float:
+    """Quantil estimado pelos limites do histograma (interpolação linear, como no Prometheus)."""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(bounds, counts):
+        if count and cumulative + count >= rank:
+            if bound == float('inf'):
+                return lower
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound if bound != float('inf') else lower
+    return lower
+
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    """Duração das etapas entre dois snapshots de metrics.STAGE_SECONDS."""
+    from metrics import STAGE_SECONDS
+
+    stages = {}
+    for key, (counts, total, count) in sorted(after.items()):
+        previous_counts, previous_total, previous_count = before.get(key, ([0] * len(counts), 0.0, 0))
+        delta_counts = [current - previous for current, previous in zip(counts, previous_counts)]
+        delta_count = count - previous_count
+        if not delta_count:
+            continue
+        stages[key[0]] = {
+            'count': delta_count,
+            'mean_ms': round((total - previous_total) / delta_count * 1000, 2),
+            'p50_ms': round(_histogram_quantile(STAGE_SECONDS.buckets, delta_counts, 0.50) * 1000, 2),
+            'p95_ms': round(_histogram_quantile(STAGE_SECONDS.buckets, delta_counts, 0.95) * 1000, 2),
+            'total_seconds': round(total - previous_total, 3)
+        }
+    return stages
+
+
+def _git_commit() -> dict:
+    """Commit atual (e se há alterações não commitadas), para comparar resultados."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def configure_environment(directory: str, args):
+    """Variáveis de ambiente lidas pelo config.py (antes de importar a API)."""
+    os.environ['CHROMA_DB_PATH'] = os.path.join(directory, 'chroma')
+    os.environ['INDEX_SNAPSHOT_PATH'] = os.path.join(directory, 'snapshot')
+    os.environ['USAGE_LOG_PATH'] = ''
+    os.environ['SEMANTIC_CACHE_AUDIT_LOG'] = os.path.join(directory, 'semantic_cache_audit.jsonl')
+    os.environ['PROFILING_DIR'] = os.path.join(directory, 'profiles')
+    os.environ['LLM_STREAMING'] = str(args.llm_streaming)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Os provedores reais são criados na importação e substituídos pelos locais
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    if args.no_answer_cache:
+        os.environ['ANSWER_CACHE_ENABLED'] = 'False'
+
+
+def setup_api(directory: str, args):
+    """Importa a API e troca os provedores de embeddings e de LLM pelos locais."""
+    import api
+    from benchmarks.stubs import HashEmbeddings, StubLLMProvider
+    from embedding_cache import CachedQueryEmbeddings
+
+    upload_folder = os.path.join(directory, 'uploads')
+    os.makedirs(upload_folder, exist_ok=True)
+    api.app.config['UPLOAD_FOLDER'] = upload_folder
+    api.document_processor.embeddings = CachedQueryEmbeddings(
+        HashEmbeddings(dimension=args.embedding_dimension, latency_seconds=args.embedding_latency_ms / 1000.0),
+        provider='stub', model='stub-embedding'
+    )
+    llm_config = {
+        'model': 'stub',
+        'answer': ANSWER,
+        'latency_seconds': args.llm_latency_ms / 1000.0,
+        'jitter_seconds': args.llm_jitter_ms / 1000.0,
+        'tokens_per_second': args.llm_tokens_per_second,
+        'streaming': args.llm_streaming,
+        'seed': args.seed
+    }
+    api.llm_provider = StubLLMProvider(llm_config)
+    # Modo degradado (se ativado): o mesmo modelo local, sem a geração token a token
+    api.degraded_provider = StubLLMProvider(dict(llm_config, tokens_per_second=0.0))
+    return api
+
+
+def build_plan(requests: int, repeat_rate: float, upload_rate: float, seed: int) -> list:
+    """Sequência fixa de operações (mesma semente = mesma carga em qualquer commit)."""
+    rng = random.Random(seed)
+    asked = []
+    plan = []
+    for index in range(requests):
+        draw = rng.random()
+        if draw < upload_rate:
+            plan.append(('upload', index))
+        elif draw < upload_rate + repeat_rate and asked:
+            plan.append(('chat_repeat', rng.choice(asked)))
+        else:
+            question = f"{QUESTIONS[index % len(QUESTIONS)]} (caso {index})"
+            asked.append(question)
+            plan.append(('chat', question))
+    return plan
+
+
+class LoadClient:
+    """Clientes de teste do Flask (um por thread) e as operações da carga."""
+
+    def __init__(self, api, pdf_paths: list, directory: str, response_format: str):
+        self.api = api
+        self.pdf_paths = pdf_paths
+        self.directory = directory
+        self.response_format = response_format
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.api.app.test_client()
+        return self._local.client
+
+    def chat(self, question: str) -> tuple:
+        response = self._client().post('/api/chat', json={'question': question, 'format': self.response_format})
+        payload = response.get_json(silent=True) or {}
+        return response.status_code, bool(payload.get('cached'))
+
+    def upload(self, path: str, name: str) -> tuple:
+        with open(path, 'rb') as pdf_file:
+            response = self._client().post('/api/upload', data={'files': (pdf_file, name)},
+                                           content_type='multipart/form-data')
+        info = (response.get_json(silent=True) or {}).get('processing_info') or {}
+        return response.status_code, info
+
+    def run(self, operation: str, argument) -> dict:
+        started_at = time.perf_counter()
+        cached = None
+        if operation == 'upload':
+            path = self.pdf_paths[argument % len(self.pdf_paths)]
+            status, _ = self.upload(path, f"carga_{argument}_{os.path.basename(path)}")
+        else:
+            status, cached = self.chat(argument)
+        return {'operation': operation, 'status': status, 'cached': cached,
+                'seconds': time.perf_counter() - started_at}
+
+
+def run_ingestion(client: LoadClient) -> dict:
+    """Envia os PDFs de docs/ um de cada vez."""
+    from metrics import STAGE_SECONDS
+
+    before = STAGE_SECONDS.snapshot()
+    documents = []
+    started_at = time.perf_counter()
+    for path in client.pdf_paths:
+        document_started_at = time.perf_counter()
+        status, info = client.upload(path, os.path.basename(path))
+        documents.append({
+            'name': os.path.basename(path),
+            'status': status,
+            'seconds': round(time.perf_counter() - document_started_at, 3),
+            'pages': info.get('total_pages'),
+            'chunks': info.get('total_chunks')
+        })
+    return {
+        'documents': documents,
+        'total_seconds': round(time.perf_counter() - started_at, 3),
+        'stages': stage_breakdown(before, STAGE_SECONDS.snapshot())
+    }
+
+
+def run_workload(client: LoadClient, plan: list, concurrency: int) -> dict:
+    """Executa a sequência de operações com concurrency clientes simultâneos."""
+    from metrics import STAGE_SECONDS
+
+    before = STAGE_SECONDS.snapshot()
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda item: client.run(*item), plan))
+    duration = time.perf_counter() - started_at
+
+    operations = {}
+    for operation in ('chat', 'chat_repeat', 'upload'):
+        selected = [result for result in results if result['operation'] == operation]
+        if not selected:
+            continue
+        succeeded = [result for result in selected if result['status'] == 200]
+        summary = {'count': len(selected), 'errors': len(selected) - len(succeeded)}
+        summary.update(_latency_summary([result['seconds'] for result in succeeded]))
+        if operation != 'upload':
+            summary['cached'] = sum(1 for result in succeeded if result['cached'])
+        operations[operation] = summary
+
+    succeeded = [result for result in results if result['status'] == 200]
+    statuses = {}
+    for result in results:
+        statuses[str(result['status'])] = statuses.get(str(result['status']), 0) + 1
+    overall = {'count': len(results), 'errors': len(results) - len(succeeded), 'statuses': statuses}
+    overall.update(_latency_summary([result['seconds'] for result in succeeded]))
+    return {
+        'duration_seconds': round(duration, 3),
+        'throughput_rps': round(len(succeeded) / duration, 2) if duration else 0.0,
+        'overall': overall,
+        'operations': operations,
+        'stages': stage_breakdown(before, STAGE_SECONDS.snapshot())
+    }
+
+
+def _print_report(report: dict):
+    ingestion = report['ingestion']
+    print(f"\nIngestão: {len(ingestion['documents'])} PDFs em {ingestion['total_seconds']:.1f}s")
+    for document in ingestion['documents']:
+        print(f"  {document['name'][:50]:<52}{document['seconds']:>7.2f}s  status {document['status']}"
+              f"  {document['pages']} páginas, {document['chunks']} chunks")
+
+    workload = report['workload']
+    print(f"\nCarga: {workload['overall']['count']} requisições em {workload['duration_seconds']:.1f}s"
+          f" ({workload['throughput_rps']:.1f} req/s), erros: {workload['overall']['errors']}")
+    print(f"{'operação':<14}{'total':>7}{'erros':>7}{'cache':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for operation, summary in [*workload['operations'].items(), ('todas', workload['overall'])]:
+        print(f"{operation:<14}{summary['count']:>7}{summary['errors']:>7}{summary.get('cached', '-'):>7}"
+              f"{summary['p50_ms']:>8.0f}ms{summary['p95_ms']:>8.0f}ms{summary['p99_ms']:>8.0f}ms")
+
+    print(f"\n{'etapa':<22}{'total':>7}{'média':>11}{'p50~':>11}{'p95~':>11}")
+    for stage, summary in workload['stages'].items():
+        print(f"{stage:<22}{summary['count']:>7}{summary['mean_ms']:>9.1f}ms"
+              f"{summary['p50_ms']:>9.1f}ms{summary['p95_ms']:>9.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga da API com provedores locais')
+    parser.add_argument('--requests', type=int, default=200, help='Requisições da carga mista')
+    parser.add_argument('--concurrency', type=int, default=16, help='Clientes simultâneos')
+    parser.add_argument('--repeat-rate', type=float, default=0.3, help='Fração de perguntas repetidas')
+    parser.add_argument('--upload-rate', type=float, default=0.01, help='Fração de uploads na carga mista')
+    parser.add_argument('--format', default='html', choices=['html', 'json'], help='Formato da resposta do chat')
+    parser.add_argument('--docs', default=DOCS_DIR, help='Pasta com os PDFs a ingerir')
+    parser.add_argument('--llm-latency-ms', type=float, default=300, help='Latência até o primeiro token')
+    parser.add_argument('--llm-jitter-ms', type=float, default=100, help='Variação da latência (uniforme)')
+    parser.add_argument('--llm-tokens-per-second', type=float, default=0.0,
+                        help='Taxa de geração de tokens (0 = resposta de uma vez)')
+    parser.add_argument('--llm-streaming', action='store_true', help='Transmite os tokens (LLM_STREAMING)')
+    parser.add_argument('--embedding-latency-ms', type=float, default=20, help='Latência de cada chamada de embeddings')
+    parser.add_argument('--embedding-dimension', type=int, default=256, help='Dimensão dos embeddings')
+    parser.add_argument('--no-answer-cache', action='store_true', help='Desativa o cache de respostas')
+    parser.add_argument('--seed', type=int, default=42, help='Semente da sequência de operações')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.docs, '*.pdf')))
+    if not pdf_paths:
+        print(f"Nenhum PDF encontrado em {args.docs}")
+        sys.exit(1)
+
+    directory = tempfile.mkdtemp(prefix='bench_load_')
+    try:
+        configure_environment(directory, args)
+        api = setup_api(directory, args)
+        client = LoadClient(api, pdf_paths, directory, args.format)
+
+        print(f"Ingerindo {len(pdf_paths)} PDFs de {args.docs}...")
+        ingestion = run_ingestion(client)
+        # Os uploads da carga mista reutilizam só os PDFs ingeridos com sucesso
+        # (ex: PDFs digitalizados, sem texto, são recusados)
+        ingested = {document['name'] for document in ingestion['documents'] if document['status'] == 200}
+        client.pdf_paths = [path for path in pdf_paths if os.path.basename(path) in ingested]
+        if not client.pdf_paths:
+            print("Nenhum PDF foi ingerido; a carga mista precisa de documentos no índice")
+            sys.exit(1)
+
+        plan = build_plan(args.requests, args.repeat_rate, args.upload_rate, args.seed)
+        print(f"Carga mista: {args.requests} requisições, {args.concurrency} clientes simultâneos...")
+        workload = run_workload(client, plan, args.concurrency)
+
+        import config
+        report = {
+            'benchmark': 'bench_load',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            **_git_commit(),
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpu_count': os.cpu_count()},
+            'options': {key: value for key, value in vars(args).items() if key not in ('docs', 'output')},
+            'config': {name: getattr(config, name) for name in (
+                'SEARCH_TYPE', 'SEARCH_K', 'SEARCH_FETCH_K', 'CHUNK_SIZE', 'CHUNK_OVERLAP',
+                'ANSWER_CACHE_ENABLED', 'SEMANTIC_CACHE_ENABLED', 'SINGLE_FLIGHT_ENABLED',
+                'MAX_CONCURRENT_LLM_CALLS', 'LLM_QUEUE_MAX_SIZE', 'DEGRADED_MODE_ENABLED',
+                'INDEX_SNAPSHOT_ENABLED', 'REQUEST_TIMEOUT_SECONDS'
+            )},
+            'ingestion': ingestion,
+            'workload': workload
+        }
+        _print_report(report)
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output_file:
+                json.dump(report, output_file, indent=2, ensure_ascii=False)
+            print(f"\nResultados gravados em {args.output}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
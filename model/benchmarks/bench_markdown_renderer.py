@@ -0,0 +1,145 @@
+"""
+Microbenchmark e entradas adversariais para o renderizador de respostas.
+
+Mede o tempo de renderização de uma resposta típica e verifica que o tempo
+cresce linearmente com o tamanho de entradas construídas para provocar
+backtracking (ReDoS). Para comparação, mede também um dos padrões da antiga
+cascata de regex da seção FONTES, que é quadrático nessas mesmas entradas.
+
+Uso (a partir de model/):
+    python -m benchmarks.bench_markdown_renderer
+"""
+
+import gc
+import re
+import sys
+import time
+
+from markdown_renderer import render_answer_html
+
+BASE_URL = 'http://localhost:5001'
+
+SAMPLE_ANSWER = """Compreendo sua dúvida sobre a carta de condução. Vou explicar de forma clara.
+
+## Conduzir sem a carta de condução
+
+Os condutores que forem encontrados a conduzir sem trazerem consigo os documentos referidos são punidos com **multa de 200,00MT** (Artigo 127, número 16 do [Decreto-Lei-n-01.2011-Aprova-o-Codigo-da-Estrada.pdf]).
+
+### Prazo para apresentação
+
+* O condutor deve apresentar o documento no prazo de **8 dias**
+- Caso não apresente, a multa é agravada (Artigo 127, número 17 do [Decreto-Lei-n-01.2011-Aprova-o-Codigo-da-Estrada.pdf])
+
+---
+
+FONTES:
+Decreto-Lei-n-01.2011-Aprova-o-Codigo-da-Estrada.pdf, Artigo 127, número 16
+Decreto-Lei-n-01.2011-Aprova-o-Codigo-da-Estrada.pdf, Artigo 127, número 17
+"""
+
+# Padrão da implementação anterior (fontes_pattern_flexible), mantido aqui
+# apenas como referência de comparação
+LEGACY_FLEXIBLE_RE = re.compile(r'([A-Za-z0-9_\-\.\s]+?\.pdf|[A-Za-z0-9_\-\.\s]+?),\s*(.+)$')
+
+# Entradas adversariais: (descrição, função que gera a linha com n unidades)
+ADVERSARIAL_INPUTS = [
+    ('nome longo sem vírgula na seção FONTES', lambda n: 'FONTES:\n' + 'a ' * n),
+    ('muitos parênteses abertos', lambda n: '(' * n + 'Artigo 1 do [x])'),
+    ('"(" sem fechamento e muitos ")"', lambda n: '(' + 'x)' * n),
+    ('"(" seguido de muitos ")" de citações rejeitadas', lambda n: '(Artigo 1 do [x' + ' a)' * n),
+    ('citações incompletas', lambda n: '(Artigo 1 do [x' * n),
+    ('negrito sem fechamento', lambda n: '**a' * n),
+    ('espaços antes de "do"', lambda n: '(Artigo' + ' ' * n + 'd)'),
+    ('vírgulas e pontos', lambda n: 'FONTES:\n' + '.pdf ,' * n),
+]
+
+
+def _time_call(func, *args, repeat: int = 3) -> float:
+    """Retorna o melhor tempo (em segundos) de várias execuções, sem coleta de lixo no meio."""
+    best = float('inf')
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best
+
+
+def run_microbenchmark(iterations: int = 2000) -> float:
+    """Renderiza a resposta de exemplo várias vezes e retorna µs por chamada."""
+    resolver = lambda name: name  # noqa: E731 - lookup O(1), como no índice de nomes
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render_answer_html(SAMPLE_ANSWER, BASE_URL, resolve_document=resolver)
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1e6
+
+
+def growth_per_doubling(build, sizes, repeat: int = 5) -> tuple:
+    """
+    Mede o tempo de renderização em cada tamanho e o crescimento médio por
+    duplicação da entrada (média geométrica das razões entre tempos
+    consecutivos: ~2 para tempo linear, ~4 para quadrático).
+
+    Args:
+        build: Função que gera a entrada com n unidades
+        sizes: Tamanhos testados (cada um o dobro do anterior)
+        repeat: Execuções por tamanho (vale o melhor tempo)
+
+    Returns:
+        Tupla (tempos, crescimento por duplicação)
+    """
+    timings = [_time_call(render_answer_html, build(n), BASE_URL, repeat=repeat) for n in sizes]
+    growth = (timings[-1] / max(timings[0], 1e-9)) ** (1.0 / (len(sizes) - 1))
+    return timings, growth
+
+
+def check_linear_scaling(sizes=(4000, 8000, 16000, 32000), max_growth: float = 2.5) -> bool:
+    """
+    Verifica que dobrar o tamanho da entrada no máximo ~dobra o tempo.
+
+    Args:
+        sizes: Tamanhos testados (cada um o dobro do anterior)
+        max_growth: Crescimento médio máximo por duplicação (linear = 2,
+            quadrático = 4; o restante é folga para ruído)
+
+    Returns:
+        True se todas as entradas adversariais escalam de forma linear
+    """
+    all_linear = True
+    for description, build in ADVERSARIAL_INPUTS:
+        timings, growth = growth_per_doubling(build, sizes)
+        linear = growth <= max_growth
+        all_linear = all_linear and linear
+        status = 'OK' if linear else 'NÃO LINEAR'
+        formatted = ', '.join(f'{t * 1000:.2f}ms' for t in timings)
+        print(f"  [{status}] {description}: {formatted} (x{growth:.2f} por duplicação)")
+    return all_linear
+
+
+def run_legacy_comparison(sizes=(1000, 2000, 4000)):
+    """Mostra o crescimento quadrático do padrão antigo na mesma entrada."""
+    for n in sizes:
+        line = 'a ' * n
+        legacy = _time_call(LEGACY_FLEXIBLE_RE.sub, '', line, repeat=1)
+        current = _time_call(render_answer_html, 'FONTES:\n' + line, BASE_URL, repeat=1)
+        print(f"  n={n}: padrão antigo {legacy * 1000:.2f}ms | renderizador atual {current * 1000:.2f}ms")
+
+
+def main() -> int:
+    print("Microbenchmark (resposta típica):")
+    print(f"  {run_microbenchmark():.1f} µs por resposta")
+    print("\nEntradas adversariais (tempo deve crescer linearmente):")
+    linear = check_linear_scaling()
+    print("\nComparação com o padrão antigo (fontes_pattern_flexible):")
+    run_legacy_comparison()
+    return 0 if linear else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+Avaliação da busca (qualidade e latência) para ajustar chunking e retriever.
+
+Usa um conjunto de perguntas de referência (benchmarks/data/golden_set_codigo_estrada.json)
+em que cada pergunta indica o artigo e o número do Código da Estrada que a
+responde, com frases do texto desse número (evidence). Um trecho recuperado é
+relevante se contém uma dessas frases (sem diferenças de maiúsculas e espaços),
+o que não depende de onde o divisor cortou o texto.
+
+Para cada combinação de CHUNK_SIZE/CHUNK_OVERLAP o documento é dividido com o
+mesmo divisor da ingestão (build_text_splitter) e indexado num ChromaDB em
+memória; para cada combinação de SEARCH_TYPE/SEARCH_K/SEARCH_FETCH_K/
+SEARCH_LAMBDA_MULT as perguntas passam pelo mesmo retriever da API
+(as_retriever). Para cada configuração mostra:
+- recall@k: fração das perguntas com um trecho relevante entre os k enviados
+  ao LLM (e recall@1/@3/@5 e MRR, para a ordem dos trechos);
+- tokens de contexto: média de tokens dos trechos enviados ao LLM (custo e
+  latência da geração);
+- latência da busca (p50/p95, embedding da pergunta já em cache).
+
+E recomenda a configuração com menos tokens de contexto cujo recall@k fica a
+até --recall-tolerance do melhor recall@k.
+
+Os embeddings ficam em cache em disco (benchmarks/.cache/embeddings.sqlite3):
+só a primeira execução de cada combinação de chunking chama a API de
+embeddings (EMBEDDING_MODEL); as seguintes rodam offline. Com
+--embeddings hash usa embeddings locais deterministas (sem API; útil para
+testar o harness, não para escolher parâmetros).
+
+Uso (a partir de model/):
+    python -m benchmarks.bench_retrieval
+    python -m benchmarks.bench_retrieval --chunk-sizes 1500,3000 --chunk-overlaps 300,1000 --k 4,8,15
+    python -m benchmarks.bench_retrieval --embeddings hash --output busca.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(BENCHMARKS_DIR)), 'docs')
+GOLDEN_SET = os.path.join(BENCHMARKS_DIR, 'data', 'golden_set_codigo_estrada.json')
+CACHE_PATH = os.path.join(BENCHMARKS_DIR, '.cache', 'embeddings.sqlite3')
+
+_SPACES_RE = re.compile(r'\s+')
+
+
+def _normalize(text: str) -> str:
+    return _SPACES_RE.sub(' ', text).strip().lower()
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def _float_list(value: str) -> List[float]:
+    return [float(item) for item in value.split(',') if item.strip()]
+
+
+class DiskCachedEmbeddings(Embeddings):
+    """Embeddings com cache em disco (SQLite), por modelo e texto."""
+
+    def __init__(self, embeddings: Embeddings, model: str, path: str = CACHE_PATH):
+        """
+        Args:
+            embeddings: Modelo de embeddings chamado nos textos fora do cache
+            model: Nome do modelo (faz parte da chave do cache)
+            path: Arquivo SQLite do cache
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)')
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f'{self.model}\0{text}'.encode('utf-8')).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                vectors.update((key, np.frombuffer(vector, dtype=np.float32).tolist()) for key, vector in rows)
+        missing = [index for index, key in enumerate(keys) if key not in vectors]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            computed = self.embeddings.embed_documents([texts[index] for index in missing])
+            with self._lock:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)',
+                    [(keys[index], np.asarray(vector, dtype=np.float32).tobytes())
+                     for index, vector in zip(missing, computed)]
+                )
+                self._connection.commit()
+            for index, vector in zip(missing, computed):
+                # Mesmo arredondamento (float32) dos vetores lidos do cache
+                vectors[keys[index]] = np.asarray(vector, dtype=np.float32).tolist()
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def load_golden_set(path: str) -> dict:
+    with open(path, encoding='utf-8') as golden_file:
+        golden = json.load(golden_file)
+    for item in golden['questions']:
+        item['_evidence'] = [_normalize(phrase) for phrase in item['evidence']]
+    return golden
+
+
+def check_golden_set(golden: dict, text: str) -> List[str]:
+    """Perguntas cujas frases de evidência não aparecem no texto extraído do documento."""
+    normalized = _normalize(text)
+    return [item['id'] for item in golden['questions']
+            if not any(phrase in normalized for phrase in item['_evidence'])]
+
+
+def build_search_configs(args) -> List[tuple]:
+    """Combinações (search_type, search_kwargs), no formato de get_search_settings()."""
+    configs = []
+    for search_type in args.search_types.split(','):
+        for k in _int_list(args.k):
+            if search_type == 'similarity':
+                configs.append((search_type, {'k': k}))
+                continue
+            for fetch_k in _int_list(args.fetch_k):
+                for lambda_mult in _float_list(args.lambda_mult):
+                    configs.append((search_type, {'k': k, 'fetch_k': max(fetch_k, k), 'lambda_mult': lambda_mult}))
+    # Sem repetições (fetch_k ajustado para k)
+    unique = []
+    for config in configs:
+        if config not in unique:
+            unique.append(config)
+    return unique
+
+
+def evaluate(retriever, golden: dict, k: int) -> dict:
+    """Recall, MRR, tokens de contexto e latência de um retriever nas perguntas de referência."""
+    from usage import count_tokens
+
+    first_relevant = []
+    context_tokens = []
+    latencies = []
+    misses = []
+    for item in golden['questions']:
+        started_at = time.perf_counter()
+        documents = retriever.invoke(item['question'])
+        latencies.append(time.perf_counter() - started_at)
+        context_tokens.append(sum(count_tokens(document.page_content) for document in documents))
+        rank = next((position for position, document in enumerate(documents, start=1)
+                     if any(phrase in _normalize(document.page_content) for phrase in item['_evidence'])), None)
+        first_relevant.append(rank)
+        if rank is None:
+            misses.append(item['id'])
+
+    total = len(first_relevant)
+
+    def recall_at(cutoff: int) -> float:
+        return round(sum(1 for rank in first_relevant if rank and rank <= cutoff) / total, 4)
+
+    return {
+        'recall_at_k': recall_at(k),
+        'recall_at_1': recall_at(1),
+        'recall_at_3': recall_at(3),
+        'recall_at_5': recall_at(5),
+        'mrr': round(sum(1.0 / rank for rank in first_relevant if rank) / total, 4),
+        'context_tokens_mean': round(sum(context_tokens) / total, 1),
+        'context_tokens_p95': _percentile(context_tokens, 0.95),
+        'latency_p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+        'latency_p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'misses': misses
+    }
+
+
+def run_sweep(text: str, golden: dict, embeddings: Embeddings, args) -> List[dict]:
+    """Avalia todas as combinações de chunking e de busca."""
+    import chromadb
+    from langchain_community.vectorstores import Chroma
+
+    from document_processor import build_text_splitter
+
+    client = chromadb.EphemeralClient()
+    search_configs = build_search_configs(args)
+    results = []
+    for chunk_size in _int_list(args.chunk_sizes):
+        for chunk_overlap in _int_list(args.chunk_overlaps):
+            if chunk_overlap >= chunk_size:
+                continue
+            chunks = build_text_splitter(chunk_size, chunk_overlap).split_text(text)
+            started_at = time.perf_counter()
+            collection_name = f'bench_{uuid.uuid4().hex[:12]}'
+            vectorstore = Chroma(client=client, collection_name=collection_name, embedding_function=embeddings)
+            vectorstore.add_texts(chunks)
+            index_seconds = time.perf_counter() - started_at
+            print(f"chunk_size={chunk_size} chunk_overlap={chunk_overlap}: {len(chunks)} chunks"
+                  f" (indexados em {index_seconds:.1f}s)")
+
+            # Aquecimento: embeddings das perguntas em cache antes de medir a busca
+            embeddings.embed_documents([item['question'] for item in golden['questions']])
+            for search_type, search_kwargs in search_configs:
+                if search_kwargs['k'] > len(chunks):
+                    continue
+                retriever = vectorstore.as_retriever(search_type=search_type, search_kwargs=search_kwargs)
+                result = {
+                    'chunk_size': chunk_size,
+                    'chunk_overlap': chunk_overlap,
+                    'chunks': len(chunks),
+                    'search_type': search_type,
+                    'k': search_kwargs['k'],
+                    'fetch_k': search_kwargs.get('fetch_k'),
+                    'lambda_mult': search_kwargs.get('lambda_mult')
+                }
+                result.update(evaluate(retriever, golden, search_kwargs['k']))
+                results.append(result)
+            client.delete_collection(collection_name)
+    return results
+
+
+def recommend(results: List[dict], tolerance: float) -> dict:
+    """Configuração com menos tokens de contexto entre as que mantêm o recall@k."""
+    best_recall = max(result['recall_at_k'] for result in results)
+    eligible = [result for result in results if result['recall_at_k'] >= best_recall - tolerance]
+    return min(eligible, key=lambda result: (result['context_tokens_mean'], -result['recall_at_k'],
+                                             -result['mrr'], result['latency_p50_ms']))
+
+
+def _describe(result: dict) -> str:
+    search = f"{result['search_type']} k={result['k']}"
+    if result['search_type'] == 'mmr':
+        search += f" fetch_k={result['fetch_k']} λ={result['lambda_mult']}"
+    return f"{result['chunk_size']}/{result['chunk_overlap']} {search}"
+
+
+def _print_report(report: dict):
+    print(f"\n{'configuração':<44}{'chunks':>7}{'R@k':>7}{'R@1':>7}{'R@3':>7}{'MRR':>7}"
+          f"{'tokens':>8}{'p50':>9}{'p95':>9}")
+    for result in report['results']:
+        marker = ' *' if result['current'] else ''
+        print(f"{_describe(result) + marker:<44}{result['chunks']:>7}{result['recall_at_k']:>7.2f}"
+              f"{result['recall_at_1']:>7.2f}{result['recall_at_3']:>7.2f}{result['mrr']:>7.3f}"
+              f"{result['context_tokens_mean']:>8.0f}{result['latency_p50_ms']:>7.1f}ms{result['latency_p95_ms']:>7.1f}ms")
+    print("(* = configuração atual; R@k = recall@k; tokens = média de tokens de contexto por pergunta)")
+
+    current = report['current']
+    recommended = report['recommended']
+    if current:
+        print(f"\nAtual:        {_describe(current)}: recall@k {current['recall_at_k']:.2f},"
+              f" {current['context_tokens_mean']:.0f} tokens de contexto")
+        if current['misses']:
+            print(f"              sem trecho relevante: {', '.join(current['misses'])}")
+    print(f"Recomendada:  {_describe(recommended)}: recall@k {recommended['recall_at_k']:.2f},"
+          f" {recommended['context_tokens_mean']:.0f} tokens de contexto"
+          f" (tolerância de recall {report['options']['recall_tolerance']})")
+
+
+def main():
+    from config import (
+        CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL, SEARCH_TYPE, SEARCH_K, SEARCH_FETCH_K, SEARCH_LAMBDA_MULT
+    )
+
+    parser = argparse.ArgumentParser(description='Avaliação da busca para ajustar chunking e retriever')
+    parser.add_argument('--golden-set', default=GOLDEN_SET, help='Arquivo JSON com as perguntas de referência')
+    parser.add_argument('--docs', default=DOCS_DIR, help='Pasta com o documento do conjunto de referência')
+    parser.add_argument('--chunk-sizes', default=f'1000,2000,{CHUNK_SIZE}', help='Valores de CHUNK_SIZE')
+    parser.add_argument('--chunk-overlaps', default=f'200,500,{CHUNK_OVERLAP}', help='Valores de CHUNK_OVERLAP')
+    parser.add_argument('--search-types', default='mmr,similarity', help='Valores de SEARCH_TYPE')
+    parser.add_argument('--k', default=f'4,8,{SEARCH_K}', help='Valores de SEARCH_K')
+    parser.add_argument('--fetch-k', default=str(SEARCH_FETCH_K), help='Valores de SEARCH_FETCH_K (mmr)')
+    parser.add_argument('--lambda-mult', default=f'{SEARCH_LAMBDA_MULT},0.7', help='Valores de SEARCH_LAMBDA_MULT (mmr)')
+    parser.add_argument('--recall-tolerance', type=float, default=0.0,
+                        help='Perda de recall@k aceita na recomendação (ex: 0.02)')
+    parser.add_argument('--embeddings', default='openai', choices=['openai', 'hash'],
+                        help='openai: EMBEDDING_MODEL com cache em disco; hash: locais, sem API')
+    parser.add_argument('--cache', default=CACHE_PATH, help='Arquivo do cache de embeddings')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    from document_processor import create_embeddings, extract_pdf_text
+
+    golden = load_golden_set(args.golden_set)
+    pdf_path = os.path.join(args.docs, golden['document'])
+    if not os.path.exists(pdf_path):
+        print(f"Documento do conjunto de referência não encontrado: {pdf_path}")
+        sys.exit(1)
+    text = extract_pdf_text(pdf_path, golden['document'])
+    missing = check_golden_set(golden, text)
+    if missing:
+        print(f"Frases de evidência ausentes do documento: {', '.join(missing)}")
+        sys.exit(1)
+
+    if args.embeddings == 'hash':
+        from benchmarks.stubs import HashEmbeddings
+        model = 'hash-256'
+        base_embeddings = HashEmbeddings()
+    else:
+        model = EMBEDDING_MODEL
+        base_embeddings = create_embeddings()
+    embeddings = DiskCachedEmbeddings(base_embeddings, model, args.cache)
+
+    print(f"{len(golden['questions'])} perguntas de referência, embeddings {model}")
+    results = run_sweep(text, golden, embeddings, args)
+    if not results:
+        print("Nenhuma combinação avaliada (verifique chunk_overlap < chunk_size e k <= chunks)")
+        sys.exit(1)
+
+    current_search = (SEARCH_TYPE, SEARCH_K, SEARCH_FETCH_K if SEARCH_TYPE == 'mmr' else None,
+                      SEARCH_LAMBDA_MULT if SEARCH_TYPE == 'mmr' else None)
+    for result in results:
+        result['current'] = ((result['chunk_size'], result['chunk_overlap']) == (CHUNK_SIZE, CHUNK_OVERLAP)
+                             and (result['search_type'], result['k'], result['fetch_k'],
+                                  result['lambda_mult']) == current_search)
+    report = {
+        'benchmark': 'bench_retrieval',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'embedding_model': model,
+        'document': golden['document'],
+        'questions': len(golden['questions']),
+        'options': {key: value for key, value in vars(args).items()
+                    if key not in ('docs', 'output', 'cache', 'golden_set')},
+        'embedding_cache': {'hits': embeddings.hits, 'misses': embeddings.misses},
+        'current': next((result for result in results if result['current']), None),
+        'recommended': recommend(results, args.recall_tolerance),
+        'results': results
+    }
+    _print_report(report)
+    print(f"Cache de embeddings: {embeddings.hits} acertos, {embeddings.misses} chamadas à API")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
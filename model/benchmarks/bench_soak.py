@@ -0,0 +1,322 @@
+"""
+Teste de resistência: perguntas contínuas enquanto documentos são enviados,
+renomeados e excluídos.
+
+Sobe a API no próprio processo com os provedores locais do bench_load
+(embeddings por hash e modelo com latência configurável), ingere os PDFs de
+docs/ e, durante --duration segundos:
+- --concurrency clientes fazem perguntas sem parar pelo /api/chat (formato
+  json, com as citações);
+- um cliente administrador repete o ciclo: envia uma cópia de um PDF pelo
+  /api/upload, renomeia esse documento e o exclui pelo
+  DELETE /api/documents/<nome>, com --admin-interval segundos entre as
+  operações. A API não tem rota de renomeação; o documento é renomeado com
+  DocumentProcessor.update_document_name, seguido da publicação da cadeia de
+  Q&A (como na exclusão).
+
+Mostra e grava (--output):
+- latência das perguntas (p50/p95/p99) e erros a cada --window segundos, com
+  as operações de administração de cada janela;
+- latência das perguntas durante operações de administração e fora delas;
+- duração de cada operação de administração;
+- respostas com resultado desatualizado: perguntas iniciadas depois de uma
+  exclusão ou renomeação concluída que ainda citam o nome antigo.
+
+Serve como verificação de regressão para mudanças de concorrência no
+DocumentProcessor: termina com código 1 se houver resposta desatualizada ou se
+a taxa de erros ou o p99 passarem de --max-error-rate e --max-p99-ms.
+
+Uso (a partir de model/):
+    python -m benchmarks.bench_soak
+    python -m benchmarks.bench_soak --duration 300 --concurrency 16 --max-p99-ms 5000 --output soak.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+from benchmarks.bench_load import (
+    DOCS_DIR, QUESTIONS, LoadClient, _git_commit, _latency_summary, configure_environment, run_ingestion,
+    setup_api, stage_breakdown
+)
+
+
+class SoakClient(LoadClient):
+    """Cliente do teste: perguntas com citações e operações de administração."""
+
+    def ask(self, question: str) -> tuple:
+        response = self._client().post('/api/chat', json={'question': question, 'format': 'json'})
+        payload = response.get_json(silent=True) or {}
+        cited = {citation.get('document') for citation in payload.get('citations') or []}
+        return response.status_code, bool(payload.get('cached')), cited
+
+    def rename(self, old_name: str, new_name: str) -> bool:
+        renamed = self.api.document_processor.update_document_name(old_name, new_name)
+        if renamed:
+            self.api.initialize_qa_chain()
+        return renamed
+
+    def delete(self, name: str) -> int:
+        return self._client().delete(f'/api/documents/{quote(name)}').status_code
+
+
+def chat_worker(client: SoakClient, worker: int, args, started_at: float, stop: threading.Event,
+                results: list, lock: threading.Lock):
+    """Faz perguntas até o fim do teste (parte delas repetidas, que podem vir do cache)."""
+    rng = random.Random(f'{args.seed}-{worker}')
+    index = 0
+    while not stop.is_set():
+        question = rng.choice(QUESTIONS)
+        if rng.random() >= args.repeat_rate:
+            question = f"{question} (cliente {worker}, pergunta {index})"
+        index += 1
+        request_started_at = time.perf_counter()
+        try:
+            status, cached, cited = client.ask(question)
+        except Exception as e:
+            status, cached, cited = f'exceção: {type(e).__name__}', False, set()
+        finished_at = time.perf_counter()
+        with lock:
+            results.append({'start': request_started_at - started_at, 'end': finished_at - started_at,
+                            'status': status, 'cached': cached, 'cited': cited})
+
+
+def admin_worker(client: SoakClient, args, started_at: float, stop: threading.Event, operations: list):
+    """Envia, renomeia e exclui documentos em ciclo até o fim do teste."""
+    cycle = 0
+
+    def record(kind: str, name: str, operation_started_at: float, ok: bool, new_name: str = None):
+        operations.append({'kind': kind, 'name': name, 'new_name': new_name, 'ok': ok,
+                           'start': operation_started_at - started_at, 'end': time.perf_counter() - started_at})
+
+    while not stop.wait(args.admin_interval):
+        cycle += 1
+        path = client.pdf_paths[cycle % len(client.pdf_paths)]
+        name = f"soak_{cycle}_{os.path.basename(path)}"
+        operation_started_at = time.perf_counter()
+        status, _ = client.upload(path, name)
+        record('upload', name, operation_started_at, status == 200)
+        if status != 200 or stop.wait(args.admin_interval):
+            continue
+
+        new_name = f"soak_{cycle}_renomeado.pdf"
+        operation_started_at = time.perf_counter()
+        renamed = client.rename(name, new_name)
+        record('rename', name, operation_started_at, renamed, new_name)
+        current_name = new_name if renamed else name
+        if stop.wait(args.admin_interval):
+            break
+
+        operation_started_at = time.perf_counter()
+        status = client.delete(current_name)
+        record('delete', current_name, operation_started_at, status == 200)
+
+
+def find_stale(results: list, operations: list) -> list:
+    """Perguntas iniciadas depois de uma exclusão/renomeação concluída que citam o nome antigo."""
+    removed = [(operation['end'], operation['name'], operation['kind']) for operation in operations
+               if operation['ok'] and operation['kind'] in ('rename', 'delete')]
+    incidents = []
+    for result in results:
+        for removed_at, name, kind in removed:
+            if removed_at < result['start'] and name in result['cited']:
+                incidents.append({'start': round(result['start'], 3), 'document': name, 'after': kind,
+                                  'seconds_after': round(result['start'] - removed_at, 3),
+                                  'cached': result['cached']})
+    return incidents
+
+
+def _summary(results: list) -> dict:
+    succeeded = [result for result in results if result['status'] == 200]
+    summary = {'count': len(results), 'errors': len(results) - len(succeeded),
+               'cached': sum(1 for result in succeeded if result['cached'])}
+    summary.update(_latency_summary([result['end'] - result['start'] for result in succeeded]))
+    return summary
+
+
+def timeline(results: list, operations: list, window: float, duration: float) -> list:
+    """Latência e erros das perguntas por janela de tempo (pelo início da pergunta)."""
+    windows = []
+    start = 0.0
+    while start < duration:
+        end = start + window
+        selected = [result for result in results if start <= result['start'] < end]
+        summary = _summary(selected)
+        summary['start_seconds'] = round(start, 1)
+        summary['admin'] = [operation['kind'] for operation in operations
+                            if operation['start'] < end and operation['end'] >= start]
+        windows.append(summary)
+        start = end
+    return windows
+
+
+def _overlaps(result: dict, operations: list) -> bool:
+    return any(operation['start'] < result['end'] and operation['end'] > result['start'] for operation in operations)
+
+
+def _print_report(report: dict):
+    workload = report['workload']
+    print(f"\n{'janela':>8}{'perguntas':>11}{'erros':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'máx':>10}  administração")
+    for window in workload['timeline']:
+        admin = ' '.join(kind[0].upper() for kind in window['admin'])
+        print(f"{window['start_seconds']:>7.0f}s{window['count']:>11}{window['errors']:>7}"
+              f"{window['p50_ms']:>8.0f}ms{window['p95_ms']:>8.0f}ms{window['p99_ms']:>8.0f}ms"
+              f"{window['max_ms']:>8.0f}ms  {admin}")
+    print("(administração: U = envio, R = renomeação, D = exclusão em andamento na janela)")
+
+    print(f"\n{'perguntas':<24}{'total':>7}{'erros':>7}{'cache':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for label, key in (('todas', 'overall'), ('durante administração', 'during_admin'), ('sem administração', 'idle')):
+        summary = workload[key]
+        print(f"{label:<24}{summary['count']:>7}{summary['errors']:>7}{summary['cached']:>7}"
+              f"{summary['p50_ms']:>8.0f}ms{summary['p95_ms']:>8.0f}ms{summary['p99_ms']:>8.0f}ms")
+
+    print(f"\n{'operação':<12}{'total':>7}{'falhas':>8}{'p50':>10}{'máx':>10}")
+    for kind, summary in workload['admin'].items():
+        print(f"{kind:<12}{summary['count']:>7}{summary['failures']:>8}{summary['p50_ms']:>8.0f}ms{summary['max_ms']:>8.0f}ms")
+
+    stale = workload['stale']
+    print(f"\nRespostas desatualizadas: {len(stale)}")
+    for incident in stale[:10]:
+        print(f"  {incident['start']:.1f}s: citou {incident['document']} {incident['seconds_after']:.2f}s depois"
+              f" da {'exclusão' if incident['after'] == 'delete' else 'renomeação'}"
+              f"{' (cache)' if incident['cached'] else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perguntas contínuas durante envio, renomeação e exclusão de documentos')
+    parser.add_argument('--duration', type=float, default=60, help='Duração do teste (segundos)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clientes fazendo perguntas')
+    parser.add_argument('--repeat-rate', type=float, default=0.3,
+                        help='Fração de perguntas repetidas (podem vir do cache de respostas)')
+    parser.add_argument('--admin-interval', type=float, default=2.0,
+                        help='Intervalo entre as operações de administração (segundos)')
+    parser.add_argument('--window', type=float, default=5.0, help='Janela da série temporal (segundos)')
+    parser.add_argument('--docs', default=DOCS_DIR, help='Pasta com os PDFs a ingerir')
+    parser.add_argument('--llm-latency-ms', type=float, default=100, help='Latência até o primeiro token')
+    parser.add_argument('--llm-jitter-ms', type=float, default=50, help='Variação da latência (uniforme)')
+    parser.add_argument('--llm-tokens-per-second', type=float, default=0.0,
+                        help='Taxa de geração de tokens (0 = resposta de uma vez)')
+    parser.add_argument('--llm-streaming', action='store_true', help='Transmite os tokens (LLM_STREAMING)')
+    parser.add_argument('--embedding-latency-ms', type=float, default=20, help='Latência de cada chamada de embeddings')
+    parser.add_argument('--embedding-dimension', type=int, default=256, help='Dimensão dos embeddings')
+    parser.add_argument('--no-answer-cache', action='store_true', help='Desativa o cache de respostas')
+    parser.add_argument('--max-error-rate', type=float, default=0.0, help='Taxa de erros aceita nas perguntas')
+    parser.add_argument('--max-p99-ms', type=float, help='p99 aceito das perguntas (padrão: sem limite)')
+    parser.add_argument('--seed', type=int, default=42, help='Semente das perguntas')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.docs, '*.pdf')))
+    if not pdf_paths:
+        print(f"Nenhum PDF encontrado em {args.docs}")
+        sys.exit(1)
+
+    directory = tempfile.mkdtemp(prefix='bench_soak_')
+    try:
+        configure_environment(directory, args)
+        api = setup_api(directory, args)
+        client = SoakClient(api, pdf_paths, directory, 'json')
+
+        print(f"Ingerindo {len(pdf_paths)} PDFs de {args.docs}...")
+        ingestion = run_ingestion(client)
+        ingested = {document['name'] for document in ingestion['documents'] if document['status'] == 200}
+        client.pdf_paths = [path for path in pdf_paths if os.path.basename(path) in ingested]
+        if not client.pdf_paths:
+            print("Nenhum PDF foi ingerido; o teste precisa de documentos no índice")
+            sys.exit(1)
+
+        from metrics import STAGE_SECONDS
+
+        print(f"Teste de {args.duration:.0f}s: {args.concurrency} clientes fazendo perguntas,"
+              f" administração a cada {args.admin_interval:.1f}s...")
+        before = STAGE_SECONDS.snapshot()
+        results = []
+        operations = []
+        lock = threading.Lock()
+        stop = threading.Event()
+        started_at = time.perf_counter()
+        threads = [threading.Thread(target=chat_worker, args=(client, worker, args, started_at, stop, results, lock),
+                                    name=f'soak-chat-{worker}', daemon=True)
+                   for worker in range(args.concurrency)]
+        threads.append(threading.Thread(target=admin_worker, args=(client, args, started_at, stop, operations),
+                                        name='soak-admin', daemon=True))
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started_at
+
+        admin = {}
+        for kind in ('upload', 'rename', 'delete'):
+            selected = [operation for operation in operations if operation['kind'] == kind]
+            summary = {'count': len(selected), 'failures': sum(1 for operation in selected if not operation['ok'])}
+            summary.update(_latency_summary([operation['end'] - operation['start'] for operation in selected]))
+            admin[kind] = summary
+        workload = {
+            'duration_seconds': round(duration, 3),
+            'throughput_rps': round(sum(1 for result in results if result['status'] == 200) / duration, 2),
+            'overall': _summary(results),
+            'during_admin': _summary([result for result in results if _overlaps(result, operations)]),
+            'idle': _summary([result for result in results if not _overlaps(result, operations)]),
+            'timeline': timeline(results, operations, args.window, duration),
+            'admin': admin,
+            'admin_operations': [dict(operation, start=round(operation['start'], 3), end=round(operation['end'], 3))
+                                 for operation in operations],
+            'stale': find_stale(results, operations),
+            'stages': stage_breakdown(before, STAGE_SECONDS.snapshot())
+        }
+
+        failures = []
+        overall = workload['overall']
+        if workload['stale']:
+            failures.append(f"{len(workload['stale'])} respostas desatualizadas")
+        if overall['count'] and overall['errors'] / overall['count'] > args.max_error_rate:
+            failures.append(f"taxa de erros {overall['errors'] / overall['count']:.2%}"
+                            f" acima de {args.max_error_rate:.2%}")
+        if args.max_p99_ms is not None and overall['p99_ms'] > args.max_p99_ms:
+            failures.append(f"p99 de {overall['p99_ms']:.0f}ms acima de {args.max_p99_ms:.0f}ms")
+
+        import config
+        report = {
+            'benchmark': 'bench_soak',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            **_git_commit(),
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpu_count': os.cpu_count()},
+            'options': {key: value for key, value in vars(args).items() if key not in ('docs', 'output')},
+            'config': {name: getattr(config, name) for name in (
+                'SEARCH_TYPE', 'SEARCH_K', 'ANSWER_CACHE_ENABLED', 'SEMANTIC_CACHE_ENABLED',
+                'SINGLE_FLIGHT_ENABLED', 'INDEX_SNAPSHOT_ENABLED', 'REQUEST_TIMEOUT_SECONDS'
+            )},
+            'ingestion': ingestion,
+            'workload': workload,
+            'passed': not failures,
+            'failures': failures
+        }
+        _print_report(report)
+        print(f"\nResultado: {'OK' if not failures else 'FALHOU (' + '; '.join(failures) + ')'}")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output_file:
+                json.dump(report, output_file, indent=2, ensure_ascii=False)
+            print(f"Resultados gravados em {args.output}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
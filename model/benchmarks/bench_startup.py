@@ -0,0 +1,259 @@
+"""
+Tempo de inicialização e memória da API, com o custo de importação por módulo.
+
+Cada cenário roda num processo Python novo (como um worker recém-criado),
+repetido --repeat vezes (vale a mediana):
+
+- eager: importa antes da API os SDKs que eram carregados na inicialização
+  (langchain_openai, langchain_anthropic, langchain_google_genai e ChromaDB),
+  reproduzindo a inicialização anterior às importações sob demanda;
+- lazy: apenas `import api` (os SDKs ficam para o primeiro uso);
+- preload: `import api` + api.preload_dependencies(), o que o mestre do
+  gunicorn faz antes do fork (só os SDKs da configuração atual).
+
+Para cada cenário: tempo de importação da API, memória do processo (RSS e
+USS), módulos carregados, quais SDKs pesados estão no processo e o tempo do
+primeiro uso (criar o provedor de LLM configurado e o modelo de embeddings,
+sem chamadas de rede), que é o custo transferido para a primeira pergunta.
+
+Em seguida, o relatório por módulo (python -X importtime) do cenário lazy:
+tempo próprio e acumulado de importação agrupado por pacote de primeiro nível.
+
+Com --budget-seconds (padrão: STARTUP_BUDGET_SECONDS), o benchmark termina
+com código 1 se a importação da API no cenário lazy passar do orçamento.
+
+Uso (a partir de model/):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --top 20 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCENARIOS = ('eager', 'lazy', 'preload')
+# SDKs importados na inicialização antes das importações sob demanda
+EAGER_MODULES = (
+    'langchain_openai', 'langchain_anthropic', 'langchain_google_genai',
+    'chromadb', 'langchain_community.vectorstores.chroma'
+)
+_IMPORTTIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def _memory_mb() -> dict:
+    """RSS e USS do processo atual, em MB (smaps_rollup no Linux, maxrss nos demais)."""
+    if os.path.exists('/proc/self/smaps_rollup'):
+        from benchmarks.bench_worker_memory import _read_smaps_rollup
+
+        memory = _read_smaps_rollup()
+        return {'rss_mb': memory['rss_mb'], 'uss_mb': memory['uss_mb']}
+    import resource
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss em bytes no macOS e em KB no Linux
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {'rss_mb': round(maxrss / divisor, 1), 'uss_mb': None}
+
+
+def configure_environment(directory: str):
+    """Variáveis de ambiente lidas pelo config.py (antes de importar a API)."""
+    os.environ['CHROMA_DB_PATH'] = os.path.join(directory, 'chroma')
+    os.environ['INDEX_SNAPSHOT_PATH'] = os.path.join(directory, 'snapshot')
+    os.environ['USAGE_LOG_PATH'] = ''
+    os.environ['SEMANTIC_CACHE_AUDIT_LOG'] = os.path.join(directory, 'semantic_cache_audit.jsonl')
+    os.environ['PROFILING_DIR'] = os.path.join(directory, 'profiles')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Chaves fictícias: o primeiro uso cria os clientes, sem chamadas de rede
+    for key in ('OPENAI_API_KEY', 'ANTHROPIC_API_KEY', 'GOOGLE_API_KEY'):
+        os.environ.setdefault(key, 'benchmark')
+
+
+def run_trial(scenario: str, directory: str, first_use: bool = True) -> dict:
+    """
+    Executa um cenário neste processo (novo).
+
+    Args:
+        scenario: 'eager', 'lazy' ou 'preload'
+        directory: Pasta temporária (ChromaDB, snapshot, logs)
+        first_use: Mede também o primeiro uso (provedor e embeddings)
+
+    Returns:
+        Tempos (segundos), memória e módulos carregados
+    """
+    configure_environment(directory)
+    started_at = time.perf_counter()
+    if scenario == 'eager':
+        import importlib
+
+        for name in EAGER_MODULES:
+            importlib.import_module(name)
+    import api
+
+    import_seconds = time.perf_counter() - started_at
+    preload_seconds = 0.0
+    if scenario == 'preload':
+        preload_started_at = time.perf_counter()
+        api.preload_dependencies()
+        preload_seconds = time.perf_counter() - preload_started_at
+    memory = _memory_mb()
+    module_count = len(sys.modules)
+    heavy = [name for name, loaded in api.lazy_imports.stats()['loaded'].items() if loaded]
+
+    # Primeiro uso: provedor de LLM configurado e modelo de embeddings
+    first_use_seconds = 0.0
+    if first_use:
+        first_use_started_at = time.perf_counter()
+        api.get_llm_provider()
+        api.document_processor.embeddings.embeddings.model
+        first_use_seconds = time.perf_counter() - first_use_started_at
+
+    return {
+        'scenario': scenario,
+        'import_s': round(import_seconds, 3),
+        'api_import_s': api.lazy_imports.stats()['startup'].get('api'),
+        'preload_s': round(preload_seconds, 3),
+        'first_use_s': round(first_use_seconds, 3),
+        'modules': module_count,
+        'rss_mb': memory['rss_mb'],
+        'uss_mb': memory['uss_mb'],
+        'heavy_modules': heavy
+    }
+
+
+def _run_subprocess(args: list) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable] + args, check=True, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+
+
+def measure_scenario(scenario: str, repeat: int) -> dict:
+    """Mediana de --repeat execuções do cenário, cada uma num processo novo."""
+    trials = []
+    for _ in range(repeat):
+        directory = tempfile.mkdtemp(prefix='bench_startup_')
+        try:
+            completed = _run_subprocess(['-m', 'benchmarks.bench_startup', '--trial', scenario, directory])
+            trials.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    summary = {'scenario': scenario, 'runs': len(trials), 'heavy_modules': trials[-1]['heavy_modules']}
+    for key in ('import_s', 'preload_s', 'first_use_s', 'modules', 'rss_mb', 'uss_mb'):
+        values = [trial[key] for trial in trials if trial[key] is not None]
+        summary[key] = round(statistics.median(values), 3) if values else None
+    return summary
+
+
+def import_report(scenario: str, top: int) -> list:
+    """
+    Custo de importação por pacote de primeiro nível (python -X importtime).
+
+    Returns:
+        Lista (maior tempo próprio primeiro) com 'package', 'self_s',
+        'cumulative_s' (importações do pacote feitas por outros pacotes, com as
+        dependências) e 'modules'
+    """
+    directory = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        completed = _run_subprocess(['-X', 'importtime', '-m', 'benchmarks.bench_startup',
+                                     '--trial', scenario, directory, '--skip-first-use'])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    lines = [match for match in map(_IMPORTTIME_RE.match, completed.stderr.splitlines()) if match]
+    packages = {}
+    # O importtime lista cada módulo depois dos que ele importou; na ordem
+    # inversa, o pai aparece antes dos filhos. O acumulado de um pacote soma só
+    # as importações feitas de fora dele (sem contar duas vezes os submódulos)
+    parents = []
+    for match in reversed(lines):
+        self_us, cumulative_us = int(match.group(1)), int(match.group(2))
+        indent, module = len(match.group(3)), match.group(4)
+        package_name = module.split('.')[0]
+        while parents and parents[-1][0] >= indent:
+            parents.pop()
+        package = packages.setdefault(package_name, {'self_us': 0, 'cumulative_us': 0, 'modules': 0})
+        package['self_us'] += self_us
+        package['modules'] += 1
+        if not parents or parents[-1][1] != package_name:
+            package['cumulative_us'] += cumulative_us
+        parents.append((indent, package_name))
+    report = [
+        {
+            'package': name,
+            'self_s': round(values['self_us'] / 1e6, 3),
+            'cumulative_s': round(values['cumulative_us'] / 1e6, 3),
+            'modules': values['modules']
+        }
+        for name, values in packages.items()
+    ]
+    report.sort(key=lambda item: item['self_s'], reverse=True)
+    return report[:top]
+
+
+def main():
+    from benchmarks.bench_load import _git_commit
+    from config import STARTUP_BUDGET_SECONDS
+
+    parser = argparse.ArgumentParser(description='Tempo de inicialização e custo de importação por módulo')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Cenários (separados por vírgula)')
+    parser.add_argument('--repeat', type=int, default=3, help='Execuções por cenário (vale a mediana)')
+    parser.add_argument('--top', type=int, default=15, help='Pacotes no relatório de importação')
+    parser.add_argument('--report-scenario', default='lazy', choices=SCENARIOS,
+                        help='Cenário do relatório por módulo')
+    parser.add_argument('--budget-seconds', type=float, default=STARTUP_BUDGET_SECONDS,
+                        help='Orçamento para a importação da API no cenário lazy (0 = sem limite)')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    parser.add_argument('--trial', nargs=2, metavar=('CENARIO', 'DIRETORIO'), help=argparse.SUPPRESS)
+    parser.add_argument('--skip-first-use', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trial:
+        print(json.dumps(run_trial(*args.trial, first_use=not args.skip_first_use)))
+        return
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    print(f"{'cenário':<10}{'importação':>12}{'preload':>10}{'1º uso':>10}{'módulos':>9}{'RSS':>10}{'USS':>10}  SDKs pesados")
+    summaries = []
+    for scenario in scenarios:
+        summary = measure_scenario(scenario, args.repeat)
+        summaries.append(summary)
+        uss = f"{summary['uss_mb']:>8.1f}MB" if summary['uss_mb'] is not None else f"{'-':>10}"
+        print(f"{scenario:<10}{summary['import_s']:>11.2f}s{summary['preload_s']:>9.2f}s"
+              f"{summary['first_use_s']:>9.2f}s{summary['modules']:>9.0f}{summary['rss_mb']:>8.1f}MB{uss}"
+              f"  {', '.join(summary['heavy_modules']) or '-'}")
+
+    report = import_report(args.report_scenario, args.top)
+    print(f"\nImportação por pacote ({args.report_scenario}, python -X importtime):")
+    print(f"{'pacote':<28}{'próprio':>10}{'acumulado':>12}{'módulos':>9}")
+    for item in report:
+        print(f"{item['package']:<28}{item['self_s']:>9.3f}s{item['cumulative_s']:>11.3f}s{item['modules']:>9}")
+
+    lazy = next((summary for summary in summaries if summary['scenario'] == 'lazy'), None)
+    over_budget = bool(args.budget_seconds and lazy and lazy['import_s'] > args.budget_seconds)
+    if lazy and args.budget_seconds:
+        status = 'ACIMA do orçamento' if over_budget else 'dentro do orçamento'
+        print(f"\nImportação da API (lazy): {lazy['import_s']:.2f}s, {status} de {args.budget_seconds:.2f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({
+                'commit': _git_commit(),
+                'python': sys.version.split()[0],
+                'repeat': args.repeat,
+                'budget_seconds': args.budget_seconds,
+                'over_budget': over_budget,
+                'scenarios': summaries,
+                'import_report': {'scenario': args.report_scenario, 'packages': report}
+            }, output_file, indent=2)
+        print(f"\nResultados gravados em {args.output}")
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
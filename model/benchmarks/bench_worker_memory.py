@@ -0,0 +1,255 @@
+"""
+Memória por worker: ChromaDB em cada worker x snapshot mapeado em memória.
+
+Monta um índice sintético (vetores aleatórios normalizados, com a dimensão
+dos embeddings da OpenAI) no ChromaDB e exporta o mesmo conteúdo para um
+snapshot (index_snapshot.py). Para 1, 4 e 8 workers, cada modo roda num
+processo mestre novo que cria os workers com fork, como o gunicorn:
+
+- chroma: cada worker abre o seu próprio cliente do ChromaDB (índice HNSW
+  carregado por processo);
+- snapshot: o mestre mapeia e aquece o snapshot antes do fork (preload) e os
+  workers apenas usam o mapeamento herdado.
+
+Cada worker executa algumas consultas (MMR) e, com todos os workers ainda
+vivos, lê /proc/self/smaps_rollup. O PSS (memória proporcional, que divide as
+páginas compartilhadas entre os processos) é a medida relevante para o custo
+real de RAM; o RSS conta as páginas compartilhadas em todos os processos.
+
+Uso (a partir de model/, somente Linux):
+    python -m benchmarks.bench_worker_memory
+    python -m benchmarks.bench_worker_memory --chunks 20000 --workers 1,4,8 --output memoria.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+COLLECTION_NAME = 'benchmark_documents'
+
+
+def _read_smaps_rollup() -> dict:
+    """Lê RSS, PSS e memória privada (USS) do processo atual, em MB."""
+    values = {}
+    with open('/proc/self/smaps_rollup', 'r') as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) >= 3 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024.0
+    return {
+        'rss_mb': round(values.get('Rss', 0.0), 1),
+        'pss_mb': round(values.get('Pss', 0.0), 1),
+        'uss_mb': round(values.get('Private_Clean', 0.0) + values.get('Private_Dirty', 0.0), 1)
+    }
+
+
+def build_index(directory: str, chunks: int, dimension: int, seed: int = 42):
+    """Cria a collection sintética no ChromaDB e exporta o snapshot equivalente."""
+    import chromadb
+    import numpy as np
+    from chromadb.config import Settings
+
+    from index_snapshot import export_snapshot
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((chunks, dimension), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    text = 'Os condutores que forem encontrados a conduzir sem trazerem consigo os documentos ' * 10
+
+    client = chromadb.PersistentClient(path=os.path.join(directory, 'chroma'),
+                                       settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection(COLLECTION_NAME)
+    batch_size = 1000
+    for start in range(0, chunks, batch_size):
+        end = min(start + batch_size, chunks)
+        collection.add(
+            ids=[f'chunk-{i}' for i in range(start, end)],
+            embeddings=vectors[start:end].tolist(),
+            documents=[text] * (end - start),
+            metadatas=[{'source': f'documento_{i % 20}.pdf', 'article_number': str(i % 300), 'page': i % 150 + 1}
+                       for i in range(start, end)]
+        )
+    export_snapshot(collection, os.path.join(directory, 'snapshot'), corpus_version=1)
+
+
+def _worker(mode: str, directory: str, queries, fetch_k: int, k: int):
+    """Corpo de um worker: abre o índice (modo chroma) e executa as consultas."""
+    if mode == 'chroma':
+        import chromadb
+        from chromadb.config import Settings
+
+        client = chromadb.PersistentClient(path=os.path.join(directory, 'chroma'),
+                                           settings=Settings(anonymized_telemetry=False))
+        collection = client.get_collection(COLLECTION_NAME)
+        for query in queries:
+            collection.query(query_embeddings=[query.tolist()], n_results=fetch_k,
+                             include=['metadatas', 'documents', 'distances', 'embeddings'])
+    else:
+        for query in queries:
+            _SNAPSHOT.max_marginal_relevance_search_by_vector(query, k=k, fetch_k=fetch_k)
+
+
+_SNAPSHOT = None
+
+
+def run_trial(mode: str, directory: str, workers: int, query_count: int) -> dict:
+    """
+    Executa um cenário (modo x número de workers) neste processo, que faz o papel do mestre.
+
+    Returns:
+        Medidas do mestre e de cada worker
+    """
+    global _SNAPSHOT
+    import chromadb  # noqa: F401  (mesmas bibliotecas carregadas nos dois modos)
+    import numpy as np
+
+    from index_snapshot import load_current_snapshot
+
+    if mode == 'snapshot':
+        _SNAPSHOT = load_current_snapshot(os.path.join(directory, 'snapshot'))
+        _SNAPSHOT.warm()
+        dimension = _SNAPSHOT.dimension
+    else:
+        with open(os.path.join(directory, 'snapshot', 'current.json')) as current_file:
+            name = json.load(current_file)['name']
+        with open(os.path.join(directory, 'snapshot', name, 'manifest.json')) as manifest_file:
+            dimension = json.load(manifest_file)['dimension']
+
+    rng = np.random.default_rng(7)
+    queries = rng.standard_normal((query_count, dimension), dtype=np.float32)
+
+    ready_read, ready_write = os.pipe()
+    release_read, release_write = os.pipe()
+    result_read, result_write = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                os.close(ready_read)
+                os.close(release_write)
+                os.close(result_read)
+                started_at = time.perf_counter()
+                _worker(mode, directory, queries, fetch_k=10, k=8)
+                elapsed = time.perf_counter() - started_at
+                os.write(ready_write, b'r')
+                # Todos os workers vivos ao mesmo tempo durante a medição
+                os.read(release_read, 1)
+                measurement = _read_smaps_rollup()
+                measurement['query_ms'] = round(elapsed / max(query_count, 1) * 1000, 2)
+                os.write(result_write, (json.dumps(measurement) + '\n').encode())
+            except Exception as e:
+                print(f"Erro no worker: {str(e)}", file=sys.stderr)
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        pids.append(pid)
+
+    os.close(ready_write)
+    os.close(release_read)
+    os.close(result_write)
+    for _ in range(workers):
+        os.read(ready_read, 1)
+    # Mestre medido com todos os workers vivos
+    master = _read_smaps_rollup()
+    os.write(release_write, b'g' * workers)
+
+    output = b''
+    while output.count(b'\n') < workers:
+        chunk = os.read(result_read, 65536)
+        if not chunk:
+            break
+        output += chunk
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    worker_measurements = [json.loads(line) for line in output.decode().splitlines() if line]
+    return {'mode': mode, 'workers': workers, 'master': master, 'worker_measurements': worker_measurements}
+
+
+def summarize(trial: dict) -> dict:
+    """Resume um cenário: médias por worker e PSS total (mestre + workers)."""
+    measurements = trial['worker_measurements']
+    count = max(len(measurements), 1)
+
+    def average(key):
+        return round(sum(m[key] for m in measurements) / count, 1)
+
+    return {
+        'mode': trial['mode'],
+        'workers': trial['workers'],
+        'rss_per_worker_mb': average('rss_mb'),
+        'pss_per_worker_mb': average('pss_mb'),
+        'uss_per_worker_mb': average('uss_mb'),
+        'total_pss_mb': round(trial['master']['pss_mb'] + sum(m['pss_mb'] for m in measurements), 1),
+        'query_ms': round(sum(m['query_ms'] for m in measurements) / count, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memória por worker: ChromaDB x snapshot mapeado')
+    parser.add_argument('--chunks', type=int, default=20000, help='Número de chunks do índice sintético')
+    parser.add_argument('--dimension', type=int, default=1536, help='Dimensão dos embeddings')
+    parser.add_argument('--workers', default='1,4,8', help='Números de workers (separados por vírgula)')
+    parser.add_argument('--queries', type=int, default=20, help='Consultas por worker')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    parser.add_argument('--trial', nargs=3, metavar=('MODO', 'WORKERS', 'DIRETORIO'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trial:
+        mode, workers, directory = args.trial
+        print(json.dumps(run_trial(mode, directory, int(workers), args.queries)))
+        return
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print('Este benchmark precisa do /proc/self/smaps_rollup (Linux).')
+        sys.exit(1)
+
+    directory = tempfile.mkdtemp(prefix='bench_worker_memory_')
+    try:
+        print(f"Montando índice sintético: {args.chunks} chunks x {args.dimension} dimensões...")
+        started_at = time.perf_counter()
+        # Em outro processo: o mestre de cada cenário não herda o cliente usado na montagem
+        subprocess.run([sys.executable, '-c',
+                        'import sys; from benchmarks.bench_worker_memory import build_index; '
+                        'build_index(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))',
+                        directory, str(args.chunks), str(args.dimension)], check=True)
+        print(f"Índice montado em {time.perf_counter() - started_at:.1f}s\n")
+
+        summaries = []
+        print(f"{'modo':<10}{'workers':>8}{'RSS/worker':>12}{'PSS/worker':>12}{'USS/worker':>12}"
+              f"{'PSS total':>11}{'consulta':>10}")
+        for mode in ('chroma', 'snapshot'):
+            for workers in [int(w) for w in args.workers.split(',')]:
+                completed = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.bench_worker_memory', '--queries', str(args.queries),
+                     '--trial', mode, str(workers), directory],
+                    check=True, capture_output=True, text=True
+                )
+                summary = summarize(json.loads(completed.stdout.strip().splitlines()[-1]))
+                summaries.append(summary)
+                print(f"{mode:<10}{workers:>8}{summary['rss_per_worker_mb']:>10.1f}MB"
+                      f"{summary['pss_per_worker_mb']:>10.1f}MB{summary['uss_per_worker_mb']:>10.1f}MB"
+                      f"{summary['total_pss_mb']:>9.1f}MB{summary['query_ms']:>8.2f}ms")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output_file:
+                json.dump({
+                    'chunks': args.chunks,
+                    'dimension': args.dimension,
+                    'queries_per_worker': args.queries,
+                    'results': summaries
+                }, output_file, indent=2)
+            print(f"\nResultados gravados em {args.output}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""
+Gerador de corpus sintético de decretos em PDF para testes de escala.
+
+Cada documento imita a estrutura dos decretos do Código da Estrada: título e
+preâmbulo, CAPÍTULO, SECÇÃO, "Artigo N - Título" com números ("1.", "2."),
+alíneas ("a)", "b)") e multas em MT. O texto é sorteado a partir de --seed
+(mesma semente = mesmos PDFs) e o tamanho é controlado pelo número de páginas.
+
+Os PDFs são escritos diretamente (PDF 1.4, fonte Helvetica padrão com
+WinAnsiEncoding, sem dependências) e têm texto extraível pelo PyPDF2, como
+os PDFs reais.
+
+Uso (a partir de model/):
+    python -m benchmarks.corpus_generator --output-dir /tmp/corpus --documents 50 --pages 40
+"""
+
+import argparse
+import os
+import random
+import textwrap
+from typing import List
+
+# Página A4 em pontos, fonte de 10 pt
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+FONT_SIZE = 10
+LEADING = 13
+MARGIN = 56
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+LINE_WIDTH = 95
+
+ROMAN = ['I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX', 'X', 'XI', 'XII', 'XIII', 'XIV', 'XV',
+         'XVI', 'XVII', 'XVIII', 'XIX', 'XX']
+
+CHAPTERS = [
+    'Disposições gerais', 'Do trânsito de veículos', 'Da sinalização', 'Da circulação de peões',
+    'Dos veículos e sua matrícula', 'Da habilitação legal para conduzir', 'Das contravenções',
+    'Do estacionamento', 'Do transporte de passageiros', 'Do transporte de mercadorias',
+    'Da fiscalização', 'Das sanções acessórias', 'Dos acidentes de viação', 'Disposições finais e transitórias',
+]
+SECTIONS = [
+    'Regras gerais', 'Velocidade', 'Ultrapassagem', 'Cruzamentos e entroncamentos', 'Iluminação',
+    'Paragem e estacionamento', 'Auto-estradas', 'Equipamento obrigatório', 'Inspecções',
+    'Cartas de condução', 'Multas', 'Inibição de conduzir', 'Seguro obrigatório', 'Apreensão de veículos',
+]
+ARTICLE_TOPICS = [
+    'Âmbito de aplicação', 'Definições', 'Sinais dos agentes reguladores do trânsito', 'Distância entre veículos',
+    'Limites de velocidade', 'Velocidade moderada', 'Proibição de ultrapassar', 'Cedência de passagem',
+    'Utilização das luzes', 'Sinais sonoros', 'Estacionamento proibido', 'Paragem de veículos',
+    'Transporte de crianças', 'Cintos de segurança e capacetes', 'Condução sob influência do álcool',
+    'Uso de telemóveis', 'Avaria e imobilização forçada', 'Pré-sinalização de perigo', 'Inspecção periódica',
+    'Matrícula dos veículos', 'Validade da carta de condução', 'Revalidação de títulos de condução',
+    'Classificação das contravenções', 'Inibição de conduzir', 'Cassação da carta de condução',
+    'Responsabilidade pelas contravenções', 'Apreensão de documentos', 'Abandono de sinistrados',
+    'Transporte de carga perigosa', 'Dimensões e pesos dos veículos', 'Reboque de veículos',
+    'Circulação de ciclomotores', 'Veículos de tracção animal', 'Passagens de peões', 'Obras na via pública',
+]
+SUBJECTS = [
+    'Os condutores', 'Os titulares de carta de condução', 'Os proprietários dos veículos',
+    'Os condutores de veículos pesados', 'Os condutores de ciclomotores e motociclos',
+    'Os peões', 'As entidades fiscalizadoras', 'Os agentes de fiscalização do trânsito',
+    'Os condutores de veículos de transporte público', 'Os passageiros',
+]
+DUTIES = [
+    'devem moderar especialmente a velocidade', 'são obrigados a parar sempre que lhes seja ordenado',
+    'devem ceder a passagem aos veículos que se apresentem pela direita',
+    'não podem transitar a velocidade superior à fixada para a respectiva categoria',
+    'devem manter entre o seu veículo e o que o precede a distância suficiente',
+    'são obrigados a usar as luzes de cruzamento', 'devem apresentar os documentos exigidos por lei',
+    'não podem estacionar nos locais assinalados', 'devem sinalizar a manobra com a necessária antecedência',
+    'são responsáveis pelo cumprimento das obrigações previstas no presente Código',
+]
+CONTEXTS = [
+    'nas localidades', 'fora das localidades', 'nas auto-estradas', 'nas pontes e túneis',
+    'junto das passagens de peões', 'nos cruzamentos e entroncamentos', 'durante a noite',
+    'em condições de visibilidade reduzida', 'nas vias de sentido único', 'nas curvas e lombas de estrada',
+    'junto de escolas e hospitais', 'quando o piso se apresente escorregadio',
+]
+ITEMS = [
+    'Nas lombas de estrada, curvas e outros locais de visibilidade reduzida',
+    'A menos de 50 m dos cruzamentos e entroncamentos', 'Nas passagens assinaladas para peões',
+    'Nas faixas de rodagem, em segunda fila', 'Nas pontes, túneis e passagens de nível',
+    'Sempre que a largura da via não permita a manobra em segurança', 'Quando transportem carga perigosa',
+    'Durante a realização de obras na via pública', 'Em caso de avaria ou acidente',
+    'Quando o condutor não possua o título de condução exigido',
+]
+FINES = ['500,00MT', '1000,00MT', '1500,00MT', '2000,00MT', '3500,00MT', '4000,00MT', '8000,00MT', '12000,00MT']
+SEVERITIES = ['leve', 'média', 'grave']
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """
+    Grava um PDF de texto simples (uma lista de linhas por página).
+
+    Args:
+        path: Arquivo de destino
+        pages: Linhas de cada página (até LINES_PER_PAGE por página)
+    """
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # Páginas: preenchido depois de conhecer os objetos das páginas
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    ]
+    page_ids = []
+    for lines in pages:
+        content = [f'BT /F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td'.encode('ascii')]
+        for line in lines:
+            content.append(b'(' + _escape(line).encode('cp1252', errors='replace') + b') Tj T*')
+        content.append(b'ET')
+        stream = b'\n'.join(content)
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>'.encode('ascii')
+        )
+        page_ids.append(len(objects))
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+    objects[1] = f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'.encode('ascii')
+
+    output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref_offset = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        output += b'%010d 00000 n \n' % offset
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset)
+    with open(path, 'wb') as pdf_file:
+        pdf_file.write(output)
+
+
+def _paragraph(rng: random.Random) -> str:
+    sentence = f"{rng.choice(SUBJECTS)} {rng.choice(DUTIES)} {rng.choice(CONTEXTS)}"
+    if rng.random() < 0.5:
+        sentence += f", salvo nos casos previstos no artigo {rng.randint(1, 180)}"
+    return sentence + '.'
+
+
+def decree_lines(rng: random.Random, number: int, pages: int) -> List[str]:
+    """
+    Texto de um decreto sintético com aproximadamente o número de páginas pedido.
+
+    Args:
+        rng: Gerador aleatório (determina o texto)
+        number: Número do decreto (usado no título)
+        pages: Número aproximado de páginas
+
+    Returns:
+        Linhas do documento, já quebradas na largura da página
+    """
+    year = rng.randint(1990, 2024)
+    paragraphs = [
+        f"DECRETO-LEI N.º {number}/{year}",
+        f"de {rng.randint(1, 28)} de {rng.choice(['Janeiro', 'Março', 'Maio', 'Julho', 'Setembro', 'Novembro'])}",
+        "Havendo necessidade de actualizar as normas que regulam o trânsito nas vias públicas, ao abrigo "
+        "da competência atribuída pela Constituição, o Conselho de Ministros decreta:",
+        "",
+    ]
+    target_lines = pages * LINES_PER_PAGE
+    article = 1
+    chapter = 0
+    section = 0
+    line_count = sum(len(textwrap.wrap(paragraph, LINE_WIDTH)) or 1 for paragraph in paragraphs)
+    while line_count < target_lines:
+        block = []
+        if article == 1 or rng.random() < 0.08:
+            block += ['', f"CAPÍTULO {ROMAN[chapter % len(ROMAN)]}", CHAPTERS[chapter % len(CHAPTERS)]]
+            chapter += 1
+            section = 0
+        if rng.random() < 0.15:
+            block += ['', f"SECÇÃO {ROMAN[section % len(ROMAN)]}", rng.choice(SECTIONS)]
+            section += 1
+        block += ['', f"Artigo {article} - {rng.choice(ARTICLE_TOPICS)}"]
+        for paragraph_number in range(1, rng.randint(2, 7)):
+            if rng.random() < 0.3:
+                block.append(f"{paragraph_number}. É proibido:")
+                for letter, item in zip('abcdefghij', rng.sample(ITEMS, rng.randint(2, 5))):
+                    block.append(f"{letter}) {item};")
+            elif rng.random() < 0.4:
+                block.append(
+                    f"{paragraph_number}. Quem infringir o disposto no n.º {rng.randint(1, paragraph_number)} "
+                    f"é punido com multa de {rng.choice(FINES)}, constituindo contravenção "
+                    f"{rng.choice(SEVERITIES)}."
+                )
+            else:
+                block.append(f"{paragraph_number}. {_paragraph(rng)} {_paragraph(rng)}")
+        paragraphs += block
+        line_count += sum(len(textwrap.wrap(paragraph, LINE_WIDTH)) or 1 for paragraph in block)
+        article += 1
+
+    lines = []
+    for paragraph in paragraphs:
+        lines.extend(textwrap.wrap(paragraph, LINE_WIDTH) or [''])
+    return lines
+
+
+def generate_document(path: str, number: int, pages: int, seed: int):
+    """Gera um decreto sintético em path (mesmos seed e number = mesmo PDF)."""
+    rng = random.Random(f'{seed}-{number}')
+    lines = decree_lines(rng, number, pages)
+    write_pdf(path, [lines[start:start + LINES_PER_PAGE] for start in range(0, len(lines), LINES_PER_PAGE)])
+
+
+def document_name(number: int) -> str:
+    return f'Decreto-Lei-sintetico-{number:04d}.pdf'
+
+
+def generate_corpus(directory: str, documents: int, pages: int, seed: int = 42, start: int = 1) -> List[str]:
+    """
+    Gera documentos numerados a partir de start.
+
+    Returns:
+        Caminhos dos PDFs gerados
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for number in range(start, start + documents):
+        path = os.path.join(directory, document_name(number))
+        generate_document(path, number, pages, seed)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera decretos sintéticos em PDF')
+    parser.add_argument('--output-dir', required=True, help='Pasta de destino dos PDFs')
+    parser.add_argument('--documents', type=int, default=10, help='Número de documentos')
+    parser.add_argument('--pages', type=int, default=40, help='Páginas por documento (aproximado)')
+    parser.add_argument('--seed', type=int, default=42, help='Semente do texto')
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.output_dir, args.documents, args.pages, args.seed)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    print(f"{len(paths)} PDFs gerados em {args.output_dir} ({total_bytes / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Provedores locais (stubs) para benchmarks sem custo de API.
+
+- StubChatModel: chat model do LangChain com latência, taxa de geração de
+  tokens, lentidão ocasional e taxa de erros configuráveis, deterministas a
+  partir de uma semente;
+- StubLLMProvider: provedor (llm_providers) que usa o StubChatModel;
+- HashEmbeddings: embeddings deterministas a partir do hash das palavras
+  (textos com palavras em comum ficam próximos), com latência configurável.
+"""
+
+import asyncio
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from llm_providers.base import BaseLLMProvider
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model falso com latência e falhas configuráveis."""
+
+    answer: str = 'Resposta de teste (Artigo 1 do documento.pdf).'
+    # Latência normal e variação (uniforme, em segundos)
+    latency_seconds: float = 0.05
+    jitter_seconds: float = 0.0
+    # Fração das chamadas que demoram slow_latency_seconds (fornecedor degradado)
+    slow_rate: float = 0.0
+    slow_latency_seconds: float = 2.0
+    # Fração das chamadas que falham (ex: 429/500 do fornecedor)
+    error_rate: float = 0.0
+    # Tokens gerados por segundo depois da latência inicial (0 = resposta inteira de uma vez);
+    # cada palavra da resposta conta como um token
+    tokens_per_second: float = 0.0
+    # Como no LLM_STREAMING dos provedores: invoke transmite os tokens (mede o primeiro token)
+    streaming: bool = False
+    seed: int = 0
+
+    _random: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'stub'
+
+    def _draw(self) -> tuple:
+        """Sorteia (latência, se falha) da próxima chamada."""
+        with self._lock:
+            if self._random is None:
+                self._random = random.Random(self.seed)
+            self.calls += 1
+            latency = self.latency_seconds + self._random.uniform(0.0, self.jitter_seconds)
+            if self._random.random() < self.slow_rate:
+                latency = self.slow_latency_seconds
+            fails = self._random.random() < self.error_rate
+        return latency, fails
+
+    def _generation_seconds(self) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return len(self.answer.split()) / self.tokens_per_second
+
+    def _usage(self, messages: List[Any]) -> dict:
+        """Tokens informados como usage_metadata (~4 caracteres por token na entrada)."""
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        output_tokens = len(self.answer.split())
+        return {'input_tokens': input_tokens, 'output_tokens': output_tokens,
+                'total_tokens': input_tokens + output_tokens}
+
+    def _result(self, messages: List[Any], fails: bool) -> ChatResult:
+        if fails:
+            raise RuntimeError('Erro simulado do provedor (stub)')
+        message = AIMessage(content=self.answer, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[Any], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        if self.streaming:
+            return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+        latency, fails = self._draw()
+        time.sleep(latency + self._generation_seconds())
+        return self._result(messages, fails)
+
+    async def _agenerate(self, messages: List[Any], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs) -> ChatResult:
+        latency, fails = self._draw()
+        await asyncio.sleep(latency + self._generation_seconds())
+        return self._result(messages, fails)
+
+    def _stream(self, messages: List[Any], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        """Transmite a resposta palavra por palavra, na taxa tokens_per_second."""
+        latency, fails = self._draw()
+        time.sleep(latency)
+        if fails:
+            raise RuntimeError('Erro simulado do provedor (stub)')
+        words = self.answer.split(' ')
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for index, word in enumerate(words):
+            if index and interval:
+                time.sleep(interval)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if index == 0 else ' ' + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content='', usage_metadata=self._usage(messages)))
+
+
+class StubLLMProvider(BaseLLMProvider):
+    """
+    Provedor de LLM local para benchmarks.
+
+    O config aceita 'model' (nome na contabilização de uso) e os campos do
+    StubChatModel (ex: {'model': 'stub', 'latency_seconds': 0.3, 'tokens_per_second': 50}).
+    """
+
+    provider_name = 'stub'
+
+    def _initialize_llm(self):
+        self.llm = StubChatModel(**{key: value for key, value in self.config.items() if key != 'model'})
+
+    def get_llm(self):
+        return self.llm
+
+
+_WORD_RE = re.compile(r'\w+')
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Embeddings deterministas: cada palavra soma ±1 numa posição do vetor
+    escolhida pelo seu hash (blake2b, igual em todas as execuções).
+    """
+
+    def __init__(self, dimension: int = 256, latency_seconds: float = 0.0):
+        """
+        Args:
+            dimension: Dimensão dos vetores
+            latency_seconds: Latência simulada de cada chamada ao provedor
+        """
+        self.dimension = dimension
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for word in _WORD_RE.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], 'little') % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
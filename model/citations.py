@@ -0,0 +1,98 @@
+"""
+Citações estruturadas para as respostas do IB - EstradaResponde.
+
+Monta a lista de citações a partir dos metadados dos chunks recuperados
+(source, article_number, chapter, section, page) e do catálogo de documentos,
+sem depender do texto livre gerado pelo LLM.
+"""
+
+import os
+from typing import Callable, List, Optional
+
+from document_processor import PAGE_MARKER_RE
+from markdown_renderer import build_document_url
+
+# Tamanho do identificador UUID usado como prefixo dos arquivos enviados
+_UUID_LENGTH = 36
+
+
+def document_id_from_path(file_path: str, fallback: str) -> str:
+    """
+    Obtém o identificador do documento a partir do caminho salvo no upload.
+
+    Os arquivos são salvos como "<uuid>_<nome>.pdf"; se o caminho não seguir
+    esse padrão, usa o valor de fallback (normalmente o nome do documento).
+
+    Args:
+        file_path: Caminho do arquivo físico
+        fallback: Valor usado quando não há UUID no nome do arquivo
+
+    Returns:
+        Identificador do documento
+    """
+    filename = os.path.basename(file_path or '')
+    prefix, _, rest = filename.partition('_')
+    if rest and len(prefix) == _UUID_LENGTH:
+        return prefix
+    return fallback
+
+
+def _page_from_chunk(metadata: dict, content: str) -> Optional[int]:
+    """Página do chunk: metadado 'page' ou primeiro marcador no conteúdo."""
+    page = metadata.get('page')
+    if page:
+        return int(page)
+    marker = PAGE_MARKER_RE.search(content or '')
+    return int(marker.group(1)) if marker else None
+
+
+def build_citations(source_documents, base_url: str,
+                    resolve_document: Optional[Callable[[str], Optional[str]]] = None) -> List[dict]:
+    """
+    Cria a lista de citações a partir dos documentos recuperados.
+
+    Cada par (documento, artigo) aparece uma única vez, na ordem em que foi
+    recuperado (do mais relevante para o menos relevante).
+
+    Args:
+        source_documents: Documentos retornados pelo retriever (LangChain Document)
+        base_url: URL base da API para montar os links de visualização
+        resolve_document: Função opcional que devolve o nome exato do documento
+            no catálogo (ex: DocumentProcessor.find_document_by_name)
+
+    Returns:
+        Lista de dicionários com document_id, document, article, chapter,
+        section, page e view_url
+    """
+    citations = []
+    seen = set()
+
+    for doc in source_documents or []:
+        metadata = getattr(doc, 'metadata', None) or {}
+        source = metadata.get('source')
+        if not source:
+            continue
+
+        document_name = (resolve_document(source) if resolve_document else None) or source
+        article = metadata.get('article_number')
+        key = (document_name, article)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        page = _page_from_chunk(metadata, getattr(doc, 'page_content', ''))
+        view_url = build_document_url(base_url, document_name)
+        if page:
+            view_url = f"{view_url}#page={page}"
+
+        citations.append({
+            'document_id': document_id_from_path(metadata.get('file_path', ''), document_name),
+            'document': document_name,
+            'article': article,
+            'chapter': metadata.get('chapter'),
+            'section': metadata.get('section'),
+            'page': page,
+            'view_url': view_url
+        })
+
+    return citations
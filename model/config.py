@@ -3,6 +3,7 @@ Configuração centralizada para o sistema IB - EstradaResponde.
 Permite trocar facilmente entre diferentes modelos LLM.
 """
 
+import json
 import os
 from dotenv import load_dotenv
 
@@ -15,36 +16,82 @@ load_dotenv()
 # export LLM_PROVIDER=openai && python api.py
 LLM_PROVIDER = 'claude'  # SEMPRE usar Claude Sonnet, ignorar .env
 
+# Prazos das perguntas (segundos): total e por etapa; nenhuma etapa passa do total
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('REQUEST_TIMEOUT_SECONDS', '120'))
+EMBEDDING_TIMEOUT_SECONDS = float(os.getenv('EMBEDDING_TIMEOUT_SECONDS', '10'))
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv('RETRIEVAL_TIMEOUT_SECONDS', '20'))
+# Também é o tempo limite HTTP dos clientes dos provedores de LLM
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '90'))
+# Recebe a resposta do LLM em streaming (Claude e OpenAI), o que permite medir
+# o tempo até o primeiro token; a resposta da API continua sendo enviada inteira
+LLM_STREAMING = os.getenv('LLM_STREAMING', 'False').lower() == 'true'
+
 # Configurações específicas por provedor
 LLM_CONFIG = {
     'openai': {
         'model': os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
         'temperature': float(os.getenv('OPENAI_TEMPERATURE', '0.1')),
         'max_tokens': int(os.getenv('OPENAI_MAX_TOKENS', '2048')),
+        'timeout': LLM_TIMEOUT_SECONDS,
+        'streaming': LLM_STREAMING,
         'api_key': os.getenv('OPENAI_API_KEY')
     },
     'claude': {
         'model': os.getenv('CLAUDE_MODEL', 'claude-sonnet-4-5-20250929'),
         'temperature': float(os.getenv('CLAUDE_TEMPERATURE', '0.1')),
         'max_tokens': int(os.getenv('CLAUDE_MAX_TOKENS', '2048')),
+        'timeout': LLM_TIMEOUT_SECONDS,
+        'streaming': LLM_STREAMING,
         'api_key': os.getenv('ANTHROPIC_API_KEY')
     },
     'gemini': {
         'model': os.getenv('GEMINI_MODEL', 'gemini-pro'),
         'temperature': float(os.getenv('GEMINI_TEMPERATURE', '0.1')),
+        'timeout': LLM_TIMEOUT_SECONDS,
         'api_key': os.getenv('GOOGLE_API_KEY')
     }
 }
 
+# Roteamento entre vários provedores (failover e requisições de reserva)
+# Lista em ordem de preferência (ex: "claude,openai"); vazio = apenas LLM_PROVIDER
+LLM_ROUTER_PROVIDERS = [name.strip().lower() for name in os.getenv('LLM_ROUTER_PROVIDERS', '').split(',') if name.strip()]
+# Tempo máximo de cada chamada a um provedor antes de passar ao próximo
+LLM_ROUTER_TIMEOUT_SECONDS = float(os.getenv('LLM_ROUTER_TIMEOUT_SECONDS', '60'))
+# Envia a pergunta também ao próximo provedor quando o primeiro passa do seu p95
+LLM_ROUTER_HEDGE_ENABLED = os.getenv('LLM_ROUTER_HEDGE_ENABLED', 'False').lower() == 'true'
+# Espera mínima antes da requisição de reserva (segundos)
+LLM_ROUTER_HEDGE_MIN_SECONDS = float(os.getenv('LLM_ROUTER_HEDGE_MIN_SECONDS', '5'))
+
+# Gravação e reprodução das respostas do LLM (testes e benchmarks sem custo e reproduzíveis)
+# '' = desativado; 'record' = chama o provedor e grava; 'replay' = usa a resposta
+# gravada e chama o provedor (gravando) quando não houver; 'strict' = só respostas
+# gravadas, erro quando não houver
+LLM_REPLAY_MODE = os.getenv('LLM_REPLAY_MODE', '').strip().lower()
+# Pasta com as respostas gravadas (um arquivo JSON por chamada)
+LLM_REPLAY_PATH = os.getenv('LLM_REPLAY_PATH', './llm_replay')
+
 # Configuração de embeddings
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-large')
 EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'openai')
 
+# Embeddings de consulta: cache LRU e agrupamento de consultas concorrentes em lotes
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '1024'))
+QUERY_EMBEDDING_BATCH_WINDOW_MS = float(os.getenv('QUERY_EMBEDDING_BATCH_WINDOW_MS', '5'))
+QUERY_EMBEDDING_MAX_BATCH_SIZE = int(os.getenv('QUERY_EMBEDDING_MAX_BATCH_SIZE', '64'))
+# Lotes enviados ao provedor ao mesmo tempo (um lote lento não segura os seguintes)
+QUERY_EMBEDDING_MAX_CONCURRENT_BATCHES = int(os.getenv('QUERY_EMBEDDING_MAX_CONCURRENT_BATCHES', '4'))
+
 # Configuração do ChromaDB - Banco separado para Código de Estrada
 CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH', './chroma_db_codigo_estrada')
 CHROMA_COLLECTION_NAME = os.getenv('CHROMA_COLLECTION_NAME', 'codigo_estrada_documents')
+# Arquivo com a versão do corpus, compartilhado pelos workers (fica fora do diretório do banco)
+CORPUS_VERSION_FILE = os.getenv('CORPUS_VERSION_FILE', CHROMA_DB_PATH.rstrip('/\\') + '.version')
+# Snapshot do índice mapeado em memória, compartilhado pelos workers (modo preload)
+INDEX_SNAPSHOT_ENABLED = os.getenv('INDEX_SNAPSHOT_ENABLED', 'False').lower() == 'true'
+INDEX_SNAPSHOT_PATH = os.getenv('INDEX_SNAPSHOT_PATH', CHROMA_DB_PATH.rstrip('/\\') + '_snapshot')
 
 # Configuração de processamento de texto
+# Para comparar valores de chunking e de busca: python -m benchmarks.bench_retrieval
 # Aumentado para melhor preservar artigos completos e capturar últimos parágrafos
 CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '3000'))  # Aumentado para 3000 para capturar artigos completos
 # Overlap aumentado MUITO significativamente para garantir que artigos não sejam cortados e capturar melhor os últimos parágrafos, especialmente quando estão em outra página
@@ -56,11 +103,92 @@ SEARCH_K = int(os.getenv('SEARCH_K', '15'))  # Aumentado para 15 para buscar mai
 SEARCH_FETCH_K = int(os.getenv('SEARCH_FETCH_K', '25'))  # Aumentado para 25 para ter mais opções na busca
 SEARCH_LAMBDA_MULT = float(os.getenv('SEARCH_LAMBDA_MULT', '0.4'))  # Reduzido para 0.4 para mais diversidade e capturar chunks relacionados
 
+# Cache de respostas (perguntas repetidas)
+ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '512'))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv('ANSWER_CACHE_TTL_SECONDS', '3600'))  # 1 hora
+
+# Cache semântico (perguntas parafraseadas) - desativado por padrão até o limiar ser calibrado
+SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'False').lower() == 'true'
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '256'))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92'))  # Similaridade de cosseno mínima
+SEMANTIC_CACHE_AUDIT_LOG = os.getenv('SEMANTIC_CACHE_AUDIT_LOG', './logs/semantic_cache_audit.jsonl')
+
 # Configuração da API - Porta diferente para não conflitar
 API_HOST = os.getenv('API_HOST', '0.0.0.0')
 API_PORT = int(os.getenv('API_PORT', '5001'))  # Porta 5001 para Código de Estrada
 API_DEBUG = os.getenv('API_DEBUG', 'False').lower() == 'true'
 
+# Servidor: número máximo de chamadas simultâneas ao LLM por processo
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv('MAX_CONCURRENT_LLM_CALLS', '16'))
+# Fila de espera por uma vaga no LLM: tamanho máximo, tempo máximo de espera
+# e requisições em espera por cliente; acima disso a resposta é 503 (ocupado)
+LLM_QUEUE_MAX_SIZE = int(os.getenv('LLM_QUEUE_MAX_SIZE', '64'))
+LLM_QUEUE_MAX_WAIT_SECONDS = float(os.getenv('LLM_QUEUE_MAX_WAIT_SECONDS', '10'))
+LLM_QUEUE_MAX_PER_CLIENT = int(os.getenv('LLM_QUEUE_MAX_PER_CLIENT', '4'))
+# Modo degradado: sob carga (fila ou p95 acima dos limites) as novas perguntas
+# usam um modelo mais barato, menos trechos e um contexto menor; volta ao normal
+# quando a carga cai abaixo de DEGRADED_RECOVERY_RATIO dos limites
+DEGRADED_MODE_ENABLED = os.getenv('DEGRADED_MODE_ENABLED', 'False').lower() == 'true'
+DEGRADED_QUEUE_DEPTH = int(os.getenv('DEGRADED_QUEUE_DEPTH', '8'))
+DEGRADED_P95_SECONDS = float(os.getenv('DEGRADED_P95_SECONDS', '30'))
+DEGRADED_RECOVERY_RATIO = float(os.getenv('DEGRADED_RECOVERY_RATIO', '0.5'))
+DEGRADED_MIN_SECONDS = float(os.getenv('DEGRADED_MIN_SECONDS', '30'))
+DEGRADED_LLM_PROVIDER = os.getenv('DEGRADED_LLM_PROVIDER', 'claude')
+DEGRADED_MODEL = os.getenv('DEGRADED_MODEL', 'claude-haiku-4-5-20251001')
+DEGRADED_MAX_TOKENS = int(os.getenv('DEGRADED_MAX_TOKENS', '1024'))
+DEGRADED_SEARCH_K = int(os.getenv('DEGRADED_SEARCH_K', '6'))
+DEGRADED_CONTEXT_CHARS = int(os.getenv('DEGRADED_CONTEXT_CHARS', '12000'))  # 0 = sem limite
+# Perguntas idênticas simultâneas compartilham uma única execução (single-flight)
+SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+# Métricas de latência por etapa e contadores, expostos em /api/metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+
+# Logging: nível geral, níveis por módulo ("document_processor=DEBUG,api=WARNING"),
+# formato ('text' ou 'json'), arquivo opcional, tamanho da fila de gravação em
+# segundo plano e fração dos eventos DEBUG que são gravados
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_FILE = os.getenv('LOG_FILE', '')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0'))
+
+# Contabilização de tokens e custos: preços em USD por milhão de tokens
+# ('input', 'cached_input' e 'output' para LLMs; 'embedding' para embeddings).
+# USAGE_PRICES_FILE aponta para um JSON no mesmo formato que substitui ou
+# acrescenta modelos; modelos fora da tabela têm os tokens contados sem custo
+USAGE_PRICES = {
+    'claude-sonnet-4-5-20250929': {'input': 3.0, 'cached_input': 0.3, 'output': 15.0},
+    'claude-haiku-4-5-20251001': {'input': 1.0, 'cached_input': 0.1, 'output': 5.0},
+    'gpt-4o-mini': {'input': 0.15, 'cached_input': 0.075, 'output': 0.6},
+    'gpt-4o': {'input': 2.5, 'cached_input': 1.25, 'output': 10.0},
+    'text-embedding-3-large': {'embedding': 0.13},
+    'text-embedding-3-small': {'embedding': 0.02}
+}
+USAGE_PRICES_FILE = os.getenv('USAGE_PRICES_FILE', '')
+if USAGE_PRICES_FILE:
+    with open(USAGE_PRICES_FILE, encoding='utf-8') as prices_file:
+        USAGE_PRICES = {**USAGE_PRICES, **json.load(prices_file)}
+# Arquivo JSONL com um registro por chamada ao LLM/embeddings (vazio = sem arquivo)
+USAGE_LOG_PATH = os.getenv('USAGE_LOG_PATH', '')
+
+# Profiling de requisições sob demanda: token de administrador aceito no header
+# X-Profile-Token (ou ?profile=<token>; vazio = desativado), fração das
+# perguntas perfiladas automaticamente, modo ('sampling' ou 'cprofile', que
+# também grava o perfil determinístico), intervalo de amostragem, pasta dos
+# perfis e quantos perfis manter
+PROFILING_ADMIN_TOKEN = os.getenv('PROFILING_ADMIN_TOKEN', '')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.0'))
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'sampling').lower()
+PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', '5'))
+PROFILING_DIR = os.getenv('PROFILING_DIR', './logs/profiles')
+PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', '50'))
+
+# Orçamento de inicialização: tempo máximo (segundos) para importar a API; acima
+# dele, um aviso é registrado no log (os SDKs dos provedores são importados sob demanda)
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', '3'))
+
 # CORS
 CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:5173,http://localhost:5174,http://localhost:5175').split(',')
 
@@ -0,0 +1,126 @@
+"""
+Versão do corpus compartilhada entre processos do IB - EstradaResponde.
+
+Com vários workers (gunicorn/uvicorn --workers N), cada processo tem o seu
+DocumentProcessor e a sua cadeia de Q&A. A versão do corpus fica gravada num
+pequeno arquivo ao lado do banco do ChromaDB: o worker que altera os
+documentos incrementa a versão e os demais percebem a mudança com um simples
+os.stat por requisição, recarregando o índice apenas quando ela muda.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (um único worker)
+    fcntl = None
+
+
+class CorpusVersionStamp:
+    """Arquivo com a versão do corpus, lido de forma barata e gravado atomicamente."""
+
+    def __init__(self, path: str):
+        """
+        Inicializa o carimbo de versão.
+
+        Args:
+            path: Caminho do arquivo de versão (criado no primeiro incremento)
+        """
+        self.path = os.path.abspath(path)
+        self._lock_path = f"{self.path}.lock"
+        self._lock = threading.Lock()
+        # Identidade do arquivo lido por último (inode, mtime, tamanho) e a versão dele
+        self._signature = None
+        self._version = 0
+
+    @staticmethod
+    def _signature_of(stat_result) -> tuple:
+        return (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+    def _read(self) -> tuple:
+        """Lê o arquivo e retorna (assinatura, versão); versão 0 se não existir."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as stamp_file:
+                signature = self._signature_of(os.fstat(stamp_file.fileno()))
+                data = json.load(stamp_file)
+            return signature, int(data.get('version', 0))
+        except FileNotFoundError:
+            return None, 0
+        except (OSError, ValueError) as e:
+            logger.warning("Erro ao ler versão do corpus (%s): %s", self.path, e)
+            return None, self._version
+
+    def current(self) -> int:
+        """
+        Retorna a versão atual do corpus.
+
+        Só relê o arquivo quando ele foi substituído (custa um os.stat quando
+        nada mudou).
+        """
+        try:
+            signature = self._signature_of(os.stat(self.path))
+        except FileNotFoundError:
+            signature = None
+        except OSError:
+            return self._version
+        if signature == self._signature:
+            return self._version
+
+        signature, version = self._read()
+        with self._lock:
+            self._signature, self._version = signature, version
+        return version
+
+    @contextmanager
+    def _exclusive(self):
+        """Trava o incremento entre threads e, quando disponível, entre processos."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def bump(self, before_publish: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Incrementa a versão do corpus e a publica para os demais processos.
+
+        Args:
+            before_publish: Função chamada com a nova versão antes de ela ficar
+                visível aos outros processos (ex: exportar o snapshot do índice
+                dessa versão); erros são registrados e não impedem o incremento
+
+        Returns:
+            Nova versão
+        """
+        with self._exclusive():
+            _, version = self._read()
+            version += 1
+            if before_publish is not None:
+                try:
+                    before_publish(version)
+                except Exception as e:
+                    logger.error("Erro ao preparar a versão %s do corpus: %s", version, e)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as temp_file:
+                json.dump({'version': version, 'updated_at': time.time(), 'pid': os.getpid()}, temp_file)
+            # Substituição atômica: leitores veem o arquivo antigo ou o novo, nunca um parcial
+            os.replace(temp_path, self.path)
+            self._signature = self._signature_of(os.stat(self.path))
+            self._version = version
+        return version
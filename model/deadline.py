@@ -0,0 +1,151 @@
+"""
+Prazo de ponta a ponta das perguntas do IB - EstradaResponde.
+
+Cada pergunta recebe um prazo total (REQUEST_TIMEOUT_SECONDS) que é repartido
+entre as etapas: espera na fila, embedding da pergunta, busca nos documentos
+e geração da resposta. Cada etapa tem o seu próprio limite e nunca passa do
+tempo que resta ao prazo total. Quando uma etapa esgota o tempo, a pergunta
+termina com StageTimeout, que identifica a etapa.
+
+No servidor Flask a etapa roda numa thread do pool e a thread da requisição
+é liberada no fim do prazo (a chamada abandonada termina sozinha, limitada
+pelo tempo limite HTTP do provedor). No servidor ASGI a etapa é cancelada.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+import profiling
+
+# Nomes das etapas nas mensagens de erro
+STAGE_NAMES = {
+    'queue': 'espera na fila',
+    'embedding': 'embedding da pergunta',
+    'retrieval': 'busca nos documentos',
+    'llm': 'geração da resposta'
+}
+
+
+class StageTimeout(Exception):
+    """Uma etapa da pergunta esgotou o tempo."""
+
+    def __init__(self, stage: str, timeout_seconds: float, future: Optional[Future] = None):
+        super().__init__(
+            f"Tempo esgotado na etapa '{STAGE_NAMES.get(stage, stage)}' ({timeout_seconds:.1f}s)"
+        )
+        self.stage = stage
+        self.timeout_seconds = timeout_seconds
+        # Execução abandonada (servidor Flask), ainda em andamento
+        self.future = future
+
+
+class Deadline:
+    """Prazo total de uma pergunta."""
+
+    def __init__(self, total_seconds: float):
+        """
+        Args:
+            total_seconds: Tempo total disponível para a pergunta
+        """
+        self.total_seconds = total_seconds
+        self.expires_at = time.monotonic() + total_seconds
+
+    def remaining(self) -> float:
+        """Segundos que restam (negativo depois do prazo)."""
+        return self.expires_at - time.monotonic()
+
+    def budget(self, stage_seconds: Optional[float] = None) -> float:
+        """Tempo disponível para uma etapa: o limite dela, sem passar do prazo total."""
+        remaining = self.remaining()
+        if stage_seconds is not None and stage_seconds > 0:
+            return min(remaining, stage_seconds)
+        return remaining
+
+    def check(self, stage: str):
+        """
+        Verifica se ainda há tempo antes de começar uma etapa.
+
+        Raises:
+            StageTimeout: Se o prazo total já acabou
+        """
+        if self.remaining() <= 0:
+            raise StageTimeout(stage, self.total_seconds)
+
+
+# Threads que executam as etapas do servidor Flask; criado no primeiro uso
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix='request-stage')
+        return _executor
+
+
+def submit_stage(func: Callable[[], Any]) -> Future:
+    """Inicia uma etapa síncrona no pool das etapas, no contexto da requisição."""
+    # Ex: coletor de uso de tokens e perfil da requisição
+    return _get_executor().submit(contextvars.copy_context().run, profiling.bind(func))
+
+
+def run_stage(stage: str, func: Callable[[], Any], deadline: Deadline,
+              stage_seconds: Optional[float] = None) -> Any:
+    """
+    Executa uma etapa síncrona dentro do prazo.
+
+    Args:
+        stage: Nome da etapa ('embedding', 'retrieval', 'llm', ...)
+        func: Função sem argumentos da etapa
+        deadline: Prazo da pergunta
+        stage_seconds: Limite da etapa
+
+    Raises:
+        StageTimeout: Se a etapa não terminar a tempo (com a execução abandonada em future)
+    """
+    timeout = deadline.budget(stage_seconds)
+    if timeout <= 0:
+        raise StageTimeout(stage, 0.0)
+    future = submit_stage(func)
+    try:
+        return future.result(timeout)
+    except futures.TimeoutError:
+        # Até o Python 3.10, Future.result() levanta concurrent.futures.TimeoutError,
+        # que não é o TimeoutError embutido (são o mesmo a partir do 3.11)
+        if future.done():
+            # A etapa terminou logo depois do fim da espera (ou levantou o seu
+            # próprio TimeoutError): vale o resultado dela
+            return future.result()
+        raise StageTimeout(stage, timeout, future)
+
+
+async def arun_stage(stage: str, awaitable: Awaitable, deadline: Deadline,
+                     stage_seconds: Optional[float] = None) -> Any:
+    """
+    Versão assíncrona de run_stage: a etapa é cancelada no fim do prazo ou
+    quando a própria pergunta é cancelada (ex: cliente desconectou).
+
+    Raises:
+        StageTimeout: Se a etapa não terminar a tempo
+    """
+    timeout = deadline.budget(stage_seconds)
+    task = asyncio.ensure_future(awaitable)
+    if timeout <= 0:
+        task.cancel()
+        raise StageTimeout(stage, 0.0)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if not done:
+        task.cancel()
+        raise StageTimeout(stage, timeout)
+    return task.result()
@@ -0,0 +1,158 @@
+"""
+Índice em memória dos nomes de documentos para o sistema IB - EstradaResponde.
+
+Evita percorrer a collection do ChromaDB a cada consulta de nome: a lista de
+documentos é carregada uma vez, junto com estruturas de busca exata,
+normalizada e parcial, e só é recarregada depois de uma invalidação
+(upload, renomeação, exclusão ou limpeza). Depois de uma invalidação, só uma
+consulta recarrega a lista; as que chegam ao mesmo tempo esperam e usam o
+índice publicado por ela.
+"""
+
+import contextlib
+import threading
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple
+
+# Limite de nomes aproximados memorizados por versão do índice
+_MAX_CACHED_LOOKUPS = 1024
+
+
+def normalize_document_name(name: str) -> str:
+    """
+    Normaliza nome removendo espaços extras, convertendo para minúsculas e
+    removendo .pdf.
+
+    Args:
+        name: Nome do documento (do banco ou gerado pelo LLM)
+
+    Returns:
+        Nome normalizado (ex: "decreto lei n 01.2011")
+    """
+    if not name:
+        return ""
+    normalized = name.strip().lower()
+    # Remover .pdf se presente
+    if normalized.endswith('.pdf'):
+        normalized = normalized[:-4]
+    # Substituir underscores e hífens por espaços
+    normalized = normalized.replace('_', ' ').replace('-', ' ')
+    # Remover espaços extras
+    return ' '.join(normalized.split())
+
+
+class _IndexSnapshot:
+    """Estado imutável do índice; substituído por inteiro a cada reconstrução."""
+
+    def __init__(self, documents: List[dict]):
+        self.documents = documents
+        self.by_name: Dict[str, dict] = {}
+        self.by_normalized: Dict[str, str] = {}
+        # Pares (nome normalizado, nome exato) na ordem da collection,
+        # usados no match parcial
+        self.partial: List[Tuple[str, str]] = []
+        # Resultados de buscas já feitas (nome do LLM -> nome exato ou None)
+        self.lookups: Dict[str, Optional[str]] = {}
+
+        for doc in documents:
+            name = doc.get('name', '')
+            self.by_name.setdefault(name, doc)
+            normalized = normalize_document_name(name)
+            self.by_normalized.setdefault(normalized, name)
+            self.partial.append((normalized, name))
+
+
+class DocumentNameIndex:
+    """Índice de nomes de documentos com invalidação atômica."""
+
+    def __init__(self, loader: Callable[[], List[dict]],
+                 guard: Optional[Callable[[], ContextManager]] = None):
+        """
+        Inicializa o índice.
+
+        Args:
+            loader: Função que lê a lista de documentos do banco (operação cara).
+                Deve retornar None em caso de erro.
+            guard: Trava tomada antes da trava de reconstrução (ex: a trava de
+                leitura do vectorstore, que o loader também usa), para que as
+                duas sejam sempre tomadas na mesma ordem
+        """
+        self._loader = loader
+        self._guard = guard or contextlib.nullcontext
+        self._snapshot: Optional[_IndexSnapshot] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        # Uma reconstrução por vez
+        self._rebuild_lock = threading.Lock()
+
+    def invalidate(self):
+        """Descarta o índice atual; a próxima consulta recarrega do banco."""
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def _get_snapshot(self) -> _IndexSnapshot:
+        """Retorna o índice atual, reconstruindo-o se necessário."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._guard(), self._rebuild_lock:
+            with self._lock:
+                # Publicado por quem reconstruiu enquanto esta consulta esperava
+                snapshot = self._snapshot
+                generation = self._generation
+            if snapshot is not None:
+                return snapshot
+            documents = self._loader()
+            if documents is None:
+                # Erro de leitura: responder com índice vazio sem publicá-lo
+                return _IndexSnapshot([])
+            snapshot = _IndexSnapshot(documents)
+            with self._lock:
+                # Só publica se ninguém invalidou o índice durante a leitura
+                if generation == self._generation:
+                    self._snapshot = snapshot
+            return snapshot
+
+    def documents(self) -> List[dict]:
+        """Retorna a lista de documentos únicos (cópia rasa da lista)."""
+        return list(self._get_snapshot().documents)
+
+    def get(self, name: str) -> Optional[dict]:
+        """Retorna o documento com o nome exato informado, se existir."""
+        return self._get_snapshot().by_name.get(name)
+
+    def find(self, doc_name: str) -> Optional[str]:
+        """
+        Encontra o nome exato de um documento a partir de um nome aproximado.
+
+        Tenta, nesta ordem: nome exato, nome normalizado e match parcial
+        (um nome normalizado contém o outro).
+
+        Args:
+            doc_name: Nome do documento como gerado pelo LLM
+
+        Returns:
+            Nome exato do arquivo se encontrado, None caso contrário
+        """
+        if not doc_name:
+            return None
+
+        snapshot = self._get_snapshot()
+        if doc_name in snapshot.lookups:
+            return snapshot.lookups[doc_name]
+
+        if doc_name in snapshot.by_name:
+            result = doc_name
+        else:
+            normalized = normalize_document_name(doc_name)
+            result = snapshot.by_normalized.get(normalized)
+            if result is None:
+                result = next(
+                    (name for doc_normalized, name in snapshot.partial
+                     if normalized in doc_normalized or doc_normalized in normalized),
+                    None
+                )
+        if len(snapshot.lookups) < _MAX_CACHED_LOOKUPS:
+            snapshot.lookups[doc_name] = result
+        return result
@@ -3,26 +3,123 @@ Processador de documentos PDF para o sistema IB - EstradaResponde.
 Usa ChromaDB como banco de dados vetorial.
 """
 
+import logging
 import os
+import re
 import time
 import shutil
 import gc
-from typing import List, Optional
+import threading
+from typing import TYPE_CHECKING, List, Optional
 from PyPDF2 import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-import chromadb
-from chromadb.config import Settings
+from corpus_version import CorpusVersionStamp
+from document_index import DocumentNameIndex
+from embedding_cache import CachedQueryEmbeddings, LazyEmbeddings
+from lazy_imports import import_module, lazy_module
+from index_snapshot import IndexSnapshot, export_snapshot, load_current_snapshot
+import usage
+from metrics import INGESTED_CHUNKS, INGESTED_DOCUMENTS, INGESTED_PAGES, STAGE_SECONDS, span
+from rwlock import ReadWriteLock
 from config import (
     CHROMA_DB_PATH, 
     CHROMA_COLLECTION_NAME,
+    CORPUS_VERSION_FILE,
+    INDEX_SNAPSHOT_ENABLED,
+    INDEX_SNAPSHOT_PATH,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
     EMBEDDING_MODEL,
-    EMBEDDING_PROVIDER
+    EMBEDDING_PROVIDER,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_BATCH_WINDOW_MS,
+    QUERY_EMBEDDING_MAX_BATCH_SIZE,
+    QUERY_EMBEDDING_MAX_CONCURRENT_BATCHES,
+    EMBEDDING_TIMEOUT_SECONDS
 )
 
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+logger = logging.getLogger(__name__)
+
+# Importados só no primeiro uso: com o snapshot do índice, os workers que só
+# respondem perguntas nunca abrem o ChromaDB
+chromadb = lazy_module('chromadb')
+chromadb_config = lazy_module('chromadb.config')
+vectorstores = lazy_module('langchain_community.vectorstores')
+
+# Marcador de página inserido no texto extraído de cada PDF
+PAGE_MARKER_RE = re.compile(r'--- Documento: .*? \| Página (\d+) ---')
+
+# Separadores otimizados para preservar estrutura de artigos
+# Prioriza quebras de linha duplas, títulos de artigos, e depois espaços
+# REMOVIDO separador de números seguidos de maiúsculas para não quebrar no meio de artigos
+TEXT_SEPARATORS = [
+    r"\n\n+",  # Múltiplas quebras de linha (parágrafos)
+    r"\nArtigo\s+\d+",  # Início de artigos (Artigo 1, Artigo 2, etc.)
+    r"\nArt\.\s+\d+",  # Abreviação de artigo (Art. 1, Art. 2, etc.)
+    r"\nCAPÍTULO\s+[IVX]+",  # Capítulos romanos
+    r"\nCAPÍTULO\s+\d+",  # Capítulos numéricos
+    r"\nSECÇÃO\s+[IVX]+",  # Seções romanas
+    r"\nSECÇÃO\s+\d+",  # Seções numéricas
+    # REMOVIDO: r"\n\d+\.\s+[A-ZÁÉÍÓÚÀÈÌÒÙÂÊÔÃÕÇ]" - estava quebrando no meio de artigos (ex: "5. A contravenção...")
+    r"\n",  # Quebra de linha simples
+    ". ",  # Pontos seguidos de espaço
+    " ",  # Espaços
+]
+
+
+def build_text_splitter(chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> RecursiveCharacterTextSplitter:
+    """
+    Cria o divisor de texto dos documentos.
+
+    Args:
+        chunk_size: Tamanho máximo de cada chunk (caracteres)
+        chunk_overlap: Sobreposição entre chunks consecutivos (caracteres)
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=TEXT_SEPARATORS,
+        is_separator_regex=True,
+    )
+
+
+def create_embeddings():
+    """Cria o modelo de embeddings configurado (EMBEDDING_PROVIDER/EMBEDDING_MODEL), sem cache."""
+    OpenAIEmbeddings = import_module('langchain_openai').OpenAIEmbeddings
+    if EMBEDDING_PROVIDER == 'openai':
+        return OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    # Por padrão usa OpenAI
+    return OpenAIEmbeddings(model=EMBEDDING_MODEL)
+
+
+def extract_pdf_text(pdf_path: str, pdf_name: str) -> str:
+    """
+    Extrai o texto de um arquivo PDF, com um marcador no início de cada página.
+
+    Args:
+        pdf_path: Caminho do arquivo PDF
+        pdf_name: Nome do arquivo PDF
+
+    Returns:
+        Texto extraído do PDF
+    """
+    text = ""
+    pdf_reader = PdfReader(pdf_path)
+
+    for i, page in enumerate(pdf_reader.pages):
+        try:
+            page_text = page.extract_text()
+            if page_text and page_text.strip():
+                text += f"--- Documento: {pdf_name} | Página {i+1} ---\n{page_text}\n\n"
+        except Exception as e:
+            logger.error("Erro ao extrair página %s do documento %s: %s", i+1, pdf_name, e)
+
+    return text
+
 
 class DocumentProcessor:
     """Processador de documentos PDF com ChromaDB."""
@@ -30,42 +127,100 @@ class DocumentProcessor:
     def __init__(self):
         """Inicializa o processador de documentos."""
         self.embeddings = self._get_embeddings()
-        # Separadores otimizados para preservar estrutura de artigos
-        # Prioriza quebras de linha duplas, títulos de artigos, e depois espaços
-        # REMOVIDO separador de números seguidos de maiúsculas para não quebrar no meio de artigos
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len,
-            separators=[
-                r"\n\n+",  # Múltiplas quebras de linha (parágrafos)
-                r"\nArtigo\s+\d+",  # Início de artigos (Artigo 1, Artigo 2, etc.)
-                r"\nArt\.\s+\d+",  # Abreviação de artigo (Art. 1, Art. 2, etc.)
-                r"\nCAPÍTULO\s+[IVX]+",  # Capítulos romanos
-                r"\nCAPÍTULO\s+\d+",  # Capítulos numéricos
-                r"\nSECÇÃO\s+[IVX]+",  # Seções romanas
-                r"\nSECÇÃO\s+\d+",  # Seções numéricas
-                # REMOVIDO: r"\n\d+\.\s+[A-ZÁÉÍÓÚÀÈÌÒÙÂÊÔÃÕÇ]" - estava quebrando no meio de artigos (ex: "5. A contravenção...")
-                r"\n",  # Quebra de linha simples
-                ". ",  # Pontos seguidos de espaço
-                " ",  # Espaços
-            ],
-            is_separator_regex=True,
-        )
+        self.text_splitter = build_text_splitter()
         self.vectorstore = None
         # Usar caminho absoluto normalizado para evitar conflitos de singleton
         self.chroma_db_path = os.path.abspath(CHROMA_DB_PATH)
+        # Índice de nomes em memória (evita varrer a collection a cada consulta);
+        # a reconstrução acontece dentro da trava de leitura (também permitida ao
+        # escritor), sempre tomada antes da trava de reconstrução do índice
+        self.name_index = DocumentNameIndex(self._load_documents_list, guard=lambda: self.lock.read_locked())
+        # Versão do corpus: incrementada a cada upload, exclusão, renomeação ou
+        # limpeza e compartilhada com os outros workers pelo arquivo de versão
+        self.version_stamp = CorpusVersionStamp(CORPUS_VERSION_FILE)
+        self.corpus_version = self.version_stamp.current()
+        # Recargas do índice causadas por alterações feitas em outros processos
+        self.corpus_reloads = 0
+        # Leitores (consultas) x escritor (upload, renomeação, exclusão, limpeza):
+        # o vectorstore nunca é recriado no meio de uma consulta
+        self.lock = ReadWriteLock()
+        # Evita que consultas concorrentes carreguem o vectorstore duas vezes
+        self._vectorstore_load_lock = threading.Lock()
+        # Snapshot do índice mapeado em memória (INDEX_SNAPSHOT_ENABLED)
+        self.index_snapshot_path = os.path.abspath(INDEX_SNAPSHOT_PATH)
+        self.index_snapshot = None
+    
+    def _mark_corpus_changed(self):
+        """
+        Registra que o conjunto de documentos mudou (invalida índice e caches).
+        
+        Com o modo snapshot, o snapshot da nova versão é exportado antes de a
+        versão ser publicada: um worker que percebe a nova versão já encontra
+        o snapshot dela (sem cair no ChromaDB até a próxima alteração).
+        Chamado com a trava de escrita, depois de a collection ser alterada.
+        """
+        before_publish = self._publish_index_snapshot if INDEX_SNAPSHOT_ENABLED else None
+        try:
+            self.corpus_version = self.version_stamp.bump(before_publish)
+        except OSError as e:
+            logger.error("Erro ao gravar versão do corpus: %s", e)
+            self.corpus_version += 1
+        self.name_index.invalidate()
+    
+    def corpus_version_changed(self) -> bool:
+        """Verifica (com um os.stat) se outro processo alterou o corpus."""
+        return self.version_stamp.current() != self.corpus_version
+    
+    def refresh_corpus_version(self) -> bool:
+        """
+        Recarrega o índice se outro processo alterou o corpus.
+        
+        O vectorstore é reaberto a partir do disco na próxima consulta e o
+        índice de nomes é invalidado; a cadeia de Q&A e os caches de respostas
+        seguem a versão do corpus e são renovados automaticamente.
+        
+        Returns:
+            True se o índice foi recarregado
+        """
+        if not self.corpus_version_changed():
+            return False
+        
+        with self.lock.write_locked():
+            version = self.version_stamp.current()
+            if version == self.corpus_version:
+                return False
+            self.vectorstore = None
+            self._clear_chromadb_cache()
+            self.corpus_version = version
+            self.corpus_reloads += 1
+            self.name_index.invalidate()
+        logger.info("Corpus alterado por outro processo (versão %s): índice recarregado", version)
+        return True
     
     def _get_embeddings(self):
-        """Obtém o modelo de embeddings configurado."""
-        if EMBEDDING_PROVIDER == 'openai':
-            return OpenAIEmbeddings(model=EMBEDDING_MODEL)
-        else:
-            # Por padrão usa OpenAI
-            return OpenAIEmbeddings(model=EMBEDDING_MODEL)
+        """
+        Obtém o modelo de embeddings configurado.
+        
+        O modelo é envolvido por CachedQueryEmbeddings, que guarda em cache os
+        embeddings das perguntas e agrupa consultas concorrentes em lotes, e
+        só é criado (com a importação do SDK) no primeiro embedding calculado.
+        """
+        return CachedQueryEmbeddings(
+            LazyEmbeddings(create_embeddings),
+            max_entries=QUERY_EMBEDDING_CACHE_SIZE,
+            batch_window_ms=QUERY_EMBEDDING_BATCH_WINDOW_MS,
+            max_batch_size=QUERY_EMBEDDING_MAX_BATCH_SIZE,
+            provider=EMBEDDING_PROVIDER,
+            model=EMBEDDING_MODEL,
+            max_concurrent_batches=QUERY_EMBEDDING_MAX_CONCURRENT_BATCHES,
+            timeout_seconds=EMBEDDING_TIMEOUT_SECONDS or None
+        )
     
     def _clear_chromadb_cache(self):
         """Limpa o cache do singleton do ChromaDB de forma mais agressiva."""
+        if not chromadb.loaded:
+            # Nenhum cliente foi criado neste processo
+            return
         try:
             from chromadb.api.client import SharedSystemClient
             if hasattr(SharedSystemClient, '_identifer_to_system'):
@@ -101,7 +256,7 @@ class DocumentProcessor:
                             except:
                                 pass
                     except Exception as e:
-                        print(f"Erro ao remover sistema {key}: {str(e)}")
+                        logger.warning("Erro ao remover sistema %s: %s", key, e)
                         pass
                 
                 # Forçar garbage collection
@@ -126,7 +281,7 @@ class DocumentProcessor:
                             pass
                     gc.collect()
         except Exception as e:
-            print(f"Aviso ao limpar cache do ChromaDB: {str(e)}")
+            logger.warning("Aviso ao limpar cache do ChromaDB: %s", e)
             # Tentar limpar de forma mais básica
             try:
                 gc.collect()
@@ -172,6 +327,39 @@ class DocumentProcessor:
         
         return article_info
     
+    def _locate_chunk_pages(self, pdf_text: str, chunks: List[str]) -> List[Optional[int]]:
+        """
+        Determina a página em que cada chunk começa.
+        
+        Usa os marcadores "--- Documento: X | Página N ---" inseridos por
+        extract_text_from_pdf e a posição de cada chunk no texto completo.
+        
+        Args:
+            pdf_text: Texto completo extraído do PDF
+            chunks: Chunks gerados a partir de pdf_text, na ordem original
+            
+        Returns:
+            Lista com o número da página de cada chunk (ou None se desconhecido)
+        """
+        from bisect import bisect_right
+        
+        markers = [(m.start(), int(m.group(1))) for m in PAGE_MARKER_RE.finditer(pdf_text)]
+        offsets = [offset for offset, _ in markers]
+        
+        pages = []
+        cursor = 0
+        for chunk in chunks:
+            position = pdf_text.find(chunk, cursor)
+            if position < 0 or not markers:
+                # Chunk não localizado: usar o primeiro marcador dentro dele
+                marker = PAGE_MARKER_RE.search(chunk)
+                pages.append(int(marker.group(1)) if marker else None)
+                continue
+            cursor = position + 1
+            index = bisect_right(offsets, position) - 1
+            pages.append(markers[index][1] if index >= 0 else None)
+        return pages
+    
     def extract_text_from_pdf(self, pdf_path: str, pdf_name: str) -> str:
         """
         Extrai texto de um arquivo PDF.
@@ -183,18 +371,7 @@ class DocumentProcessor:
         Returns:
             Texto extraído do PDF
         """
-        text = ""
-        pdf_reader = PdfReader(pdf_path)
-        
-        for i, page in enumerate(pdf_reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text and page_text.strip():
-                    text += f"--- Documento: {pdf_name} | Página {i+1} ---\n{page_text}\n\n"
-            except Exception as e:
-                print(f"Erro ao extrair página {i+1} do documento {pdf_name}: {str(e)}")
-        
-        return text
+        return extract_pdf_text(pdf_path, pdf_name)
     
     def process_pdfs(self, pdf_paths: List[tuple]) -> dict:
         """
@@ -204,7 +381,8 @@ class DocumentProcessor:
             pdf_paths: Lista de tuplas (caminho, nome) dos PDFs
             
         Returns:
-            Dicionário com informações do processamento
+            Dicionário com informações do processamento (inclui 'usage': tokens
+            e custo dos embeddings)
         """
         from datetime import datetime
         import os
@@ -221,16 +399,19 @@ class DocumentProcessor:
             total_pages += len(pdf_reader.pages)
             
             # Extrair texto do PDF
-            pdf_text = self.extract_text_from_pdf(pdf_path, pdf_name)
+            with span('pdf_extract'):
+                pdf_text = self.extract_text_from_pdf(pdf_path, pdf_name)
             
             # Criar chunks para este documento
+            chunking_started_at = time.perf_counter()
             doc_chunks = self.text_splitter.split_text(pdf_text)
+            chunk_pages = self._locate_chunk_pages(pdf_text, doc_chunks)
             
             # Criar metadados para cada chunk com informações de artigos
             file_size = os.path.getsize(pdf_path)
             upload_date = datetime.now().isoformat()
             
-            for chunk in doc_chunks:
+            for chunk, page_number in zip(doc_chunks, chunk_pages):
                 all_chunks.append(chunk)
                 
                 # Detectar informações de artigo no chunk
@@ -244,11 +425,16 @@ class DocumentProcessor:
                     'document_type': 'general'
                 }
                 
+                # Página onde o chunk começa (usada nas citações estruturadas)
+                if page_number:
+                    metadata['page'] = page_number
+                
                 # Adicionar informações de artigo aos metadados
                 if article_info:
                     metadata.update(article_info)
                 
                 all_metadatas.append(metadata)
+            STAGE_SECONDS.observe(time.perf_counter() - chunking_started_at, stage='chunking')
             
             # Contar páginas bem-sucedidas
             for page in pdf_reader.pages:
@@ -269,18 +455,38 @@ class DocumentProcessor:
         if not all_chunks:
             raise ValueError("Não foi possível extrair texto dos PDFs")
         
+        # Calcular os embeddings fora da trava de escrita: as consultas
+        # continuam usando o índice atual durante a parte demorada da ingestão
+        with span('document_embedding'), usage.collect() as ingestion_usage:
+            prepared_embeddings = self.embeddings.prepare_documents(
+                all_chunks, [metadata['source'] for metadata in all_metadatas]
+            )
+        
         # Criar ou atualizar vectorstore no ChromaDB com metadados
-        self._create_or_update_vectorstore(all_chunks, all_metadatas)
+        try:
+            with span('index_write'), self.lock.write_locked():
+                try:
+                    self._create_or_update_vectorstore(all_chunks, all_metadatas, embeddings=prepared_embeddings)
+                finally:
+                    self._mark_corpus_changed()
+        finally:
+            prepared_embeddings.release()
+        
+        INGESTED_DOCUMENTS.inc(len(processed_files))
+        INGESTED_PAGES.inc(total_pages)
+        INGESTED_CHUNKS.inc(len(all_chunks))
         
         return {
             'total_pages': total_pages,
             'successful_pages': successful_pages,
             'total_chunks': len(all_chunks),
             'total_characters': sum(len(chunk) for chunk in all_chunks),
-            'processed_files': processed_files
+            'processed_files': processed_files,
+            'usage': ingestion_usage.to_dict()
         }
     
-    def _create_or_update_vectorstore(self, text_chunks: List[str], metadatas: Optional[List[dict]] = None):
+    def _create_or_update_vectorstore(self, text_chunks: List[str], metadatas: Optional[List[dict]] = None,
+                                      embeddings=None):
         """
         Cria ou atualiza o vectorstore no ChromaDB.
         Adiciona novos documentos de forma acumulativa se a collection já existir.
@@ -288,7 +494,10 @@ class DocumentProcessor:
         Args:
             text_chunks: Lista de chunks de texto
             metadatas: Lista opcional de metadados para cada chunk
+            embeddings: Embeddings dos chunks calculados antes da gravação
+                (prepare_documents); padrão: self.embeddings
         """
+        embeddings = embeddings or self.embeddings
         # Limpar cache do singleton ANTES de qualquer operação
         self._clear_chromadb_cache()
         
@@ -322,7 +531,7 @@ class DocumentProcessor:
             # Usar cliente direto do ChromaDB para verificar sem criar instância do LangChain
             temp_client = chromadb.PersistentClient(
                 path=self.chroma_db_path,
-                settings=Settings(anonymized_telemetry=False)
+                settings=chromadb_config.Settings(anonymized_telemetry=False)
             )
             try:
                 # Tentar obter a collection
@@ -343,7 +552,7 @@ class DocumentProcessor:
                 time.sleep(0.2)
         except Exception as e:
             # Se houver qualquer erro, assumir que não existe e limpar cache
-            print(f"Erro ao verificar collection: {str(e)}")
+            logger.error("Erro ao verificar collection: %s", e)
             self._clear_chromadb_cache()
             collection_exists = False
         
@@ -364,10 +573,10 @@ class DocumentProcessor:
                 
                 if collection_exists:
                     # Adicionar novos chunks à collection existente
-                    print(f"Tentativa {retry_count + 1}: Adicionando {len(text_chunks)} novos chunks à collection existente...")
-                    self.vectorstore = Chroma(
+                    logger.info("Tentativa %s: Adicionando %s novos chunks à collection existente...", retry_count + 1, len(text_chunks))
+                    self.vectorstore = vectorstores.Chroma(
                         persist_directory=self.chroma_db_path,
-                        embedding_function=self.embeddings,
+                        embedding_function=embeddings,
                         collection_name=CHROMA_COLLECTION_NAME
                     )
                     # Adicionar novos textos com metadados
@@ -375,27 +584,27 @@ class DocumentProcessor:
                         self.vectorstore.add_texts(texts=text_chunks, metadatas=metadatas)
                     else:
                         self.vectorstore.add_texts(texts=text_chunks)
-                    print(f"Documentos adicionados com sucesso à collection existente")
+                    logger.info("Documentos adicionados com sucesso à collection existente")
                     break  # Sucesso, sair do loop
                 else:
                     # Criar nova collection
-                    print(f"Tentativa {retry_count + 1}: Criando nova collection com {len(text_chunks)} chunks...")
+                    logger.info("Tentativa %s: Criando nova collection com %s chunks...", retry_count + 1, len(text_chunks))
                     if metadatas:
-                        self.vectorstore = Chroma.from_texts(
+                        self.vectorstore = vectorstores.Chroma.from_texts(
                             texts=text_chunks,
-                            embedding=self.embeddings,
+                            embedding=embeddings,
                             collection_name=CHROMA_COLLECTION_NAME,
                             persist_directory=self.chroma_db_path,
                             metadatas=metadatas
                         )
                     else:
-                        self.vectorstore = Chroma.from_texts(
+                        self.vectorstore = vectorstores.Chroma.from_texts(
                             texts=text_chunks,
-                            embedding=self.embeddings,
+                            embedding=embeddings,
                             collection_name=CHROMA_COLLECTION_NAME,
                             persist_directory=self.chroma_db_path
                         )
-                    print(f"Collection criada com sucesso")
+                    logger.info("Collection criada com sucesso")
                     break  # Sucesso, sair do loop
                     
             except Exception as e:
@@ -404,13 +613,13 @@ class DocumentProcessor:
                 
                 if "already exists" in error_msg or "instance" in error_msg:
                     if retry_count < max_retries:
-                        print(f"Erro de instância na tentativa {retry_count}: {str(e)}")
-                        print(f"Limpando cache e tentando novamente ({retry_count + 1}/{max_retries})...")
+                        logger.warning("Erro de instância na tentativa %s: %s", retry_count, e)
+                        logger.warning("Limpando cache e tentando novamente (%s/%s)...", retry_count + 1, max_retries)
                         # Limpar cache mais agressivamente
                         self._clear_chromadb_cache()
                         # Tentar limpar também o diretório se necessário
                         if retry_count == max_retries - 1:  # Última tentativa
-                            print("Última tentativa: limpando diretório completamente...")
+                            logger.warning("Última tentativa: limpando diretório completamente...")
                             if os.path.exists(self.chroma_db_path):
                                 try:
                                     # Fechar qualquer vectorstore antes de limpar
@@ -425,7 +634,7 @@ class DocumentProcessor:
                                     shutil.rmtree(self.chroma_db_path)
                                     os.makedirs(self.chroma_db_path, exist_ok=True)
                                 except Exception as e_clean:
-                                    print(f"Erro ao limpar diretório: {str(e_clean)}")
+                                    logger.error("Erro ao limpar diretório: %s", e_clean)
                         time.sleep(0.5)
                         continue
                     else:
@@ -435,13 +644,22 @@ class DocumentProcessor:
                     # Erro não relacionado a singleton, propagar imediatamente
                     raise
     
-    def get_vectorstore(self) -> Optional[Chroma]:
+    def get_vectorstore(self) -> Optional['Chroma']:
         """
         Obtém o vectorstore atual sem criar instâncias conflitantes.
         
         Returns:
             Instância do ChromaDB vectorstore ou None se não existir
         """
+        vectorstore = self.vectorstore
+        if vectorstore:
+            return vectorstore
+        
+        with self.lock.read_locked(), self._vectorstore_load_lock:
+            return self._load_vectorstore()
+    
+    def _load_vectorstore(self) -> Optional['Chroma']:
+        """Carrega o vectorstore persistido (chamado com as travas adquiridas)."""
         if self.vectorstore:
             return self.vectorstore
         
@@ -453,7 +671,7 @@ class DocumentProcessor:
             # Verificar se a collection existe antes de tentar carregar
             client = chromadb.PersistentClient(
                 path=self.chroma_db_path,
-                settings=Settings(anonymized_telemetry=False)
+                settings=chromadb_config.Settings(anonymized_telemetry=False)
             )
             
             try:
@@ -469,7 +687,7 @@ class DocumentProcessor:
                 self._clear_chromadb_cache()
                 
                 # Carregar vectorstore
-                self.vectorstore = Chroma(
+                self.vectorstore = vectorstores.Chroma(
                     persist_directory=self.chroma_db_path,
                     embedding_function=self.embeddings,
                     collection_name=CHROMA_COLLECTION_NAME
@@ -483,31 +701,117 @@ class DocumentProcessor:
                     pass
                 return None
         except Exception as e:
-            print(f"Erro ao carregar vectorstore: {str(e)}")
+            logger.error("Erro ao carregar vectorstore: %s", e)
+            return None
+    
+    def get_index_snapshot(self) -> Optional[IndexSnapshot]:
+        """
+        Retorna o snapshot do índice mapeado em memória da versão atual do corpus.
+        
+        Returns:
+            IndexSnapshot, ou None se o modo snapshot estiver desativado ou não
+            houver snapshot exportado para a versão atual (usa-se o ChromaDB)
+        """
+        if not INDEX_SNAPSHOT_ENABLED:
             return None
+        snapshot = self.index_snapshot
+        if snapshot is not None and snapshot.corpus_version == self.corpus_version:
+            return snapshot
+        
+        with self._vectorstore_load_lock:
+            snapshot = self.index_snapshot
+            if snapshot is None or snapshot.corpus_version != self.corpus_version:
+                snapshot = load_current_snapshot(self.index_snapshot_path)
+                if snapshot is None or snapshot.corpus_version != self.corpus_version:
+                    return None
+                self.index_snapshot = snapshot
+            return snapshot
+    
+    def export_index_snapshot(self, corpus_version: Optional[int] = None) -> Optional[str]:
+        """
+        Exporta a collection atual para um novo snapshot mapeável em memória.
+        
+        Args:
+            corpus_version: Versão gravada no snapshot (padrão: a versão atual)
+        
+        Returns:
+            Caminho do snapshot publicado, ou None em caso de erro
+        """
+        with self.lock.read_locked():
+            try:
+                vectorstore = self.get_vectorstore()
+                os.makedirs(self.index_snapshot_path, exist_ok=True)
+                return export_snapshot(
+                    vectorstore._collection if vectorstore else None,
+                    self.index_snapshot_path,
+                    self.corpus_version if corpus_version is None else corpus_version
+                )
+            except Exception as e:
+                logger.error("Erro ao exportar snapshot do índice: %s", e)
+                return None
+    
+    def _publish_index_snapshot(self, corpus_version: int):
+        """Exporta o snapshot da nova versão do corpus (antes de a versão ser publicada)."""
+        if self.export_index_snapshot(corpus_version) is None:
+            raise RuntimeError("snapshot do índice não exportado (os workers usarão o ChromaDB)")
     
     def get_documents_list(self) -> List[dict]:
         """
         Retorna lista de documentos únicos com seus metadados.
+        Usa o índice em memória; a collection só é lida após uma alteração.
         
         Returns:
             Lista de dicionários com informações dos documentos
         """
-        vectorstore = self.get_vectorstore()
-        if not vectorstore:
-            return []
+        return self.name_index.documents()
+    
+    def find_document_by_name(self, doc_name: str) -> Optional[str]:
+        """
+        Encontra o nome exato de um documento a partir de um nome aproximado.
         
-        try:
-            collection = vectorstore._collection
-            # Obter todos os documentos
-            results = collection.get()
+        Args:
+            doc_name: Nome do documento (ex: gerado pelo LLM)
             
-            if not results or 'metadatas' not in results or not results['metadatas']:
+        Returns:
+            Nome exato do documento se encontrado, None caso contrário
+        """
+        return self.name_index.find(doc_name)
+    
+    def _load_documents_list(self) -> List[dict]:
+        """
+        Lê a lista de documentos únicos diretamente da collection.
+        
+        Returns:
+            Lista de dicionários com informações dos documentos,
+            ou None se a leitura falhar (o resultado não é guardado no índice)
+        """
+        with self.lock.read_locked():
+            return self._read_documents_list()
+    
+    def _read_documents_list(self) -> List[dict]:
+        """Agrupa os chunks da collection por documento (com a trava de leitura)."""
+        snapshot = self.get_index_snapshot()
+        if snapshot is not None:
+            # Metadados lidos do snapshot: o worker não precisa abrir o ChromaDB
+            metadatas = snapshot.iter_metadatas()
+        else:
+            vectorstore = self.get_vectorstore()
+            if not vectorstore:
                 return []
+        
+        try:
+            if snapshot is None:
+                collection = vectorstore._collection
+                # Obter todos os documentos
+                results = collection.get()
+                
+                if not results or 'metadatas' not in results or not results['metadatas']:
+                    return []
+                metadatas = results['metadatas']
             
             # Agrupar por documento (source)
             documents_map = {}
-            for metadata in results['metadatas']:
+            for metadata in metadatas:
                 if metadata and 'source' in metadata:
                     source = metadata.get('source', '')
                     file_path = metadata.get('file_path', '')
@@ -524,8 +828,8 @@ class DocumentProcessor:
             
             return list(documents_map.values())
         except Exception as e:
-            print(f"Erro ao listar documentos: {str(e)}")
-            return []
+            logger.error("Erro ao listar documentos: %s", e)
+            return None
     
     def update_document_name(self, old_name: str, new_name: str) -> bool:
         """
@@ -538,19 +842,29 @@ class DocumentProcessor:
         Returns:
             True se atualizado com sucesso, False caso contrário
         """
+        with self.lock.write_locked():
+            return self._update_document_name(old_name, new_name)
+    
+    def _update_document_name(self, old_name: str, new_name: str) -> bool:
+        """Renomeia o documento (chamado com a trava de escrita)."""
         # Limpar cache antes de qualquer operação
         self._clear_chromadb_cache()
-        
+        # O vectorstore carregado usava o sistema do ChromaDB que acabou de ser
+        # parado (a leitura funciona, mas collection.update falha com
+        # "Component not running"); recarregar antes de atualizar
+        self.vectorstore = None
+
         vectorstore = self.get_vectorstore()
         if not vectorstore:
-            print(f"[UPDATE] Erro: Vectorstore não disponível")
+            logger.error("[UPDATE] Erro: Vectorstore não disponível")
             return False
         
         try:
             # PRIMEIRO: Obter lista de documentos para encontrar o nome exato
             docs_list = self.get_documents_list()
-            print(f"[UPDATE] Buscando documento: {repr(old_name)}")
-            print(f"[UPDATE] Documentos disponíveis no ChromaDB: {[repr(d['name']) for d in docs_list]}")
+            logger.debug("[UPDATE] Buscando documento: %r", old_name)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[UPDATE] Documentos disponíveis no ChromaDB: %s", [d['name'] for d in docs_list])
             
             # Função auxiliar para normalizar nomes
             def normalize_name(name):
@@ -569,28 +883,28 @@ class DocumentProcessor:
                 doc_name = doc['name']
                 if doc_name == old_name:
                     exact_doc = doc
-                    print(f"[UPDATE] Match exato encontrado: {repr(doc_name)}")
+                    logger.debug("[UPDATE] Match exato encontrado: %r", doc_name)
                     break
                 else:
-                    # Debug: mostrar diferenças
-                    if len(doc_name) == len(old_name):
+                    # Debug: mostrar diferenças (só com DEBUG ativo para este módulo)
+                    if logger.isEnabledFor(logging.DEBUG) and len(doc_name) == len(old_name):
                         diff_chars = []
                         for i, (c1, c2) in enumerate(zip(doc_name, old_name)):
                             if c1 != c2:
                                 diff_chars.append(f"pos {i}: '{c1}'({ord(c1)}) vs '{c2}'({ord(c2)})")
                         if diff_chars:
-                            print(f"[UPDATE] Diferenças encontradas: {diff_chars[:3]}")
+                            logger.debug("[UPDATE] Diferenças encontradas: %s", diff_chars[:3])
             
             # Se não encontrou exato, tentar match normalizado
             if not exact_doc:
                 old_name_normalized = normalize_name(old_name)
-                print(f"[UPDATE] Tentando match normalizado: {repr(old_name_normalized)}")
+                logger.debug("[UPDATE] Tentando match normalizado: %r", old_name_normalized)
                 
                 for doc in docs_list:
                     doc_normalized = normalize_name(doc['name'])
                     if doc_normalized == old_name_normalized:
                         exact_doc = doc
-                        print(f"[UPDATE] Match normalizado encontrado: {repr(doc['name'])}")
+                        logger.debug("[UPDATE] Match normalizado encontrado: %r", doc['name'])
                         break
                 
                 # Se ainda não encontrou, tentar case-insensitive
@@ -598,29 +912,29 @@ class DocumentProcessor:
                     for doc in docs_list:
                         if normalize_name(doc['name']).lower() == old_name_normalized.lower():
                             exact_doc = doc
-                            print(f"[UPDATE] Match case-insensitive encontrado: {repr(doc['name'])}")
+                            logger.debug("[UPDATE] Match case-insensitive encontrado: %r", doc['name'])
                             break
                 
                 # Última tentativa: usar o primeiro documento se houver apenas um
                 if not exact_doc and len(docs_list) == 1:
-                    print(f"[UPDATE] Usando único documento disponível como fallback")
+                    logger.debug("[UPDATE] Usando único documento disponível como fallback")
                     exact_doc = docs_list[0]
             
             if not exact_doc:
-                print(f"[UPDATE] Documento não encontrado na lista. Nome buscado: {repr(old_name)}")
+                logger.debug("[UPDATE] Documento não encontrado na lista. Nome buscado: %r", old_name)
                 return False
             
             # Usar o nome exato do documento encontrado
             exact_old_name = exact_doc['name']
-            print(f"[UPDATE] Usando nome exato do ChromaDB: {repr(exact_old_name)}")
-            print(f"[UPDATE] Novo nome será: {repr(new_name)}")
+            logger.debug("[UPDATE] Usando nome exato do ChromaDB: %r", exact_old_name)
+            logger.debug("[UPDATE] Novo nome será: %r", new_name)
             
             collection = vectorstore._collection
             # Obter todos os IDs que pertencem a este documento
             results = collection.get()
             
             if not results or 'ids' not in results or 'metadatas' not in results:
-                print(f"[UPDATE] Erro: Não foi possível obter resultados da collection")
+                logger.error("[UPDATE] Erro: Não foi possível obter resultados da collection")
                 return False
             
             # Filtrar IDs que pertencem ao documento e atualizar metadados usando o nome exato
@@ -638,17 +952,17 @@ class DocumentProcessor:
                         updated_metadatas.append(new_metadata)
             
             if not ids_to_update:
-                print(f"[UPDATE] Erro: Nenhum chunk encontrado para o documento {repr(exact_old_name)}")
+                logger.error("[UPDATE] Erro: Nenhum chunk encontrado para o documento %r", exact_old_name)
                 return False
             
-            print(f"[UPDATE] Atualizando {len(ids_to_update)} chunks do documento '{exact_old_name}' para '{new_name}'")
+            logger.info("[UPDATE] Atualizando %s chunks do documento '%s' para '%s'", len(ids_to_update), exact_old_name, new_name)
             
             # Encontrar o arquivo físico para renomear (usar o primeiro metadata encontrado)
             file_path_to_rename = None
             new_file_path = None
             if updated_metadatas and len(updated_metadatas) > 0:
                 file_path_to_rename = updated_metadatas[0].get('file_path')
-                print(f"[UPDATE] Arquivo físico encontrado: {file_path_to_rename}")
+                logger.debug("[UPDATE] Arquivo físico encontrado: %s", file_path_to_rename)
             
             # Renomear arquivo físico se existir
             if file_path_to_rename and os.path.exists(file_path_to_rename):
@@ -677,14 +991,14 @@ class DocumentProcessor:
                     
                     # Renomear arquivo físico
                     os.rename(file_path_to_rename, new_file_path)
-                    print(f"Arquivo físico renomeado: '{file_path_to_rename}' -> '{new_file_path}'")
+                    logger.info("Arquivo físico renomeado: '%s' -> '%s'", file_path_to_rename, new_file_path)
                     
                     # Atualizar file_path nos metadados
                     for i in range(len(updated_metadatas)):
                         if updated_metadatas[i].get('file_path') == file_path_to_rename:
                             updated_metadatas[i]['file_path'] = new_file_path
                 except Exception as e:
-                    print(f"Erro ao renomear arquivo físico: {str(e)}")
+                    logger.error("Erro ao renomear arquivo físico: %s", e)
                     # Continuar mesmo se falhar ao renomear o arquivo
             
             # Atualizar metadados no ChromaDB em lotes se necessário
@@ -699,20 +1013,19 @@ class DocumentProcessor:
                     metadatas=batch_metadatas
                 )
             
-            print(f"[UPDATE] Documento '{exact_old_name}' renomeado para '{new_name}' com sucesso no ChromaDB")
+            logger.info("[UPDATE] Documento '%s' renomeado para '%s' com sucesso no ChromaDB", exact_old_name, new_name)
             if new_file_path:
-                print(f"[UPDATE] Arquivo físico também foi renomeado para: '{new_file_path}'")
+                logger.info("[UPDATE] Arquivo físico também foi renomeado para: '%s'", new_file_path)
             
             # Recarregar vectorstore para refletir as mudanças
             self.vectorstore = None
             self._clear_chromadb_cache()
             gc.collect()
+            self._mark_corpus_changed()
             
             return True
         except Exception as e:
-            print(f"[UPDATE] Erro ao atualizar nome do documento: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[UPDATE] Erro ao atualizar nome do documento: %s", e)
             return False
     
     def delete_document(self, document_name: str) -> bool:
@@ -725,19 +1038,25 @@ class DocumentProcessor:
         Returns:
             True se deletado com sucesso, False caso contrário
         """
+        with self.lock.write_locked():
+            return self._delete_document(document_name)
+    
+    def _delete_document(self, document_name: str) -> bool:
+        """Deleta o documento (chamado com a trava de escrita)."""
         # Limpar cache antes de qualquer operação
         self._clear_chromadb_cache()
         
         vectorstore = self.get_vectorstore()
         if not vectorstore:
-            print(f"[DELETE] Erro: Vectorstore não disponível")
+            logger.error("[DELETE] Erro: Vectorstore não disponível")
             return False
         
         try:
             # PRIMEIRO: Obter lista de documentos para encontrar o nome exato
             docs_list = self.get_documents_list()
-            print(f"[DELETE] Buscando documento: {repr(document_name)}")
-            print(f"[DELETE] Documentos disponíveis no ChromaDB: {[repr(d['name']) for d in docs_list]}")
+            logger.debug("[DELETE] Buscando documento: %r", document_name)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[DELETE] Documentos disponíveis no ChromaDB: %s", [d['name'] for d in docs_list])
             
             # Função auxiliar para normalizar nomes
             def normalize_name(name):
@@ -756,28 +1075,28 @@ class DocumentProcessor:
                 doc_name = doc['name']
                 if doc_name == document_name:
                     exact_doc = doc
-                    print(f"[DELETE] Match exato encontrado: {repr(doc_name)}")
+                    logger.debug("[DELETE] Match exato encontrado: %r", doc_name)
                     break
                 else:
-                    # Debug: mostrar diferenças
-                    if len(doc_name) == len(document_name):
+                    # Debug: mostrar diferenças (só com DEBUG ativo para este módulo)
+                    if logger.isEnabledFor(logging.DEBUG) and len(doc_name) == len(document_name):
                         diff_chars = []
                         for i, (c1, c2) in enumerate(zip(doc_name, document_name)):
                             if c1 != c2:
                                 diff_chars.append(f"pos {i}: '{c1}'({ord(c1)}) vs '{c2}'({ord(c2)})")
                         if diff_chars:
-                            print(f"[DELETE] Diferenças encontradas: {diff_chars[:3]}")
+                            logger.debug("[DELETE] Diferenças encontradas: %s", diff_chars[:3])
             
             # Se não encontrou exato, tentar match normalizado
             if not exact_doc:
                 doc_name_normalized = normalize_name(document_name)
-                print(f"[DELETE] Tentando match normalizado: {repr(doc_name_normalized)}")
+                logger.debug("[DELETE] Tentando match normalizado: %r", doc_name_normalized)
                 
                 for doc in docs_list:
                     doc_normalized = normalize_name(doc['name'])
                     if doc_normalized == doc_name_normalized:
                         exact_doc = doc
-                        print(f"[DELETE] Match normalizado encontrado: {repr(doc['name'])}")
+                        logger.debug("[DELETE] Match normalizado encontrado: %r", doc['name'])
                         break
                 
                 # Se ainda não encontrou, tentar case-insensitive
@@ -785,21 +1104,21 @@ class DocumentProcessor:
                     for doc in docs_list:
                         if normalize_name(doc['name']).lower() == doc_name_normalized.lower():
                             exact_doc = doc
-                            print(f"[DELETE] Match case-insensitive encontrado: {repr(doc['name'])}")
+                            logger.debug("[DELETE] Match case-insensitive encontrado: %r", doc['name'])
                             break
                 
                 # Última tentativa: usar o primeiro documento se houver apenas um
                 if not exact_doc and len(docs_list) == 1:
-                    print(f"[DELETE] Usando único documento disponível como fallback")
+                    logger.debug("[DELETE] Usando único documento disponível como fallback")
                     exact_doc = docs_list[0]
             
             if not exact_doc:
-                print(f"[DELETE] Documento não encontrado na lista. Nome buscado: {repr(document_name)}")
+                logger.debug("[DELETE] Documento não encontrado na lista. Nome buscado: %r", document_name)
                 return False
             
             # Usar o nome exato do documento encontrado
             exact_document_name = exact_doc['name']
-            print(f"[DELETE] Usando nome exato do ChromaDB: {repr(exact_document_name)}")
+            logger.debug("[DELETE] Usando nome exato do ChromaDB: %r", exact_document_name)
             
             # Obter todos os IDs que pertencem a este documento
             # Usar uma nova conexão para evitar problemas de "broken pipe"
@@ -813,7 +1132,7 @@ class DocumentProcessor:
                 results = collection.get()
                 
                 if not results or 'ids' not in results or 'metadatas' not in results:
-                    print(f"[DELETE] Erro: Não foi possível obter resultados da collection")
+                    logger.error("[DELETE] Erro: Não foi possível obter resultados da collection")
                     return False
                 
                 # Filtrar IDs que pertencem ao documento usando o nome exato
@@ -831,14 +1150,14 @@ class DocumentProcessor:
                 gc.collect()
                 time.sleep(0.1)
             except Exception as e:
-                print(f"[DELETE] Erro ao obter IDs: {str(e)}")
+                logger.error("[DELETE] Erro ao obter IDs: %s", e)
                 return False
             
             if not ids_to_delete:
-                print(f"[DELETE] Erro: Nenhum chunk encontrado para o documento {repr(exact_document_name)}")
+                logger.error("[DELETE] Erro: Nenhum chunk encontrado para o documento %r", exact_document_name)
                 return False
             
-            print(f"[DELETE] Encontrados {len(ids_to_delete)} chunks para deletar")
+            logger.debug("[DELETE] Encontrados %s chunks para deletar", len(ids_to_delete))
             
             # Deletar chunks do ChromaDB em lotes para evitar problemas de "Broken pipe"
             # ChromaDB pode ter problemas ao deletar muitos chunks de uma vez
@@ -847,7 +1166,7 @@ class DocumentProcessor:
             deleted_count = 0
             total_batches = (len(ids_to_delete) + batch_size - 1) // batch_size
             
-            print(f"[DELETE] Deletando {len(ids_to_delete)} chunks em {total_batches} lotes de {batch_size}")
+            logger.debug("[DELETE] Deletando %s chunks em %s lotes de %s", len(ids_to_delete), total_batches, batch_size)
             
             for i in range(0, len(ids_to_delete), batch_size):
                 batch_ids = ids_to_delete[i:i + batch_size]
@@ -873,7 +1192,7 @@ class DocumentProcessor:
                         collection.delete(ids=batch_ids)
                         deleted_count += len(batch_ids)
                         batch_deleted = True
-                        print(f"[DELETE] Lote {batch_num}/{total_batches}: {deleted_count}/{len(ids_to_delete)} chunks deletados")
+                        logger.debug("[DELETE] Lote %s/%s: %s/%s chunks deletados", batch_num, total_batches, deleted_count, len(ids_to_delete))
                         
                         # Fechar conexão explicitamente
                         del collection
@@ -896,18 +1215,18 @@ class DocumentProcessor:
                         gc.collect()
                         
                         if retry_count < max_retries:
-                            print(f"[DELETE] Erro ao deletar lote {batch_num} (tentativa {retry_count}/{max_retries}): {str(batch_error)}")
+                            logger.warning("[DELETE] Erro ao deletar lote %s (tentativa %s/%s): %s", batch_num, retry_count, max_retries, batch_error)
                             
                             # Se for "broken pipe" ou erro de conexão, esperar mais tempo
                             if "broken pipe" in error_msg or "connection" in error_msg or "errno 32" in error_msg:
-                                print(f"[DELETE] Erro de conexão detectado. Aguardando antes de tentar novamente...")
+                                logger.warning("[DELETE] Erro de conexão detectado. Aguardando antes de tentar novamente...")
                                 time.sleep(0.8)  # Delay maior para conexão se restabelecer
                             else:
                                 # Para outros erros, esperar um pouco e tentar novamente
                                 time.sleep(0.3)
                         else:
                             # Última tentativa falhou - tentar em sub-lotes menores
-                            print(f"[DELETE] Falha ao deletar lote {batch_num} após {max_retries} tentativas. Tentando em sub-lotes...")
+                            logger.warning("[DELETE] Falha ao deletar lote %s após %s tentativas. Tentando em sub-lotes...", batch_num, max_retries)
                             if len(batch_ids) > 5:
                                 sub_batch_size = 5
                                 sub_deleted = 0
@@ -931,7 +1250,7 @@ class DocumentProcessor:
                                         del sub_client
                                         gc.collect()
                                     except Exception as sub_error:
-                                        print(f"[DELETE] Erro ao deletar sub-lote: {str(sub_error)}")
+                                        logger.error("[DELETE] Erro ao deletar sub-lote: %s", sub_error)
                                         # Limpar em caso de erro
                                         try:
                                             if sub_collection:
@@ -943,45 +1262,49 @@ class DocumentProcessor:
                                         gc.collect()
                                 
                                 if sub_deleted > 0:
-                                    print(f"[DELETE] {sub_deleted} de {len(batch_ids)} chunks do lote {batch_num} foram deletados")
+                                    logger.debug("[DELETE] %s de %s chunks do lote %s foram deletados", sub_deleted, len(batch_ids), batch_num)
                                     batch_deleted = True
                             
                             # Se ainda não deletou, marcar como falha mas continuar
                             if not batch_deleted:
-                                print(f"[DELETE] AVISO: Lote {batch_num} não pôde ser deletado completamente")
+                                logger.warning("[DELETE] AVISO: Lote %s não pôde ser deletado completamente", batch_num)
                                 # Continuar com próximo lote
             
             if deleted_count == 0:
                 raise Exception(f"Não foi possível deletar nenhum chunk")
             
             if deleted_count < len(ids_to_delete):
-                print(f"[DELETE] AVISO: Apenas {deleted_count} de {len(ids_to_delete)} chunks foram deletados")
+                logger.warning("[DELETE] AVISO: Apenas %s de %s chunks foram deletados", deleted_count, len(ids_to_delete))
             else:
-                print(f"[DELETE] Todos os {deleted_count} chunks deletados com sucesso")
+                logger.info("[DELETE] Todos os %s chunks deletados com sucesso", deleted_count)
             
             # Deletar arquivo físico se existir
             if file_path and os.path.exists(file_path):
                 try:
                     os.remove(file_path)
-                    print(f"[DELETE] Arquivo físico deletado: {file_path}")
+                    logger.info("[DELETE] Arquivo físico deletado: %s", file_path)
                 except Exception as e:
-                    print(f"[DELETE] Erro ao deletar arquivo físico: {str(e)}")
+                    logger.error("[DELETE] Erro ao deletar arquivo físico: %s", e)
             
             # Recarregar vectorstore
             self.vectorstore = None
             self._clear_chromadb_cache()
             gc.collect()
+            self._mark_corpus_changed()
             
-            print(f"[DELETE] Documento '{exact_document_name}' deletado com sucesso")
+            logger.info("[DELETE] Documento '%s' deletado com sucesso", exact_document_name)
             return True
         except Exception as e:
-            print(f"[DELETE] Erro ao deletar documento: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[DELETE] Erro ao deletar documento: %s", e)
             return False
     
     def clear_vectorstore(self):
         """Limpa o vectorstore."""
+        with self.lock.write_locked():
+            self._clear_vectorstore()
+    
+    def _clear_vectorstore(self):
+        """Remove a collection (chamado com a trava de escrita)."""
         try:
             # Limpar cache primeiro
             self._clear_chromadb_cache()
@@ -1003,7 +1326,7 @@ class DocumentProcessor:
             try:
                 client = chromadb.PersistentClient(
                     path=self.chroma_db_path,
-                    settings=Settings(anonymized_telemetry=False)
+                    settings=chromadb_config.Settings(anonymized_telemetry=False)
                 )
                 try:
                     client.delete_collection(name=CHROMA_COLLECTION_NAME)
@@ -1019,5 +1342,7 @@ class DocumentProcessor:
             self._clear_chromadb_cache()
             gc.collect()
         except Exception as e:
-            print(f"Erro ao limpar vectorstore: {str(e)}")
+            logger.error("Erro ao limpar vectorstore: %s", e)
+        finally:
+            self._mark_corpus_changed()
 
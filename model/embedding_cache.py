@@ -0,0 +1,358 @@
+"""
+Camada de embeddings de consulta do IB - EstradaResponde.
+
+Envolve o modelo de embeddings com:
+- um cache LRU de embeddings de perguntas (chave: texto normalizado);
+- um agrupador (micro-batching) que junta as perguntas que chegam quase ao
+  mesmo tempo, vindas de requisições diferentes, numa única chamada em lote
+  ao provedor de embeddings. Os lotes são enviados por um pool pequeno de
+  threads (um lote lento não segura os seguintes) e a espera de cada pergunta
+  é limitada pelo tempo da etapa de embedding.
+
+Os embeddings de documentos (ingestão) são repassados diretamente ao modelo;
+podem ser calculados antecipadamente (prepare_documents), fora da trava de
+escrita do vectorstore. Os vetores preparados ficam com a ingestão que os
+calculou (PreparedDocumentEmbeddings), sem estado compartilhado entre uploads
+simultâneos.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from deadline import StageTimeout
+from metrics import CACHE_LOOKUPS
+from usage import count_tokens, record_embedding
+
+
+def normalize_query_text(text: str) -> str:
+    """Normaliza o texto da consulta (remove espaços extras nas pontas e no meio)."""
+    return ' '.join((text or '').split())
+
+
+class _QueryBatcher:
+    """Agrupa pedidos de embedding concorrentes em chamadas em lote."""
+
+    def __init__(self, embeddings: Embeddings, window_seconds: float, max_batch_size: int,
+                 max_concurrent_batches: int = 4):
+        self._embeddings = embeddings
+        self._window_seconds = window_seconds
+        self._max_batch_size = max_batch_size
+        self._max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._executor = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.batched_texts = 0
+
+    def _ensure_worker(self):
+        """Inicia a thread do agrupador e o pool de lotes no primeiro uso (e após um fork)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                # Após um fork, as threads do pool anterior não existem mais
+                self._executor = ThreadPoolExecutor(max_workers=self._max_concurrent_batches,
+                                                    thread_name_prefix='query-embedding')
+                self._thread = threading.Thread(target=self._run, name='query-embedding-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Enfileira um texto para embedding.
+
+        Args:
+            text: Texto (já normalizado) da consulta
+
+        Returns:
+            Future que recebe (vetor de embedding, se este pedido paga os
+            tokens): textos repetidos no mesmo lote são cobrados uma única vez
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        # Não cancelável: quem desiste de esperar (prazo, cliente desconectado)
+        # não interrompe o lote, que entrega o vetor aos demais pedidos
+        future.set_running_or_notify_cancel()
+        self._queue.put((text, future))
+        return future
+
+    def _collect_batch(self) -> List[tuple]:
+        """Espera o primeiro pedido e junta os que chegarem dentro da janela."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._window_seconds
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._executor.submit(self._embed_batch, self._collect_batch())
+
+    def _embed_batch(self, batch: List[tuple]):
+        # Textos repetidos no mesmo lote são enviados (e cobrados) uma única vez
+        futures_by_text: Dict[str, List[Future]] = {}
+        for text, future in batch:
+            futures_by_text.setdefault(text, []).append(future)
+        texts = list(futures_by_text)
+        try:
+            vectors = self._embeddings.embed_documents(texts)
+        except Exception as e:
+            for text_futures in futures_by_text.values():
+                for future in text_futures:
+                    future.set_exception(e)
+            return
+        with self._stats_lock:
+            self.batches += 1
+            self.batched_texts += len(texts)
+        for text, vector in zip(texts, vectors):
+            for index, future in enumerate(futures_by_text[text]):
+                future.set_result((vector, index == 0))
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    Modelo de embeddings criado só na primeira chamada.
+
+    Adia a importação do SDK do provedor (ex: langchain_openai) para o primeiro
+    embedding calculado, em vez da inicialização do processo.
+    """
+
+    def __init__(self, factory: Callable[[], Embeddings]):
+        """
+        Args:
+            factory: Função que cria o modelo de embeddings
+        """
+        self._factory = factory
+        self._embeddings: Optional[Embeddings] = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> Embeddings:
+        """O modelo de embeddings (criado na primeira chamada)."""
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self._factory()
+        return self._embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.model.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.model.aembed_query(text)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings com cache LRU e micro-batching para consultas."""
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = 1024,
+                 batch_window_ms: float = 5, max_batch_size: int = 64,
+                 provider: str = '', model: str = '', max_concurrent_batches: int = 4,
+                 timeout_seconds: Optional[float] = None):
+        """
+        Inicializa a camada de embeddings de consulta.
+
+        Args:
+            embeddings: Modelo de embeddings original (ex: OpenAIEmbeddings)
+            max_entries: Número máximo de embeddings de consulta em cache
+            batch_window_ms: Janela (ms) para juntar consultas concorrentes num lote
+            max_batch_size: Tamanho máximo de cada lote
+            provider: Provedor de embeddings (contabilização de tokens)
+            model: Modelo de embeddings (contabilização de tokens e custos)
+            max_concurrent_batches: Lotes enviados ao provedor ao mesmo tempo
+            timeout_seconds: Espera máxima pelo embedding de uma consulta (None = sem limite)
+        """
+        self.embeddings = embeddings
+        self.provider = provider
+        self.model = model
+        self.max_entries = max_entries
+        self.timeout_seconds = timeout_seconds
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._batcher = _QueryBatcher(embeddings, batch_window_ms / 1000.0, max_batch_size,
+                                      max_concurrent_batches)
+        self._hits = 0
+        self._misses = 0
+
+    def _get_cached(self, key: str):
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is None:
+                self._misses += 1
+            else:
+                self._cache.move_to_end(key)
+                self._hits += 1
+        CACHE_LOOKUPS.inc(cache='query_embedding', result='hit' if vector is not None else 'miss')
+        return vector
+
+    def _store(self, key: str, vector: List[float]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _record_usage(self, texts: List[str], document: Optional[str] = None):
+        """Registra os tokens dos textos enviados ao provedor de embeddings."""
+        record_embedding(self.provider, self.model, sum(count_tokens(text) for text in texts), document)
+
+    def prepare_documents(self, texts: List[str],
+                          sources: Optional[List[str]] = None) -> 'PreparedDocumentEmbeddings':
+        """
+        Calcula antecipadamente os embeddings de documentos de uma ingestão.
+
+        Args:
+            texts: Textos (chunks) que serão gravados no vectorstore
+            sources: Documento de cada texto, para contabilizar os tokens por documento
+
+        Returns:
+            Embeddings a usar na gravação desses textos: devolvem os vetores já
+            calculados, sem nova chamada ao provedor
+        """
+        vectors = self.embeddings.embed_documents(texts)
+        texts_by_source: Dict[Optional[str], List[str]] = {}
+        for text, source in zip(texts, sources or [None] * len(texts)):
+            texts_by_source.setdefault(source, []).append(text)
+        for source, source_texts in texts_by_source.items():
+            self._record_usage(source_texts, source)
+        return PreparedDocumentEmbeddings(self, dict(zip(texts, vectors)))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de documentos (ingestão): repassados ao modelo original."""
+        vectors = self.embeddings.embed_documents(texts)
+        self._record_usage(texts)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Retorna o embedding de uma consulta, usando o cache ou o agrupador.
+
+        Args:
+            text: Texto da consulta
+
+        Returns:
+            Vetor de embedding
+
+        Raises:
+            StageTimeout: Se o embedding não chegar em timeout_seconds
+        """
+        key = normalize_query_text(text)
+        vector = self._get_cached(key)
+        if vector is None:
+            future = self._batcher.submit(key)
+            try:
+                vector, charged = future.result(self.timeout_seconds)
+            except futures.TimeoutError:
+                raise self._abandon(key, future)
+            self._batched(key, vector, charged)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Versão assíncrona de embed_query (não bloqueia o event loop)."""
+        key = normalize_query_text(text)
+        vector = self._get_cached(key)
+        if vector is None:
+            future = self._batcher.submit(key)
+            try:
+                vector, charged = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+            except asyncio.TimeoutError:
+                raise self._abandon(key, future)
+            self._batched(key, vector, charged)
+        return vector
+
+    def _batched(self, key: str, vector: List[float], charged: bool):
+        """Guarda o embedding calculado pelo agrupador; só o pedido que pagou registra os tokens."""
+        self._store(key, vector)
+        if charged:
+            self._record_usage([key])
+
+    def _abandon(self, key: str, future: Future) -> StageTimeout:
+        """
+        Desiste de esperar o embedding; quando ele chegar, vai para o cache e os
+        tokens são registrados (sem a requisição, que já terminou).
+
+        Returns:
+            StageTimeout da etapa de embedding, a ser levantado por quem esperava
+        """
+        def settle(done: Future):
+            if done.exception() is None:
+                self._batched(key, *done.result())
+
+        future.add_done_callback(settle)
+        return StageTimeout('embedding', self.timeout_seconds)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Versão assíncrona de embed_documents."""
+        vectors = await self.embeddings.aembed_documents(texts)
+        self._record_usage(texts)
+        return vectors
+
+    def stats(self) -> dict:
+        """Retorna estatísticas do cache e do agrupamento de consultas."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            batches = self._batcher.batches
+            return {
+                'entries': len(self._cache),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'batches': batches,
+                'average_batch_size': round(self._batcher.batched_texts / batches, 2) if batches else 0.0
+            }
+
+
+class PreparedDocumentEmbeddings(Embeddings):
+    """Embeddings de documentos calculados antecipadamente por uma ingestão."""
+
+    def __init__(self, embeddings: Embeddings, vectors: Dict[str, List[float]]):
+        """
+        Args:
+            embeddings: Embeddings de origem (textos não preparados e consultas)
+            vectors: Vetor já calculado de cada texto
+        """
+        self._embeddings = embeddings
+        self._vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Vetores preparados; os textos que faltarem vão para os embeddings de origem."""
+        prepared = [self._vectors.get(text) for text in texts]
+        missing = [text for text, vector in zip(texts, prepared) if vector is None]
+        if not missing:
+            return prepared
+        computed = iter(self._embeddings.embed_documents(missing))
+        return [vector if vector is not None else next(computed) for vector in prepared]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._embeddings.aembed_query(text)
+
+    def release(self):
+        """Libera os vetores preparados (após a gravação no vectorstore)."""
+        self._vectors = {}
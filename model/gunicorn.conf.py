@@ -0,0 +1,42 @@
+"""
+Configuração do gunicorn para o IB - EstradaResponde (vários workers).
+
+Uso:
+    INDEX_SNAPSHOT_ENABLED=True gunicorn -c gunicorn.conf.py
+
+Com preload_app, o processo mestre importa a API e mapeia o snapshot do
+índice antes do fork: os workers herdam o mapeamento e compartilham as mesmas
+páginas de memória (somente leitura), em vez de cada um carregar o seu
+próprio índice do ChromaDB.
+"""
+
+import os
+
+from config import API_HOST, API_PORT
+
+wsgi_app = 'api:app'
+bind = f"{API_HOST}:{API_PORT}"
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+# Respostas do LLM podem levar dezenas de segundos
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = True
+
+
+def when_ready(server):
+    """Mapeia o snapshot do índice e importa os SDKs usados no mestre (antes do fork dos workers)."""
+    import api
+
+    snapshot = api.document_processor.get_index_snapshot()
+    if snapshot is not None:
+        snapshot.warm()
+        server.log.info(f"Snapshot do índice carregado: {snapshot.count} chunks (versão {snapshot.corpus_version})")
+    else:
+        server.log.info("Sem snapshot do índice: cada worker usará o ChromaDB")
+    loaded = api.preload_dependencies(include_chromadb=snapshot is None)
+    startup = api.lazy_imports.stats()['startup'].get('api', 0.0)
+    server.log.info(
+        f"API importada em {startup:.2f}s; SDKs pré-carregados: "
+        + (', '.join(f"{name} ({seconds:.2f}s)" for name, seconds in loaded.items()) or 'nenhum')
+    )
@@ -0,0 +1,245 @@
+"""
+Snapshot somente leitura do índice vetorial do IB - EstradaResponde.
+
+Exporta os embeddings, textos e metadados da collection do ChromaDB para
+arquivos mapeados em memória (numpy .npy + blobs com offsets). Cada worker do
+servidor apenas mapeia os arquivos: as páginas ficam no cache do sistema
+operacional e são compartilhadas por todos os processos (e, com preload, o
+mapeamento é herdado pelos workers no fork), em vez de cada worker carregar o
+seu próprio cliente do ChromaDB e índice HNSW.
+
+A busca é exata (força bruta em numpy) e reproduz a ordenação do Chroma
+(distância L2) e o MMR do LangChain.
+
+Uso (exporta o corpus atual):
+    python index_snapshot.py
+"""
+
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+# Arquivo que aponta para o snapshot publicado (substituído atomicamente)
+CURRENT_FILE = 'current.json'
+
+
+def _write_blob(path: str, items: List[bytes]) -> np.ndarray:
+    """Grava itens concatenados num arquivo e retorna os offsets (n + 1)."""
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    with open(path, 'wb') as blob_file:
+        for i, item in enumerate(items):
+            blob_file.write(item)
+            offsets[i + 1] = offsets[i] + len(item)
+    return offsets
+
+
+def export_snapshot(collection, base_path: str, corpus_version: int) -> str:
+    """
+    Exporta a collection do ChromaDB para um novo snapshot e o publica.
+
+    Args:
+        collection: Collection do ChromaDB (ex: vectorstore._collection), ou
+            None para publicar um snapshot vazio
+        base_path: Diretório base dos snapshots
+        corpus_version: Versão do corpus exportada
+
+    Returns:
+        Caminho do snapshot publicado
+    """
+    results = collection.get(include=['embeddings', 'documents', 'metadatas']) if collection is not None else {}
+    embeddings = np.asarray(results.get('embeddings') or [], dtype=np.float32)
+    if embeddings.ndim != 2:
+        embeddings = embeddings.reshape(0, 0)
+
+    name = f"v{corpus_version}-{os.getpid()}-{time.time_ns()}"
+    directory = os.path.join(base_path, name)
+    os.makedirs(directory)
+
+    np.save(os.path.join(directory, 'embeddings.npy'), embeddings)
+    np.save(os.path.join(directory, 'squared_norms.npy'), np.einsum('ij,ij->i', embeddings, embeddings))
+    texts = [(text or '').encode('utf-8') for text in results.get('documents') or []]
+    np.save(os.path.join(directory, 'text_offsets.npy'), _write_blob(os.path.join(directory, 'texts.bin'), texts))
+    metadatas = [json.dumps(metadata or {}, ensure_ascii=False).encode('utf-8')
+                 for metadata in results.get('metadatas') or []]
+    np.save(os.path.join(directory, 'metadata_offsets.npy'),
+            _write_blob(os.path.join(directory, 'metadata.bin'), metadatas))
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as manifest_file:
+        json.dump({
+            'corpus_version': corpus_version,
+            'count': int(embeddings.shape[0]),
+            'dimension': int(embeddings.shape[1]) if embeddings.size else 0,
+            'created_at': time.time()
+        }, manifest_file)
+
+    # Publicar: current.json passa a apontar para o novo snapshot
+    temp_path = os.path.join(base_path, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(temp_path, 'w', encoding='utf-8') as current_file:
+        json.dump({'name': name}, current_file)
+    os.replace(temp_path, os.path.join(base_path, CURRENT_FILE))
+
+    _remove_old_snapshots(base_path, keep={name})
+    return directory
+
+
+def _remove_old_snapshots(base_path: str, keep: set, keep_previous: int = 1):
+    """
+    Remove snapshots antigos, mantendo o atual e o(s) anterior(es).
+
+    Workers que ainda mapeiam um snapshot removido continuam funcionando: no
+    Linux o arquivo só é liberado quando o último mapeamento é desfeito.
+    """
+    candidates = []
+    for entry in os.listdir(base_path):
+        path = os.path.join(base_path, entry)
+        if entry not in keep and os.path.isdir(path):
+            candidates.append((os.path.getmtime(path), path))
+    candidates.sort(reverse=True)
+    for _, path in candidates[keep_previous:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class IndexSnapshot:
+    """Snapshot mapeado em memória com busca por similaridade e MMR."""
+
+    def __init__(self, directory: str):
+        """
+        Mapeia um snapshot exportado.
+
+        Args:
+            directory: Diretório do snapshot (contém manifest.json)
+        """
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+        self.corpus_version = manifest['corpus_version']
+        self.count = manifest['count']
+        self.dimension = manifest['dimension']
+
+        self.embeddings = np.load(os.path.join(directory, 'embeddings.npy'), mmap_mode='r')
+        self.squared_norms = np.load(os.path.join(directory, 'squared_norms.npy'), mmap_mode='r')
+        self._text_offsets = np.load(os.path.join(directory, 'text_offsets.npy'), mmap_mode='r')
+        self._metadata_offsets = np.load(os.path.join(directory, 'metadata_offsets.npy'), mmap_mode='r')
+        self._texts = self._map(os.path.join(directory, 'texts.bin'))
+        self._metadata = self._map(os.path.join(directory, 'metadata.bin'))
+
+    @staticmethod
+    def _map(path: str):
+        """Mapeia um blob somente leitura (mmap não aceita arquivos vazios)."""
+        if os.path.getsize(path) == 0:
+            return b''
+        with open(path, 'rb') as blob_file:
+            return mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def warm(self):
+        """Lê todas as páginas do snapshot (para carregá-las no processo mestre antes do fork)."""
+        if self.count:
+            float(np.sum(self.embeddings, dtype=np.float64))
+            float(np.sum(self.squared_norms))
+
+    def metadata(self, index: int) -> dict:
+        """Metadados do chunk na posição informada."""
+        start, end = int(self._metadata_offsets[index]), int(self._metadata_offsets[index + 1])
+        return json.loads(self._metadata[start:end].decode('utf-8'))
+
+    def document(self, index: int) -> Document:
+        """Chunk na posição informada como Document do LangChain."""
+        start, end = int(self._text_offsets[index]), int(self._text_offsets[index + 1])
+        return Document(page_content=self._texts[start:end].decode('utf-8'), metadata=self.metadata(index))
+
+    def iter_metadatas(self):
+        """Percorre os metadados de todos os chunks."""
+        for index in range(self.count):
+            yield self.metadata(index)
+
+    def _nearest(self, embedding, k: int) -> np.ndarray:
+        """Posições dos k chunks mais próximos (distância L2, como o Chroma)."""
+        if not self.count or k <= 0:
+            return np.empty(0, dtype=np.int64)
+        query = np.asarray(embedding, dtype=np.float32)
+        # ||x - q||² = ||x||² - 2 x·q + ||q||² (o último termo não altera a ordem)
+        distances = self.squared_norms - 2.0 * (self.embeddings @ query)
+        k = min(k, self.count)
+        nearest = np.argpartition(distances, k - 1)[:k]
+        return nearest[np.argsort(distances[nearest], kind='stable')]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4) -> List[Document]:
+        """Retorna os k chunks mais próximos do embedding."""
+        return [self.document(int(i)) for i in self._nearest(embedding, k)]
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5) -> List[Document]:
+        """Retorna k chunks escolhidos por MMR entre os fetch_k mais próximos."""
+        from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+        candidates = self._nearest(embedding, fetch_k)
+        if not len(candidates):
+            return []
+        selected = set(maximal_marginal_relevance(
+            np.asarray(embedding, dtype=np.float32),
+            np.asarray(self.embeddings[candidates]),
+            k=k,
+            lambda_mult=lambda_mult
+        ))
+        # Mesma ordem do Chroma: candidatos por distância, filtrados pelo MMR
+        return [self.document(int(index)) for position, index in enumerate(candidates) if position in selected]
+
+
+def load_current_snapshot(base_path: str) -> Optional[IndexSnapshot]:
+    """
+    Mapeia o snapshot publicado.
+
+    Args:
+        base_path: Diretório base dos snapshots
+
+    Returns:
+        IndexSnapshot ou None se não houver snapshot publicado
+    """
+    try:
+        with open(os.path.join(base_path, CURRENT_FILE), 'r', encoding='utf-8') as current_file:
+            name = json.load(current_file)['name']
+        return IndexSnapshot(os.path.join(base_path, name))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.error("Erro ao carregar snapshot do índice: %s", e)
+        return None
+
+
+class SnapshotRetriever(BaseRetriever):
+    """Retriever do LangChain sobre um IndexSnapshot (mesmos search_type/search_kwargs do Chroma)."""
+
+    snapshot: Any
+    embeddings: Any
+    search_type: str = 'similarity'
+    search_kwargs: dict = {}
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        embedding = self.embeddings.embed_query(query)
+        if self.search_type == 'mmr':
+            return self.snapshot.max_marginal_relevance_search_by_vector(
+                embedding,
+                k=self.search_kwargs.get('k', 4),
+                fetch_k=self.search_kwargs.get('fetch_k', 20),
+                lambda_mult=self.search_kwargs.get('lambda_mult', 0.5)
+            )
+        return self.snapshot.similarity_search_by_vector(embedding, k=self.search_kwargs.get('k', 4))
+
+
+if __name__ == '__main__':
+    from document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    path = processor.export_index_snapshot()
+    print(f"Snapshot exportado: {path}" if path else "Nenhum snapshot exportado")
@@ -0,0 +1,117 @@
+"""
+Importação sob demanda dos SDKs pesados.
+
+Importar a API carregava os SDKs de todos os provedores de LLM (OpenAI,
+Anthropic, Google) e o ChromaDB, mesmo os que não são usados: segundos a mais
+na inicialização de cada processo e memória ocupada à toa. Os módulos
+declarados com lazy_module() só são importados no primeiro acesso a um
+atributo; import_module() importa na hora, medindo o tempo.
+
+O tempo de cada importação feita por aqui fica registrado e aparece em
+`imports` no /api/stats (quando ocorreu e quanto custou), junto com o tempo de
+importação da API. O relatório completo por módulo é gerado por
+`python -m benchmarks.bench_startup`.
+"""
+
+import importlib
+import logging
+import sys
+import threading
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Módulos pesados acompanhados no relatório (importados ou não neste processo)
+HEAVY_MODULES = (
+    'langchain_openai', 'openai', 'langchain_anthropic', 'anthropic',
+    'langchain_google_genai', 'google.generativeai', 'chromadb'
+)
+
+_lock = threading.RLock()
+# Módulo -> {'seconds': duração da importação, 'at': momento (time.time())}
+_loads: Dict[str, dict] = {}
+# Tempo de importação da API (registrado pelo api.py)
+_startup: Dict[str, float] = {}
+
+
+def import_module(name: str):
+    """
+    Importa um módulo e registra quanto tempo a importação levou.
+
+    Args:
+        name: Nome completo do módulo (ex: 'langchain_openai')
+
+    Returns:
+        O módulo importado
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        started_at = time.perf_counter()
+        module = importlib.import_module(name)
+        seconds = time.perf_counter() - started_at
+        _loads[name] = {'seconds': round(seconds, 4), 'at': time.time()}
+    logger.info("Módulo %s importado sob demanda em %.2fs", name, seconds)
+    return module
+
+
+class LazyModule:
+    """Módulo importado no primeiro acesso a um atributo."""
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Nome completo do módulo
+        """
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        """Se o módulo já foi importado."""
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self) -> str:
+        state = 'importado' if self.loaded else 'não importado'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    """Declara um módulo a ser importado só no primeiro uso."""
+    return LazyModule(name)
+
+
+def record_startup(name: str, seconds: float):
+    """Registra o tempo de importação de um componente (ex: 'api')."""
+    with _lock:
+        _startup[name] = round(seconds, 4)
+
+
+def stats() -> dict:
+    """
+    Importações sob demanda e tempo de inicialização.
+
+    Returns:
+        Dicionário com 'startup' (segundos por componente), 'lazy_loads'
+        (segundos e momento de cada importação sob demanda) e 'loaded' (quais
+        dos HEAVY_MODULES já foram importados)
+    """
+    with _lock:
+        return {
+            'startup': dict(_startup),
+            'lazy_loads': {name: dict(load) for name, load in _loads.items()},
+            'loaded': {name: name in sys.modules for name in HEAVY_MODULES}
+        }
@@ -2,34 +2,113 @@
 Factory para criar instâncias de provedores de LLM.
 """
 
-from config import LLM_PROVIDER, LLM_CONFIG
-from .openai_provider import OpenAIProvider
-from .claude_provider import ClaudeProvider
-from .gemini_provider import GeminiProvider
+from config import (
+    LLM_PROVIDER, LLM_CONFIG, LLM_ROUTER_PROVIDERS, LLM_ROUTER_TIMEOUT_SECONDS,
+    LLM_ROUTER_HEDGE_ENABLED, LLM_ROUTER_HEDGE_MIN_SECONDS, LLM_REPLAY_MODE, LLM_REPLAY_PATH
+)
+from lazy_imports import import_module
+from .router_provider import RouterProvider
+from .record_replay_provider import RecordReplayProvider
 
+# Provedor -> (módulo, classe). Cada módulo importa o SDK do seu provedor
+# (langchain_openai, langchain_anthropic, langchain_google_genai), por isso só
+# é importado quando o provedor é criado
+PROVIDER_CLASSES = {
+    'openai': ('llm_providers.openai_provider', 'OpenAIProvider'),
+    'claude': ('llm_providers.claude_provider', 'ClaudeProvider'),
+    'gemini': ('llm_providers.gemini_provider', 'GeminiProvider')
+}
 
-def get_llm_provider():
+
+def get_provider_class(provider_name: str):
     """
-    Factory function para criar o provedor de LLM configurado.
+    Importa e retorna a classe do provedor.
     
+    Args:
+        provider_name: 'openai', 'claude' ou 'gemini'
+        
     Returns:
-        Instância do provedor de LLM configurado
+        Classe do provedor (subclasse de BaseLLMProvider)
+        
+    Raises:
+        ValueError: Se o provedor não for suportado
+    """
+    if provider_name not in PROVIDER_CLASSES:
+        raise ValueError(f"Provedor '{provider_name}' não implementado")
+    module_name, class_name = PROVIDER_CLASSES[provider_name]
+    return getattr(import_module(module_name), class_name)
+
+
+def __getattr__(name: str):
+    """Mantém `from llm_providers import OpenAIProvider` (importação sob demanda)."""
+    for provider_name, (_, class_name) in PROVIDER_CLASSES.items():
+        if name == class_name:
+            return get_provider_class(provider_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_provider(provider_name: str, overrides: dict = None):
+    """
+    Cria um provedor de LLM pelo nome.
+    
+    Com LLM_REPLAY_MODE definido, o provedor é envolvido pela gravação e
+    reprodução das respostas (também os provedores do roteador e do modo
+    degradado).
+    
+    Args:
+        provider_name: 'openai', 'claude' ou 'gemini'
+        overrides: Configurações que substituem as de LLM_CONFIG (ex: outro
+            modelo ou max_tokens)
+        
+    Returns:
+        Instância do provedor de LLM
         
     Raises:
         ValueError: Se o provedor não for suportado
     """
-    provider_name = LLM_PROVIDER.lower()
+    provider_name = provider_name.lower()
     config = LLM_CONFIG.get(provider_name)
     
     if not config:
         raise ValueError(f"Provedor '{provider_name}' não suportado. Use: 'openai', 'claude' ou 'gemini'")
+    if overrides:
+        config = {**config, **overrides}
     
-    if provider_name == 'openai':
-        return OpenAIProvider(config)
-    elif provider_name == 'claude':
-        return ClaudeProvider(config)
-    elif provider_name == 'gemini':
-        return GeminiProvider(config)
-    else:
-        raise ValueError(f"Provedor '{provider_name}' não implementado")
+    if LLM_REPLAY_MODE:
+        return RecordReplayProvider({
+            'provider': provider_name,
+            'provider_config': config,
+            'factory': lambda: _build_provider(provider_name, config),
+            'mode': LLM_REPLAY_MODE,
+            'path': LLM_REPLAY_PATH
+        })
+    return _build_provider(provider_name, config)
+
+
+def _build_provider(provider_name: str, config: dict):
+    """Instancia o provedor real com a configuração já resolvida."""
+    return get_provider_class(provider_name)(config)
 
+
+def get_llm_provider():
+    """
+    Factory function para criar o provedor de LLM configurado.
+    
+    Com LLM_ROUTER_PROVIDERS definido, retorna o roteador entre esses
+    provedores (failover e requisições de reserva); caso contrário, o
+    provedor de LLM_PROVIDER.
+    
+    Returns:
+        Instância do provedor de LLM configurado
+        
+    Raises:
+        ValueError: Se o provedor não for suportado
+    """
+    if LLM_ROUTER_PROVIDERS:
+        return RouterProvider({
+            'providers': LLM_ROUTER_PROVIDERS,
+            'timeout_seconds': LLM_ROUTER_TIMEOUT_SECONDS,
+            'hedge_enabled': LLM_ROUTER_HEDGE_ENABLED,
+            'hedge_min_seconds': LLM_ROUTER_HEDGE_MIN_SECONDS
+        })
+    return create_provider(LLM_PROVIDER)
@@ -3,52 +3,21 @@ Classe base abstrata para provedores de LLM.
 Todas as implementações de modelos devem herdar desta classe.
 """
 
+import hashlib
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from langchain_community.vectorstores import Chroma
 from langchain.chains.combine_documents.stuff import StuffDocumentsChain
 from langchain.chains.llm import LLMChain
+from usage import UsageCallback
 
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
 
-class BaseLLMProvider(ABC):
-    """Classe base para provedores de LLM."""
-    
-    def __init__(self, config: Dict[str, Any]):
-        """
-        Inicializa o provedor de LLM.
-        
-        Args:
-            config: Dicionário com configurações do modelo
-        """
-        self.config = config
-        self.llm = None
-        self._initialize_llm()
-    
-    @abstractmethod
-    def _initialize_llm(self):
-        """Inicializa o modelo LLM específico."""
-        pass
-    
-    @abstractmethod
-    def get_llm(self):
-        """Retorna a instância do modelo LLM."""
-        pass
-    
-    def get_qa_chain(self, vectorstore: Chroma) -> RetrievalQA:
-        """
-        Cria uma cadeia de Q&A usando o modelo LLM e o vectorstore.
-        
-        Args:
-            vectorstore: Instância do ChromaDB vectorstore
-            
-        Returns:
-            RetrievalQA chain configurada
-        """
-        llm = self.get_llm()
-        
-        custom_prompt_template = """{context}
+
+# Prompt usado pela cadeia de Q&A
+QA_PROMPT_TEMPLATE = """{context}
 
 Responda à pergunta com base APENAS no contexto fornecido abaixo.
 Sempre responda em português.
@@ -305,25 +274,91 @@ Pergunta: {question}
 
 Resposta:"""
 
+# Versão do prompt: muda automaticamente sempre que o texto do prompt muda
+# (usada, por exemplo, na chave do cache de respostas)
+PROMPT_VERSION = hashlib.sha256(QA_PROMPT_TEMPLATE.encode('utf-8')).hexdigest()[:12]
+
+
+def get_search_settings() -> tuple:
+    """
+    Retorna o tipo de busca e os parâmetros do retriever definidos na configuração.
+    
+    Returns:
+        Tupla (search_type, search_kwargs)
+    """
+    from config import SEARCH_TYPE, SEARCH_K, SEARCH_FETCH_K, SEARCH_LAMBDA_MULT
+    
+    search_kwargs = {"k": SEARCH_K}
+    if SEARCH_TYPE == "mmr":
+        search_kwargs.update({
+            "fetch_k": SEARCH_FETCH_K,
+            "lambda_mult": SEARCH_LAMBDA_MULT
+        })
+    return SEARCH_TYPE, search_kwargs
+
+
+class BaseLLMProvider(ABC):
+    """Classe base para provedores de LLM."""
+    
+    # Nome do provedor na contabilização de tokens e custos
+    provider_name = ''
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Inicializa o provedor de LLM.
+        
+        Args:
+            config: Dicionário com configurações do modelo
+        """
+        self.config = config
+        self.llm = None
+        self._initialize_llm()
+        self._attach_usage_callback()
+    
+    def _attach_usage_callback(self):
+        """Registra os tokens (e o custo) de cada chamada ao modelo no coletor de uso."""
+        llm = self.get_llm()
+        if llm is not None:
+            llm.callbacks = list(llm.callbacks or []) + [
+                UsageCallback(self.provider_name, self.config.get('model', ''))
+            ]
+    
+    @abstractmethod
+    def _initialize_llm(self):
+        """Inicializa o modelo LLM específico."""
+        pass
+    
+    @abstractmethod
+    def get_llm(self):
+        """Retorna a instância do modelo LLM."""
+        pass
+    
+    def get_qa_chain(self, vectorstore: Optional['Chroma'] = None, retriever=None) -> RetrievalQA:
+        """
+        Cria uma cadeia de Q&A usando o modelo LLM e o vectorstore.
+        
+        Args:
+            vectorstore: Instância do ChromaDB vectorstore
+            retriever: Retriever já configurado (ex: snapshot do índice em
+                memória); se informado, o vectorstore não é usado
+            
+        Returns:
+            RetrievalQA chain configurada
+        """
+        llm = self.get_llm()
+        
         QA_PROMPT = PromptTemplate(
-            template=custom_prompt_template,
+            template=QA_PROMPT_TEMPLATE,
             input_variables=["context", "question"]
         )
         
-        from config import SEARCH_TYPE, SEARCH_K, SEARCH_FETCH_K, SEARCH_LAMBDA_MULT
-        
-        search_kwargs = {"k": SEARCH_K}
-        if SEARCH_TYPE == "mmr":
-            search_kwargs.update({
-                "fetch_k": SEARCH_FETCH_K,
-                "lambda_mult": SEARCH_LAMBDA_MULT
-            })
-        
         # Criar retriever
-        retriever = vectorstore.as_retriever(
-            search_type=SEARCH_TYPE,
-            search_kwargs=search_kwargs
-        )
+        if retriever is None:
+            search_type, search_kwargs = get_search_settings()
+            retriever = vectorstore.as_retriever(
+                search_type=search_type,
+                search_kwargs=search_kwargs
+            )
         
         # Criar LLM chain
         llm_chain = LLMChain(llm=llm, prompt=QA_PROMPT)
@@ -9,6 +9,8 @@ from .base import BaseLLMProvider
 class ClaudeProvider(BaseLLMProvider):
     """Provedor de LLM usando Anthropic Claude."""
     
+    provider_name = 'claude'
+    
     def _initialize_llm(self):
         """Inicializa o modelo Claude."""
         api_key = self.config.get('api_key')
@@ -24,7 +26,9 @@ class ClaudeProvider(BaseLLMProvider):
         self.llm = ChatAnthropic(
             model=self.config['model'],
             temperature=self.config['temperature'],
-            max_tokens=self.config.get('max_tokens', 2048)
+            max_tokens=self.config.get('max_tokens', 2048),
+            default_request_timeout=self.config.get('timeout'),
+            streaming=self.config.get('streaming', False)
         )
     
     def get_llm(self):
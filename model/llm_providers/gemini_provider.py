@@ -9,6 +9,8 @@ from .base import BaseLLMProvider
 class GeminiProvider(BaseLLMProvider):
     """Provedor de LLM usando Google Gemini."""
     
+    provider_name = 'gemini'
+    
     def _initialize_llm(self):
         """Inicializa o modelo Gemini."""
         if not self.config.get('api_key'):
@@ -17,6 +19,7 @@ class GeminiProvider(BaseLLMProvider):
         self.llm = ChatGoogleGenerativeAI(
             model=self.config['model'],
             temperature=self.config['temperature'],
+            timeout=self.config.get('timeout'),
             google_api_key=self.config['api_key']
         )
     
@@ -9,6 +9,8 @@ from .base import BaseLLMProvider
 class OpenAIProvider(BaseLLMProvider):
     """Provedor de LLM usando OpenAI."""
     
+    provider_name = 'openai'
+    
     def _initialize_llm(self):
         """Inicializa o modelo OpenAI."""
         if not self.config.get('api_key'):
@@ -18,6 +20,10 @@ class OpenAIProvider(BaseLLMProvider):
             model=self.config['model'],
             temperature=self.config['temperature'],
             max_tokens=self.config.get('max_tokens', 2048),
+            timeout=self.config.get('timeout'),
+            streaming=self.config.get('streaming', False),
+            # Uso de tokens também nas respostas em streaming
+            stream_usage=True,
             openai_api_key=self.config['api_key']
         )
     
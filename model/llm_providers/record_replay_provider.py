@@ -0,0 +1,242 @@
+"""
+Gravação e reprodução das chamadas ao LLM.
+
+Envolve o modelo de um provedor e guarda cada resposta numa pasta local, com
+a chave (hash SHA-256) formada pelo provedor, pelos parâmetros que alteram a
+resposta (modelo, temperature, max_tokens...) e pelo prompt completo. Com as
+respostas gravadas, a cadeia inteira (busca, prompt, conversão para HTML)
+pode ser testada e medida sem custo de API e com o mesmo resultado em todas
+as execuções.
+
+Modos (LLM_REPLAY_MODE):
+- record: sempre chama o provedor e grava (substitui) a resposta;
+- replay: usa a resposta gravada; sem ela, chama o provedor e grava;
+- strict: só usa respostas gravadas; sem ela, a chamada falha com
+  LLMReplayMiss (o provedor real nem é criado, não precisa de chave de API).
+
+Cada resposta fica em <LLM_REPLAY_PATH>/<chave>.json (texto, metadados e o
+prompt, para inspeção), gravado de forma atômica; vários workers podem
+compartilhar a pasta.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from .base import BaseLLMProvider
+
+logger = logging.getLogger(__name__)
+
+REPLAY_MODES = ('record', 'replay', 'strict')
+# Configurações do provedor que não alteram a resposta (fora da chave)
+_IGNORED_PARAMS = ('api_key', 'timeout', 'streaming')
+
+
+class LLMReplayMiss(LookupError):
+    """Chamada sem resposta gravada no modo strict."""
+
+
+class ReplayStore:
+    """Respostas gravadas numa pasta (um arquivo JSON por chave)."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Pasta das respostas gravadas
+        """
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.json')
+
+    def get(self, key: str) -> Optional[dict]:
+        """Resposta gravada para a chave, ou None."""
+        try:
+            with open(self._file(key), 'r', encoding='utf-8') as record_file:
+                record = json.load(record_file)
+        except FileNotFoundError:
+            record = None
+        except (OSError, ValueError) as e:
+            logger.warning("Resposta gravada ilegível (%s): %s", key, e)
+            record = None
+        with self._lock:
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return record
+
+    def put(self, key: str, record: dict):
+        """Grava (ou substitui) a resposta da chave."""
+        os.makedirs(self.path, exist_ok=True)
+        temp_path = f'{self._file(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as record_file:
+            json.dump(record, record_file, ensure_ascii=False, indent=2, default=str)
+        os.replace(temp_path, self._file(key))
+        with self._lock:
+            self.recorded += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'path': self.path, 'hits': self.hits, 'misses': self.misses, 'recorded': self.recorded}
+
+
+# Uma pasta por processo, compartilhada pelos provedores (ex: roteador e modo degradado)
+_stores: Dict[str, ReplayStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str) -> ReplayStore:
+    """Store da pasta informada (uma instância por pasta)."""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ReplayStore(path)
+        return _stores[path]
+
+
+def replay_stats() -> dict:
+    """Acertos, faltas e gravações de cada pasta de respostas usada pelo processo."""
+    from config import LLM_REPLAY_MODE
+
+    if not LLM_REPLAY_MODE:
+        return {'enabled': False}
+    with _stores_lock:
+        stores = list(_stores.values())
+    return {'enabled': True, 'mode': LLM_REPLAY_MODE, 'stores': [store.stats() for store in stores]}
+
+
+def _message_payload(message) -> dict:
+    return {'type': message.type, 'content': message.content}
+
+
+def replay_key(provider: str, params: dict, messages: List[Any], stop: Optional[List[str]] = None) -> str:
+    """Chave da chamada: provedor, parâmetros e prompt completo."""
+    payload = {
+        'provider': provider,
+        'params': params,
+        'messages': [_message_payload(message) for message in messages],
+        'stop': stop or None
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class RecordReplayChatModel(BaseChatModel):
+    """Chat model do LangChain que grava e reproduz as respostas de outro modelo."""
+
+    provider: str
+    params: dict
+    mode: str = 'replay'
+    store: Any
+    # Cria o modelo real no primeiro uso (no modo strict, nunca)
+    backend_factory: Callable[[], BaseChatModel]
+    # Repassa a resposta reproduzida como um token (mede llm_first_token com LLM_STREAMING)
+    streaming: bool = False
+    backend: Optional[Any] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return 'record-replay'
+
+    def _get_backend(self) -> BaseChatModel:
+        with _stores_lock:
+            if self.backend is None:
+                self.backend = self.backend_factory()
+            return self.backend
+
+    def _lookup(self, messages, stop) -> tuple:
+        key = replay_key(self.provider, self.params, messages, stop)
+        if self.mode == 'record':
+            return key, None
+        record = self.store.get(key)
+        if record is None and self.mode == 'strict':
+            raise LLMReplayMiss(f"Resposta não gravada para esta chamada ({self.provider}, chave {key})")
+        return key, record
+
+    def _replayed(self, key: str, record: dict, run_manager) -> ChatResult:
+        if run_manager and self.streaming:
+            run_manager.on_llm_new_token(record['content'] if isinstance(record['content'], str) else '')
+        response_metadata = dict(record.get('response_metadata') or {}, replay_key=key, replayed=True)
+        message = AIMessage(content=record['content'], response_metadata=response_metadata)
+        return ChatResult(generations=[ChatGeneration(message=message)],
+                          llm_output={'replay': {'key': key, 'replayed': True}})
+
+    def _record(self, key: str, messages, result) -> ChatResult:
+        generation = result.generations[0][0]
+        message = generation.message
+        self.store.put(key, {
+            'key': key,
+            'provider': self.provider,
+            'params': self.params,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'content': message.content,
+            'response_metadata': message.response_metadata,
+            'usage_metadata': message.usage_metadata,
+            'messages': [_message_payload(item) for item in messages]
+        })
+        llm_output = dict(result.llm_output or {})
+        llm_output['replay'] = {'key': key, 'replayed': False}
+        return ChatResult(generations=[generation], llm_output=llm_output)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key, record = self._lookup(messages, stop)
+        if record is not None:
+            return self._replayed(key, record, run_manager)
+        result = self._get_backend().generate([messages], stop=stop, **kwargs)
+        return self._record(key, messages, result)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key, record = self._lookup(messages, stop)
+        if record is not None:
+            if run_manager and self.streaming:
+                await run_manager.on_llm_new_token(record['content'] if isinstance(record['content'], str) else '')
+            return self._replayed(key, record, None)
+        result = await self._get_backend().agenerate([messages], stop=stop, **kwargs)
+        return self._record(key, messages, result)
+
+
+class RecordReplayProvider(BaseLLMProvider):
+    """Provedor que grava e reproduz as respostas de outro provedor (LLM_REPLAY_MODE)."""
+
+    provider_name = 'replay'
+
+    def _initialize_llm(self):
+        """
+        Configura o modelo de gravação e reprodução.
+
+        Raises:
+            ValueError: Se o modo não for 'record', 'replay' ou 'strict'
+        """
+        mode = self.config['mode']
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"LLM_REPLAY_MODE inválido: '{mode}'. Use: {', '.join(REPLAY_MODES)}")
+        provider_config = self.config['provider_config']
+        factory = self.config['factory']
+        self.llm = RecordReplayChatModel(
+            provider=self.config['provider'],
+            params={key: value for key, value in provider_config.items() if key not in _IGNORED_PARAMS},
+            mode=mode,
+            store=get_store(self.config['path']),
+            backend_factory=lambda: factory().get_llm(),
+            streaming=provider_config.get('streaming', False)
+        )
+
+    def get_llm(self):
+        """Retorna o modelo de gravação e reprodução."""
+        return self.llm
+
+    def _attach_usage_callback(self):
+        """Os tokens das chamadas reais são registrados pelo modelo do provedor; as reproduzidas não têm custo."""
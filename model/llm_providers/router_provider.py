@@ -0,0 +1,408 @@
+"""
+Provedor de LLM que distribui as chamadas entre vários provedores configurados.
+
+Mantém, para cada provedor, uma janela com as latências e os erros recentes e
+escolhe o mais rápido e saudável (preferindo a ordem configurada quando a
+diferença é pequena). Se o provedor escolhido falhar ou passar do tempo
+limite, a chamada segue para o próximo (failover). Opcionalmente, quando o
+primeiro provedor passa do seu p95 de latência sem responder, uma requisição
+de reserva (hedge) é enviada ao segundo e vale a primeira resposta, o que
+mantém a latência de cauda limitada quando um fornecedor degrada.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+
+import profiling
+from .base import BaseLLMProvider
+
+logger = logging.getLogger(__name__)
+
+
+class BackendHealth:
+    """Latências e erros recentes de um provedor (janela móvel) e o disjuntor de falhas."""
+
+    def __init__(self, window_size: int = 100, failure_threshold: int = 3, cooldown_seconds: float = 30.0):
+        """
+        Args:
+            window_size: Número de chamadas recentes consideradas
+            failure_threshold: Falhas seguidas que tiram o provedor do rodízio
+            cooldown_seconds: Tempo fora do rodízio após as falhas seguidas
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        # (latência em segundos, sucesso)
+        self._samples: deque = deque(maxlen=window_size)
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    def record(self, latency: float, ok: bool, timed_out: bool = False):
+        """Registra o resultado de uma chamada."""
+        with self._lock:
+            self._samples.append((latency, ok))
+            self.calls += 1
+            if ok:
+                self._consecutive_failures = 0
+                return
+            self.errors += 1
+            if timed_out:
+                self.timeouts += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown_seconds
+
+    def available(self) -> bool:
+        """False enquanto o provedor estiver fora do rodízio por falhas seguidas."""
+        return time.monotonic() >= self._open_until
+
+    def sample_count(self) -> int:
+        return len(self._samples)
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Percentil de latência das chamadas bem-sucedidas recentes (None sem amostras)."""
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def score(self, timeout_seconds: float) -> float:
+        """Custo esperado de uma chamada: p95 penalizado pela taxa de erros."""
+        p95 = self.latency_percentile(0.95)
+        if p95 is None:
+            # Só erros na janela: custo do tempo limite
+            p95 = timeout_seconds if self._samples else 0.0
+        return p95 * (1.0 + 4.0 * self.error_rate())
+
+
+class RouterBackend:
+    """Provedor configurado no roteador: nome, modelo e saúde."""
+
+    def __init__(self, name: str, llm: BaseChatModel, health: BackendHealth):
+        self.name = name
+        self.llm = llm
+        self.health = health
+        self.selected = 0
+        self.hedges = 0
+        self.answered = 0
+
+
+class _Attempt:
+    """Uma chamada a um provedor; o resultado é registrado uma única vez."""
+
+    __slots__ = ('backend', 'started_at', 'hedge', '_settled', '_lock')
+
+    def __init__(self, backend: RouterBackend, hedge: bool = False):
+        self.backend = backend
+        self.started_at = time.monotonic()
+        self.hedge = hedge
+        self._settled = False
+        self._lock = threading.Lock()
+
+    def settle(self, ok: bool, timed_out: bool = False):
+        with self._lock:
+            if self._settled:
+                return
+            self._settled = True
+        self.backend.health.record(time.monotonic() - self.started_at, ok, timed_out)
+
+
+class LLMRouterTimeout(TimeoutError):
+    """O provedor não respondeu dentro do tempo limite."""
+
+
+# Threads das chamadas síncronas (uma por provedor em andamento); criado no primeiro uso
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix='llm-router')
+        return _executor
+
+
+class RoutingChatModel(BaseChatModel):
+    """Chat model do LangChain que encaminha cada chamada a um dos provedores."""
+
+    backends: List[Any]
+    timeout_seconds: float = 60.0
+    hedge_enabled: bool = False
+    hedge_min_seconds: float = 5.0
+    # Diferença de custo tolerada para manter a ordem configurada
+    latency_tolerance: float = 0.25
+    # Amostras mínimas antes de usar o p95 como prazo da requisição de reserva
+    # (antes disso o prazo é hedge_min_seconds)
+    min_samples: int = 5
+
+    @property
+    def _llm_type(self) -> str:
+        return 'router'
+
+    def route(self) -> List[RouterBackend]:
+        """
+        Ordena os provedores para uma chamada.
+
+        O primeiro provedor (na ordem configurada) com custo até
+        latency_tolerance acima do menor custo é o escolhido; os demais seguem
+        por custo. Provedores fora do rodízio ficam no fim, como último recurso.
+        """
+        available = [b for b in self.backends if b.health.available()]
+        unavailable = [b for b in self.backends if not b.health.available()]
+        if not available:
+            return unavailable
+
+        scores = {id(b): b.health.score(self.timeout_seconds) for b in available}
+        best = min(scores.values())
+        preferred = next(b for b in available if scores[id(b)] <= best * (1.0 + self.latency_tolerance))
+        others = sorted((b for b in available if b is not preferred), key=lambda b: scores[id(b)])
+        return [preferred] + others + unavailable
+
+    def _hedge_delay(self, backend: RouterBackend) -> Optional[float]:
+        """Tempo sem resposta após o qual a requisição de reserva é enviada."""
+        if not self.hedge_enabled:
+            return None
+        p95 = backend.health.latency_percentile(0.95)
+        if p95 is None or backend.health.sample_count() < self.min_samples:
+            return self.hedge_min_seconds
+        return max(self.hedge_min_seconds, p95)
+
+    @staticmethod
+    def _chat_result(result, attempt: _Attempt, attempts: int) -> ChatResult:
+        """Converte o LLMResult do provedor e identifica quem respondeu."""
+        attempt.backend.answered += 1
+        generations = result.generations[0]
+        for generation in generations:
+            generation.message.response_metadata['router_backend'] = attempt.backend.name
+        llm_output = dict(result.llm_output or {})
+        llm_output['router'] = {'backend': attempt.backend.name, 'hedge': attempt.hedge, 'attempts': attempts}
+        return ChatResult(generations=generations, llm_output=llm_output)
+
+    def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
+        return next((output for output in llm_outputs if output), {})
+
+    def _call_backend(self, attempt: _Attempt, messages, stop, kwargs):
+        try:
+            result = attempt.backend.llm.generate([messages], stop=stop, **kwargs)
+        except BaseException:
+            attempt.settle(False)
+            raise
+        attempt.settle(True)
+        return result
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        remaining = self.route()
+        executor = _get_executor()
+        pending: Dict[Any, _Attempt] = {}
+        last_error: Optional[BaseException] = None
+        launched = 0
+        hedged = False
+
+        def launch(hedge: bool = False):
+            nonlocal launched
+            backend = remaining.pop(0)
+            backend.selected += 1
+            if hedge:
+                backend.hedges += 1
+            attempt = _Attempt(backend, hedge)
+            # A chamada roda no contexto da requisição (ex: coletor de uso de tokens)
+            context = contextvars.copy_context()
+            pending[executor.submit(context.run, profiling.bind(self._call_backend), attempt, messages, stop, kwargs)] = attempt
+            launched += 1
+
+        launch()
+        while pending:
+            now = time.monotonic()
+            deadlines = [attempt.started_at + self.timeout_seconds for attempt in pending.values()]
+            hedge_at = None
+            if not hedged and remaining and len(pending) == 1:
+                delay = self._hedge_delay(next(iter(pending.values())).backend)
+                if delay is not None:
+                    hedge_at = next(iter(pending.values())).started_at + delay
+                    deadlines.append(hedge_at)
+
+            done, _ = wait(list(pending), timeout=max(0.0, min(deadlines) - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt = pending.pop(future)
+                try:
+                    return self._chat_result(future.result(), attempt, launched)
+                except Exception as e:
+                    logger.warning("Erro no provedor %s: %s", attempt.backend.name, e)
+                    last_error = e
+
+            now = time.monotonic()
+            for future, attempt in list(pending.items()):
+                if now >= attempt.started_at + self.timeout_seconds:
+                    # A thread continua até o provedor responder; o resultado é descartado
+                    attempt.settle(False, timed_out=True)
+                    del pending[future]
+                    last_error = LLMRouterTimeout(
+                        f"Provedor {attempt.backend.name} não respondeu em {self.timeout_seconds:.0f}s"
+                    )
+            if hedge_at is not None and pending and now >= hedge_at:
+                hedged = True
+                launch(hedge=True)
+            if not pending and remaining:
+                launch()
+
+        raise last_error
+
+    async def _acall_backend(self, attempt: _Attempt, messages, stop, kwargs):
+        try:
+            result = await attempt.backend.llm.agenerate([messages], stop=stop, **kwargs)
+        except asyncio.CancelledError:
+            # Perdeu para outro provedor ou o cliente desistiu: não conta como erro
+            raise
+        except BaseException:
+            attempt.settle(False)
+            raise
+        attempt.settle(True)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        remaining = self.route()
+        pending: Dict[asyncio.Task, _Attempt] = {}
+        last_error: Optional[BaseException] = None
+        launched = 0
+        hedged = False
+
+        def launch(hedge: bool = False):
+            nonlocal launched
+            backend = remaining.pop(0)
+            backend.selected += 1
+            if hedge:
+                backend.hedges += 1
+            attempt = _Attempt(backend, hedge)
+            pending[asyncio.ensure_future(self._acall_backend(attempt, messages, stop, kwargs))] = attempt
+            launched += 1
+
+        launch()
+        try:
+            while pending:
+                now = time.monotonic()
+                deadlines = [attempt.started_at + self.timeout_seconds for attempt in pending.values()]
+                hedge_at = None
+                if not hedged and remaining and len(pending) == 1:
+                    delay = self._hedge_delay(next(iter(pending.values())).backend)
+                    if delay is not None:
+                        hedge_at = next(iter(pending.values())).started_at + delay
+                        deadlines.append(hedge_at)
+
+                done, _ = await asyncio.wait(list(pending), timeout=max(0.0, min(deadlines) - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    attempt = pending.pop(task)
+                    try:
+                        return self._chat_result(task.result(), attempt, launched)
+                    except Exception as e:
+                        logger.warning("Erro no provedor %s: %s", attempt.backend.name, e)
+                        last_error = e
+
+                now = time.monotonic()
+                for task, attempt in list(pending.items()):
+                    if now >= attempt.started_at + self.timeout_seconds:
+                        attempt.settle(False, timed_out=True)
+                        task.cancel()
+                        del pending[task]
+                        last_error = LLMRouterTimeout(
+                            f"Provedor {attempt.backend.name} não respondeu em {self.timeout_seconds:.0f}s"
+                        )
+                if hedge_at is not None and pending and now >= hedge_at:
+                    hedged = True
+                    launch(hedge=True)
+                if not pending and remaining:
+                    launch()
+        finally:
+            # Chamadas que perderam (ou cancelamento da requisição) são canceladas
+            for task in pending:
+                task.cancel()
+
+        raise last_error
+
+    def stats(self) -> dict:
+        """Retorna latência, erros e uso de cada provedor."""
+        order = [backend.name for backend in self.route()]
+        stats = {}
+        for backend in self.backends:
+            health = backend.health
+            p50 = health.latency_percentile(0.5)
+            p95 = health.latency_percentile(0.95)
+            stats[backend.name] = {
+                'rank': order.index(backend.name) + 1,
+                'available': health.available(),
+                'calls': health.calls,
+                'errors': health.errors,
+                'timeouts': health.timeouts,
+                'error_rate': round(health.error_rate(), 4),
+                'latency_p50_seconds': round(p50, 3) if p50 is not None else None,
+                'latency_p95_seconds': round(p95, 3) if p95 is not None else None,
+                'selected': backend.selected,
+                'hedges': backend.hedges,
+                'answered': backend.answered
+            }
+        return stats
+
+
+class RouterProvider(BaseLLMProvider):
+    """Provedor de LLM que roteia entre vários provedores configurados."""
+
+    provider_name = 'router'
+
+    def _initialize_llm(self):
+        """Inicializa os provedores configurados e o modelo roteador."""
+        from . import create_provider
+
+        backends = []
+        for name in self.config['providers']:
+            try:
+                provider = create_provider(name)
+            except Exception as e:
+                # Provedor sem chave de API ou não instalado: o roteador segue com os demais
+                logger.warning("Provedor %s ignorado no roteamento: %s", name, e)
+                continue
+            backends.append(RouterBackend(
+                name,
+                provider.get_llm(),
+                BackendHealth(window_size=self.config.get('window_size', 100))
+            ))
+        if not backends:
+            raise ValueError(f"Nenhum provedor disponível para o roteamento: {', '.join(self.config['providers'])}")
+
+        self.llm = RoutingChatModel(
+            backends=backends,
+            timeout_seconds=self.config.get('timeout_seconds', 60.0),
+            hedge_enabled=self.config.get('hedge_enabled', False),
+            hedge_min_seconds=self.config.get('hedge_min_seconds', 5.0)
+        )
+
+    def get_llm(self):
+        """Retorna o modelo roteador."""
+        return self.llm
+
+    def _attach_usage_callback(self):
+        """Os tokens já são registrados pelo modelo de cada provedor do roteamento."""
+
+    def stats(self) -> dict:
+        """Retorna as estatísticas de cada provedor do roteamento."""
+        return self.llm.stats()
@@ -0,0 +1,131 @@
+"""
+Política de carga do IB - EstradaResponde: modo degradado sob sobrecarga.
+
+Quando a fila de espera pelo LLM ou o p95 de latência das respostas passa dos
+limites configurados, as novas perguntas passam a ser respondidas por um
+nível mais barato e rápido (outro modelo, menos trechos e contexto menor).
+A volta ao nível normal tem histerese: só acontece depois de um tempo mínimo
+no modo degradado e com a carga abaixo de uma fração dos limites, para não
+alternar a cada requisição.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TIER_NORMAL = 'normal'
+TIER_DEGRADED = 'degraded'
+
+
+class LoadPolicy:
+    """Decide o nível (normal ou degradado) de cada nova pergunta."""
+
+    def __init__(self, queue_depth_threshold: int = 8, p95_threshold_seconds: float = 30.0,
+                 recovery_ratio: float = 0.5, min_degraded_seconds: float = 30.0,
+                 window_seconds: float = 60.0):
+        """
+        Inicializa a política de carga.
+
+        Args:
+            queue_depth_threshold: Requisições na fila que ativam o modo degradado
+            p95_threshold_seconds: p95 de latência das respostas que ativa o modo degradado
+            recovery_ratio: Fração dos limites abaixo da qual o nível normal volta
+            min_degraded_seconds: Tempo mínimo no modo degradado
+            window_seconds: Janela das latências usadas no p95
+        """
+        self.queue_depth_threshold = queue_depth_threshold
+        self.p95_threshold_seconds = p95_threshold_seconds
+        self.recovery_ratio = recovery_ratio
+        self.min_degraded_seconds = min_degraded_seconds
+        self.window_seconds = window_seconds
+
+        self._lock = threading.Lock()
+        # (instante, latência) das respostas recentes
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=2048)
+        self._tier = TIER_NORMAL
+        self._changed_at = time.monotonic()
+        self._switches = 0
+        self._answers = {TIER_NORMAL: 0, TIER_DEGRADED: 0}
+
+    def record_latency(self, seconds: float):
+        """Registra o tempo de cálculo de uma resposta."""
+        with self._lock:
+            self._latencies.append((time.monotonic(), seconds))
+
+    def _p95(self, now: float) -> Optional[float]:
+        """p95 das latências dentro da janela (chamado com a trava)."""
+        while self._latencies and self._latencies[0][0] < now - self.window_seconds:
+            self._latencies.popleft()
+        if not self._latencies:
+            return None
+        latencies = sorted(latency for _, latency in self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def select_tier(self, queue_depth: int) -> str:
+        """
+        Retorna o nível da próxima pergunta, atualizando o estado.
+
+        Args:
+            queue_depth: Requisições esperando por uma vaga no LLM
+        """
+        with self._lock:
+            now = time.monotonic()
+            p95 = self._p95(now) or 0.0
+            if self._tier == TIER_NORMAL:
+                if queue_depth >= self.queue_depth_threshold or p95 >= self.p95_threshold_seconds:
+                    self._set_tier(TIER_DEGRADED, now, queue_depth, p95)
+            elif (now - self._changed_at >= self.min_degraded_seconds
+                  and queue_depth <= self.queue_depth_threshold * self.recovery_ratio
+                  and p95 <= self.p95_threshold_seconds * self.recovery_ratio):
+                self._set_tier(TIER_NORMAL, now, queue_depth, p95)
+            self._answers[self._tier] += 1
+            return self._tier
+
+    def _set_tier(self, tier: str, now: float, queue_depth: int, p95: float):
+        self._tier = tier
+        self._changed_at = now
+        self._switches += 1
+        logger.info("Política de carga: nível %s (fila: %s, p95: %.1fs)", tier, queue_depth, p95)
+
+    def stats(self) -> dict:
+        """Retorna o nível atual, as trocas e as medidas de carga."""
+        with self._lock:
+            now = time.monotonic()
+            p95 = self._p95(now)
+            return {
+                'tier': self._tier,
+                'tier_seconds': round(now - self._changed_at, 1),
+                'switches': self._switches,
+                'answers': dict(self._answers),
+                'latency_p95_seconds': round(p95, 3) if p95 is not None else None,
+                'queue_depth_threshold': self.queue_depth_threshold,
+                'p95_threshold_seconds': self.p95_threshold_seconds
+            }
+
+
+def apply_context_budget(documents: list, max_chars: int) -> list:
+    """
+    Limita o contexto enviado ao LLM a um número máximo de caracteres.
+
+    Os trechos são mantidos na ordem da busca até o orçamento acabar; o
+    primeiro trecho é sempre mantido.
+
+    Args:
+        documents: Trechos recuperados (Documents do LangChain)
+        max_chars: Orçamento de caracteres (0 = sem limite)
+    """
+    if max_chars <= 0:
+        return documents
+    selected = []
+    used = 0
+    for document in documents:
+        size = len(document.page_content)
+        if selected and used + size > max_chars:
+            break
+        selected.append(document)
+        used += size
+    return selected
@@ -0,0 +1,204 @@
+"""
+Logging estruturado do IB - EstradaResponde.
+
+Os módulos usam loggers do pacote padrão logging (logging.getLogger(__name__))
+e esta configuração decide o que é gravado e onde:
+
+- níveis: LOG_LEVEL para todos e LOG_LEVELS por módulo
+  (ex: "document_processor=DEBUG,chromadb=ERROR");
+- amostragem: só uma fração LOG_DEBUG_SAMPLE_RATE dos eventos DEBUG é
+  gravada (um evento pode pedir a sua própria taxa com extra={'sample_rate': x});
+- formato: texto ou JSON (LOG_FORMAT), com os campos passados em extra;
+- gravação em segundo plano: a thread da requisição só coloca o evento numa
+  fila limitada; uma thread do logging formata e escreve no stderr (e em
+  LOG_FILE). Com a fila cheia o evento é descartado, sem bloquear.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict
+
+from config import (
+    LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_FILE, LOG_QUEUE_SIZE, LOG_DEBUG_SAMPLE_RATE
+)
+
+# Bibliotecas que registram cada requisição em INFO; LOG_LEVELS pode mudar
+_LIBRARY_LEVELS = 'httpx=WARNING,httpcore=WARNING,urllib3=WARNING,chromadb=WARNING'
+
+# Atributos padrão de um LogRecord (os demais vêm de extra e são campos estruturados)
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES and key != 'sample_rate'}
+
+
+class TextFormatter(logging.Formatter):
+    """Linha de texto: data, nível, módulo, mensagem e campos extras (chave=valor)."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value!r}' for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com os campos extras no mesmo nível."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName
+        }
+        event.update(_extra_fields(record))
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            event['exception'] = record.exc_text
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Deixa passar só uma fração dos eventos DEBUG (os demais níveis passam sempre)."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = getattr(record, 'sample_rate', self.rate)
+        return rate >= 1.0 or random.random() < rate
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Coloca os eventos numa fila limitada, gravada por uma thread em segundo plano.
+
+    A thread é (re)iniciada no primeiro evento de cada processo, de modo que
+    workers criados por fork (gunicorn com preload) também gravam.
+    """
+
+    def __init__(self, handlers: list, max_size: int):
+        super().__init__(queue.Queue(maxsize=max_size))
+        self._handlers = handlers
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # Depois de um fork, a fila herdada pode conter eventos do processo pai
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                self._listener = QueueListener(self.queue, *self._handlers, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Monta só a mensagem (os argumentos podem mudar depois de enfileirados);
+        a formatação da linha fica para a thread do logging.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Grava os eventos pendentes e encerra a thread (ao sair do processo)."""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def stats(self) -> dict:
+        return {'queued': self.queue.qsize(), 'max_queue': self.queue.maxsize, 'dropped': self.dropped}
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Converte "modulo=NIVEL,outro=NIVEL" em {modulo: nível}; entradas inválidas são ignoradas."""
+    levels = {}
+    for item in spec.split(','):
+        name, _, level = item.partition('=')
+        level = logging.getLevelName(level.strip().upper())
+        if name.strip() and isinstance(level, int):
+            levels[name.strip()] = level
+    return levels
+
+
+_handler = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging() -> BackgroundQueueHandler:
+    """
+    Configura o logging do processo (chamado uma vez, na importação da API).
+
+    Returns:
+        Handler da fila (para estatísticas)
+    """
+    global _handler
+    with _setup_lock:
+        if _handler is not None:
+            return _handler
+
+        formatter = JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter()
+        outputs = [logging.StreamHandler(sys.stderr)]
+        if LOG_FILE:
+            os.makedirs(os.path.dirname(os.path.abspath(LOG_FILE)), exist_ok=True)
+            outputs.append(logging.FileHandler(LOG_FILE, encoding='utf-8'))
+        for output in outputs:
+            output.setFormatter(formatter)
+
+        _handler = BackgroundQueueHandler(outputs, LOG_QUEUE_SIZE)
+        _handler.addFilter(DebugSamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(parse_levels(f'root={LOG_LEVEL}').get('root', logging.INFO))
+        for name, level in {**parse_levels(_LIBRARY_LEVELS), **parse_levels(LOG_LEVELS)}.items():
+            logging.getLogger(name).setLevel(level)
+
+        atexit.register(_handler.stop)
+        return _handler
+
+
+def logging_stats() -> dict:
+    """Fila e eventos descartados do logging em segundo plano."""
+    return _handler.stats() if _handler is not None else {'enabled': False}
@@ -0,0 +1,257 @@
+"""
+Renderizador de respostas do IB - EstradaResponde.
+
+Converte o Markdown básico gerado pelo LLM (títulos, listas, negrito,
+citações e seção FONTES) em HTML numa única passada pelas linhas.
+Todas as expressões regulares são pré-compiladas e não têm quantificadores
+aninhados ambíguos, de forma que o tempo de renderização é linear no
+tamanho do texto (sem risco de ReDoS).
+"""
+
+import html
+import re
+from typing import Callable, List, Optional
+from urllib.parse import quote
+
+# Estilo dos links de documentos (mesmo usado pelo frontend)
+DOCUMENT_LINK_STYLE = 'color: #059669; text-decoration: underline; font-weight: 500;'
+
+# Padrões pré-compilados - todos lineares (sem grupos repetidos ambíguos)
+_HR_RE = re.compile(r'-{3,}')
+# Título da seção FONTES: linha terminada em "FONTES:"/"REFERÊNCIAS:" (ex: "Fontes consultadas - FONTES:")
+_FONTES_HEADING_RE = re.compile(r'(?:FONTES?|REFERÊNCIAS?):?$', re.IGNORECASE)
+_PARENTHESIS_RE = re.compile(r'[()]')
+_BOLD_RE = re.compile(r'\*\*([^*]+)\*\*')
+_EMPHASIS_RE = re.compile(r'\*([^*\s]+)\*')
+_ARTICLE_RE = re.compile(r'\b(?:Artigo|Art\.)\s', re.IGNORECASE)
+
+# Tamanho máximo do conteúdo de uma citação "(Artigo X do [Nome])"
+MAX_CITATION_CHARS = 500
+
+DocumentResolver = Callable[[str], Optional[str]]
+
+
+def build_document_url(base_url: str, document_name: str) -> str:
+    """
+    Monta a URL de visualização de um documento.
+
+    Args:
+        base_url: URL base da API (ex: "http://localhost:5001")
+        document_name: Nome exato do documento no banco
+
+    Returns:
+        URL do endpoint /api/documents/<nome>/view
+    """
+    return f"{base_url}/api/documents/{quote(document_name, safe='')}/view"
+
+
+def build_document_link(base_url: str, document_name: str, link_text: str) -> str:
+    """
+    Cria o HTML de um link para documento.
+
+    Args:
+        base_url: URL base da API
+        document_name: Nome exato do documento (usado na URL)
+        link_text: Texto exibido no link (será escapado)
+
+    Returns:
+        Tag <a> pronta para ser inserida no HTML
+    """
+    doc_url = build_document_url(base_url, document_name)
+    return (
+        f'<a href="{doc_url}" target="_blank" rel="noopener noreferrer" '
+        f'class="document-link" style="{DOCUMENT_LINK_STYLE}">{html.escape(link_text)}</a>'
+    )
+
+
+def _format_emphasis(escaped_text: str) -> str:
+    """Converte **texto** e *texto* (já escapados) para <strong>."""
+    text = _BOLD_RE.sub(r'<strong>\1</strong>', escaped_text)
+    return _EMPHASIS_RE.sub(r'<strong>\1</strong>', text)
+
+
+def _split_citation(segment: str):
+    """
+    Verifica se o conteúdo entre parênteses é uma citação "X do [Nome]".
+
+    Args:
+        segment: Texto entre "(" e ")" (sem os parênteses)
+
+    Returns:
+        Tupla (artigo, nome) ou None se não for uma citação
+    """
+    if not segment.endswith(']'):
+        return None
+    bracket = segment.rfind('[')
+    if bracket < 0:
+        return None
+    doc_name = segment[bracket + 1:-1]
+    if not doc_name or ']' in doc_name:
+        return None
+    prefix = segment[:bracket].rstrip()
+    # Exige "<espaço>do" imediatamente antes do colchete
+    if len(prefix) < 3 or not prefix.endswith('do') or not prefix[-3].isspace():
+        return None
+    article = prefix[:-2].strip()
+    if not article:
+        return None
+    return article, doc_name
+
+
+def _render_inline(text: str, base_url: str) -> str:
+    """
+    Renderiza uma linha de texto: escapa HTML, aplica negrito e transforma
+    citações "(Artigo X do [Nome])" em links.
+
+    A busca de citações percorre os parênteses uma única vez, guardando o
+    último "(" visto; cada "(" é testado como abertura no máximo uma vez (é
+    descartado quando a citação é rejeitada) e o conteúdo examinado tem no
+    máximo MAX_CITATION_CHARS, garantindo tempo linear.
+    """
+    parts: List[str] = []
+    cursor = 0
+    opening = -1
+    for match in _PARENTHESIS_RE.finditer(text):
+        position = match.start()
+        if text[position] == '(':
+            opening = position
+            continue
+        if opening < 0:
+            continue
+        citation = None
+        if position - opening - 1 <= MAX_CITATION_CHARS:
+            citation = _split_citation(text[opening + 1:position])
+        if not citation:
+            opening = -1
+            continue
+        article, doc_name = citation
+        parts.append(_format_emphasis(html.escape(text[cursor:opening])))
+        link_html = build_document_link(base_url, doc_name, doc_name)
+        parts.append(f"({html.escape(article)} do {link_html})")
+        cursor = position + 1
+        opening = -1
+    parts.append(_format_emphasis(html.escape(text[cursor:])))
+    return ''.join(parts)
+
+
+def parse_fontes_line(line: str):
+    """
+    Separa uma linha da seção FONTES em nome do documento e referência.
+
+    Formatos aceitos: "Nome.pdf, Artigo X", "[Nome], Artigo X" e
+    "Nome.pdf Artigo X" (sem vírgula).
+
+    Args:
+        line: Linha da seção FONTES (já sem marcador de lista)
+
+    Returns:
+        Tupla (nome, referência) ou None se a linha não tiver esse formato
+    """
+    if line.startswith('['):
+        end = line.find('],')
+        if end > 0:
+            return ' '.join(line[1:end].split()), line[end + 2:].strip()
+    if ',' in line:
+        doc_name, article_info = line.split(',', 1)
+    else:
+        article_match = _ARTICLE_RE.search(line)
+        if not article_match:
+            return None
+        doc_name, article_info = line[:article_match.start()], line[article_match.start():]
+    doc_name = ' '.join(doc_name.strip().strip('[]*').split())
+    if not doc_name:
+        return None
+    return doc_name, article_info.strip()
+
+
+def _render_fontes_line(line: str, base_url: str, resolve_document: Optional[DocumentResolver]) -> str:
+    """Renderiza uma linha da seção FONTES como parágrafo com link."""
+    parsed = parse_fontes_line(line)
+    if not parsed:
+        return f'<p>{_format_emphasis(html.escape(line))}</p>'
+    doc_name_llm, article_info = parsed
+    # Mostrar o nome gerado pelo LLM, mas usar o nome exato do banco na URL
+    doc_name_exact = (resolve_document(doc_name_llm) if resolve_document else None) or doc_name_llm
+    link_html = build_document_link(base_url, doc_name_exact, doc_name_llm)
+    if article_info:
+        return f'<p>{link_html}, {html.escape(article_info)}</p>'
+    return f'<p>{link_html}</p>'
+
+
+def _is_fontes_heading(line: str) -> bool:
+    """
+    Detecta o título da seção FONTES: linha (sem "#" e "**") terminada em
+    "FONTES:" ou "REFERÊNCIAS:", como "## FONTES:", "**FONTES:**" ou
+    "**Fontes consultadas - FONTES:**".
+    """
+    bare = line.lstrip('#').strip().strip('*').strip()
+    return bool(_FONTES_HEADING_RE.search(bare))
+
+
+def render_answer_html(text: str, base_url: str,
+                       resolve_document: Optional[DocumentResolver] = None) -> str:
+    """
+    Converte a resposta do LLM (Markdown básico) para HTML.
+
+    Args:
+        text: Resposta gerada pelo LLM
+        base_url: URL base da API para montar os links de documentos
+        resolve_document: Função opcional que recebe o nome citado pelo LLM e
+            devolve o nome exato do documento no banco (ou None)
+
+    Returns:
+        HTML com títulos, listas, negrito e links de documentos
+    """
+    if not text:
+        return text
+
+    output: List[str] = []
+    list_items: List[str] = []
+    in_fontes = False
+
+    def flush_list():
+        if list_items:
+            output.append('<ul>')
+            output.extend(list_items)
+            output.append('</ul>')
+            list_items.clear()
+
+    for raw_line in text.split('\n'):
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        if _HR_RE.fullmatch(line):
+            flush_list()
+            output.append('<hr>')
+            continue
+
+        if _is_fontes_heading(line):
+            flush_list()
+            in_fontes = True
+            output.append('<h3>FONTES:</h3>')
+            continue
+
+        if line.startswith('### ') or line.startswith('## '):
+            flush_list()
+            in_fontes = False
+            level = 3 if line.startswith('###') else 2
+            title = _format_emphasis(html.escape(line[level:].strip()))
+            output.append(f'<h{level}>{title}</h{level}>')
+            continue
+
+        if in_fontes:
+            flush_list()
+            source_line = line.lstrip('-*').strip() if line[0] in '-*' and not line.startswith('**') else line
+            output.append(_render_fontes_line(source_line, base_url, resolve_document))
+            continue
+
+        if (line.startswith('* ') or line.startswith('- ')) and len(line) > 2:
+            list_items.append(f'<li>{_render_inline(line[2:].strip(), base_url)}</li>')
+            continue
+
+        flush_list()
+        output.append(f'<p>{_render_inline(line, base_url)}</p>')
+
+    flush_list()
+    return '\n'.join(output)
@@ -0,0 +1,325 @@
+"""
+Métricas de desempenho do IB - EstradaResponde.
+
+Contadores e histogramas mantidos em memória, no próprio processo, e
+expostos em /api/metrics no formato de texto do Prometheus (não é preciso
+um coletor externo; qualquer ferramenta que leia esse formato pode consultar
+o endpoint). Cada worker tem as suas próprias métricas.
+
+As etapas de uma pergunta (embedding, busca, montagem do contexto, primeiro
+token e geração do LLM, conversão para HTML) e da ingestão de PDFs são
+medidas com span() e agregadas no histograma estrada_stage_duration_seconds.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import METRICS_ENABLED
+from usage import extract_token_usage
+
+logger = logging.getLogger(__name__)
+
+# Limites (segundos) dos histogramas de latência
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Base das famílias de métricas (um valor por combinação de rótulos)."""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Rótulos de {self.name} devem ser {self.labelnames}, recebido {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> list:
+        raise NotImplementedError
+
+    def render(self) -> list:
+        """Linhas do formato de texto do Prometheus desta família."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        return lines + self._samples()
+
+
+class Counter(_Metric):
+    """Contador (só aumenta)."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Soma amount ao contador dos rótulos informados."""
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in values]
+
+
+class Histogram(_Metric):
+    """Histograma cumulativo com limites fixos."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # rótulos -> [contagem por limite (não cumulativa), soma, total]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        """Registra uma observação (ex: duração em segundos)."""
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def snapshot(self) -> Dict[Tuple[str, ...], tuple]:
+        """Cópia dos valores: rótulos -> (contagem por limite, não cumulativa; soma; total)."""
+        with self._lock:
+            return {key: (list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()}
+
+    def _samples(self) -> list:
+        with self._lock:
+            values = sorted((key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Valor instantâneo lido de uma função no momento da coleta."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], Optional[float]]):
+        super().__init__(name, documentation)
+        self._read = read
+
+    def _samples(self) -> list:
+        try:
+            value = self._read()
+        except Exception as e:
+            logger.warning("Erro ao ler a métrica %s: %s", self.name, e)
+            return []
+        return [] if value is None else [f'{self.name} {_format_value(value)}']
+
+
+class MetricsRegistry:
+    """Conjunto das métricas do processo."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Métrica {metric.name} já registrada com outro tipo")
+                if isinstance(metric, Gauge):
+                    # Nova leitura substitui a anterior (ex: recarga do módulo)
+                    self._metrics[metric.name] = metric
+                    return metric
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], Optional[float]]) -> Gauge:
+        return self._register(Gauge(name, documentation, read))
+
+    def render(self) -> str:
+        """Todas as métricas no formato de texto do Prometheus."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Registro global do processo e métricas compartilhadas pelos módulos
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'estrada_stage_duration_seconds', 'Duração das etapas das perguntas e da ingestão', ('stage',)
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    'estrada_http_requests_total', 'Requisições HTTP atendidas', ('route', 'method', 'status')
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    'estrada_http_request_duration_seconds', 'Duração das requisições HTTP', ('route', 'method')
+)
+CHAT_ANSWERS = REGISTRY.counter(
+    'estrada_chat_answers_total', 'Respostas do chat por origem (cache ou LLM) e nível', ('source', 'tier')
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    'estrada_cache_lookups_total', 'Consultas aos caches de respostas', ('cache', 'result')
+)
+LLM_CALLS = REGISTRY.counter(
+    'estrada_llm_calls_total', 'Chamadas ao LLM por resultado', ('result',)
+)
+LLM_TOKENS = REGISTRY.counter(
+    'estrada_llm_tokens_total', 'Tokens do LLM informados pelo provedor', ('type',)
+)
+RETRIEVED_CHUNKS = REGISTRY.counter(
+    'estrada_retrieved_chunks_total', 'Trechos recuperados e enviados como contexto ao LLM'
+)
+INGESTED_DOCUMENTS = REGISTRY.counter('estrada_ingested_documents_total', 'PDFs processados')
+INGESTED_PAGES = REGISTRY.counter('estrada_ingested_pages_total', 'Páginas de PDF processadas')
+INGESTED_CHUNKS = REGISTRY.counter('estrada_ingested_chunks_total', 'Chunks gravados no índice')
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Mede a duração de um bloco e registra em estrada_stage_duration_seconds.
+
+    Exemplo:
+        with span('vector_search'):
+            documents = retriever.invoke(question)
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started_at, stage=stage)
+
+
+def observe_request(route: str, method: str, status: int, seconds: float):
+    """Registra uma requisição HTTP atendida (Flask ou ASGI)."""
+    HTTP_REQUESTS.inc(route=route, method=method, status=status)
+    HTTP_SECONDS.observe(seconds, route=route, method=method)
+
+
+class LLMTimingCallback(BaseCallbackHandler):
+    """
+    Mede as etapas da geração da resposta dentro da cadeia de combinação.
+
+    Uma instância por chamada (passada em config={'callbacks': [...]}):
+    - context_assembly: do início da cadeia até a chamada ao modelo
+      (montagem do prompt com os trechos);
+    - llm_first_token: até o primeiro token (só quando o modelo transmite
+      tokens, ver LLM_STREAMING);
+    - llm_generation: da chamada ao modelo até a resposta completa.
+    Também conta as chamadas e os tokens informados pelo provedor.
+    """
+
+    # Executado na mesma thread/event loop da cadeia, para medir sem atraso
+    run_inline = True
+
+    def __init__(self):
+        self._chain_started_at = None
+        self._llm_started_at = None
+        self._first_token = False
+
+    def on_chain_start(self, serialized, inputs, **kwargs):
+        if self._chain_started_at is None:
+            self._chain_started_at = time.perf_counter()
+
+    def _llm_start(self):
+        self._llm_started_at = time.perf_counter()
+        self._first_token = False
+        if self._chain_started_at is not None:
+            STAGE_SECONDS.observe(self._llm_started_at - self._chain_started_at, stage='context_assembly')
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._llm_start()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._llm_start()
+
+    def on_llm_new_token(self, token, **kwargs):
+        if not self._first_token and self._llm_started_at is not None:
+            self._first_token = True
+            STAGE_SECONDS.observe(time.perf_counter() - self._llm_started_at, stage='llm_first_token')
+
+    def on_llm_end(self, response, **kwargs):
+        if self._llm_started_at is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - self._llm_started_at, stage='llm_generation')
+        LLM_CALLS.inc(result='success')
+        try:
+            tokens = extract_token_usage(response)
+        except Exception as e:
+            logger.warning("Erro ao ler o uso de tokens: %s", e)
+            return
+        for kind in ('input', 'output', 'cached_input'):
+            if tokens and tokens[f'{kind}_tokens']:
+                LLM_TOKENS.inc(tokens[f'{kind}_tokens'], type=kind)
+
+    def on_llm_error(self, error, **kwargs):
+        LLM_CALLS.inc(result='error')
@@ -0,0 +1,335 @@
+"""
+Profiling de requisições sob demanda do IB - EstradaResponde.
+
+Uma requisição é perfilada quando traz o token de administrador
+(PROFILING_ADMIN_TOKEN) no header X-Profile-Token ou em ?profile=<token>, ou
+por amostragem (uma fração PROFILING_SAMPLE_RATE das perguntas). Enquanto
+ela roda, uma thread amostra a pilha da thread da requisição e das threads
+das etapas (run_stage, roteador de provedores) a cada PROFILING_INTERVAL_MS.
+As amostras são de tempo de parede: uma thread bloqueada aparece onde espera
+(ex: na resposta HTTP do LLM).
+
+Cada perfil é gravado em PROFILING_DIR:
+- <id>.json: rota, duração, status e as funções com mais amostras;
+- <id>.folded: pilhas no formato "collapsed" (uma pilha por linha, com a
+  contagem de amostras), lido por flamegraph.pl, speedscope e inferno;
+- <id>.prof: com PROFILING_MODE=cprofile, também o perfil determinístico do
+  cProfile (pstats, lido por snakeviz).
+"""
+
+import contextvars
+import cProfile
+import functools
+import hmac
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    PROFILING_ADMIN_TOKEN, PROFILING_SAMPLE_RATE, PROFILING_MODE, PROFILING_INTERVAL_MS,
+    PROFILING_DIR, PROFILING_MAX_PROFILES
+)
+
+logger = logging.getLogger(__name__)
+
+# Arquivos gravados por perfil (além do <id>.json)
+PROFILE_FILES = {'folded': '.folded', 'prof': '.prof'}
+# Funções listadas no resumo do perfil
+TOP_FUNCTIONS = 25
+
+_PROFILE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+_MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@functools.lru_cache(maxsize=8192)
+def _frame_label(code) -> str:
+    """'modulo:funcao' de um code object (módulos de bibliotecas com o pacote)."""
+    filename = code.co_filename
+    marker = 'site-packages' + os.sep
+    if marker in filename:
+        module = filename.split(marker, 1)[1]
+    elif filename.startswith(_MODEL_DIR):
+        module = os.path.relpath(filename, _MODEL_DIR)
+    else:
+        module = os.path.basename(filename)
+    module = module[:-3] if module.endswith('.py') else module
+    name = getattr(code, 'co_qualname', code.co_name)
+    # ';' separa as funções no formato collapsed
+    return f"{module.replace(os.sep, '.')}:{name}".replace(';', ',').replace(' ', '_')
+
+
+class RequestProfile:
+    """Perfil de uma requisição (amostras das suas threads e, opcionalmente, cProfile)."""
+
+    def __init__(self, route: str, method: str, trigger: str, mode: str = PROFILING_MODE,
+                 interval_seconds: float = PROFILING_INTERVAL_MS / 1000.0):
+        """
+        Args:
+            route: Rota da requisição (ex: '/api/chat')
+            method: Método HTTP
+            trigger: Motivo do perfil ('token' ou 'sample')
+            mode: 'sampling' ou 'cprofile'
+            interval_seconds: Intervalo entre amostras
+        """
+        self.id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.route = route
+        self.method = method
+        self.trigger = trigger
+        self.mode = mode
+        self.interval_seconds = max(interval_seconds, 0.001)
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        # thread -> papel ('request' ou 'stage'), raiz das pilhas
+        self._threads: Dict[int, str] = {}
+        self._profilers: List[cProfile.Profile] = []
+        self._request_profiler: Optional[cProfile.Profile] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f'profiler-{self.id}', daemon=True)
+        self._started_at = None
+        self._context_token = None
+        self.duration_seconds = None
+
+    def start(self):
+        """Começa a perfilar a thread atual (a da requisição)."""
+        self._started_at = time.perf_counter()
+        self._threads[threading.get_ident()] = 'request'
+        self._request_profiler = self._enable_cprofile()
+        self._sampler.start()
+
+    def stop(self):
+        """Encerra as amostras (chamado na thread da requisição)."""
+        self._finish_cprofile(self._request_profiler)
+        self._stop.set()
+        self._sampler.join()
+        self.duration_seconds = time.perf_counter() - self._started_at
+
+    def _enable_cprofile(self) -> Optional[cProfile.Profile]:
+        if self.mode != 'cprofile':
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Outro profiler ativo no interpretador (Python 3.12+): só amostras
+            logger.debug("cProfile indisponível na thread: %s", e)
+            return None
+        return profiler
+
+    def _finish_cprofile(self, profiler: Optional[cProfile.Profile]):
+        # Só entram no perfil as threads que terminaram (uma etapa abandonada
+        # no fim do prazo continua rodando com o seu profiler)
+        if profiler is not None:
+            profiler.disable()
+            with self._lock:
+                self._profilers.append(profiler)
+
+    @contextmanager
+    def thread(self, role: str = 'stage'):
+        """Inclui a thread atual no perfil enquanto o bloco roda."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = role
+        profiler = self._enable_cprofile()
+        try:
+            yield
+        finally:
+            self._finish_cprofile(profiler)
+            with self._lock:
+                self._threads.pop(ident, None)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads.items())
+            for ident, role in threads:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    stack.append(role)
+                    self._stacks[';'.join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def top_functions(self, limit: int = TOP_FUNCTIONS) -> list:
+        """Funções com mais amostras próprias (self) e acumuladas (total, incluindo as chamadas)."""
+        own = Counter()
+        total = Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        return [{'function': label, 'self_samples': count, 'total_samples': total[label]}
+                for label, count in own.most_common(limit)]
+
+    def save(self, directory: str, status: int) -> dict:
+        """
+        Grava o perfil em disco.
+
+        Returns:
+            Metadados do perfil (conteúdo do <id>.json)
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.id)
+        files = {}
+        with open(base + PROFILE_FILES['folded'], 'w', encoding='utf-8') as folded_file:
+            for stack, count in sorted(self._stacks.items()):
+                folded_file.write(f'{stack} {count}\n')
+        files['folded'] = self.id + PROFILE_FILES['folded']
+        with self._lock:
+            profilers = list(self._profilers)
+        if profilers:
+            stats = pstats.Stats(profilers[0])
+            for profiler in profilers[1:]:
+                stats.add(profiler)
+            stats.dump_stats(base + PROFILE_FILES['prof'])
+            files['prof'] = self.id + PROFILE_FILES['prof']
+        metadata = {
+            'id': self.id,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'route': self.route,
+            'method': self.method,
+            'status': status,
+            'trigger': self.trigger,
+            'mode': self.mode,
+            'duration_seconds': round(self.duration_seconds or 0.0, 4),
+            'interval_ms': round(self.interval_seconds * 1000, 3),
+            'samples': self.samples,
+            'top_functions': self.top_functions(),
+            'files': files
+        }
+        with open(base + '.json', 'w', encoding='utf-8') as metadata_file:
+            json.dump(metadata, metadata_file, ensure_ascii=False, indent=2)
+        return metadata
+
+
+# Perfil da requisição atual (propagado às threads das etapas com copy_context)
+_current_profile: contextvars.ContextVar = contextvars.ContextVar('request_profile', default=None)
+
+
+def enabled() -> bool:
+    """Se o profiling pode ser acionado (por token ou por amostragem)."""
+    return bool(PROFILING_ADMIN_TOKEN) or PROFILING_SAMPLE_RATE > 0
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """Se o token informado é o token de administrador do profiling."""
+    return bool(PROFILING_ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, PROFILING_ADMIN_TOKEN)
+
+
+def profile_trigger(token: Optional[str], sampled: bool) -> Optional[str]:
+    """
+    Decide se a requisição será perfilada.
+
+    Args:
+        token: Token enviado pelo cliente (header ou query)
+        sampled: Se a rota participa da amostragem (perguntas)
+
+    Returns:
+        'token', 'sample' ou None
+    """
+    if token and is_authorized(token):
+        return 'token'
+    if sampled and PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return 'sample'
+    return None
+
+
+def start(route: str, method: str, trigger: str) -> RequestProfile:
+    """Começa o perfil da requisição na thread atual."""
+    profile = RequestProfile(route, method, trigger)
+    profile.start()
+    profile._context_token = _current_profile.set(profile)
+    return profile
+
+
+def finish(profile: RequestProfile, status: int) -> Optional[dict]:
+    """Encerra e grava o perfil da requisição (na mesma thread de start)."""
+    profile.stop()
+    _current_profile.reset(profile._context_token)
+    try:
+        metadata = profile.save(PROFILING_DIR, status)
+    except OSError as e:
+        logger.warning("Erro ao gravar o perfil %s: %s", profile.id, e)
+        return None
+    prune_profiles(PROFILING_DIR, PROFILING_MAX_PROFILES)
+    logger.info("Perfil %s gravado", profile.id,
+                extra={'route': profile.route, 'duration_seconds': metadata['duration_seconds']})
+    return metadata
+
+
+def bind(func: Callable) -> Callable:
+    """
+    Inclui no perfil da requisição atual a thread que executar func (etapas
+    em outras threads). Sem perfil ativo, devolve func sem alteração.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return func
+
+    @functools.wraps(func)
+    def profiled(*args, **kwargs):
+        with profile.thread():
+            return func(*args, **kwargs)
+    return profiled
+
+
+def _profile_names(directory: str) -> list:
+    """Arquivos <id>.json da pasta, do mais novo ao mais antigo."""
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.json')]
+    except OSError:
+        return []
+    entries.sort(key=lambda entry: (entry.stat().st_mtime, entry.name), reverse=True)
+    return [entry.name for entry in entries]
+
+
+def prune_profiles(directory: str, max_profiles: int):
+    """Remove os perfis mais antigos além de max_profiles."""
+    names = _profile_names(directory)
+    for name in names[max_profiles:]:
+        profile_id = name[:-len('.json')]
+        for suffix in ('.json', *PROFILE_FILES.values()):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(limit: int = 20) -> list:
+    """Metadados dos perfis mais recentes (de todos os workers), do mais novo ao mais antigo."""
+    names = _profile_names(PROFILING_DIR)
+    profiles = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(PROFILING_DIR, name), encoding='utf-8') as metadata_file:
+                profiles.append(json.load(metadata_file))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(profile_id: str, kind: str) -> Optional[str]:
+    """Caminho de um arquivo de perfil ('json', 'folded' ou 'prof'), ou None se inválido."""
+    if not _PROFILE_ID.match(profile_id) or kind not in ('json', *PROFILE_FILES):
+        return None
+    suffix = '.json' if kind == 'json' else PROFILE_FILES[kind]
+    path = os.path.join(os.path.abspath(PROFILING_DIR), profile_id + suffix)
+    return path if os.path.exists(path) else None
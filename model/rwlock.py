@@ -0,0 +1,154 @@
+"""
+Trava leitores-escritor do IB - EstradaResponde.
+
+Protege o vectorstore entre a ingestão (upload, renomeação, exclusão e
+limpeza de documentos, que recriam o cliente do ChromaDB) e as consultas do
+chat. Várias consultas leem ao mesmo tempo; uma escrita espera as leituras em
+andamento terminarem e tem prioridade sobre novas leituras, para não ficar
+esperando indefinidamente. Mede o tempo de espera para expor a contenção.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Trava leitores-escritor com prioridade para o escritor e métricas de contenção."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        # Profundidade de leitura por thread (leituras aninhadas não esperam)
+        self._local = threading.local()
+        self._stats = {
+            'read_acquisitions': 0,
+            'read_contended': 0,
+            'read_wait_seconds': 0.0,
+            'read_wait_max_seconds': 0.0,
+            'write_acquisitions': 0,
+            'write_contended': 0,
+            'write_wait_seconds': 0.0,
+            'write_wait_max_seconds': 0.0,
+            'write_hold_seconds': 0.0,
+            'write_hold_max_seconds': 0.0
+        }
+        self._write_started_at = 0.0
+
+    def _record_wait(self, kind: str, waited: float, contended: bool):
+        """Atualiza as métricas de espera (chamado com a trava interna adquirida)."""
+        self._stats[f'{kind}_acquisitions'] += 1
+        if contended:
+            self._stats[f'{kind}_contended'] += 1
+            self._stats[f'{kind}_wait_seconds'] += waited
+            self._stats[f'{kind}_wait_max_seconds'] = max(self._stats[f'{kind}_wait_max_seconds'], waited)
+
+    def acquire_read(self):
+        """Adquire a trava para leitura (reentrante; permitida ao escritor atual)."""
+        me = threading.get_ident()
+        depth = getattr(self._local, 'depth', 0)
+        if depth or self._writer == me:
+            self._local.depth = depth + 1
+            return
+
+        started_at = time.perf_counter()
+        with self._cond:
+            contended = self._writer is not None or self._writers_waiting > 0
+            while self._writer is not None or self._writers_waiting > 0:
+                self._cond.wait()
+            self._readers += 1
+            self._record_wait('read', time.perf_counter() - started_at, contended)
+        self._local.depth = 1
+        self._local.counted = True
+
+    def release_read(self):
+        """Libera a trava de leitura."""
+        depth = getattr(self._local, 'depth', 0)
+        if depth <= 0:
+            raise RuntimeError('release_read sem acquire_read correspondente')
+        self._local.depth = depth - 1
+        if depth > 1 or not getattr(self._local, 'counted', False):
+            return
+
+        self._local.counted = False
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        """
+        Adquire a trava para escrita (reentrante para o mesmo escritor).
+
+        Raises:
+            RuntimeError: Se a thread já tiver a trava de leitura (promoção
+                de leitura para escrita causaria deadlock)
+        """
+        me = threading.get_ident()
+        if self._writer == me:
+            self._writer_depth += 1
+            return
+        if getattr(self._local, 'depth', 0):
+            raise RuntimeError('Não é possível promover uma trava de leitura para escrita')
+
+        started_at = time.perf_counter()
+        with self._cond:
+            contended = self._writer is not None or self._readers > 0
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers > 0:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+            self._write_started_at = time.perf_counter()
+            self._record_wait('write', self._write_started_at - started_at, contended)
+
+    def release_write(self):
+        """Libera a trava de escrita."""
+        if self._writer != threading.get_ident():
+            raise RuntimeError('release_write chamado por uma thread que não é o escritor')
+        self._writer_depth -= 1
+        if self._writer_depth:
+            return
+
+        with self._cond:
+            held = time.perf_counter() - self._write_started_at
+            self._stats['write_hold_seconds'] += held
+            self._stats['write_hold_max_seconds'] = max(self._stats['write_hold_max_seconds'], held)
+            self._writer = None
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        """Context manager para leitura."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        """Context manager para escrita."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def stats(self) -> dict:
+        """Retorna as métricas de contenção da trava."""
+        with self._cond:
+            stats = {
+                key: round(value, 4) if isinstance(value, float) else value
+                for key, value in self._stats.items()
+            }
+            stats['active_readers'] = self._readers
+            stats['writer_active'] = self._writer is not None
+            stats['writers_waiting'] = self._writers_waiting
+            return stats
@@ -0,0 +1,203 @@
+"""
+Agrupamento de requisições idênticas em andamento (single-flight).
+
+Quando várias requisições fazem a mesma pergunta ao mesmo tempo (mesma chave:
+pergunta normalizada + versão do corpus, provedor, modelo e prompt), apenas a
+primeira executa a busca e a chamada ao LLM; as demais esperam e recebem o
+mesmo resultado (ou a mesma exceção). Erros que dependem de quem executou
+(ex: vaga negada ao cliente do líder, prazo do líder esgotado) podem ser
+informados em retry_errors: nesse caso as requisições que esperavam voltam
+à tabela, uma delas executa a sua própria função (com o seu cliente e o seu
+prazo) e as demais esperam por ela. A espera de cada requisição é limitada
+pelo seu prazo. Funciona com chamadores síncronos (threads do Flask) e
+assíncronos (servidor ASGI) na mesma tabela.
+"""
+
+import asyncio
+import threading
+from concurrent import futures
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Type
+
+from deadline import Deadline, StageTimeout
+
+
+class SingleFlight:
+    """Tabela de execuções em andamento por chave."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        # Task do líder e número de chamadores assíncronos esperando, por chave
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self._async_waiters: Dict[Hashable, int] = {}
+        self._leaders = 0
+        self._followers = 0
+        self._fallbacks = 0
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Retorna o Future da chave e se o chamador é o líder (quem executa)."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._followers += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self._leaders += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+                self._tasks.pop(key, None)
+                self._async_waiters.pop(key, None)
+
+    def _count_fallback(self):
+        with self._lock:
+            self._fallbacks += 1
+
+    @staticmethod
+    def _wait_timeout(deadline: Optional[Deadline]) -> Optional[float]:
+        return max(0.0, deadline.remaining()) if deadline is not None else None
+
+    def do(self, key: Hashable, func: Callable[[], Any],
+           retry_errors: Tuple[Type[BaseException], ...] = (),
+           deadline: Optional[Deadline] = None) -> Tuple[Any, bool]:
+        """
+        Executa func uma única vez por chave entre chamadas concorrentes.
+
+        Args:
+            key: Chave da execução
+            func: Função sem argumentos que calcula o resultado
+            retry_errors: Erros do líder que não valem para as demais
+                requisições: quem esperava volta à tabela e uma delas executa
+                a sua própria func
+            deadline: Prazo do chamador, que limita a espera por outra execução
+
+        Raises:
+            StageTimeout: Se o prazo acabar esperando a execução de outra requisição
+
+        Returns:
+            Tupla (resultado, se foi compartilhado com outra requisição)
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # exception() só levanta TimeoutError se a execução ainda não terminou
+                error = future.exception(self._wait_timeout(deadline))
+            except futures.TimeoutError:
+                raise StageTimeout('queue', deadline.total_seconds)
+            if isinstance(error, retry_errors):
+                self._count_fallback()
+                continue
+            return future.result(), True
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._finish(key, future)
+
+    async def ado(self, key: Hashable, func: Callable[[], Awaitable[Any]],
+                  retry_errors: Tuple[Type[BaseException], ...] = (),
+                  deadline: Optional[Deadline] = None) -> Tuple[Any, bool]:
+        """
+        Versão assíncrona de do.
+
+        A execução do líder roda numa task própria: se o cliente que a
+        iniciou desconectar, as demais requisições continuam recebendo o
+        resultado. Quando todos os chamadores que esperam a chave são
+        cancelados, a execução também é cancelada.
+
+        Args:
+            key: Chave da execução
+            func: Função sem argumentos que retorna a corrotina do cálculo
+            retry_errors: Erros do líder que não valem para as demais
+                requisições: quem esperava volta à tabela e uma delas executa
+                a sua própria func
+            deadline: Prazo do chamador, que limita a espera por outra execução
+
+        Raises:
+            StageTimeout: Se o prazo acabar esperando a execução de outra requisição
+
+        Returns:
+            Tupla (resultado, se foi compartilhado com outra requisição)
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                self._start_task(key, future, func)
+
+            with self._lock:
+                self._async_waiters[key] = self._async_waiters.get(key, 0) + 1
+            waiter = asyncio.wrap_future(future)
+            try:
+                # O líder espera a própria execução (limitada pelas etapas)
+                timeout = None if leader else self._wait_timeout(deadline)
+                await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            except asyncio.CancelledError:
+                self._leave(key, future, waiter)
+                raise
+            except Exception:
+                # Erro da execução (lido abaixo) ou fim do prazo de espera
+                if not waiter.done():
+                    self._leave(key, future, waiter)
+                    raise StageTimeout('queue', deadline.total_seconds)
+            if not leader and isinstance(waiter.exception(), retry_errors):
+                self._count_fallback()
+                continue
+            return waiter.result(), not leader
+
+    def _start_task(self, key: Hashable, future: Future, func: Callable[[], Awaitable[Any]]):
+        """Executa o cálculo do líder numa task própria, que resolve o Future da chave."""
+        task = asyncio.ensure_future(func())
+
+        def resolve(done: asyncio.Future):
+            try:
+                if done.cancelled():
+                    future.set_exception(asyncio.CancelledError())
+                elif done.exception() is not None:
+                    future.set_exception(done.exception())
+                else:
+                    future.set_result(done.result())
+            finally:
+                self._finish(key, future)
+
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                self._tasks[key] = task
+        task.add_done_callback(resolve)
+
+    def _leave(self, key: Hashable, future: Future, waiter: asyncio.Future):
+        """Chamador assíncrono desistiu; sem ninguém esperando, a execução é cancelada."""
+        # O resultado (ou erro) que chegar depois não tem mais quem o leia
+        waiter.add_done_callback(lambda done: done.cancelled() or done.exception())
+        task_to_cancel = None
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                self._async_waiters[key] -= 1
+                if self._async_waiters[key] <= 0:
+                    task_to_cancel = self._tasks.get(key)
+        if task_to_cancel is not None:
+            task_to_cancel.cancel()
+
+    def stats(self) -> dict:
+        """Retorna as estatísticas de agrupamento."""
+        with self._lock:
+            total = self._leaders + self._followers
+            return {
+                'in_flight': len(self._in_flight),
+                'executions': self._leaders,
+                'coalesced': self._followers,
+                'coalesced_rate': round(self._followers / total, 4) if total else 0.0,
+                'fallbacks': self._fallbacks
+            }
@@ -0,0 +1,61 @@
+"""
+Configuração dos testes (a partir de model/: python -m pytest tests).
+
+Os módulos da API ficam na raiz de model/ (layout plano) e são importados
+pelo nome, como em `python api.py`.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if MODEL_DIR not in sys.path:
+    sys.path.insert(0, MODEL_DIR)
+
+from benchmarks.bench_startup import configure_environment  # noqa: E402
+
+# ChromaDB, snapshot e logs da API (testes que importam api.py) numa pasta
+# temporária, definida antes de qualquer módulo ler o config.py
+_DATA_DIR = tempfile.mkdtemp(prefix='estrada_tests_')
+atexit.register(shutil.rmtree, _DATA_DIR, True)
+configure_environment(_DATA_DIR)
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    """
+    DocumentProcessor isolado numa pasta temporária, com embeddings locais
+    (HashEmbeddings) e o snapshot do índice ativado.
+    """
+    import document_processor
+    from benchmarks.stubs import HashEmbeddings
+    from embedding_cache import CachedQueryEmbeddings
+
+    monkeypatch.setattr(document_processor, 'CHROMA_DB_PATH', str(tmp_path / 'chroma'))
+    monkeypatch.setattr(document_processor, 'CORPUS_VERSION_FILE', str(tmp_path / 'chroma' / 'corpus.version'))
+    monkeypatch.setattr(document_processor, 'INDEX_SNAPSHOT_PATH', str(tmp_path / 'snapshot'))
+    monkeypatch.setattr(document_processor, 'INDEX_SNAPSHOT_ENABLED', True)
+    instance = document_processor.DocumentProcessor()
+    instance.embeddings = CachedQueryEmbeddings(HashEmbeddings(dimension=64), provider='stub', model='stub-embedding')
+    yield instance
+    instance.vectorstore = None
+    instance._clear_chromadb_cache()
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """Gera um decreto sintético (benchmarks/corpus_generator.py) e retorna (caminho, nome)."""
+    from benchmarks.corpus_generator import document_name, generate_document
+
+    def build(number: int, pages: int = 1):
+        name = document_name(number)
+        path = str(tmp_path / name)
+        generate_document(path, number, pages, seed=number)
+        return path, name
+
+    return build
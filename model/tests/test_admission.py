@@ -0,0 +1,110 @@
+"""Controle de admissão das chamadas ao LLM (admission.py)."""
+
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def _enqueue(controller: AdmissionController, client_id: str, label: str, admitted: list) -> threading.Thread:
+    """Coloca uma requisição do cliente na fila e espera ela entrar."""
+    depth = controller.queue_depth
+    thread = threading.Thread(target=lambda: (controller.acquire(client_id), admitted.append(label)))
+    thread.start()
+    while controller.queue_depth == depth:
+        time.sleep(0.01)
+    return thread
+
+
+def test_slots_rotate_between_clients():
+    controller = AdmissionController(max_concurrent=1, max_queue=8, max_queue_wait_seconds=5.0)
+    controller.acquire('cliente-a')
+    admitted = []
+    threads = [
+        _enqueue(controller, 'cliente-a', 'a1', admitted),
+        _enqueue(controller, 'cliente-a', 'a2', admitted),
+        _enqueue(controller, 'cliente-b', 'b1', admitted)
+    ]
+
+    for count in range(1, 4):
+        controller.release()
+        while len(admitted) < count:
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # O cliente B não espera as duas requisições do cliente A
+    assert admitted == ['a1', 'b1', 'a2']
+    assert controller.stats()['admitted'] == 4
+
+
+def test_full_queue_is_rejected_immediately():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, max_queue_wait_seconds=5.0)
+    controller.acquire('cliente-a')
+    admitted = []
+    thread = _enqueue(controller, 'cliente-b', 'b1', admitted)
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        controller.acquire('cliente-c')
+    controller.release()
+    thread.join(timeout=5)
+
+    assert exc_info.value.reason == 'queue_full'
+    assert exc_info.value.retry_after >= 1
+    assert admitted == ['b1']
+    assert controller.stats()['rejected']['queue_full'] == 1
+
+
+def test_client_limit_is_rejected_while_other_clients_queue():
+    controller = AdmissionController(max_concurrent=1, max_queue=8, max_queue_wait_seconds=5.0,
+                                     max_queued_per_client=1)
+    controller.acquire('cliente-a')
+    admitted = []
+    threads = [_enqueue(controller, 'cliente-b', 'b1', admitted)]
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        controller.acquire('cliente-b')
+    threads.append(_enqueue(controller, 'cliente-c', 'c1', admitted))
+    for count in range(1, 3):
+        controller.release()
+        while len(admitted) < count:
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert exc_info.value.reason == 'client_queue_full'
+    assert admitted == ['b1', 'c1']
+
+
+def test_queue_wait_timeout_suggests_retry_after():
+    controller = AdmissionController(max_concurrent=1, max_queue=8, max_queue_wait_seconds=0.05)
+    controller.acquire('cliente-a')
+    # Tempo de atendimento observado: média móvel 0.8 * 1.0 + 0.2 * 20.0 = 4.8s
+    controller.release(service_seconds=20.0)
+    controller.acquire('cliente-a')
+
+    started_at = time.perf_counter()
+    with pytest.raises(AdmissionRejected) as exc_info:
+        controller.acquire('cliente-b')
+
+    assert exc_info.value.reason == 'queue_timeout'
+    assert time.perf_counter() - started_at < 1.0
+    # Uma requisição em atendimento numa vaga: 1 * 4.8s, arredondado para cima
+    assert exc_info.value.retry_after == 5
+    assert controller.queue_depth == 0
+    assert controller.stats()['rejected']['queue_timeout'] == 1
+
+
+def test_queue_wait_is_bounded_by_the_request_deadline():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, max_queue_wait_seconds=5.0)
+    controller.acquire('cliente-a')
+
+    started_at = time.perf_counter()
+    with pytest.raises(AdmissionRejected) as exc_info:
+        controller.acquire('cliente-b', max_wait_seconds=0.05)
+
+    assert exc_info.value.reason == 'queue_timeout'
+    assert time.perf_counter() - started_at < 1.0
+    assert controller.queue_depth == 0
@@ -0,0 +1,124 @@
+"""Caches de respostas (answer_cache.py)."""
+
+import json
+import math
+
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache, SemanticAnswerCache
+
+QUESTION = 'Qual é a velocidade máxima nas autoestradas?'
+SCOPE = (1, 'openai', 'gpt-4o-mini', 'v1')
+
+
+class FakeClock:
+    """Relógio controlado pelo teste no lugar de time.monotonic."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(answer_cache, 'time', fake)
+    return fake
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(max_entries=4, ttl_seconds=60)
+    cache.put('chave', 'resposta')
+
+    clock.now += 59
+    assert cache.get('chave') == 'resposta'
+    clock.now += 1
+    assert cache.get('chave') is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert stats['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2, ttl_seconds=60)
+    cache.put('a', 'resposta a')
+    cache.put('b', 'resposta b')
+    # A leitura torna "a" a mais recente: "b" sai quando "c" entra
+    assert cache.get('a') == 'resposta a'
+    cache.put('c', 'resposta c')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'resposta a'
+    assert cache.get('c') == 'resposta c'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_key_changes_with_the_corpus_version(monkeypatch):
+    import api
+
+    cache = AnswerCache(max_entries=4, ttl_seconds=60)
+    cache.put(api.get_answer_cache_key(QUESTION), 'resposta antiga')
+    # A mesma pergunta com outra grafia usa a mesma chave
+    assert cache.get(api.get_answer_cache_key('  qual e a velocidade maxima nas autoestradas')) == 'resposta antiga'
+
+    # Upload, exclusão ou renomeação de documentos
+    monkeypatch.setattr(api.document_processor, 'corpus_version', api.document_processor.corpus_version + 1)
+    assert cache.get(api.get_answer_cache_key(QUESTION)) is None
+
+
+def _at_angle(degrees: float) -> list:
+    """Vetor unitário com a similaridade de cosseno cos(degrees) em relação a [1, 0]."""
+    radians = math.radians(degrees)
+    return [math.cos(radians), math.sin(radians)]
+
+
+def test_semantic_hit_requires_the_similarity_threshold():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9, ttl_seconds=60)
+    cache.put(QUESTION, [1.0, 0.0], SCOPE, 'resposta')
+
+    # cos(20°) ≈ 0.94 e cos(30°) ≈ 0.87
+    assert cache.get('Velocidade máxima na autoestrada?', _at_angle(20), SCOPE) == 'resposta'
+    assert cache.get('Qual é a multa por excesso de velocidade?', _at_angle(30), SCOPE) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_semantic_entries_are_invalidated():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9, ttl_seconds=60)
+    cache.put(QUESTION, [1.0, 0.0], SCOPE, 'resposta')
+
+    # Outra versão do corpus (ou outro modelo) não reutiliza a resposta
+    assert cache.get(QUESTION, [1.0, 0.0], (2,) + SCOPE[1:]) is None
+    assert cache.get(QUESTION, [1.0, 0.0], SCOPE) == 'resposta'
+    cache.clear()
+    assert cache.get(QUESTION, [1.0, 0.0], SCOPE) is None
+
+
+def test_semantic_entries_expire_after_ttl(clock):
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9, ttl_seconds=60)
+    cache.put(QUESTION, [1.0, 0.0], SCOPE, 'resposta')
+
+    clock.now += 60
+    assert cache.get(QUESTION, [1.0, 0.0], SCOPE) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_semantic_hits_are_audited_as_jsonl(tmp_path):
+    audit_log_path = tmp_path / 'auditoria' / 'semantic_cache.jsonl'
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9, ttl_seconds=60, audit_log_path=str(audit_log_path))
+    cache.put(QUESTION, [1.0, 0.0], SCOPE, 'resposta')
+
+    cache.get('Velocidade máxima na autoestrada?', _at_angle(20), SCOPE)
+    cache.get('Qual é a multa por excesso de velocidade?', _at_angle(30), SCOPE)
+    cache.get(QUESTION, [1.0, 0.0], SCOPE)
+
+    records = [json.loads(line) for line in audit_log_path.read_text(encoding='utf-8').splitlines()]
+    # Só os acertos são registrados
+    assert [record['question'] for record in records] == ['Velocidade máxima na autoestrada?', QUESTION]
+    assert all(record['matched_question'] == QUESTION for record in records)
+    assert records[0]['similarity'] == round(math.cos(math.radians(20)), 4)
+    assert records[1]['similarity'] == 1.0
+    assert all(record['threshold'] == 0.9 for record in records)
@@ -0,0 +1,84 @@
+"""Ordem das consultas do /api/chat: cache exato, embedding da pergunta e cache semântico."""
+
+import asyncio
+
+import pytest
+
+from answer_cache import AnswerCache
+
+QUESTION = 'Qual é a velocidade máxima nas autoestradas?'
+CACHED_RESPONSE = {'result': 'Resposta em cache.', 'source_documents': []}
+
+
+class RecordingSemanticCache:
+    """Cache semântico falso que registra os embeddings consultados."""
+
+    def __init__(self, response=None):
+        self.response = response
+        self.lookups = []
+
+    def get(self, question, question_embedding, scope):
+        self.lookups.append(question_embedding)
+        return self.response
+
+
+@pytest.fixture
+def embedded():
+    """Perguntas enviadas para embedding."""
+    return []
+
+
+@pytest.fixture
+def chat_api(monkeypatch, embedded):
+    """API com caches em memória e o embedding da pergunta contado (sem provedor)."""
+    import api
+
+    def embed_question(question):
+        embedded.append(question)
+        return [1.0, 0.0]
+
+    monkeypatch.setattr(api, 'answer_cache', AnswerCache(16, 60))
+    monkeypatch.setattr(api, 'semantic_cache', RecordingSemanticCache())
+    monkeypatch.setattr(api, 'embed_question', embed_question)
+    return api
+
+
+def _post_chat(api):
+    response = api.app.test_client().post('/api/chat', json={'question': QUESTION, 'format': 'json'})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_exact_hit_skips_question_embedding(chat_api, embedded):
+    chat_api.answer_cache.put(chat_api.get_answer_cache_key(QUESTION), CACHED_RESPONSE)
+    payload = _post_chat(chat_api)
+    assert payload['cached'] is True
+    assert payload['answer'] == 'Resposta em cache.'
+    assert embedded == []
+    assert chat_api.semantic_cache.lookups == []
+
+
+def test_exact_miss_embeds_once_for_semantic_lookup(chat_api, embedded):
+    chat_api.semantic_cache.response = CACHED_RESPONSE
+    payload = _post_chat(chat_api)
+    assert payload['cached'] is True
+    assert embedded == [QUESTION]
+    assert chat_api.semantic_cache.lookups == [[1.0, 0.0]]
+
+
+def test_asgi_exact_hit_skips_question_embedding(chat_api, embedded, monkeypatch):
+    import asgi
+
+    async def embed_question(question):
+        embedded.append(question)
+        return [1.0, 0.0]
+
+    monkeypatch.setattr(asgi.ChatASGIApp, '_embed_question', staticmethod(embed_question))
+    chat_api.answer_cache.put(chat_api.get_answer_cache_key(QUESTION), CACHED_RESPONSE)
+    assert asyncio.run(asgi.app.answer(QUESTION)) == (CACHED_RESPONSE, True)
+    assert embedded == []
+
+    chat_api.answer_cache.clear()
+    chat_api.semantic_cache.response = CACHED_RESPONSE
+    assert asyncio.run(asgi.app.answer('Outra pergunta?')) == (CACHED_RESPONSE, True)
+    assert embedded == ['Outra pergunta?']
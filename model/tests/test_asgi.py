@@ -0,0 +1,134 @@
+"""Aplicação ASGI (asgi.py): rotas Flask em paralelo e /api/chat sem trabalho síncrono no event loop."""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController
+from answer_cache import AnswerCache
+from deadline import Deadline, StageTimeout
+
+QUESTION = 'Qual é a velocidade máxima nas autoestradas?'
+CACHED_RESPONSE = {'result': 'Resposta em cache.', 'source_documents': []}
+
+
+async def call_asgi(app, method: str, path: str, body: bytes = b'', headers: list = None) -> tuple:
+    """Executa uma requisição HTTP numa aplicação ASGI; retorna (status, corpo)."""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Cliente conectado até o fim da resposta
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode('ascii'), 'query_string': b'',
+        'root_path': '', 'headers': [(b'host', b'testserver')] + (headers or []),
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80)
+    }
+    await app(scope, receive, send)
+    status = next(message['status'] for message in sent if message['type'] == 'http.response.start')
+    return status, b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+
+
+def test_wsgi_requests_run_in_parallel():
+    from asgi import _ThreadPoolWsgiToAsgi
+
+    threads = set()
+
+    def slow_app(environ, start_response):
+        threads.add(threading.get_ident())
+        time.sleep(0.3)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [environ['wsgi.input'].read()]
+
+    adapter = _ThreadPoolWsgiToAsgi(slow_app)
+
+    async def run():
+        return await asyncio.gather(*(call_asgi(adapter, 'POST', '/', f'corpo {n}'.encode()) for n in range(4)))
+
+    started_at = time.perf_counter()
+    results = asyncio.run(run())
+    assert time.perf_counter() - started_at < 1.0
+    assert results == [(200, f'corpo {n}'.encode()) for n in range(4)]
+    assert len(threads) == 4
+
+
+def test_flask_routes_are_served():
+    import asgi
+
+    status, body = asyncio.run(call_asgi(asgi.app, 'GET', '/api/stats'))
+    assert status == 200
+    assert 'answer_cache' in json.loads(body)
+
+
+def test_chat_cache_lookup_and_payload_run_off_the_event_loop(monkeypatch):
+    import api
+    import asgi
+
+    answer_cache = AnswerCache(16, 60)
+    answer_cache.put(api.get_answer_cache_key(QUESTION), CACHED_RESPONSE)
+    monkeypatch.setattr(api, 'answer_cache', answer_cache)
+    monkeypatch.setattr(api, 'semantic_cache', None)
+    threads = {}
+
+    def record(name, func):
+        def wrapper(*args, **kwargs):
+            threads[name] = threading.get_ident()
+            return func(*args, **kwargs)
+        monkeypatch.setattr(api, name, wrapper)
+
+    record('lookup_cached_answer', api.lookup_cached_answer)
+    record('build_chat_payload', api.build_chat_payload)
+
+    async def run():
+        threads['loop'] = threading.get_ident()
+        body = json.dumps({'question': QUESTION, 'format': 'json'}).encode('utf-8')
+        return await call_asgi(asgi.app, 'POST', '/api/chat', body, [(b'content-type', b'application/json')])
+
+    status, body = asyncio.run(run())
+    assert status == 200
+    assert json.loads(body)['cached'] is True
+    assert threads['lookup_cached_answer'] != threads['loop']
+    assert threads['build_chat_payload'] != threads['loop']
+
+
+def test_abandoned_retrieval_keeps_the_admission_slot(monkeypatch):
+    import api
+    import asgi
+
+    admission = AdmissionController(max_concurrent=1)
+    monkeypatch.setattr(api, 'admission', admission)
+    retrieval_done = threading.Event()
+
+    def slow_retrieval(question, tier):
+        time.sleep(0.3)
+        retrieval_done.set()
+
+    async def embed_question(question):
+        return [0.0]
+
+    monkeypatch.setattr(api, 'retrieve_documents', slow_retrieval)
+    monkeypatch.setattr(asgi.ChatASGIApp, '_embed_question', staticmethod(embed_question))
+
+    async def run():
+        with pytest.raises(StageTimeout) as exc_info:
+            await asgi.app.compute_answer(QUESTION, api.get_answer_cache_key(QUESTION), None, '', Deadline(0.05))
+        return exc_info.value.stage, admission.stats()['in_flight']
+
+    stage, in_flight = asyncio.run(run())
+    assert stage == 'retrieval'
+    # A busca abandonada continua na thread e segura a vaga até terminar
+    assert in_flight == 1
+    assert retrieval_done.wait(timeout=5)
+    time.sleep(0.05)
+    assert admission.stats()['in_flight'] == 0
@@ -0,0 +1,72 @@
+"""Publicação do snapshot do índice junto com a versão do corpus (vários workers)."""
+
+from corpus_version import CorpusVersionStamp
+from index_snapshot import load_current_snapshot
+
+
+def test_before_publish_runs_before_version_is_visible(tmp_path):
+    path = str(tmp_path / 'corpus.version')
+    writer, reader = CorpusVersionStamp(path), CorpusVersionStamp(path)
+    seen = []
+
+    def before_publish(version):
+        seen.append((version, reader.current()))
+
+    assert writer.bump(before_publish) == 1
+    assert seen == [(1, 0)]
+    assert reader.current() == 1
+
+
+def test_before_publish_error_does_not_block_bump(tmp_path):
+    stamp = CorpusVersionStamp(str(tmp_path / 'corpus.version'))
+
+    def failing(version):
+        raise RuntimeError('falha')
+
+    assert stamp.bump(failing) == 1
+    assert stamp.current() == 1
+
+
+def _watch_publication(processor):
+    """Registra, no momento da exportação, a versão vista por outro worker e a do snapshot publicado."""
+    other_worker = CorpusVersionStamp(processor.version_stamp.path)
+    observed = []
+    publish = processor._publish_index_snapshot
+
+    def watched(version):
+        before = other_worker.current()
+        publish(version)
+        snapshot = load_current_snapshot(processor.index_snapshot_path)
+        observed.append({'version': version, 'seen_by_other': before, 'snapshot': snapshot.corpus_version})
+
+    processor._publish_index_snapshot = watched
+    return other_worker, observed
+
+
+def test_snapshot_is_published_before_version(processor, make_pdf):
+    other_worker, observed = _watch_publication(processor)
+
+    processor.process_pdfs([make_pdf(1)])
+    assert observed == [{'version': 1, 'seen_by_other': 0, 'snapshot': 1}]
+    assert other_worker.current() == 1
+    assert processor.get_index_snapshot().corpus_version == 1
+
+    new_name = 'Decreto-renomeado.pdf'
+    assert processor.update_document_name(processor.get_documents_list()[0]['name'], new_name)
+    assert observed[-1] == {'version': 2, 'seen_by_other': 1, 'snapshot': 2}
+    snapshot = processor.get_index_snapshot()
+    assert snapshot is not None and snapshot.corpus_version == 2
+
+    assert processor.delete_document(new_name)
+    assert observed[-1] == {'version': 3, 'seen_by_other': 2, 'snapshot': 3}
+    snapshot = processor.get_index_snapshot()
+    assert snapshot is not None and snapshot.count == 0
+
+
+def test_clear_publishes_empty_snapshot_first(processor, make_pdf):
+    processor.process_pdfs([make_pdf(2)])
+    _, observed = _watch_publication(processor)
+
+    processor.clear_vectorstore()
+    assert observed == [{'version': 2, 'seen_by_other': 1, 'snapshot': 2}]
+    assert processor.get_index_snapshot().count == 0
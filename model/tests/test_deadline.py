@@ -0,0 +1,55 @@
+"""Testes do prazo das perguntas (deadline.py)."""
+
+import time
+from concurrent import futures
+
+import pytest
+
+import deadline as deadline_module
+from deadline import Deadline, StageTimeout, run_stage
+
+
+def test_run_stage_returns_result():
+    assert run_stage('retrieval', lambda: 42, Deadline(5)) == 42
+
+
+def test_run_stage_timeout_raises_stage_timeout():
+    with pytest.raises(StageTimeout) as excinfo:
+        run_stage('llm', lambda: time.sleep(1), Deadline(5), stage_seconds=0.05)
+    assert excinfo.value.stage == 'llm'
+    assert excinfo.value.future is not None
+
+
+def test_run_stage_keeps_timeout_raised_by_the_stage():
+    def stage():
+        raise TimeoutError('provedor')
+
+    with pytest.raises(TimeoutError) as excinfo:
+        run_stage('embedding', stage, Deadline(5))
+    assert not isinstance(excinfo.value, StageTimeout)
+
+
+class LateFuture(futures.Future):
+    """Future cuja espera esgota no mesmo instante em que a etapa termina."""
+
+    def result(self, timeout=None):
+        if timeout is not None and not self.done():
+            self.set_result(42)
+            raise futures.TimeoutError()
+        return super().result(timeout)
+
+
+class LateExecutor:
+    def submit(self, fn, *args, **kwargs):
+        return LateFuture()
+
+
+def test_run_stage_returns_result_finished_right_after_the_wait(monkeypatch):
+    monkeypatch.setattr(deadline_module, '_get_executor', LateExecutor)
+    assert run_stage('retrieval', lambda: 42, Deadline(5)) == 42
+
+
+def test_run_stage_without_time_left():
+    deadline = Deadline(0)
+    with pytest.raises(StageTimeout):
+        run_stage('retrieval', lambda: 42, deadline)
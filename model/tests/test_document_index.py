@@ -0,0 +1,82 @@
+"""Índice em memória dos nomes de documentos (document_index.py)."""
+
+import threading
+import time
+
+from document_index import DocumentNameIndex
+from rwlock import ReadWriteLock
+
+DOCUMENTS = [{'name': 'Decreto_Lei_n_01.2011.pdf'}, {'name': 'Regulamento_de_Sinalizacao.pdf'}]
+
+
+class SlowLoader:
+    """Loader que demora e conta as leituras do banco."""
+
+    def __init__(self, seconds: float = 0.2, on_call=None):
+        self.seconds = seconds
+        self.on_call = on_call
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.on_call:
+            self.on_call(self.calls)
+        time.sleep(self.seconds)
+        return list(DOCUMENTS)
+
+
+def _run_threads(target, count: int = 8):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return threads
+
+
+def test_concurrent_misses_load_once():
+    loader = SlowLoader()
+    index = DocumentNameIndex(loader)
+    results = []
+    _run_threads(lambda: results.append(index.find('decreto lei n 01.2011')))
+
+    assert loader.calls == 1
+    assert results == ['Decreto_Lei_n_01.2011.pdf'] * 8
+
+
+def test_invalidation_during_rebuild_is_not_published():
+    index = None
+
+    def invalidate_first_load(call):
+        if call == 1:
+            index.invalidate()
+
+    loader = SlowLoader(seconds=0.0, on_call=invalidate_first_load)
+    index = DocumentNameIndex(loader)
+    assert len(index.documents()) == 2
+    assert len(index.documents()) == 2
+    # A primeira leitura foi invalidada no meio: a segunda consulta recarrega
+    assert loader.calls == 2
+    index.documents()
+    assert loader.calls == 2
+
+
+def test_writer_rebuilds_while_reader_waits():
+    lock = ReadWriteLock()
+    loader = SlowLoader(seconds=0.05)
+
+    def load():
+        with lock.read_locked():
+            return loader()
+
+    index = DocumentNameIndex(load, guard=lambda: lock.read_locked())
+    with lock.write_locked():
+        reader = threading.Thread(target=index.documents)
+        reader.start()
+        time.sleep(0.05)
+        # O escritor consulta o índice enquanto a leitura espera a trava
+        assert len(index.documents()) == 2
+    reader.join(timeout=5)
+
+    assert not reader.is_alive()
+    assert loader.calls == 1
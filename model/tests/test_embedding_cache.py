@@ -0,0 +1,143 @@
+"""Testes da camada de embeddings (embedding_cache.py)."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import embedding_cache
+from benchmarks.stubs import HashEmbeddings
+from deadline import StageTimeout
+from embedding_cache import CachedQueryEmbeddings
+
+
+class CountingEmbeddings(HashEmbeddings):
+    """HashEmbeddings que conta os textos enviados ao "provedor"."""
+
+    def __init__(self, barrier: threading.Barrier = None, slow_texts: dict = None, **kwargs):
+        super().__init__(**kwargs)
+        self.barrier = barrier
+        # Texto -> latência (segundos) dos lotes que o contêm
+        self.slow_texts = slow_texts or {}
+        self.texts = []
+        self._texts_lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._texts_lock:
+            self.texts.extend(texts)
+        time.sleep(max([self.slow_texts.get(text, 0.0) for text in texts] or [0.0]))
+        vectors = super().embed_documents(texts)
+        if self.barrier is not None:
+            # Os dois uploads terminam a preparação antes de qualquer gravação
+            self.barrier.wait(timeout=30)
+        return vectors
+
+
+def test_prepared_vectors_are_reused_without_new_calls():
+    base = CountingEmbeddings(dimension=16)
+    embeddings = CachedQueryEmbeddings(base)
+    prepared = embeddings.prepare_documents(['a', 'b'])
+    assert prepared.embed_documents(['b', 'a']) == HashEmbeddings(dimension=16).embed_documents(['b', 'a'])
+    assert base.texts == ['a', 'b']
+    prepared.embed_documents(['a', 'c'])
+    assert base.texts == ['a', 'b', 'c']
+
+
+def test_prepared_vectors_belong_to_each_ingestion():
+    base = CountingEmbeddings(dimension=16)
+    embeddings = CachedQueryEmbeddings(base)
+    first = embeddings.prepare_documents(['a'])
+    second = embeddings.prepare_documents(['b'])
+    first.release()
+    assert second.embed_documents(['b']) == HashEmbeddings(dimension=16).embed_documents(['b'])
+    assert base.texts == ['a', 'b']
+
+
+def test_concurrent_uploads_embed_each_chunk_once(processor, make_pdf):
+    base = CountingEmbeddings(barrier=threading.Barrier(2), dimension=64)
+    processor.embeddings = CachedQueryEmbeddings(base, provider='stub', model='stub-embedding')
+    results, errors = [], []
+
+    def upload(number):
+        try:
+            results.append(processor.process_pdfs([make_pdf(number)]))
+        except Exception as e:  # pragma: no cover - falha reportada abaixo
+            errors.append(e)
+
+    threads = [threading.Thread(target=upload, args=(number,)) for number in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=120)
+
+    assert not errors
+    total_chunks = sum(result['total_chunks'] for result in results)
+    assert len(base.texts) == total_chunks
+    assert {document['name'] for document in processor.get_documents_list()} == {
+        make_pdf(1)[1], make_pdf(2)[1]
+    }
+
+
+@pytest.fixture
+def billed(monkeypatch):
+    """Tokens de embeddings registrados (um item por registro)."""
+    records = []
+    monkeypatch.setattr(embedding_cache, 'record_embedding',
+                        lambda provider, model, tokens, document=None: records.append(tokens))
+    return records
+
+
+def _wait_until(condition, timeout: float = 5.0):
+    limit = time.monotonic() + timeout
+    while not condition() and time.monotonic() < limit:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_duplicate_queries_in_one_batch_are_billed_once(billed):
+    base = CountingEmbeddings(dimension=16)
+    embeddings = CachedQueryEmbeddings(base, batch_window_ms=200)
+    vectors = []
+    threads = [threading.Thread(target=lambda: vectors.append(embeddings.embed_query('Qual a multa?')))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert len(vectors) == 3 and vectors[0] == vectors[1] == vectors[2]
+    assert base.texts == ['Qual a multa?']
+    assert len(billed) == 1
+
+
+def test_slow_batch_does_not_block_the_next_one():
+    base = CountingEmbeddings(slow_texts={'lenta': 1.0}, dimension=16)
+    embeddings = CachedQueryEmbeddings(base, batch_window_ms=1)
+    slow = threading.Thread(target=embeddings.embed_query, args=('lenta',))
+    slow.start()
+    assert _wait_until(lambda: 'lenta' in base.texts)
+
+    started_at = time.monotonic()
+    embeddings.embed_query('rápida')
+    assert time.monotonic() - started_at < 0.5
+    slow.join(timeout=5)
+
+
+@pytest.mark.parametrize('asynchronous', [False, True])
+def test_wait_is_bounded_and_abandoned_embedding_is_kept(billed, asynchronous):
+    base = CountingEmbeddings(slow_texts={'lenta': 0.5}, dimension=16)
+    embeddings = CachedQueryEmbeddings(base, batch_window_ms=1, timeout_seconds=0.05)
+
+    with pytest.raises(StageTimeout) as excinfo:
+        if asynchronous:
+            asyncio.run(embeddings.aembed_query('lenta'))
+        else:
+            embeddings.embed_query('lenta')
+    assert excinfo.value.stage == 'embedding'
+
+    # O vetor chega depois: vai para o cache e os tokens são registrados uma vez
+    assert _wait_until(lambda: len(billed) == 1)
+    assert embeddings.stats()['entries'] == 1
+    embeddings.embed_query('lenta')
+    assert base.texts == ['lenta']
@@ -0,0 +1,86 @@
+"""Política de carga e modo degradado (load_policy.py)."""
+
+import pytest
+from langchain_core.documents import Document
+
+import load_policy
+from load_policy import TIER_DEGRADED, TIER_NORMAL, LoadPolicy, apply_context_budget
+
+
+class FakeClock:
+    """Relógio controlado pelo teste no lugar de time.monotonic."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(load_policy, 'time', fake)
+    return fake
+
+
+def build_policy() -> LoadPolicy:
+    return LoadPolicy(queue_depth_threshold=8, p95_threshold_seconds=10.0, recovery_ratio=0.5,
+                      min_degraded_seconds=30.0, window_seconds=60.0)
+
+
+def test_queue_depth_switches_down_and_back_with_hysteresis(clock):
+    policy = build_policy()
+    assert policy.select_tier(7) == TIER_NORMAL
+    assert policy.select_tier(8) == TIER_DEGRADED
+
+    # Abaixo do limite, mas antes do tempo mínimo no modo degradado
+    clock.now += 29
+    assert policy.select_tier(0) == TIER_DEGRADED
+    clock.now += 1
+    # Entre a fração de recuperação (4) e o limite (8): continua degradado
+    assert policy.select_tier(5) == TIER_DEGRADED
+    assert policy.select_tier(4) == TIER_NORMAL
+
+    stats = policy.stats()
+    assert stats['switches'] == 2
+    assert stats['answers'] == {TIER_NORMAL: 2, TIER_DEGRADED: 3}
+
+
+def test_latency_p95_switches_down_and_back(clock):
+    policy = build_policy()
+    for _ in range(20):
+        policy.record_latency(2.0)
+    assert policy.select_tier(0) == TIER_NORMAL
+    for _ in range(2):
+        policy.record_latency(12.0)
+    assert policy.select_tier(0) == TIER_DEGRADED
+
+    # As latências altas continuam na janela: sem volta
+    clock.now += 30
+    assert policy.select_tier(0) == TIER_DEGRADED
+    # Fora da janela, o p95 cai (sem latências recentes) e o nível normal volta
+    clock.now += 31
+    assert policy.select_tier(0) == TIER_NORMAL
+    assert policy.stats()['latency_p95_seconds'] is None
+
+
+def _documents(*sizes: int) -> list:
+    return [Document(page_content='x' * size, metadata={'chunk': index}) for index, size in enumerate(sizes)]
+
+
+def test_context_budget_keeps_leading_chunks_within_the_limit():
+    documents = _documents(400, 300, 200, 100)
+    selected = apply_context_budget(documents, 750)
+    # A ordem da busca é mantida e o corte acontece no primeiro trecho que não cabe
+    assert [document.metadata['chunk'] for document in selected] == [0, 1]
+
+
+def test_context_budget_always_keeps_the_first_chunk():
+    documents = _documents(1000, 10)
+    assert apply_context_budget(documents, 500) == documents[:1]
+
+
+def test_context_budget_zero_means_no_limit():
+    documents = _documents(1000, 1000)
+    assert apply_context_budget(documents, 0) == documents
@@ -0,0 +1,117 @@
+"""Testes do renderizador de respostas (markdown_renderer.py), incluindo entradas adversariais."""
+
+import time
+
+import pytest
+
+from benchmarks.bench_markdown_renderer import ADVERSARIAL_INPUTS, growth_per_doubling
+from markdown_renderer import MAX_CITATION_CHARS, parse_fontes_line, render_answer_html
+
+BASE_URL = 'http://localhost:5001'
+DOCUMENT = 'Decreto-Lei-n-01.2011-Aprova-o-Codigo-da-Estrada.pdf'
+
+
+def test_citation_becomes_document_link():
+    html = render_answer_html(f'Multa de 200,00MT (Artigo 127, número 16 do [{DOCUMENT}]).', BASE_URL)
+    assert f'href="{BASE_URL}/api/documents/{DOCUMENT}/view"' in html
+    assert html.startswith('<p>Multa de 200,00MT (Artigo 127, número 16 do <a ')
+    assert html.endswith('</a>).</p>')
+
+
+def test_multiple_citations_in_one_line():
+    html = render_answer_html('(Artigo 1 do [A.pdf]) e (Art. 2 do [B.pdf])', BASE_URL)
+    assert html.count('class="document-link"') == 2
+
+
+@pytest.mark.parametrize('text', [
+    '(Artigo 1 sem documento)',
+    '(Artigo 1 [A.pdf])',
+    '(do [A.pdf])',
+    '(Artigo 1 do [])',
+    '(Artigo 1 do [A.pdf]',
+])
+def test_non_citations_are_not_linked(text):
+    assert '<a ' not in render_answer_html(text, BASE_URL)
+
+
+def test_citation_longer_than_limit_is_not_linked():
+    article = 'Artigo ' + '1' * MAX_CITATION_CHARS
+    assert '<a ' not in render_answer_html(f'({article} do [A.pdf])', BASE_URL)
+
+
+def test_unclosed_parenthesis_does_not_hide_later_citation():
+    html = render_answer_html('Texto (sem fechar x) y) z (Artigo 3 do [A.pdf])', BASE_URL)
+    assert html.count('class="document-link"') == 1
+
+
+def test_html_is_escaped():
+    html = render_answer_html('<script>alert(1)</script> **multa** (Artigo 1 do [<b>.pdf])', BASE_URL)
+    assert '<script>' not in html
+    assert '&lt;script&gt;' in html
+    assert '<strong>multa</strong>' in html
+    assert '>&lt;b&gt;.pdf</a>' in html
+
+
+def test_headings_and_lists():
+    html = render_answer_html('## Título\n### Subtítulo\n* item 1\n- item 2\nTexto', BASE_URL)
+    assert html.split('\n') == [
+        '<h2>Título</h2>', '<h3>Subtítulo</h3>',
+        '<ul>', '<li>item 1</li>', '<li>item 2</li>', '</ul>',
+        '<p>Texto</p>'
+    ]
+
+
+@pytest.mark.parametrize('heading', [
+    'FONTES:', 'Fontes', '## FONTES:', '**FONTES:**', 'REFERÊNCIAS:',
+    '**Fontes consultadas - FONTES:**', 'Documentos utilizados - fontes:'
+])
+def test_fontes_heading_variants(heading):
+    html = render_answer_html(f'{heading}\n{DOCUMENT}, Artigo 127', BASE_URL)
+    assert html.startswith('<h3>FONTES:</h3>\n<p><a ')
+    assert html.endswith(', Artigo 127</p>')
+
+
+def test_fontes_heading_requires_keyword_at_end_of_line():
+    html = render_answer_html('As FONTES: estão abaixo\nA.pdf, Artigo 1', BASE_URL)
+    assert '<h3>FONTES:</h3>' not in html
+
+
+def test_fontes_link_uses_resolved_name():
+    html = render_answer_html('FONTES:\n- Decreto Lei.pdf, Artigo 1', BASE_URL,
+                              resolve_document=lambda name: 'Decreto-Lei.pdf')
+    assert f'href="{BASE_URL}/api/documents/Decreto-Lei.pdf/view"' in html
+    assert '>Decreto Lei.pdf</a>, Artigo 1' in html
+
+
+def test_new_heading_ends_fontes_section():
+    html = render_answer_html('FONTES:\nA.pdf, Artigo 1\n## Outro assunto\nB.pdf, Artigo 2', BASE_URL)
+    assert html.endswith('<h2>Outro assunto</h2>\n<p>B.pdf, Artigo 2</p>')
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('A.pdf, Artigo 1', ('A.pdf', 'Artigo 1')),
+    ('[Nome do  documento], Artigo 2, número 3', ('Nome do documento', 'Artigo 2, número 3')),
+    ('A.pdf Artigo 4', ('A.pdf', 'Artigo 4')),
+    ('**A.pdf**, Art. 5', ('A.pdf', 'Art. 5')),
+    ('sem referência', None),
+])
+def test_parse_fontes_line(line, expected):
+    assert parse_fontes_line(line) == expected
+
+
+@pytest.mark.parametrize('description, build', ADVERSARIAL_INPUTS, ids=[item[0] for item in ADVERSARIAL_INPUTS])
+def test_adversarial_inputs_scale_linearly(description, build):
+    # Linear: ~2x por duplicação; quadrático: ~4x. Uma nova medição absorve ruído pontual
+    for _ in range(2):
+        _, growth = growth_per_doubling(build, (4000, 8000, 16000, 32000))
+        if growth <= 2.5:
+            break
+    assert growth <= 2.5, f'{description}: x{growth:.2f} por duplicação'
+
+
+def test_unclosed_parenthesis_with_many_closings_is_fast():
+    text = '(' + 'x)' * 200000
+    started_at = time.perf_counter()
+    html = render_answer_html(text, BASE_URL)
+    assert time.perf_counter() - started_at < 1.0
+    assert '<a ' not in html
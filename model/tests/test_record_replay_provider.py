@@ -0,0 +1,56 @@
+"""Gravação e reprodução das chamadas ao LLM (llm_providers/record_replay_provider.py)."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from benchmarks.stubs import StubChatModel
+from llm_providers.record_replay_provider import LLMReplayMiss, RecordReplayProvider
+
+MESSAGES = [SystemMessage(content='Responda com base no Código da Estrada.'),
+            HumanMessage(content='Qual é a velocidade máxima nas autoestradas?')]
+PROVIDER_CONFIG = {'model': 'modelo-teste', 'temperature': 0.0, 'api_key': 'chave-de-teste'}
+
+
+def build_provider(path, mode: str, factory) -> RecordReplayProvider:
+    return RecordReplayProvider({'mode': mode, 'provider': 'openai', 'provider_config': dict(PROVIDER_CONFIG),
+                                 'factory': factory, 'path': str(path)})
+
+
+def no_backend():
+    raise AssertionError('o modo strict não cria o provedor real')
+
+
+def test_recorded_call_is_replayed_without_the_provider(tmp_path):
+    backend = StubChatModel(latency_seconds=0.0, answer='Nas autoestradas, 120 km/h.')
+    recorder = build_provider(tmp_path, 'record', lambda: SimpleNamespace(get_llm=lambda: backend))
+    recorded = recorder.get_llm().invoke(MESSAGES)
+    assert recorded.content == 'Nas autoestradas, 120 km/h.'
+    assert backend.calls == 1
+    assert len(list(tmp_path.glob('*.json'))) == 1
+
+    # Outro processo (nova instância), sem chave de API e sem o provedor real
+    player = build_provider(tmp_path, 'strict', no_backend)
+    replayed = player.get_llm().invoke(MESSAGES)
+    assert replayed.content == recorded.content
+    assert replayed.response_metadata['replayed'] is True
+    assert asyncio.run(player.get_llm().ainvoke(MESSAGES)).content == recorded.content
+    assert backend.calls == 1
+
+
+def test_strict_mode_fails_on_unrecorded_call(tmp_path):
+    player = build_provider(tmp_path, 'strict', no_backend)
+    with pytest.raises(LLMReplayMiss):
+        player.get_llm().invoke([HumanMessage(content='Pergunta nunca gravada?')])
+
+
+def test_replay_mode_records_missing_calls_once(tmp_path):
+    backend = StubChatModel(latency_seconds=0.0)
+    player = build_provider(tmp_path, 'replay', lambda: SimpleNamespace(get_llm=lambda: backend))
+    first = player.get_llm().invoke(MESSAGES)
+    second = player.get_llm().invoke(MESSAGES)
+
+    assert second.content == first.content
+    assert backend.calls == 1
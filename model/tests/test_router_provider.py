@@ -0,0 +1,91 @@
+"""Roteamento entre provedores de LLM (llm_providers/router_provider.py) com provedores locais."""
+
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.stubs import StubChatModel
+from llm_providers.router_provider import BackendHealth, RouterBackend, RoutingChatModel
+
+MESSAGES = [[HumanMessage(content='Qual é a velocidade máxima?')]]
+
+
+class CancellableStubChatModel(StubChatModel):
+    """StubChatModel que conta as chamadas assíncronas canceladas."""
+
+    cancelled: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        try:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def build_router(primary: StubChatModel, secondary: StubChatModel, **kwargs) -> RoutingChatModel:
+    backends = [
+        RouterBackend('primary', primary, BackendHealth()),
+        RouterBackend('secondary', secondary, BackendHealth())
+    ]
+    return RoutingChatModel(backends=backends, **kwargs)
+
+
+def router_info(result) -> dict:
+    return result.llm_output['router']
+
+
+def test_primary_error_fails_over_to_secondary():
+    router = build_router(StubChatModel(latency_seconds=0.0, error_rate=1.0),
+                          StubChatModel(latency_seconds=0.0, answer='Resposta do secundário.'))
+    result = router.generate(MESSAGES)
+    assert result.generations[0][0].text == 'Resposta do secundário.'
+    assert router_info(result) == {'backend': 'secondary', 'hedge': False, 'attempts': 2}
+    stats = router.stats()
+    assert stats['primary']['errors'] == 1
+    assert stats['secondary']['answered'] == 1
+
+
+def test_async_primary_error_fails_over_to_secondary():
+    router = build_router(StubChatModel(latency_seconds=0.0, error_rate=1.0),
+                          StubChatModel(latency_seconds=0.0))
+    result = asyncio.run(router.agenerate(MESSAGES))
+    assert router_info(result)['backend'] == 'secondary'
+    assert router.stats()['primary']['errors'] == 1
+
+
+def test_primary_timeout_fails_over_to_secondary():
+    router = build_router(StubChatModel(latency_seconds=1.0), StubChatModel(latency_seconds=0.0),
+                          timeout_seconds=0.1)
+    result = router.generate(MESSAGES)
+    assert router_info(result) == {'backend': 'secondary', 'hedge': False, 'attempts': 2}
+    assert router.stats()['primary']['timeouts'] == 1
+
+
+def test_hedge_winner_is_returned():
+    router = build_router(StubChatModel(latency_seconds=1.0, answer='Resposta lenta.'),
+                          StubChatModel(latency_seconds=0.0, answer='Resposta de reserva.'),
+                          hedge_enabled=True, hedge_min_seconds=0.05, timeout_seconds=5.0)
+    result = router.generate(MESSAGES)
+    assert result.generations[0][0].text == 'Resposta de reserva.'
+    assert router_info(result) == {'backend': 'secondary', 'hedge': True, 'attempts': 2}
+    assert router.stats()['secondary']['hedges'] == 1
+
+
+def test_losing_async_call_is_cancelled():
+    primary = CancellableStubChatModel(latency_seconds=1.0)
+    router = build_router(primary, StubChatModel(latency_seconds=0.0),
+                          hedge_enabled=True, hedge_min_seconds=0.05, timeout_seconds=5.0)
+
+    async def run():
+        result = await router.agenerate(MESSAGES)
+        # Deixa o event loop entregar o cancelamento à chamada perdedora (antes
+        # do fim do asyncio.run, que cancelaria as tarefas restantes)
+        await asyncio.sleep(0.05)
+        return result, primary.cancelled
+
+    result, cancelled = asyncio.run(run())
+    assert router_info(result) == {'backend': 'secondary', 'hedge': True, 'attempts': 2}
+    assert cancelled == 1
+    # Perder para a reserva não conta como erro do provedor
+    assert router.stats()['primary']['errors'] == 0
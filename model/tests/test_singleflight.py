@@ -0,0 +1,143 @@
+"""Agrupamento de perguntas idênticas em andamento (singleflight.py)."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionRejected
+from deadline import Deadline, StageTimeout
+from singleflight import SingleFlight
+
+LEADER_ERRORS = (AdmissionRejected, StageTimeout)
+
+
+def _run_with_followers(flight: SingleFlight, leader_func, follower_func, followers: int = 2):
+    """Líder bloqueado até os seguidores entrarem na tabela; retorna (resultados, erros) dos seguidores."""
+    release = threading.Event()
+    results, errors = [], []
+
+    def compute():
+        release.wait(timeout=5)
+        return leader_func()
+
+    def leader():
+        try:
+            flight.do('pergunta', compute, retry_errors=LEADER_ERRORS)
+        except Exception:
+            pass
+
+    def follower():
+        try:
+            results.append(flight.do('pergunta', follower_func, retry_errors=LEADER_ERRORS))
+        except Exception as e:
+            errors.append(e)
+
+    leader_thread = threading.Thread(target=leader)
+    leader_thread.start()
+    while flight.stats()['in_flight'] == 0:
+        time.sleep(0.01)
+    threads = [threading.Thread(target=follower) for _ in range(followers)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()['coalesced'] < followers:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader_thread] + threads:
+        thread.join(timeout=5)
+    return results, errors
+
+
+@pytest.mark.parametrize('error', [AdmissionRejected('queue_full', 1), StageTimeout('queue', 1.0)])
+def test_one_follower_leads_after_leader_specific_errors(error):
+    flight = SingleFlight()
+    follower_calls = []
+
+    def leader_func():
+        raise error
+
+    def follower_func():
+        follower_calls.append(1)
+        # Segura a nova execução até o outro seguidor voltar à tabela e esperar por ela
+        while flight.stats()['coalesced'] < 3:
+            time.sleep(0.01)
+        return 'resposta do seguidor'
+
+    results, errors = _run_with_followers(flight, leader_func, follower_func)
+    assert errors == []
+    assert follower_calls == [1]
+    assert sorted(results) == [('resposta do seguidor', False), ('resposta do seguidor', True)]
+    assert flight.stats()['fallbacks'] == 2
+
+
+def test_other_errors_are_shared():
+    flight = SingleFlight()
+    follower_calls = []
+
+    def leader_func():
+        raise RuntimeError('falha do provedor')
+
+    results, errors = _run_with_followers(flight, leader_func, lambda: follower_calls.append(1))
+    assert results == [] and len(errors) == 2
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert follower_calls == []
+    assert flight.stats()['fallbacks'] == 0
+
+
+def test_async_follower_computes_on_leader_admission_error():
+    flight = SingleFlight()
+
+    async def leader_func():
+        await asyncio.sleep(0.05)
+        raise AdmissionRejected('client_queue_full', 1)
+
+    async def follower_func():
+        return 'resposta do seguidor'
+
+    async def run():
+        leader = asyncio.ensure_future(flight.ado('pergunta', leader_func, retry_errors=LEADER_ERRORS))
+        await asyncio.sleep(0)
+        follower = await flight.ado('pergunta', follower_func, retry_errors=LEADER_ERRORS)
+        with pytest.raises(AdmissionRejected):
+            await leader
+        return follower
+
+    assert asyncio.run(run()) == ('resposta do seguidor', False)
+    assert flight.stats()['fallbacks'] == 1
+
+
+def test_follower_wait_is_bounded_by_its_deadline():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=('pergunta', lambda: release.wait(timeout=5)))
+    leader.start()
+    while flight.stats()['in_flight'] == 0:
+        time.sleep(0.01)
+
+    started_at = time.perf_counter()
+    with pytest.raises(StageTimeout) as exc_info:
+        flight.do('pergunta', lambda: 'resposta do seguidor', deadline=Deadline(0.05))
+    release.set()
+    leader.join(timeout=5)
+
+    assert exc_info.value.stage == 'queue'
+    assert time.perf_counter() - started_at < 1.0
+
+
+def test_async_follower_wait_is_bounded_by_its_deadline():
+    flight = SingleFlight()
+
+    async def leader_func():
+        await asyncio.sleep(0.3)
+        return 'resposta do líder'
+
+    async def run():
+        leader = asyncio.ensure_future(flight.ado('pergunta', leader_func))
+        await asyncio.sleep(0)
+        with pytest.raises(StageTimeout):
+            await flight.ado('pergunta', leader_func, deadline=Deadline(0.05))
+        # O líder não é cancelado pela desistência do seguidor
+        return await leader
+
+    assert asyncio.run(run()) == ('resposta do líder', False)
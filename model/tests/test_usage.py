@@ -0,0 +1,64 @@
+"""Contabilização de tokens e custos (usage.py)."""
+
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+import usage
+from usage import extract_token_usage, llm_cost
+
+# 100 tokens novos + 400 lidos do cache, 50 de saída
+EXPECTED = {'input_tokens': 500, 'output_tokens': 50, 'cached_input_tokens': 400}
+
+
+def llm_result(llm_output: dict = None, usage_metadata: dict = None) -> LLMResult:
+    message = AIMessage(content='Resposta.', usage_metadata=usage_metadata)
+    return LLMResult(generations=[[ChatGeneration(message=message)]], llm_output=llm_output)
+
+
+def test_anthropic_llm_output_adds_cache_reads_to_input():
+    anthropic_usage = {'input_tokens': 100, 'output_tokens': 50,
+                       'cache_read_input_tokens': 400, 'cache_creation_input_tokens': 0}
+    assert extract_token_usage(llm_result({'usage': anthropic_usage})) == EXPECTED
+    # O SDK também entrega o uso como objeto
+    assert extract_token_usage(llm_result({'usage': SimpleNamespace(**anthropic_usage)})) == EXPECTED
+
+
+def test_openai_llm_output_already_includes_cached_tokens():
+    openai_usage = {'prompt_tokens': 500, 'completion_tokens': 50, 'total_tokens': 550,
+                    'prompt_tokens_details': {'cached_tokens': 400}}
+    assert extract_token_usage(llm_result({'token_usage': openai_usage})) == EXPECTED
+
+
+def test_usage_metadata_takes_precedence_over_llm_output():
+    usage_metadata = {'input_tokens': 500, 'output_tokens': 50, 'total_tokens': 550,
+                      'input_token_details': {'cache_read': 400}}
+    response = llm_result({'token_usage': {'prompt_tokens': 1, 'completion_tokens': 1}}, usage_metadata)
+    assert extract_token_usage(response) == EXPECTED
+
+
+def test_response_without_usage():
+    assert extract_token_usage(llm_result({'model_name': 'modelo'})) is None
+
+
+@pytest.fixture
+def prices(monkeypatch):
+    table = {
+        'modelo-com-cache': {'input': 3.0, 'cached_input': 0.3, 'output': 15.0},
+        'modelo-sem-cache': {'input': 2.0, 'output': 8.0}
+    }
+    monkeypatch.setattr(usage, 'USAGE_PRICES', table)
+    return table
+
+
+def test_llm_cost_prices_cached_input_separately(prices):
+    # (100 * 3.0 + 400 * 0.3 + 50 * 15.0) / 1M
+    assert llm_cost('modelo-com-cache', **EXPECTED) == pytest.approx(1170 / 1_000_000)
+    # Sem preço de cache, os tokens em cache custam o preço de entrada
+    assert llm_cost('modelo-sem-cache', **EXPECTED) == pytest.approx(1400 / 1_000_000)
+
+
+def test_llm_cost_of_unknown_model(prices):
+    assert llm_cost('modelo-desconhecido', **EXPECTED) is None
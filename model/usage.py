@@ -0,0 +1,300 @@
+"""
+Contabilização de tokens e custos do IB - EstradaResponde.
+
+Registra os tokens gastos nas chamadas ao LLM (entrada, saída e entrada em
+cache) e nos embeddings (perguntas e chunks dos documentos), com o custo
+calculado pela tabela de preços USAGE_PRICES (USD por milhão de tokens).
+
+- Cada pergunta ou upload abre um coletor (collect()); os tokens gastos
+  durante a requisição, inclusive nas threads das etapas, são somados nele e
+  devolvidos na resposta.
+- O livro de uso (LEDGER) agrega tudo por dia, por provedor/modelo e por
+  documento (embeddings da ingestão) e, se USAGE_LOG_PATH estiver definido,
+  grava cada registro numa linha JSON. Cada worker tem os seus agregados.
+
+Os tokens do LLM vêm do próprio provedor (usage_metadata do LangChain). Os
+tokens de embeddings são contados localmente com o tiktoken (o mesmo
+tokenizador dos modelos text-embedding-3) ou, sem ele, estimados.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config import USAGE_PRICES, USAGE_LOG_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def extract_token_usage(response) -> Optional[dict]:
+    """
+    Tokens de um LLMResult, se o provedor informar.
+
+    Returns:
+        Dicionário com 'input_tokens', 'output_tokens' e 'cached_input_tokens'
+        (os tokens em cache fazem parte de input_tokens), ou None
+    """
+    totals = {'input_tokens': 0, 'output_tokens': 0, 'cached_input_tokens': 0}
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+            if usage:
+                found = True
+                totals['input_tokens'] += usage.get('input_tokens', 0)
+                totals['output_tokens'] += usage.get('output_tokens', 0)
+                totals['cached_input_tokens'] += (usage.get('input_token_details') or {}).get('cache_read', 0) or 0
+    if found:
+        return totals
+    # Provedores sem usage_metadata: formato do llm_output de cada SDK
+    llm_output = response.llm_output or {}
+    usage = llm_output.get('usage') or llm_output.get('token_usage')
+    if not usage:
+        return None
+    if not isinstance(usage, dict):
+        usage = dict(usage) if hasattr(usage, 'items') else vars(usage)
+    cached = usage.get('cache_read_input_tokens') or (usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0)
+    input_tokens = usage.get('input_tokens', usage.get('prompt_tokens', 0))
+    if 'input_tokens' in usage:
+        # Formato da Anthropic: input_tokens não inclui os tokens lidos do cache
+        input_tokens += cached or 0
+    return {
+        'input_tokens': input_tokens,
+        'output_tokens': usage.get('output_tokens', usage.get('completion_tokens', 0)),
+        'cached_input_tokens': cached or 0
+    }
+
+
+# Tokenizador dos modelos de embeddings da OpenAI; carregado no primeiro uso
+_encoding = None
+_encoding_lock = threading.Lock()
+_ENCODING_UNAVAILABLE = object()
+
+
+def _get_encoding():
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding('cl100k_base')
+            except Exception as e:
+                logger.warning("Tokenizador indisponível, tokens de embeddings serão estimados: %s", e)
+                _encoding = _ENCODING_UNAVAILABLE
+        return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Número de tokens de um texto para embeddings (estimado em ~4 caracteres por token sem o tiktoken)."""
+    encoding = _get_encoding()
+    if encoding is _ENCODING_UNAVAILABLE:
+        return max(1, (len(text) + 3) // 4) if text else 0
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def llm_cost(model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0) -> Optional[float]:
+    """Custo (USD) de uma chamada ao LLM, ou None se o modelo não estiver na tabela de preços."""
+    prices = USAGE_PRICES.get(model)
+    if not prices or 'input' not in prices:
+        return None
+    cached_price = prices.get('cached_input', prices['input'])
+    cost = ((input_tokens - cached_input_tokens) * prices['input']
+            + cached_input_tokens * cached_price
+            + output_tokens * prices.get('output', 0.0))
+    return cost / 1_000_000
+
+
+def embedding_cost(model: str, tokens: int) -> Optional[float]:
+    """Custo (USD) de embeddings, ou None se o modelo não estiver na tabela de preços."""
+    prices = USAGE_PRICES.get(model)
+    if not prices or 'embedding' not in prices:
+        return None
+    return tokens * prices['embedding'] / 1_000_000
+
+
+def _empty_totals() -> dict:
+    return {'llm_calls': 0, 'input_tokens': 0, 'output_tokens': 0, 'cached_input_tokens': 0,
+            'embedding_tokens': 0, 'cost_usd': 0.0, 'unpriced_tokens': 0}
+
+
+def _add(totals: dict, record: dict):
+    totals['llm_calls'] += 1 if record['kind'] == 'llm' else 0
+    for key in ('input_tokens', 'output_tokens', 'cached_input_tokens', 'embedding_tokens'):
+        totals[key] += record.get(key, 0)
+    if record['cost_usd'] is None:
+        totals['unpriced_tokens'] += (record.get('input_tokens', 0) + record.get('output_tokens', 0)
+                                      + record.get('embedding_tokens', 0))
+    else:
+        totals['cost_usd'] += record['cost_usd']
+
+
+def _rounded(totals: dict) -> dict:
+    return dict(totals, cost_usd=round(totals['cost_usd'], 6))
+
+
+class RequestUsage:
+    """Uso de tokens de uma requisição (pergunta ou upload)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = _empty_totals()
+        self._models: List[str] = []
+
+    def add(self, record: dict):
+        with self._lock:
+            _add(self._totals, record)
+            if record['model'] not in self._models:
+                self._models.append(record['model'])
+
+    def to_dict(self) -> dict:
+        """Totais da requisição ('llm_calls', tokens, 'cost_usd', 'unpriced_tokens' e 'models')."""
+        with self._lock:
+            return dict(_rounded(self._totals), models=list(self._models))
+
+
+class UsageLedger:
+    """Agregados de uso por dia, por provedor/modelo e por documento."""
+
+    def __init__(self, log_path: str = ''):
+        """
+        Args:
+            log_path: Arquivo JSONL com um registro por linha ('' = sem arquivo)
+        """
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        # dia -> 'provedor/modelo' -> totais
+        self._days: Dict[str, Dict[str, dict]] = {}
+        # documento -> totais (embeddings da ingestão)
+        self._documents: Dict[str, dict] = {}
+        self._totals = _empty_totals()
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+
+    def add(self, record: dict):
+        """Soma um registro aos agregados e grava no arquivo de uso."""
+        day = record['timestamp'][:10]
+        key = f"{record['provider']}/{record['model']}"
+        with self._lock:
+            _add(self._days.setdefault(day, {}).setdefault(key, _empty_totals()), record)
+            if record.get('document'):
+                _add(self._documents.setdefault(record['document'], _empty_totals()), record)
+            _add(self._totals, record)
+            if self.log_path:
+                try:
+                    with open(self.log_path, 'a', encoding='utf-8') as log_file:
+                        log_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                except OSError as e:
+                    logger.warning("Erro ao gravar o uso de tokens: %s", e)
+
+    def summary(self) -> dict:
+        """Totais gerais, por dia (e provedor/modelo) e por documento."""
+        with self._lock:
+            return {
+                'totals': _rounded(self._totals),
+                'days': {day: {key: _rounded(totals) for key, totals in models.items()}
+                         for day, models in sorted(self._days.items())},
+                'documents': {name: _rounded(totals) for name, totals in sorted(self._documents.items())},
+                'prices_usd_per_million_tokens': USAGE_PRICES
+            }
+
+
+LEDGER = UsageLedger(USAGE_LOG_PATH)
+
+# Coletor da requisição atual (propagado às threads das etapas com copy_context)
+_current_usage: contextvars.ContextVar = contextvars.ContextVar('request_usage', default=None)
+
+
+@contextmanager
+def collect():
+    """
+    Abre o coletor de uso de uma requisição.
+
+    Exemplo:
+        with usage.collect() as request_usage:
+            answer = ...
+        payload['usage'] = request_usage.to_dict()
+    """
+    request_usage = RequestUsage()
+    token = _current_usage.set(request_usage)
+    try:
+        yield request_usage
+    finally:
+        _current_usage.reset(token)
+
+
+def _record(record: dict):
+    record['timestamp'] = datetime.now().isoformat(timespec='seconds')
+    LEDGER.add(record)
+    request_usage = _current_usage.get()
+    if request_usage is not None:
+        request_usage.add(record)
+
+
+def record_llm(provider: str, model: str, tokens: dict):
+    """
+    Registra os tokens de uma chamada ao LLM.
+
+    Args:
+        provider: Nome do provedor ('claude', 'openai', 'gemini')
+        model: Modelo configurado (chave da tabela de preços)
+        tokens: Resultado de extract_token_usage
+    """
+    _record({
+        'kind': 'llm',
+        'provider': provider,
+        'model': model,
+        'input_tokens': tokens['input_tokens'],
+        'output_tokens': tokens['output_tokens'],
+        'cached_input_tokens': tokens['cached_input_tokens'],
+        'cost_usd': llm_cost(model, tokens['input_tokens'], tokens['output_tokens'],
+                             tokens['cached_input_tokens'])
+    })
+
+
+def record_embedding(provider: str, model: str, tokens: int, document: Optional[str] = None):
+    """
+    Registra os tokens de embeddings.
+
+    Args:
+        provider: Nome do provedor de embeddings
+        model: Modelo de embeddings (chave da tabela de preços)
+        tokens: Tokens enviados ao provedor
+        document: Documento dos chunks (ingestão); None para perguntas
+    """
+    if tokens <= 0:
+        return
+    _record({
+        'kind': 'embedding',
+        'provider': provider,
+        'model': model,
+        'embedding_tokens': tokens,
+        'document': document,
+        'cost_usd': embedding_cost(model, tokens)
+    })
+
+
+class UsageCallback(BaseCallbackHandler):
+    """Registra os tokens de cada chamada a um modelo (instalado pelo BaseLLMProvider)."""
+
+    # Executado na thread/contexto da chamada, onde está o coletor da requisição
+    run_inline = True
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+
+    def on_llm_end(self, response, **kwargs):
+        try:
+            tokens = extract_token_usage(response)
+        except Exception as e:
+            logger.warning("Erro ao ler o uso de tokens de %s: %s", self.provider, e)
+            return
+        if tokens is not None:
+            record_llm(self.provider, self.model, tokens)